@@ -12,6 +12,7 @@ __license__   = """
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+import collections
 import ConfigParser
 import datetime
 import math
@@ -29,7 +30,9 @@ from .Error import ConfigurationError
 from .Logger import FastTripsLogger, setupLogging
 from .Passenger import Passenger
 from .PathSet import PathSet
+from .PathSetCache import PathSetCache
 from .Performance import Performance
+from .Route import Route
 from .Trip import Trip
 from .Util import Util
 
@@ -48,6 +51,13 @@ class Assignment:
     #: (Hmm naming conventions are a bit awkward here)
     CONFIGURATION_OUTPUT_FILE       = 'ft_output_config.txt'
 
+    #: Stop time arrays for the pathfinding worker processes, which memory-map them read-only
+    #: rather than getting the vehicle trips dataframe.  These are rewritten each pathfinding iteration.
+    #: The index is (trip id num, stop sequence, stop id num)
+    STOPTIMES_INDEX_FILE            = 'ft_intermediate_stop_times_index.npy'
+    #: The times are (arrival time min, departure time min, shape dist traveled, overcap)
+    STOPTIMES_TIMES_FILE            = 'ft_intermediate_stop_times_times.npy'
+
     #: Configuration: Input network directory
     INPUT_NETWORK_ARCHIVE               = None
     #: Configuration: Input demand directory
@@ -70,9 +80,13 @@ class Assignment:
     PATHFINDING_TYPE_DETERMINISTIC  = 'deterministic'
     #: Find paths stochastically using trip-based hyperpath
     PATHFINDING_TYPE_STOCHASTIC     = 'stochastic'
+    #: Find a single time-optimal path (earliest arrival, or latest departure for outbound trips) by scanning the
+    #: vehicle trips' stop-to-stop connections in time order (the Connection Scan Algorithm).  Unlike
+    #: :py:attr:`Assignment.PATHFINDING_TYPE_DETERMINISTIC`, generalized cost doesn't choose the path; it's only costed after.
+    PATHFINDING_TYPE_CONNECTION_SCAN= 'connection_scan'
     #: Don't find paths; read :py:attr:`Passenger.PF_PATHS_CSV` and :py:attr:`Passenger.PF_LINKS_CSV`.
     PATHFINDING_TYPE_READ_FILE      = 'file'
-    #: Configuration: Pathfinding Type.  Should be one of `Deterministic`, `Stochastic` or `File`
+    #: Configuration: Pathfinding Type.  Should be one of `Deterministic`, `Stochastic`, `Connection_Scan` or `File`
     PATHFINDING_TYPE                = None
 
     #: Configuration: Do simulation? It should be True for iterative assignment. In a one shot
@@ -94,8 +108,8 @@ class Assignment:
     #: departure time will be checked.  A :py:class:`datetime.timedelta` instance.
     TIME_WINDOW                     = None
 
-    #: Configuration: Create skims flag. This is specific to the travel demand models
-    #: (not working in this version). Boolean.
+    #: Configuration: Create skims flag. This is specific to the travel demand models.
+    #: If true, zone-to-zone skims are written after assignment; see :py:class:`Skimming`. Boolean.
     CREATE_SKIMS                    = None
 
     #: Configuration: Beginning of the time period for which the skim is required.
@@ -106,6 +120,28 @@ class Assignment:
     #: (specify as 'HH:MM'). A :py:class:`datetime.datetime` instance.
     SKIM_END_TIME                   = None
 
+    #: Configuration: Minutes between the departure times that are skimmed, starting at
+    #: :py:attr:`Assignment.SKIM_START_TIME`. Float.
+    SKIM_SAMPLE_INTERVAL            = None
+
+    #: Configuration: User class to skim for. String.
+    SKIM_USER_CLASS                 = None
+
+    #: Configuration: Trip purpose to skim for. String.
+    SKIM_PURPOSE                    = None
+
+    #: Configuration: Access mode to skim for. String.
+    SKIM_ACCESS_MODE                = None
+
+    #: Configuration: Transit mode to skim for. String.
+    SKIM_TRANSIT_MODE               = None
+
+    #: Configuration: Egress mode to skim for. String.
+    SKIM_EGRESS_MODE                = None
+
+    #: Configuration: Value of time to skim for, in currency per hour. Float.
+    SKIM_VALUE_OF_TIME              = None
+
     #: Route choice configuration: Max number of paths in a pathset.
     #: Used in conjuntion with :py:attr:`Assignment.MIN_PATH_PROBABILITY`
     MAX_NUM_PATHS                   = None
@@ -116,6 +152,45 @@ class Assignment:
     #: this threshhold.
     MIN_PATH_PROBABILITY            = None
 
+    #: Route choice configuration: Find one pathset for each group of person trips with identical path
+    #: specifications (origin, destination, preferred time, time target, user class, purpose, modes and
+    #: value of time) and share it with every person trip in the group.  Each still chooses its own path
+    #: and is simulated separately.  Traced person trips are always found on their own. Boolean.
+    DEDUPLICATE_PATHFINDING         = None
+
+    #: Route choice configuration: After the first iteration, only re-find the pathsets of person trips whose
+    #: pathsets ride or board/alight at a trip-stop whose times, overcap or bump wait changed since the last time
+    #: everyone's paths were found.  The rest of the pathsets are carried over.  Boolean.
+    INCREMENTAL_PATHFINDING         = None
+
+    #: Route choice configuration: Directory for the on-disk pathset cache, which keeps pathfinding results across runs
+    #: keyed by the network, the pathfinding configuration, the supply and each person trip's path specification.
+    #: None turns the cache off.  See :py:class:`PathSetCache`. String.
+    PATHSET_CACHE_DIR               = None
+
+    #: Route choice configuration: Size cap, in megabytes, for :py:attr:`Assignment.PATHSET_CACHE_DIR`.  The least
+    #: recently used supplies' pathsets are evicted past it. Float.
+    PATHSET_CACHE_MAX_MB            = None
+
+    #: Route choice configuration: Memory budget, in megabytes, for each path-finding thread's cache of labeled
+    #: hyperpaths.  Trips starting labeling from the same TAZ with the same user class, purpose, modes, value of time
+    #: and preferred time bucket reuse the labeling and only link it to their own end TAZ.  The least recently used
+    #: labelings are evicted when over budget.  Zero turns the cache off. Float.
+    HYPERPATH_CACHE_MB              = None
+
+    #: Route choice configuration: Width, in minutes, of the preferred time buckets for the hyperpath cache.
+    #: Trips whose preferred times fall in the same bucket share a cached labeling, which is labeled for the start
+    #: of the bucket rather than each trip's own preferred time.  Zero means only trips with exactly the same
+    #: preferred time do, and they're labeled for it. Float.
+    HYPERPATH_CACHE_TIME_BUCKET_MIN = None
+
+    #: Route choice configuration: Skip labeling stops that are too far from the other end of the trip to be
+    #: on a useful path.  Each stop gets a lower bound on the in-vehicle time to (or from) that TAZ, which
+    #: is computed once per TAZ, and stops that can't reach it at all are skipped, which doesn't change the pathsets.
+    #: So are stops whose label plus the lower bound is past the labeling cutoff; for stochastic pathfinding,
+    #: the lower bound is scaled by the lowest in-vehicle time weight to make it a generalized cost. Boolean.
+    LOWER_BOUND_PRUNING             = None
+
     #: Route choice configuration: Dispersion parameter in the logit function.
     #: Higher values result in less stochasticity. Must be nonnegative.
     #: If unknown use a value between 0.5 and 1. Float.
@@ -176,6 +251,24 @@ class Assignment:
     #: Set to positive integer greater than 1 to set a fixed number of processes
     NUMBER_OF_PROCESSES             = None
 
+    #: Number of threads to use for path finding (via :py:func:`_fasttrips.find_pathsets_batch`)
+    #: Threads share a single copy of the network supply in this process, so if this is
+    #: greater than 1, :py:attr:`Assignment.NUMBER_OF_PROCESSES` is ignored.
+    #: Set to 1 to find paths one at a time
+    #: Set to less than 1 to use the result of :py:func:`multiprocessing.cpu_count`
+    NUMBER_OF_THREADS               = 1
+
+    #: Number of person trips to find paths for at a time, either as a unit of work for a
+    #: worker process or as a batch for the threads.  Larger chunks mean fewer round trips
+    #: through the worker queues; smaller chunks spread the work more evenly.
+    PATHFINDING_CHUNK_SIZE          = 100
+
+    #: Memory budget, in gigabytes, for this process in simulation.  If positive, the heavy simulation
+    #: DataFrame operations in :py:meth:`PathSet.calculate_cost` (fares, splitting transit links, costing
+    #: and overlap) are done for chunks of person trips sized to fit by :py:meth:`Util.get_chunk_rows`.
+    #: Zero means no budget. Float.
+    MAX_MEMORY_GB                   = 0
+
     #: Extra time so passengers don't get bumped (?). A :py:class:`datetime.timedelta` instance.
     BUMP_BUFFER                     = None
 
@@ -184,6 +277,41 @@ class Assignment:
     bump_wait                       = {}
     bump_wait_df                    = None
 
+    #: Pathfinding worker processes, started by :py:meth:`Assignment.start_worker_processes` and kept
+    #: across iterations so the network supply is only read once per worker.
+    #: workernum -> {"process":process, "update_queue":queue, "alive":alive bool, "done":done bool, "working_on":(iteration, pathfinding_iteration)}
+    worker_process_dict             = {}
+    #: Queue of path specification chunks for the worker processes to find, shared by all of them
+    worker_todo_queue               = None
+    #: Queue of results from the worker processes
+    worker_done_queue               = None
+
+    #: Person trips that share another's pathset this pathfinding iteration; see :py:meth:`Assignment.get_pathfinding_duplicates`
+    pathfinding_duplicates_df       = None
+
+    #: The :py:class:`PathSetCache` for this run, if :py:attr:`Assignment.PATHSET_CACHE_DIR` is set
+    pathset_cache                   = None
+
+    #: The stop times arrays (see :py:meth:`Assignment.get_stop_times_arrays`) this process last passed to the
+    #: C++ extension, so :py:meth:`Assignment.update_fasttrips_extension_supply` only passes them when they change
+    extension_stop_times_arrays     = None
+
+    #: The stop times arrays (see :py:meth:`Assignment.get_stop_times_arrays`) the worker processes have, so
+    #: they're only sent the stop times that changed since; see :py:meth:`Assignment.get_stop_times_changes`
+    worker_stop_times_arrays        = None
+
+    #: The supply the last time everyone's paths were found, for :py:attr:`Assignment.INCREMENTAL_PATHFINDING`;
+    #: see :py:meth:`Assignment.get_incremental_pathfinding_supply`
+    incremental_supply_df           = None
+
+    #: Column in :py:attr:`Assignment.pathfinding_duplicates_df` for the person trip sharing the pathset
+    DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM = "duplicate_trip_list_id_num"
+
+    #: Pathset results from the C++ extension for no person trips; see :py:meth:`Assignment.convert_pathset_results`
+    EMPTY_PATHSET_RESULTS           = (np.zeros((0,2), dtype=np.int32), np.zeros((0,5), dtype=np.float64),
+                                       np.zeros((0,9), dtype=np.int32), np.zeros((0,6), dtype=np.float64),
+                                       np.zeros((0,17), dtype=np.int64))
+
     #: Simulation: bump one stop at a time (slower, more accurate)
     #:
     #: When addressing capacity constraints in simulation, we look at all the (trip, stop)-pairs
@@ -289,6 +417,13 @@ class Assignment:
                       'create_skims'                    :'False',
                       'skim_start_time'                 :'5:00',
                       'skim_end_time'                   :'10:00',
+                      'skim_sample_interval'            :5,
+                      'skim_user_class'                 :'all',
+                      'skim_purpose'                    :'work',
+                      'skim_access_mode'                :'walk',
+                      'skim_transit_mode'               :'transit',
+                      'skim_egress_mode'                :'walk',
+                      'skim_value_of_time'              :10.0,
                       'capacity_constraint'             :'False',
                       'skip_person_ids'                 :'None',
                       'trace_ids'                       :[],
@@ -298,14 +433,24 @@ class Assignment:
                       'fare_zone_symmetry'              :'False',
                       'prepend_route_id_to_trip_id'     :'False',
                       'number_of_processes'             :0,
+                      'number_of_threads'               :1,
+                      'pathfinding_chunk_size'          :100,
+                      'max_memory_gb'                   :0,
                       'bump_buffer'                     :5,
                       'bump_one_at_a_time'              :'False',
 
                       # pathfinding
+                      'deduplicate_pathfinding'          :'False',
+                      'hyperpath_cache_mb'               :0,
+                      'incremental_pathfinding'          :'False',
+                      'hyperpath_cache_time_bucket_min'  :0,
+                      'lower_bound_pruning'              :'False',
+                      'pathset_cache_dir'                :'None',
+                      'pathset_cache_max_mb'             :1024,
                       'max_num_paths'                    :-1,
                       'min_path_probability'             :0.005,
                       'min_transfer_penalty'             :0.1,
-                      'overlap_chunk_size'               :500,
+                      'native_costing'                   :'False',
                       'overlap_scale_parameter'          :1.0,
                       'overlap_split_transit'            :'False',
                       'overlap_variable'                 :'count',
@@ -340,6 +485,13 @@ class Assignment:
                                                    parser.get       ('fasttrips','skim_start_time'),'%H:%M')
         Assignment.SKIM_END_TIME   = datetime.datetime.strptime(
                                                    parser.get       ('fasttrips','skim_end_time'),'%H:%M')
+        Assignment.SKIM_SAMPLE_INTERVAL          = parser.getfloat  ('fasttrips','skim_sample_interval')
+        Assignment.SKIM_USER_CLASS               = parser.get       ('fasttrips','skim_user_class')
+        Assignment.SKIM_PURPOSE                  = parser.get       ('fasttrips','skim_purpose')
+        Assignment.SKIM_ACCESS_MODE              = parser.get       ('fasttrips','skim_access_mode')
+        Assignment.SKIM_TRANSIT_MODE             = parser.get       ('fasttrips','skim_transit_mode')
+        Assignment.SKIM_EGRESS_MODE              = parser.get       ('fasttrips','skim_egress_mode')
+        Assignment.SKIM_VALUE_OF_TIME            = parser.getfloat  ('fasttrips','skim_value_of_time')
         Assignment.CAPACITY_CONSTRAINT           = parser.getboolean('fasttrips','capacity_constraint')
         Assignment.SKIP_PERSON_IDS               = eval(parser.get       ('fasttrips','skip_person_ids'))
         Assignment.TRACE_IDS                     = eval(parser.get       ('fasttrips','trace_ids'))
@@ -349,18 +501,32 @@ class Assignment:
         Assignment.FARE_ZONE_SYMMETRY            = parser.getboolean('fasttrips','fare_zone_symmetry')
         Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID   = parser.getboolean('fasttrips','prepend_route_id_to_trip_id')
         Assignment.NUMBER_OF_PROCESSES           = parser.getint    ('fasttrips','number_of_processes')
+        Assignment.NUMBER_OF_THREADS             = parser.getint    ('fasttrips','number_of_threads')
+        Assignment.PATHFINDING_CHUNK_SIZE        = parser.getint    ('fasttrips','pathfinding_chunk_size')
+        Assignment.MAX_MEMORY_GB                 = parser.getfloat  ('fasttrips','max_memory_gb')
         Assignment.BUMP_BUFFER = datetime.timedelta(
                                          minutes = parser.getfloat  ('fasttrips','bump_buffer'))
         Assignment.BUMP_ONE_AT_A_TIME            = parser.getboolean('fasttrips','bump_one_at_a_time')
 
         # pathfinding
+        Assignment.DEDUPLICATE_PATHFINDING       = parser.getboolean('pathfinding','deduplicate_pathfinding')
+        Assignment.HYPERPATH_CACHE_MB            = parser.getfloat  ('pathfinding','hyperpath_cache_mb')
+        Assignment.HYPERPATH_CACHE_TIME_BUCKET_MIN = parser.getfloat('pathfinding','hyperpath_cache_time_bucket_min')
+        Assignment.INCREMENTAL_PATHFINDING       = parser.getboolean('pathfinding','incremental_pathfinding')
+        Assignment.LOWER_BOUND_PRUNING           = parser.getboolean('pathfinding','lower_bound_pruning')
+        Assignment.PATHSET_CACHE_DIR             = parser.get       ('pathfinding','pathset_cache_dir')
+        Assignment.PATHSET_CACHE_MAX_MB          = parser.getfloat  ('pathfinding','pathset_cache_max_mb')
+        if Assignment.PATHSET_CACHE_DIR == 'None':
+            Assignment.PATHSET_CACHE_DIR = None
         Assignment.MAX_NUM_PATHS                 = parser.getint    ('pathfinding','max_num_paths')
         Assignment.MIN_PATH_PROBABILITY          = parser.getfloat  ('pathfinding','min_path_probability')
         PathSet.MIN_TRANSFER_PENALTY             = parser.getfloat  ('pathfinding','min_transfer_penalty')
-        PathSet.OVERLAP_CHUNK_SIZE               = parser.getint    ('pathfinding','overlap_chunk_size')
+        PathSet.NATIVE_COSTING                   = parser.getboolean('pathfinding','native_costing')
         PathSet.OVERLAP_SCALE_PARAMETER          = parser.getfloat  ('pathfinding','overlap_scale_parameter')
         PathSet.OVERLAP_SPLIT_TRANSIT            = parser.getboolean('pathfinding','overlap_split_transit')
         PathSet.OVERLAP_VARIABLE                 = parser.get       ('pathfinding','overlap_variable')
+        if parser.has_option('pathfinding','overlap_chunk_size'):
+            FastTripsLogger.warn("Configuration option overlap_chunk_size is deprecated and ignored; overlap is calculated for all person trips at once")
         Assignment.PATHFINDING_TYPE              = parser.get       ('pathfinding','pathfinding_type')
         PathSet.WEIGHTS_FIXED_WIDTH              = parser.getboolean('pathfinding','pathweights_fixed_width')
         Assignment.STOCH_DISPERSION              = parser.getfloat  ('pathfinding','stochastic_dispersion')
@@ -380,8 +546,15 @@ class Assignment:
 
         if Assignment.PATHFINDING_TYPE not in [Assignment.PATHFINDING_TYPE_STOCHASTIC, \
                                                Assignment.PATHFINDING_TYPE_DETERMINISTIC, \
+                                               Assignment.PATHFINDING_TYPE_CONNECTION_SCAN, \
                                                Assignment.PATHFINDING_TYPE_READ_FILE]:
-            msg = "pathfinding type [%s] not available. Expected values: %s" % (Assignment.PATHFINDING_TYPE, str([Assignment.PATHFINDING_TYPE_STOCHASTIC, Assignment.PATHFINDING_TYPE_DETERMINISTIC,  Assignment.PATHFINDING_TYPE_READ_FILE]))
+            msg = "pathfinding type [%s] not available. Expected values: %s" % (Assignment.PATHFINDING_TYPE, str([Assignment.PATHFINDING_TYPE_STOCHASTIC, Assignment.PATHFINDING_TYPE_DETERMINISTIC, Assignment.PATHFINDING_TYPE_CONNECTION_SCAN, Assignment.PATHFINDING_TYPE_READ_FILE]))
+            FastTripsLogger.fatal(msg)
+            raise ConfigurationError(config_fullpath, msg)
+
+        if Assignment.CREATE_SKIMS and (Assignment.SKIM_END_TIME <= Assignment.SKIM_START_TIME or Assignment.SKIM_SAMPLE_INTERVAL <= 0):
+            msg = "skims need skim_start_time [%s] before skim_end_time [%s] and a positive skim_sample_interval [%f]" % \
+                  (Assignment.SKIM_START_TIME.strftime('%H:%M'), Assignment.SKIM_END_TIME.strftime('%H:%M'), Assignment.SKIM_SAMPLE_INTERVAL)
             FastTripsLogger.fatal(msg)
             raise ConfigurationError(config_fullpath, msg)
 
@@ -511,6 +684,7 @@ class Assignment:
         parser.set('fasttrips','run_config',                    Assignment.CONFIGURATION_FILE)
 
 
+        parser.set('fasttrips','network_build_date',            Assignment.NETWORK_BUILD_DATE.strftime('%m/%d/%Y'))
         parser.set('fasttrips','max_iterations',                '%d' % Assignment.MAX_ITERATIONS)
         parser.set('fasttrips','max_pf_iterations',                '%d' % Assignment.MAX_PF_ITERATIONS)
         parser.set('fasttrips','simulation',                    'True' if Assignment.SIMULATION else 'False')
@@ -520,6 +694,13 @@ class Assignment:
         parser.set('fasttrips','create_skims',                  'True' if Assignment.CREATE_SKIMS else 'False')
         parser.set('fasttrips','skim_start_time',               Assignment.SKIM_START_TIME.strftime('%H:%M'))
         parser.set('fasttrips','skim_end_time',                 Assignment.SKIM_END_TIME.strftime('%H:%M'))
+        parser.set('fasttrips','skim_sample_interval',          '%f' % Assignment.SKIM_SAMPLE_INTERVAL)
+        parser.set('fasttrips','skim_user_class',               Assignment.SKIM_USER_CLASS)
+        parser.set('fasttrips','skim_purpose',                  Assignment.SKIM_PURPOSE)
+        parser.set('fasttrips','skim_access_mode',              Assignment.SKIM_ACCESS_MODE)
+        parser.set('fasttrips','skim_transit_mode',             Assignment.SKIM_TRANSIT_MODE)
+        parser.set('fasttrips','skim_egress_mode',              Assignment.SKIM_EGRESS_MODE)
+        parser.set('fasttrips','skim_value_of_time',            '%f' % Assignment.SKIM_VALUE_OF_TIME)
         parser.set('fasttrips','capacity_constraint',           'True' if Assignment.CAPACITY_CONSTRAINT else 'False')
         parser.set('fasttrips','skip_person_ids',               '%s' % str(Assignment.SKIP_PERSON_IDS))
         parser.set('fasttrips','trace_ids',                     '%s' % str(Assignment.TRACE_IDS))
@@ -529,15 +710,25 @@ class Assignment:
         parser.set('fasttrips','fare_zone_symmetry',            'True' if Assignment.FARE_ZONE_SYMMETRY else 'False')
         parser.set('fasttrips','prepend_route_id_to_trip_id',   'True' if Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID else 'False')
         parser.set('fasttrips','number_of_processes',           '%d' % Assignment.NUMBER_OF_PROCESSES)
+        parser.set('fasttrips','number_of_threads',             '%d' % Assignment.NUMBER_OF_THREADS)
+        parser.set('fasttrips','pathfinding_chunk_size',        '%d' % Assignment.PATHFINDING_CHUNK_SIZE)
+        parser.set('fasttrips','max_memory_gb',                 '%f' % Assignment.MAX_MEMORY_GB)
         parser.set('fasttrips','bump_buffer',                   '%f' % (Assignment.BUMP_BUFFER.total_seconds()/60.0))
         parser.set('fasttrips','bump_one_at_a_time',            'True' if Assignment.BUMP_ONE_AT_A_TIME else 'False')
 
         #pathfinding
         parser.add_section('pathfinding')
+        parser.set('pathfinding','deduplicate_pathfinding',     'True' if Assignment.DEDUPLICATE_PATHFINDING else 'False')
+        parser.set('pathfinding','hyperpath_cache_mb',          '%f' % Assignment.HYPERPATH_CACHE_MB)
+        parser.set('pathfinding','hyperpath_cache_time_bucket_min', '%f' % Assignment.HYPERPATH_CACHE_TIME_BUCKET_MIN)
+        parser.set('pathfinding','incremental_pathfinding',     'True' if Assignment.INCREMENTAL_PATHFINDING else 'False')
+        parser.set('pathfinding','lower_bound_pruning',         'True' if Assignment.LOWER_BOUND_PRUNING else 'False')
+        parser.set('pathfinding','pathset_cache_dir',           str(Assignment.PATHSET_CACHE_DIR))
+        parser.set('pathfinding','pathset_cache_max_mb',        '%f' % Assignment.PATHSET_CACHE_MAX_MB)
         parser.set('pathfinding','max_num_paths',               '%d' % Assignment.MAX_NUM_PATHS)
         parser.set('pathfinding','min_path_probability',        '%f' % Assignment.MIN_PATH_PROBABILITY)
         parser.set('pathfinding','min_transfer_penalty',        '%f' % PathSet.MIN_TRANSFER_PENALTY)
-        parser.set('pathfinding','overlap_chunk_size',          '%d' % PathSet.OVERLAP_CHUNK_SIZE)
+        parser.set('pathfinding','native_costing',              'True' if PathSet.NATIVE_COSTING else 'False')
         parser.set('pathfinding','overlap_scale_parameter',     '%f' % PathSet.OVERLAP_SCALE_PARAMETER)
         parser.set('pathfinding','overlap_split_transit',       'True' if PathSet.OVERLAP_SPLIT_TRANSIT else 'False')
         parser.set('pathfinding','overlap_variable',            '%s' % PathSet.OVERLAP_VARIABLE)
@@ -562,12 +753,12 @@ class Assignment:
         output_file.close()
 
     @staticmethod
-    def initialize_fasttrips_extension(process_number, output_dir, stop_times_df):
+    def get_stop_times_arrays(stop_times_df):
         """
-        Initialize the C++ fasttrips extension by passing it the network supply.
+        Returns the stop times as the arrays the C++ extension takes:
+        an int32 array of (trip id num, stop sequence, stop id num) and
+        a float64 array of (arrival time min, departure time min, shape dist traveled, overcap).
         """
-        FastTripsLogger.debug("Initializing fasttrips extension for process number %d" % process_number)
-
         # this may not be set yet if it is iter1
         overcap_col = Trip.SIM_COL_VEH_OVERCAP
         if Assignment.MSA_RESULTS:
@@ -576,31 +767,140 @@ class Assignment:
         if overcap_col not in list(stop_times_df.columns.values):
             stop_times_df[overcap_col] = 0
 
-        FastTripsLogger.debug("initialize_fasttrips_extension() overcap sum: %d" % stop_times_df[overcap_col].sum())
-        FastTripsLogger.debug("initialize_fasttrips_extension() STOPTIMES_COLUMN_DEPARTURE_TIME_MIN len: %d mean: %f" % \
+        FastTripsLogger.debug("get_stop_times_arrays() overcap sum: %d" % stop_times_df[overcap_col].sum())
+        FastTripsLogger.debug("get_stop_times_arrays() STOPTIMES_COLUMN_DEPARTURE_TIME_MIN len: %d mean: %f" % \
                               (len(stop_times_df), stop_times_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN].mean()))
 
-        _fasttrips.initialize_supply(output_dir, process_number,
-                                     stop_times_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
-                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
-                                                    Trip.STOPTIMES_COLUMN_STOP_ID_NUM]].as_matrix().astype('int32'),
-                                     stop_times_df[[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN,
-                                                    Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN,
-                                                    Trip.STOPTIMES_COLUMN_SHAPE_DIST_TRAVELED,
-                                                    overcap_col]].as_matrix().astype('float64'))
-
-        _fasttrips.initialize_parameters(Assignment.TIME_WINDOW.total_seconds() / 60.0,
-                                         Assignment.BUMP_BUFFER.total_seconds() / 60.0,
-                                         Assignment.UTILS_CONVERSION,
-                                         PathSet.DEPART_EARLY_ALLOWED_MIN.total_seconds() / 60.0,
-                                         PathSet.ARRIVE_LATE_ALLOWED_MIN.total_seconds() / 60.0,
-                                         Assignment.STOCH_PATHSET_SIZE,
-                                         Assignment.STOCH_DISPERSION,
-                                         Assignment.STOCH_MAX_STOP_PROCESS_COUNT,
-                                         1 if Assignment.TRANSFER_FARE_IGNORE_PATHFINDING else 0,
-                                         1 if Assignment.TRANSFER_FARE_IGNORE_PATHENUM else 0,
-                                         Assignment.MAX_NUM_PATHS,
-                                         Assignment.MIN_PATH_PROBABILITY)
+        stoptime_index = stop_times_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                        Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                        Trip.STOPTIMES_COLUMN_STOP_ID_NUM]].as_matrix().astype('int32')
+        stoptime_times = stop_times_df[[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN,
+                                        Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN,
+                                        Trip.STOPTIMES_COLUMN_SHAPE_DIST_TRAVELED,
+                                        overcap_col]].as_matrix().astype('float64')
+        return (stoptime_index, stoptime_times)
+
+    @staticmethod
+    def get_stop_times_changes(prev_stop_times_arrays, stop_times_arrays):
+        """
+        Returns the rows of *stop_times_arrays* whose times or overcap differ from *prev_stop_times_arrays*, as
+        a tuple of arrays like those returned by :py:meth:`Assignment.get_stop_times_arrays`, for
+        :py:func:`_fasttrips.update_stop_times`.
+
+        Returns None if there are no previous arrays, or if the stop times themselves (trips, sequences and stops)
+        have changed, since then they all need to be passed to :py:func:`_fasttrips.update_supply`.
+        """
+        if prev_stop_times_arrays is None: return None
+        if not np.array_equal(prev_stop_times_arrays[0], stop_times_arrays[0]): return None
+
+        changed = (prev_stop_times_arrays[1] != stop_times_arrays[1]).any(axis=1)
+        return (np.ascontiguousarray(stop_times_arrays[0][changed]), np.ascontiguousarray(stop_times_arrays[1][changed]))
+
+    @staticmethod
+    def write_stop_times_arrays(output_dir, stop_times_arrays):
+        """
+        Writes the stop times arrays (see :py:meth:`Assignment.get_stop_times_arrays`) to
+        :py:attr:`Assignment.STOPTIMES_INDEX_FILE` and :py:attr:`Assignment.STOPTIMES_TIMES_FILE`
+        for worker processes that need all of them to memory-map.
+        """
+        (stoptime_index, stoptime_times) = stop_times_arrays
+        np.save(os.path.join(output_dir, Assignment.STOPTIMES_INDEX_FILE), np.ascontiguousarray(stoptime_index))
+        np.save(os.path.join(output_dir, Assignment.STOPTIMES_TIMES_FILE), np.ascontiguousarray(stoptime_times))
+
+    @staticmethod
+    def read_stop_times_arrays(output_dir):
+        """
+        Memory-maps the stop times arrays written by :py:meth:`Assignment.write_stop_times_arrays`, read-only.
+        """
+        stoptime_index = np.load(os.path.join(output_dir, Assignment.STOPTIMES_INDEX_FILE), mmap_mode='r')
+        stoptime_times = np.load(os.path.join(output_dir, Assignment.STOPTIMES_TIMES_FILE), mmap_mode='r')
+        return (stoptime_index, stoptime_times)
+
+    @staticmethod
+    def initialize_fasttrips_extension(process_number, output_dir, stop_times_df=None, stop_times_arrays=None):
+        """
+        Initialize the C++ fasttrips extension by passing it the network supply.
+
+        The stop times come from *stop_times_df* or, if that's not passed, from *stop_times_arrays*,
+        a tuple as returned by :py:meth:`Assignment.get_stop_times_arrays`.
+        """
+        FastTripsLogger.debug("Initializing fasttrips extension for process number %d" % process_number)
+
+        if stop_times_df is not None:
+            stop_times_arrays = Assignment.get_stop_times_arrays(stop_times_df)
+
+        _fasttrips.initialize_supply(output_dir, process_number, stop_times_arrays[0], stop_times_arrays[1])
+        Assignment.extension_stop_times_arrays = stop_times_arrays
+
+        _fasttrips.initialize_parameters(*Assignment.get_pathfinding_parameters())
+
+    @staticmethod
+    def update_fasttrips_extension_supply(output_dir, stop_times_df):
+        """
+        Brings the C++ fasttrips extension up to date with the stop times in *stop_times_df*, initializing it
+        if this process hasn't yet.  The stop times are only passed if they've changed since they were last
+        passed, since updating the supply clears the hyperpath caches and lower bounds, and only the ones that
+        changed are passed if the trip stops are the same.
+        """
+        if Assignment.extension_stop_times_arrays is None:
+            Assignment.initialize_fasttrips_extension(0, output_dir, stop_times_df)
+            return
+
+        stop_times_arrays  = Assignment.get_stop_times_arrays(stop_times_df)
+        stop_times_changes = Assignment.get_stop_times_changes(Assignment.extension_stop_times_arrays, stop_times_arrays)
+        if stop_times_changes is None:
+            FastTripsLogger.debug("update_fasttrips_extension_supply: trip stops changed")
+            _fasttrips.update_supply(stop_times_arrays[0], stop_times_arrays[1])
+        elif len(stop_times_changes[0]) > 0:
+            FastTripsLogger.debug("update_fasttrips_extension_supply: %d stop times changed" % len(stop_times_changes[0]))
+            _fasttrips.update_stop_times(stop_times_changes[0], stop_times_changes[1])
+        else:
+            return
+        Assignment.extension_stop_times_arrays = stop_times_arrays
+
+    @staticmethod
+    def get_pathfinding_parameters():
+        """
+        Returns the tuple of pathfinding parameters for :py:func:`_fasttrips.initialize_parameters`.
+        """
+        return (Assignment.TIME_WINDOW.total_seconds() / 60.0,
+                Assignment.BUMP_BUFFER.total_seconds() / 60.0,
+                Assignment.UTILS_CONVERSION,
+                PathSet.DEPART_EARLY_ALLOWED_MIN.total_seconds() / 60.0,
+                PathSet.ARRIVE_LATE_ALLOWED_MIN.total_seconds() / 60.0,
+                Assignment.STOCH_PATHSET_SIZE,
+                Assignment.STOCH_DISPERSION,
+                Assignment.STOCH_MAX_STOP_PROCESS_COUNT,
+                1 if Assignment.TRANSFER_FARE_IGNORE_PATHFINDING else 0,
+                1 if Assignment.TRANSFER_FARE_IGNORE_PATHENUM else 0,
+                Assignment.MAX_NUM_PATHS,
+                Assignment.MIN_PATH_PROBABILITY,
+                1 if Assignment.LOWER_BOUND_PRUNING else 0,
+                Assignment.HYPERPATH_CACHE_MB,
+                Assignment.HYPERPATH_CACHE_TIME_BUCKET_MIN)
+
+    @staticmethod
+    def get_pathset_cache_supply(output_dir, veh_trips_df):
+        """
+        Returns the list of everything path-finding sees other than the person trip, for :py:meth:`PathSetCache.set_supply`:
+        the pathfinding type and parameters, the network and weights as written for the C++ extension in *output_dir*,
+        the stop times for *veh_trips_df* and the bump waits.
+        """
+        supply_parts = [Assignment.get_pathfinding_type_num()] + [repr(param) for param in Assignment.get_pathfinding_parameters()]
+
+        for filename in sorted(os.listdir(output_dir)):
+            if not (filename.startswith("ft_intermediate_") and filename.endswith(".txt")): continue
+            with open(os.path.join(output_dir, filename), 'rb') as intermediate_file:
+                supply_parts.extend([filename, intermediate_file.read()])
+
+        supply_parts.extend(Assignment.get_stop_times_arrays(veh_trips_df))
+
+        if type(Assignment.bump_wait_df) == pd.DataFrame and len(Assignment.bump_wait_df) > 0:
+            supply_parts.append(Assignment.bump_wait_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                         Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                                         Trip.STOPTIMES_COLUMN_STOP_ID_NUM]].values.astype('int32'))
+            supply_parts.append(Assignment.bump_wait_df[Passenger.PF_COL_PAX_A_TIME_MIN].values.astype('float64'))
+        return supply_parts
 
     @staticmethod
     def set_fasttrips_bump_wait(bump_wait_df):
@@ -664,54 +964,24 @@ class Assignment:
         veh_trips_df.drop(["iteration","pathfinding_iteration","simulation_iteration"], axis=1, inplace=True)
 
     @staticmethod
-    def merge_pathsets(pathfind_trip_list_df, pathset_paths_df, pathset_links_df, new_pathset_paths_df, new_pathset_links_df):
+    def merge_pathsets(pathfind_trip_list_df, pathset_store, new_pathset_paths_df, new_pathset_links_df):
         """
-        Merge the given new pathset paths and links into the existing
+        Merge the given new pathset paths and links into the existing ones in the given :py:class:`PathSetStore`.
+
+        The person trips in *pathfind_trip_list_df* were just sought, so their existing paths and links are replaced.
         """
-        FastTripsLogger.debug("merge_pathsets():     pathset_paths_df len=%d head=\n%s" % (len(    pathset_paths_df),     pathset_paths_df.head().to_string()))
         FastTripsLogger.debug("merge_pathsets(): new_pathset_paths_df len=%d head=\n%s" % (len(new_pathset_paths_df), new_pathset_paths_df.head().to_string()))
-        FastTripsLogger.debug("merge_pathsets() dtypes=\n%s" % str(pathset_paths_df.dtypes))
-        FastTripsLogger.debug("merge_pathsets():     pathset_links_df len=%d head=\n%s" % (len(    pathset_links_df),     pathset_links_df.head().to_string()))
         FastTripsLogger.debug("merge_pathsets(): new_pathset_links_df len=%d head=\n%s" % (len(new_pathset_links_df), new_pathset_links_df.head().to_string()))
-        FastTripsLogger.debug("merge_pathsets() dtypes=\n%s" % str(pathset_links_df.dtypes))
-
-
         FastTripsLogger.debug("merge_pathsets():     pathfind_trip_list_df len=%d head=\n%s" % (len(    pathfind_trip_list_df),     pathfind_trip_list_df.head().to_string()))
-        # TODO: This might be inefficient...
-
-        # filter out the new pathset person trips from pathset_paths_df
-        pathset_paths_df = pd.merge(left     =pathset_paths_df,
-                                        right    =pathfind_trip_list_df[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]],
-                                        how      ="left",
-                                        indicator=True)
-        pathset_paths_df = pathset_paths_df.loc[pathset_paths_df["_merge"]=="left_only"]
-        pathset_paths_df.drop(["_merge"], axis=1, inplace=True)
-        FastTripsLogger.debug("Filtered to %d pathset_paths_df rows" % len(pathset_paths_df))
+
         # TODO: error prone, make this cleaner with where it's initialized elsewhere
         new_pathset_paths_df[Assignment.SIM_COL_PAX_CHOSEN ] = pd.Categorical([Assignment.CHOSEN_NOT_CHOSEN_YET]*len(new_pathset_paths_df),
                                                                                   categories=Assignment.CHOSEN_CATEGORIES, ordered=True)
         new_pathset_paths_df[Assignment.SIM_COL_MISSED_XFER] = 0
-        # append
-        pathset_paths_df = pd.concat([pathset_paths_df, new_pathset_paths_df], axis=0)
-        FastTripsLogger.debug("Concatenated so pathset_paths_df has %d rows" % len(pathset_paths_df))
-
-        # filter out the new pathset person trips from pathset_links_df
-        pathset_links_df = pd.merge(left     =pathset_links_df,
-                                        right    =pathfind_trip_list_df[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]],
-                                        how      ="left",
-                                        indicator=True)
-        pathset_links_df = pathset_links_df.loc[pathset_links_df["_merge"]=="left_only"]
-        pathset_links_df.drop(["_merge"], axis=1, inplace=True)
-        FastTripsLogger.debug("Filtered to %d pathset_links_df rows" % len(pathset_links_df))
-        # append
-        pathset_links_df = pd.concat([pathset_links_df, new_pathset_links_df], axis=0)
-        FastTripsLogger.debug("Concatenated so pathset_links_df has %d rows" % len(pathset_links_df))
-
-        FastTripsLogger.debug("merge_pathsets():     pathset_paths_df len=%d head=\n%s\ntail=\n%s" % (len(pathset_paths_df), pathset_paths_df.head().to_string(),pathset_paths_df.tail().to_string()))
-        FastTripsLogger.debug("merge_pathsets():     pathset_links_df len=%d head=\n%s\ntail=\n%s" % (len(pathset_links_df), pathset_links_df.head().to_string(),pathset_links_df.tail().to_string()))
-
-        # done with this
-        return (pathset_paths_df, pathset_links_df)
+
+        # only the person trips just sought are touched
+        pathset_store.replace_pathsets(pathfind_trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values,
+                                       new_pathset_paths_df, new_pathset_links_df)
 
     @staticmethod
     def number_of_pathsets(pathset_paths_df):
@@ -727,6 +997,10 @@ class Assignment:
         """
         # clear any state
         _fasttrips.reset()
+        Assignment.extension_stop_times_arrays = None
+        Assignment.pathset_cache = None
+        if Assignment.PATHSET_CACHE_DIR:
+            Assignment.pathset_cache = PathSetCache(Assignment.PATHSET_CACHE_DIR, Assignment.PATHSET_CACHE_MAX_MB)
 
         # write the initial load profile, iteration 0
         veh_trips_df     = FT.trips.get_full_trips()
@@ -747,6 +1021,9 @@ class Assignment:
                 else:
                     Assignment.PATHFINDING_EVERYONE = False
 
+                # Incremental: everyone is re-chosen and re-simulated, but pathsets the supply changes can't affect are carried over
+                carry_over_pathsets = Assignment.INCREMENTAL_PATHFINDING and Assignment.PATHFINDING_EVERYONE and (pathset_paths_df is not None)
+
                 FastTripsLogger.info("***************************** ITERATION %d PATHFINDING ITERATION %d **************************************" % (iteration, pathfinding_iteration))
 
                 if (Assignment.PATHFINDING_TYPE == Assignment.PATHFINDING_TYPE_READ_FILE) and (iteration == 1) and (pathfinding_iteration == 1):
@@ -760,7 +1037,7 @@ class Assignment:
 
                 else:
                     FT.performance.record_step_start(iteration, pathfinding_iteration, -1, "pathfinding")
-                    num_new_paths_found = Assignment.generate_pathsets(FT, pathset_paths_df, veh_trips_df, output_dir, iteration, pathfinding_iteration)
+                    num_new_paths_found = Assignment.generate_pathsets(FT, pathset_paths_df, pathset_links_df, veh_trips_df, output_dir, iteration, pathfinding_iteration)
                     (new_pathset_paths_df, new_pathset_links_df) = FT.passengers.setup_passenger_pathsets(iteration, pathfinding_iteration, FT.stops,
                                                                                                           FT.trips.trip_id_df, FT.trips.trips_df, FT.routes.modes_df,
                                                                                                           FT.transfers, FT.tazs, Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
@@ -774,15 +1051,15 @@ class Assignment:
                     FT.performance.write_pathfinding(output_dir, append=((iteration>1) or (pathfinding_iteration>1)))
 
                 # If we found paths for everyone, excellent
-                if Assignment.PATHFINDING_EVERYONE:
-                    pathset_paths_df = new_pathset_paths_df
-                    pathset_links_df = new_pathset_links_df
+                if Assignment.PATHFINDING_EVERYONE and not carry_over_pathsets:
+                    FT.passengers.pathset_store.set_pathsets(new_pathset_paths_df, new_pathset_links_df)
                 # Otherwise, merge with those for whom we already have
                 else:
-                    (pathset_paths_df, pathset_links_df) = Assignment.merge_pathsets(FT.passengers.pathfind_trip_list_df, pathset_paths_df, pathset_links_df, new_pathset_paths_df, new_pathset_links_df)
+                    Assignment.merge_pathsets(FT.passengers.pathfind_trip_list_df, FT.passengers.pathset_store, new_pathset_paths_df, new_pathset_links_df)
+                (pathset_paths_df, pathset_links_df) = FT.passengers.pathset_store.get_pathsets()
 
-                # if we have new paths, simulate them
-                if num_new_paths_found > 0:
+                # if we have new paths, simulate them (carried over pathsets are on empty vehicles, so simulate them too)
+                if num_new_paths_found > 0 or carry_over_pathsets:
 
                     if Assignment.SIMULATION:
                         FastTripsLogger.info("***************************** ITERATION %d PATHFINDING ITERATION %d *** SIMULATING ***********************" % (iteration, pathfinding_iteration))
@@ -796,6 +1073,9 @@ class Assignment:
                         (num_passengers_arrived, pathset_paths_df, pathset_links_df) = \
                             Assignment.choose_paths_without_simulation(FT, output_dir, iteration, pathfinding_iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
 
+                    # simulation results carry over to the next pathfinding iteration
+                    FT.passengers.pathset_store.set_pathsets(pathset_paths_df, pathset_links_df)
+
                 FT.performance.record_step_start(iteration, pathfinding_iteration, -1, "output_per_pathfinding_iteration")
 
                 # Set new schedule
@@ -825,7 +1105,7 @@ class Assignment:
                 FT.performance.record_step_end(iteration, pathfinding_iteration, -1)
 
                 # if no new paths found, pathfinding_iteration loop is done
-                if num_new_paths_found == 0:
+                if num_new_paths_found == 0 and not carry_over_pathsets:
                     break
 
             # end condition for iterations loop
@@ -834,6 +1114,100 @@ class Assignment:
 
             # end for loop
 
+        # the network supply is done changing
+        Assignment.stop_worker_processes()
+
+        return {"capacity_gap": capacity_gap,
+                "paths_found": num_paths_found,
+                "passengers_arrived": num_passengers_arrived,
+                "passengers_missed": num_bumped_passengers,
+                "passengers_demand": len(FT.passengers.trip_list_df) }
+
+    @staticmethod
+    def get_recosting_pathsets(FT, pathset_paths_df, pathset_links_df):
+        """
+        Prepares pathsets read from a previous run's pathfinding results (see :py:meth:`Passenger.read_passenger_pathsets`)
+        for :py:meth:`Assignment.recost_paths`.  Pathfinding results are appended every iteration, so only the latest
+        pathset for each person trip is kept, and only for person trips in the trip list.
+
+        Links are given their stop zones here so re-costing with each set of weights doesn't redo it.
+
+        Returns (pathset_paths_df, pathset_links_df).
+        """
+        trip_cols = [Passenger.TRIP_LIST_COLUMN_PERSON_ID, Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID]
+
+        if "iteration" in list(pathset_paths_df.columns.values):
+            latest_df = pathset_paths_df[trip_cols + ["iteration", "pathfinding_iteration"]].drop_duplicates()
+            latest_df = latest_df.sort_values(["iteration", "pathfinding_iteration"]).drop_duplicates(subset=trip_cols, keep="last")
+            pathset_paths_df = pd.merge(left=pathset_paths_df, right=latest_df, how="inner")
+            pathset_links_df = pd.merge(left=pathset_links_df, right=latest_df, how="inner")
+            pathset_paths_df.drop(["iteration", "pathfinding_iteration"], axis=1, inplace=True)
+            pathset_links_df.drop(["iteration", "pathfinding_iteration"], axis=1, inplace=True)
+
+        # use this trip list's numbering
+        trip_list_ids_df = FT.passengers.trip_list_df[trip_cols + [Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]]
+        if Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM in list(pathset_paths_df.columns.values):
+            pathset_paths_df = pathset_paths_df.drop([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM], axis=1)
+        if Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM in list(pathset_links_df.columns.values):
+            pathset_links_df = pathset_links_df.drop([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM], axis=1)
+        pathset_paths_df = pd.merge(left=pathset_paths_df, right=trip_list_ids_df, how="inner", on=trip_cols)
+        pathset_links_df = pd.merge(left=pathset_links_df, right=trip_list_ids_df, how="inner", on=trip_cols)
+
+        pathset_links_df = FT.stops.add_stop_zone_id(pathset_links_df, "A_id", "A_zone_id")
+        pathset_links_df = FT.stops.add_stop_zone_id(pathset_links_df, "B_id", "B_zone_id")
+
+        FastTripsLogger.info("Re-costing %d pathsets with %d paths and %d links" %
+                             (Assignment.number_of_pathsets(pathset_paths_df), len(pathset_paths_df), len(pathset_links_df)))
+        return (pathset_paths_df, pathset_links_df)
+
+    @staticmethod
+    def recost_paths(output_dir, FT, pathset_paths_df, pathset_links_df, veh_trips_df):
+        """
+        Re-costs the given pathsets (see :py:meth:`Assignment.get_recosting_pathsets`) with the current weights,
+        chooses paths and, if :py:attr:`Assignment.SIMULATION`, simulates them, writing the results to *output_dir*.
+        No paths are found, so this is one pass of :py:meth:`Assignment.assign_paths` starting from empty vehicles.
+
+        Returns a dictionary of results like :py:meth:`Assignment.assign_paths`.
+        """
+        iteration             = 1
+        pathfinding_iteration = 1
+
+        # start over
+        Assignment.bump_wait_df         = None
+        Assignment.PATHFINDING_EVERYONE = True
+
+        Assignment.write_vehicle_trips(output_dir, 0, 0, 0, veh_trips_df)
+
+        if PathSet.NATIVE_COSTING:
+            # the extension read the weights when it was initialized; cost with these, written to output_dir
+            Assignment.update_fasttrips_extension_supply(Assignment.OUTPUT_DIR, veh_trips_df)
+            _fasttrips.reload_weights(output_dir)
+
+        if Assignment.SIMULATION:
+            FT.performance.record_step_start(iteration, pathfinding_iteration, -1, "simulating")
+            (num_passengers_arrived, pathset_paths_df, pathset_links_df, veh_trips_df) = \
+                Assignment.simulate(FT, output_dir, iteration, pathfinding_iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
+        else:
+            FT.performance.record_step_start(iteration, pathfinding_iteration, -1, "choosing_without_simulating")
+            (num_passengers_arrived, pathset_paths_df, pathset_links_df) = \
+                Assignment.choose_paths_without_simulation(FT, output_dir, iteration, pathfinding_iteration, pathset_paths_df, pathset_links_df, veh_trips_df)
+        FT.performance.record_step_end(iteration, pathfinding_iteration, -1)
+
+        Assignment.write_vehicle_trips(output_dir, iteration, pathfinding_iteration, "final", veh_trips_df)
+
+        num_paths_found = Assignment.number_of_pathsets(pathset_paths_df)
+        num_bumped_passengers = num_paths_found - num_passengers_arrived
+        if num_paths_found > 0:
+            capacity_gap = 100.0*num_bumped_passengers/num_paths_found
+        else:
+            capacity_gap = 100
+
+        FastTripsLogger.info("")
+        FastTripsLogger.info("  Number of pathsets:        %10d" % num_paths_found)
+        FastTripsLogger.info("  ARRIVED PASSENGERS:        %10d" % num_passengers_arrived)
+        FastTripsLogger.info("  MISSED PASSENGERS:         %10d" % num_bumped_passengers)
+        FastTripsLogger.info("  CAPACITY GAP:              %10.5f" % capacity_gap)
+
         return {"capacity_gap": capacity_gap,
                 "paths_found": num_paths_found,
                 "passengers_arrived": num_passengers_arrived,
@@ -866,9 +1240,107 @@ class Assignment:
         return trip_list_df_to_return
 
     @staticmethod
-    def generate_pathsets(FT, pathset_paths_df, veh_trips_df, output_dir, iteration, pathfinding_iteration):
+    def get_incremental_pathfinding_supply(veh_trips_df):
+        """
+        Returns the parts of the supply that path-finding uses and simulation changes, for comparing across iterations
+        for :py:attr:`Assignment.INCREMENTAL_PATHFINDING`.  This is a :py:class:`pandas.DataFrame` with a row per
+        trip-stop and columns :py:attr:`Trip.STOPTIMES_COLUMN_TRIP_ID_NUM`, :py:attr:`Trip.STOPTIMES_COLUMN_STOP_SEQUENCE`,
+        :py:attr:`Trip.STOPTIMES_COLUMN_STOP_ID_NUM`, :py:attr:`Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN`,
+        :py:attr:`Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN`, :py:attr:`Trip.SIM_COL_VEH_OVERCAP` and
+        :py:attr:`Passenger.PF_COL_PAX_A_TIME_MIN` for the bump wait (NaN if there isn't one).
+
+        Path-finding only sees whether a vehicle is at capacity and by how much it's over, so overcaps under
+        capacity are all -1: a vehicle that's just less empty than it was doesn't count as a change.
         """
-        Figures out which person trips for whom to generate_pathsets, stored in :py:attr:`Passenger.pathfind_trip_list_df`
+        # exactly what goes to the extension
+        (stoptime_index, stoptime_times) = Assignment.get_stop_times_arrays(veh_trips_df)
+        supply_df = pd.DataFrame(collections.OrderedDict([
+            (Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,        stoptime_index[:,0]),
+            (Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,      stoptime_index[:,1]),
+            (Trip.STOPTIMES_COLUMN_STOP_ID_NUM,        stoptime_index[:,2]),
+            (Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN,   stoptime_times[:,0]),
+            (Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN, stoptime_times[:,1]),
+            (Trip.SIM_COL_VEH_OVERCAP,                 np.where(stoptime_times[:,3] < 0, -1.0, stoptime_times[:,3])) ]))
+
+        if type(Assignment.bump_wait_df) == pd.DataFrame and len(Assignment.bump_wait_df) > 0:
+            bump_wait_df = Assignment.bump_wait_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                    Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                                    Passenger.PF_COL_PAX_A_TIME_MIN]].drop_duplicates(
+                subset=[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE])
+            bump_wait_df = bump_wait_df.astype({Trip.STOPTIMES_COLUMN_TRIP_ID_NUM:np.int32, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE:np.int32})
+            supply_df = pd.merge(left=supply_df, right=bump_wait_df, how="left")
+        else:
+            supply_df[Passenger.PF_COL_PAX_A_TIME_MIN] = np.nan
+        return supply_df
+
+    @staticmethod
+    def filter_trip_list_to_supply_changes(trip_list_df, pathset_paths_df, pathset_links_df, prev_supply_df, supply_df):
+        """
+        Filter the given trip list to the person trips whose pathsets could be affected by the changes from
+        *prev_supply_df* to *supply_df* (see :py:meth:`Assignment.get_incremental_pathfinding_supply`).
+
+        A changed trip-stop affects the person trips with a pathset that rides that trip through it, or that boards or
+        alights any trip at that stop, since the trip's labels there could now win.  Person trips without a pathset, or
+        whose pathset was found in a later pathfinding iteration (and so on a different supply), are kept too.
+        """
+        supply_cols = [Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN,
+                       Trip.SIM_COL_VEH_OVERCAP, Passenger.PF_COL_PAX_A_TIME_MIN]
+        supply_diff_df = pd.merge(left    =prev_supply_df,
+                                  right   =supply_df,
+                                  on      =[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE, Trip.STOPTIMES_COLUMN_STOP_ID_NUM],
+                                  how     ="outer",
+                                  suffixes=("_prev",""),
+                                  indicator=True)
+        changed = supply_diff_df["_merge"] != "both"
+        for supply_col in supply_cols:
+            prev_values = supply_diff_df["%s_prev" % supply_col]
+            values      = supply_diff_df[supply_col]
+            changed     = changed | ((prev_values != values) & ~(pd.isnull(prev_values) & pd.isnull(values)))
+        changed_df = supply_diff_df.loc[changed, [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                  Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                                  Trip.STOPTIMES_COLUMN_STOP_ID_NUM]]
+        FastTripsLogger.info("Incremental pathfinding: %d of %d trip-stops changed" % (len(changed_df), len(supply_df)))
+
+        trip_list_id_nums = trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+
+        # without a pathset found in the first pathfinding iteration
+        first_pf_iter = pathset_paths_df[Passenger.PF_COL_PATHFINDING_ITERATION] <= 1
+        carry_over    = np.in1d(trip_list_id_nums,
+                                pathset_paths_df.loc[first_pf_iter, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values)
+        carry_over    = carry_over & ~np.in1d(trip_list_id_nums,
+                                pathset_paths_df.loc[~first_pf_iter, Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values)
+
+        if len(changed_df) > 0:
+            trip_links_df = pathset_links_df.loc[pathset_links_df[Passenger.PF_COL_LINK_MODE] == PathSet.STATE_MODE_TRIP,
+                                                 [Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Trip.STOPTIMES_COLUMN_TRIP_ID_NUM,
+                                                  "A_id_num", "B_id_num", "A_seq", "B_seq"]]
+
+            # riding a changed trip through a changed stop: the trip-stop is in the range of the link
+            ride_df = pd.merge(left    =trip_links_df[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq", "B_seq"]],
+                               right   =changed_df[[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]].astype(np.float64),
+                               how     ="inner")
+            ride_df = ride_df.loc[(ride_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] >= ride_df["A_seq"]) &
+                                  (ride_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE] <= ride_df["B_seq"])]
+
+            # boarding or alighting at a changed stop
+            changed_stops = changed_df[Trip.STOPTIMES_COLUMN_STOP_ID_NUM].unique()
+            stop_df = trip_links_df.loc[trip_links_df["A_id_num"].isin(changed_stops) | trip_links_df["B_id_num"].isin(changed_stops)]
+
+            affected = np.union1d(ride_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values,
+                                  stop_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values)
+            FastTripsLogger.debug("filter_trip_list_to_supply_changes(): %d riding and %d boarding or alighting at changed trip-stops; %d to carry over before" %
+                                  (ride_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].nunique(), stop_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].nunique(), carry_over.sum()))
+            carry_over = carry_over & ~np.in1d(trip_list_id_nums, affected)
+
+        FastTripsLogger.info("Incremental pathfinding: carrying over %d of %d pathsets" % (carry_over.sum(), len(trip_list_df)))
+        return trip_list_df.loc[~carry_over]
+
+    @staticmethod
+    def generate_pathsets(FT, pathset_paths_df, pathset_links_df, veh_trips_df, output_dir, iteration, pathfinding_iteration):
+        """
+        Figures out which person trips for whom to generate_pathsets, stored in :py:attr:`Passenger.pathfind_trip_list_df`.
+        With :py:attr:`Assignment.INCREMENTAL_PATHFINDING`, finding paths for everyone after the first iteration is
+        limited to the person trips the supply changes could affect; see :py:meth:`Assignment.filter_trip_list_to_supply_changes`.
 
         Generates paths sets for those person trips using deterministic trip-based shortest path (TBSP) or
         stochastic trip-based hyperpath (TBHP).
@@ -877,7 +1349,7 @@ class Assignment:
         """
         FastTripsLogger.info("**************************** GENERATING PATHS **********************************************************")
         start_time          = datetime.datetime.now()
-        process_dict        = {}  # workernum -> {"process":process, "alive":alive bool, "done":done bool, "working_on":(person_id, trip_list_num)}
+        process_dict        = {}  # workernum -> {"process":process, "update_queue":queue, "alive":alive bool, "done":done bool, "working_on":(iteration, pathfinding_iteration)}
         todo_queue          = None
         done_queue          = None
 
@@ -900,6 +1372,13 @@ class Assignment:
         if Assignment.PATHFINDING_EVERYONE:
             # we're starting over with empty vehicles
             Trip.reset_onboard(veh_trips_df)
+
+            if Assignment.INCREMENTAL_PATHFINDING:
+                supply_df = Assignment.get_incremental_pathfinding_supply(veh_trips_df)
+                if pathset_paths_df is not None:
+                    FT.passengers.pathfind_trip_list_df = Assignment.filter_trip_list_to_supply_changes(
+                        FT.passengers.trip_list_df, pathset_paths_df, pathset_links_df, Assignment.incremental_supply_df, supply_df)
+                Assignment.incremental_supply_df = supply_df
         else:
             FastTripsLogger.info("Finding paths for trips for those that haven't arrived yet")
             FT.passengers.pathfind_trip_list_df = Assignment.filter_trip_list_to_not_arrived(FT.passengers.trip_list_df, pathset_paths_df)
@@ -909,6 +1388,15 @@ class Assignment:
         if est_paths_to_find == 0:
             return 0
 
+        # person trips with the same path specification as an earlier one will share its pathset
+        Assignment.pathfinding_duplicates_df = None
+        duplicate_trip_list_ids              = set()
+        if Assignment.DEDUPLICATE_PATHFINDING:
+            Assignment.pathfinding_duplicates_df = Assignment.get_pathfinding_duplicates(FT.passengers.pathfind_trip_list_df)
+            duplicate_trip_list_ids = set(Assignment.pathfinding_duplicates_df[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM].tolist())
+            FastTripsLogger.info("Deduplicated to %d path specifications; %d trips will share their pathsets" % \
+                                 (est_paths_to_find - len(duplicate_trip_list_ids), len(duplicate_trip_list_ids)))
+
         info_freq           = pow(10, int(math.log(est_paths_to_find+1,10)-1))
         if info_freq < 1: info_freq = 1
         # info_freq = 1 # DEBUG CRASH
@@ -920,82 +1408,103 @@ class Assignment:
         if num_processes > est_paths_to_find*3:
             num_processes = int(est_paths_to_find/3)
 
+        num_threads         = Assignment.NUMBER_OF_THREADS
+        if  Assignment.NUMBER_OF_THREADS < 1:
+            num_threads     = multiprocessing.cpu_count()
+        # threads share this process's network so we don't need worker processes
+        if num_threads > 1:
+            num_processes   = 1
+
+        # person trips are sent to the workers or threads in chunks
+        chunk_size          = max(1, Assignment.PATHFINDING_CHUNK_SIZE)
+        if num_processes > 1:
+            # make sure each worker gets some
+            chunk_size      = max(1, min(chunk_size, int(est_paths_to_find/num_processes)))
+        else:
+            chunk_size      = max(chunk_size, num_threads)
+
         # this is probalby time consuming... put in a try block
         try:
             # Setup multiprocessing processes
             if num_processes > 1:
-                todo_queue      = multiprocessing.Queue()
-                done_queue      = multiprocessing.Queue()
-                for process_idx in range(1, 1+num_processes):
-                    FastTripsLogger.info("Starting worker process %2d" % process_idx)
-                    process_dict[process_idx] = {
-                        "process":multiprocessing.Process(target=find_trip_based_paths_process_worker,
-                            args=(iteration, pathfinding_iteration, process_idx, Assignment.INPUT_NETWORK_ARCHIVE, Assignment.INPUT_DEMAND_DIR,
-                                  Assignment.CONFIGURATION_FILE, Assignment.CONFIGURATION_FUNCTIONS_FILE,
-                                  Assignment.OUTPUT_DIR, todo_queue, done_queue,
-                                  Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC,
-                                  Assignment.bump_wait_df, veh_trips_df)),
-                        "alive":True,
-                        "done":False
-                    }
-                    process_dict[process_idx]["process"].start()
+                # workers are started once and then just get the supply updates
+                Assignment.start_worker_processes(iteration, pathfinding_iteration, num_processes)
+                process_dict    = Assignment.worker_process_dict
+                todo_queue      = Assignment.worker_todo_queue
+                done_queue      = Assignment.worker_done_queue
+
+                # workers that have the stop times already only get the ones that changed
+                stop_times_arrays  = Assignment.get_stop_times_arrays(veh_trips_df)
+                stop_times_changes = Assignment.get_stop_times_changes(Assignment.worker_stop_times_arrays, stop_times_arrays)
+                if stop_times_changes is None or \
+                   len([process_idx for process_idx in process_dict.keys() if not process_dict[process_idx]["has_stop_times"]]) > 0:
+                    # the others memory-map all of them rather than getting veh_trips_df
+                    Assignment.write_stop_times_arrays(output_dir, stop_times_arrays)
+                if stop_times_changes is not None:
+                    FastTripsLogger.debug("Sending %d changed stop times to worker processes" % len(stop_times_changes[0]))
+
+                for process_idx in process_dict.keys():
+                    process_dict[process_idx]["done"] = False
+                    process_dict[process_idx]["update_queue"].put( (iteration, pathfinding_iteration,
+                                                                    Assignment.get_pathfinding_type_num(),
+                                                                    Assignment.bump_wait_df,
+                                                                    stop_times_changes if process_dict[process_idx]["has_stop_times"] else None) )
+                    process_dict[process_idx]["has_stop_times"] = True
+                Assignment.worker_stop_times_arrays = stop_times_arrays
             else:
+                # workers from an earlier pathfinding iteration aren't needed this time
+                Assignment.stop_worker_processes()
                 Assignment.initialize_fasttrips_extension(0, output_dir, veh_trips_df)
+                # as the workers do
+                if iteration > 1:
+                    Assignment.set_fasttrips_bump_wait(Assignment.bump_wait_df)
+
+            if Assignment.pathset_cache is not None:
+                Assignment.pathset_cache.set_supply(Assignment.get_pathset_cache_supply(output_dir, veh_trips_df))
+
+            # the person trips to find, straight from the trip list.  Those going nowhere don't need a path, and
+            # duplicates get their pathsets from the person trip they duplicate.  Indexed by trip_list_id_num so
+            # the worker results can be matched back to them.
+            pathfind_df = FT.passengers.pathfind_trip_list_df
+            if Assignment.DEBUG_TRACE_ONLY:
+                pathfind_df = pathfind_df.loc[pathfind_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]
+            pathfind_df = pathfind_df.loc[(pathfind_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID] != pathfind_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID]) &
+                                          ~pathfind_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].isin(duplicate_trip_list_ids)]
+            pathfind_df = pathfind_df.set_index(pd.Index(pathfind_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values))
+
+            traced_df = pathfind_df.loc[pathfind_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]
+            for (person_id, person_trip_id) in zip(traced_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID], traced_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID]):
+                FastTripsLogger.debug("Tracing assignment of person_id %s and trip %s" % (person_id, person_trip_id))
 
             # process tasks or send tasks to workers for processing
-            num_paths_found_prev  = 0
             num_paths_found_now   = 0
             num_paths_sought      = 0
-            path_cols             = list(FT.passengers.pathfind_trip_list_df.columns.values)
-            for path_tuple in FT.passengers.pathfind_trip_list_df.itertuples(index=False):
-                path_dict         = dict(zip(path_cols, path_tuple))
-                trip_list_id      = path_dict[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]
-                person_id         = path_dict[Passenger.TRIP_LIST_COLUMN_PERSON_ID]
-                person_trip_id    = path_dict[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID]
-                do_trace          = path_dict[Passenger.TRIP_LIST_COLUMN_TRACE]
-
-                if Assignment.DEBUG_TRACE_ONLY and not do_trace: continue
-
-                # first iteration -- create path objects
-                if iteration==1:
-                    trip_pathset = PathSet(path_dict)
-                    FT.passengers.add_pathset(trip_list_id, trip_pathset)
-                else:
-                    trip_pathset = FT.passengers.get_pathset(trip_list_id)
+            for chunk_start in range(0, len(pathfind_df), chunk_size):
+                batch_df = pathfind_df.iloc[chunk_start:chunk_start+chunk_size]
 
-                if not trip_pathset.goes_somewhere(): continue
-
-                # find pathsets for everyone -- dwell times have changed
-                # if iteration > 1 and trip_list_id not in Assignment.bumped_trip_list_nums:
-                #    num_paths_found_prev += 1
-                #    continue
+                # use any cached pathsets and find the rest
+                if Assignment.pathset_cache is not None:
+                    num_in_chunk = len(batch_df)
+                    (num_cached_found, batch_df) = Assignment.record_cached_pathsets(FT, iteration, pathfinding_iteration, batch_df)
+                    num_paths_found_now += num_cached_found
+                    num_paths_sought    += num_in_chunk - len(batch_df)
+                    if len(batch_df) == 0: continue
 
                 if num_processes > 1:
-                    todo_queue.put( trip_pathset )
+                    # send a chunk at a time
+                    todo_queue.put( Assignment.get_pathfinding_specs(batch_df) )
                 else:
-                    if do_trace:
-                        FastTripsLogger.debug("Tracing assignment of person_id %s and trip %s" % (person_id, person_trip_id))
-
-                    # do the work
-                    (pathdict, perf_dict) = \
-                        Assignment.find_trip_based_pathset(iteration, pathfinding_iteration, trip_pathset,
-                                                           Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC,
-                                                           trace=do_trace)
-                    num_paths_sought += 1
-
-                    trip_pathset.pathdict = pathdict
-                    FT.performance.add_info(iteration, pathfinding_iteration, person_id, person_trip_id, perf_dict)
-
-                    if trip_pathset.path_found():
-                        num_paths_found_now += 1
-
-                    if num_paths_sought % info_freq == 0:
-                        time_elapsed = datetime.datetime.now() - start_time
-                        FastTripsLogger.info(" %6d paths sought, %6d paths found of %d paths total.  Time elapsed: %2dh:%2dm:%2ds" % (
-                                             num_paths_sought, num_paths_found_now, est_paths_to_find,
-                                             int( time_elapsed.total_seconds() / 3600),
-                                             int( (time_elapsed.total_seconds() % 3600) / 60),
-                                             time_elapsed.total_seconds() % 60))
+                    # find paths for a batch at a time so we can report progress
+                    num_paths_found_now += Assignment.find_trip_based_pathsets_batch(FT, iteration, pathfinding_iteration,
+                                                                                     batch_df, num_threads)
+                    num_paths_sought    += len(batch_df)
+
+                    time_elapsed = datetime.datetime.now() - start_time
+                    FastTripsLogger.info(" %6d paths sought, %6d paths found of %d paths total.  Time elapsed: %2dh:%2dm:%2ds" % (
+                                         num_paths_sought, num_paths_found_now, est_paths_to_find,
+                                         int( time_elapsed.total_seconds() / 3600),
+                                         int( (time_elapsed.total_seconds() % 3600) / 60),
+                                         time_elapsed.total_seconds() % 60))
 
             # multiprocessing follow-up
             if num_processes > 1:
@@ -1003,9 +1512,8 @@ class Assignment:
                 for process_idx in process_dict.keys():
                     todo_queue.put('DONE')
 
-                # get results
-                done_procs = 0  # where done means not alive
-                while done_procs < len(process_dict):
+                # get results until each process is done with this iteration (or not alive)
+                while len([process_idx for process_idx in process_dict.keys() if process_dict[process_idx]["alive"] and not process_dict[process_idx]["done"]]) > 0:
 
                     try:
                         result     = done_queue.get(True, 30)
@@ -1015,29 +1523,24 @@ class Assignment:
                         if result[1] == "DONE":
                             FastTripsLogger.debug("Received done from process %d" % worker_num)
                             process_dict[worker_num]["done"] = True
+                            process_dict[worker_num].pop("working_on", None)
                         elif result[1] == "STARTING":
-                            process_dict[worker_num]["working_on"] = (result[2],result[3])
+                            process_dict[worker_num]["working_on"] = (result[2], result[3])
                         elif result[1] == "COMPLETED":
-                            trip_list_id    = result[2]
-                            pathset         = FT.passengers.get_pathset(trip_list_id)
-                            pathset.pathdict= result[3]
-                            perf_dict       = result[4]
-
-                            FT.performance.add_info(iteration, pathfinding_iteration, pathset.person_id, pathset.person_trip_id, perf_dict)
+                            trip_list_id_nums = result[2]
+                            prev_info_count   = num_paths_sought / info_freq
 
-                            num_paths_sought += 1
-                            if pathset.path_found():
-                                num_paths_found_now += 1
+                            num_paths_found_now += Assignment.record_pathset_results(FT, iteration, pathfinding_iteration,
+                                                                                     pathfind_df.loc[trip_list_id_nums], result[3])
+                            num_paths_sought    += len(trip_list_id_nums)
 
-                            if num_paths_sought % info_freq == 0:
+                            if num_paths_sought / info_freq > prev_info_count:
                                 time_elapsed = datetime.datetime.now() - start_time
                                 FastTripsLogger.info("  %6d paths sought, %6d paths found of %d paths total.  Time elapsed: %2dh:%2dm:%2ds" % (
                                                      num_paths_sought, num_paths_found_now, est_paths_to_find,
                                                      int( time_elapsed.total_seconds() / 3600),
                                                      int( (time_elapsed.total_seconds() % 3600) / 60),
                                                      time_elapsed.total_seconds() % 60))
-
-                            del process_dict[worker_num]["working_on"]
                         else:
                             print "Unexpected done queue contents: " + str(result)
 
@@ -1053,18 +1556,14 @@ class Assignment:
                         if process_dict[process_idx]["alive"] and not process_dict[process_idx]["process"].is_alive():
                             FastTripsLogger.debug("Process %d is not alive" % process_idx)
                             process_dict[process_idx]["alive"] = False
-                            done_procs += 1
-
-                # join up my processes
-                for process_idx in process_dict.keys():
-                    process_dict[process_idx]["process"].join()
 
                 # check if any processes crashed
                 for process_idx in process_dict.keys():
                     if not process_dict[process_idx]["done"]:
                         if "working_on" in process_dict[process_idx]:
-                            FastTripsLogger.info("Process %d appears to have crashed; it was working on %s" % \
-                                                 (process_idx, str(process_dict[process_idx]["working_on"])))
+                            FastTripsLogger.info("Process %d appears to have crashed while finding pathsets for (iteration, pathfinding iteration) %s; "
+                                                 "see ft_debug_worker%02d.log for the person trips it was working on" % \
+                                                 (process_idx, str(process_dict[process_idx]["working_on"]), process_idx))
                         else:
                             FastTripsLogger.info("Process %d appears to have crashed; see ft_debug_worker%02d.log" % (process_idx, process_idx))
 
@@ -1075,8 +1574,10 @@ class Assignment:
             for e in error_lines: FastTripsLogger.error(e)
             FastTripsLogger.error("Terminating processes")
             # terminating my processes
-            for proc in process_dict:
-                proc.terminate()
+            for process_idx in process_dict.keys():
+                process_dict[process_idx]["process"].terminate()
+            Assignment.worker_process_dict      = {}
+            Assignment.worker_stop_times_arrays = None
             raise
         except:
             # some other error
@@ -1085,6 +1586,10 @@ class Assignment:
             for e in error_lines: FastTripsLogger.error(e)
             raise
 
+        if Assignment.pathset_cache is not None:
+            Assignment.pathset_cache.write()
+            FastTripsLogger.info("Pathset cache: %d hits, %d misses so far" % (Assignment.pathset_cache.hits, Assignment.pathset_cache.misses))
+
         time_elapsed = datetime.datetime.now() - start_time
         FastTripsLogger.info("Finished finding %6d passenger paths.  Time elapsed: %2dh:%2dm:%2ds" % (
                                  num_paths_found_now,
@@ -1092,28 +1597,99 @@ class Assignment:
                                  int( (time_elapsed.total_seconds() % 3600) / 60),
                                  time_elapsed.total_seconds() % 60))
 
-        return num_paths_found_now + num_paths_found_prev
+        return num_paths_found_now
+
+
+    @staticmethod
+    def start_worker_processes(iteration, pathfinding_iteration, num_processes):
+        """
+        Starts *num_processes* pathfinding worker processes running :py:func:`find_trip_based_paths_process_worker`,
+        unless they're already running.  The workers live until :py:meth:`Assignment.stop_worker_processes`;
+        for each pathfinding iteration, they're sent the iteration details on their update queue and then
+        take pathsets from :py:attr:`Assignment.worker_todo_queue` until they get a `DONE`.
+
+        If any existing worker isn't alive, they're all stopped and restarted.  Otherwise, if *num_processes*
+        has changed, the running workers are kept and the extra ones are stopped, or more are started.
+        """
+        process_dict = Assignment.worker_process_dict
+        if len([process_idx for process_idx in process_dict.keys() if not process_dict[process_idx]["process"].is_alive()]) > 0:
+            FastTripsLogger.info("Restarting worker processes")
+            Assignment.stop_worker_processes()
+            process_dict = Assignment.worker_process_dict
+
+        # fewer this time
+        extra_process_idxs = [process_idx for process_idx in process_dict.keys() if process_idx > num_processes]
+        for process_idx in extra_process_idxs:
+            FastTripsLogger.info("Stopping worker process %2d" % process_idx)
+            process_dict[process_idx]["update_queue"].put('EXIT')
+        for process_idx in extra_process_idxs:
+            process_dict[process_idx]["process"].join()
+            FastTripsLogger.debug("Joined worker process %2d" % process_idx)
+            del process_dict[process_idx]
+
+        if len(process_dict) == 0:
+            Assignment.worker_todo_queue = multiprocessing.Queue()
+            Assignment.worker_done_queue = multiprocessing.Queue()
+        for process_idx in range(1+len(process_dict), 1+num_processes):
+            FastTripsLogger.info("Starting worker process %2d" % process_idx)
+            update_queue = multiprocessing.Queue()
+            process_dict[process_idx] = {
+                "process":multiprocessing.Process(target=find_trip_based_paths_process_worker,
+                    args=(iteration, pathfinding_iteration, process_idx, Assignment.INPUT_NETWORK_ARCHIVE, Assignment.INPUT_DEMAND_DIR,
+                          os.path.join(Assignment.OUTPUT_DIR, Assignment.CONFIGURATION_OUTPUT_FILE),
+                          Assignment.CONFIGURATION_FUNCTIONS_FILE,
+                          Assignment.OUTPUT_DIR, update_queue, Assignment.worker_todo_queue, Assignment.worker_done_queue)),
+                "update_queue":update_queue,
+                "alive":True,
+                "done":False,
+                "has_stop_times":False
+            }
+            # don't let them outlive us if something goes wrong
+            process_dict[process_idx]["process"].daemon = True
+            process_dict[process_idx]["process"].start()
+
+    @staticmethod
+    def stop_worker_processes():
+        """
+        Tells the worker processes started by :py:meth:`Assignment.start_worker_processes` to exit, and joins them.
+        """
+        process_dict = Assignment.worker_process_dict
+        for process_idx in process_dict.keys():
+            if process_dict[process_idx]["process"].is_alive():
+                process_dict[process_idx]["update_queue"].put('EXIT')
+        for process_idx in process_dict.keys():
+            process_dict[process_idx]["process"].join()
+            FastTripsLogger.debug("Joined worker process %2d" % process_idx)
+
+        Assignment.worker_process_dict      = {}
+        Assignment.worker_todo_queue        = None
+        Assignment.worker_done_queue        = None
+        Assignment.worker_stop_times_arrays = None
 
+    @staticmethod
+    def get_pathfinding_type_num():
+        """
+        Returns the pathfinding type number the C++ extension expects for :py:attr:`Assignment.PATHFINDING_TYPE`:
+        1 for :py:attr:`Assignment.PATHFINDING_TYPE_STOCHASTIC`, 2 for :py:attr:`Assignment.PATHFINDING_TYPE_CONNECTION_SCAN`
+        and 0 (deterministic) otherwise.
+        """
+        if Assignment.PATHFINDING_TYPE == Assignment.PATHFINDING_TYPE_STOCHASTIC:
+            return 1
+        if Assignment.PATHFINDING_TYPE == Assignment.PATHFINDING_TYPE_CONNECTION_SCAN:
+            return 2
+        return 0
 
     @staticmethod
     def find_trip_based_pathset(iteration, pathfinding_iteration, pathset, hyperpath, trace):
         """
-        Perform trip-based path set search.
+        Perform trip-based path set search for a single :py:class:`PathSet`.
 
         Will do so either backwards (destination to origin) if :py:attr:`PathSet.direction` is :py:attr:`PathSet.DIR_OUTBOUND`
         or forwards (origin to destination) if :py:attr:`PathSet.direction` is :py:attr:`PathSet.DIR_INBOUND`.
 
-        Returns (pathdict,
-                 performance_dict)
-
-        Where pathdict maps {pathnum:{PATH_KEY_COST:cost, PATH_KEY_PROBABILITY:probability, PATH_KEY_STATES:[state list]}}
-
-        Where performance_dict includes:
-                 pathfinding return status,
-                 number of label iterations,
-                 max number of times a stop was processed,
-                 seconds spent in labeling,
-                 seconds spend in enumeration
+        Returns (paths_df, links_df, performance_dict), where paths_df and links_df are as described
+        in :py:meth:`Assignment.convert_pathset_results`, and performance_dict is as described in
+        :py:meth:`Assignment.get_performance_dict`.
 
         :param pathset:   the path to fill in
         :type  pathset:   a :py:class:`PathSet` instance
@@ -1124,98 +1700,302 @@ class Assignment:
         :type  trace:     bool
 
         """
-        # FastTripsLogger.debug("C++ extension start")
         # send it to the C++ extension
-        (ret_ints, ret_doubles, path_costs, process_num, pf_returnstatus,
-         label_iterations, num_labeled_stops, max_label_process_count,
-         ms_labeling, ms_enumerating,
-         bytes_workingset, bytes_privateusage, mem_timestamp) = \
+        pathset_results = \
             _fasttrips.find_pathset(iteration, pathfinding_iteration, hyperpath, pathset.person_id, pathset.person_trip_id,
                                  pathset.user_class, pathset.purpose, pathset.access_mode, pathset.transit_mode, pathset.egress_mode,
                                  pathset.o_taz_num, pathset.d_taz_num,
                                  1 if pathset.outbound else 0, float(pathset.pref_time_min), pathset.vot,
                                  1 if trace else 0)
-        # FastTripsLogger.debug("C++ extension complete")
         FastTripsLogger.debug("Finished finding path for person %s trip %s" % (pathset.person_id, pathset.person_trip_id))
-        pathdict = {}
-        row_num  = 0
-
-        for path_num in range(path_costs.shape[0]):
-
-            pathdict[path_num] = {}
-            pathdict[path_num][PathSet.PATH_KEY_COST       ] = path_costs[path_num, 0]
-            pathdict[path_num][PathSet.PATH_KEY_FARE       ] = path_costs[path_num, 1]
-            pathdict[path_num][PathSet.PATH_KEY_PROBABILITY] = path_costs[path_num, 2]
-            pathdict[path_num][PathSet.PATH_KEY_INIT_COST  ] = path_costs[path_num, 3]
-            pathdict[path_num][PathSet.PATH_KEY_INIT_FARE  ] = path_costs[path_num, 4]
-            # List of (stop_id, stop_state)
-            pathdict[path_num][PathSet.PATH_KEY_STATES     ] = []
-
-            # print "path_num %d" % path_num
-
-            # while we have unprocessed rows and the row is still relevant for this path_num
-            while (row_num < ret_ints.shape[0]) and (ret_ints[row_num, 0] == path_num):
-                # print row_num
-
-                mode = ret_ints[row_num,2]
-                # todo
-                if mode == -100:
-                    mode = PathSet.STATE_MODE_ACCESS
-                elif mode == -101:
-                    mode = PathSet.STATE_MODE_EGRESS
-                elif mode == -102:
-                    mode = PathSet.STATE_MODE_TRANSFER
-                elif mode == -103:
-                    mode = Passenger.MODE_GENERIC_TRANSIT_NUM
-
-                if hyperpath:
-                    pathdict[path_num][PathSet.PATH_KEY_STATES].append( (ret_ints[row_num, 1], [
-                        ret_doubles[row_num,0],                                                          # label,
-                        Assignment.NETWORK_BUILD_DATE_START_TIME + datetime.timedelta(minutes=ret_doubles[row_num,1]),  # departure/arrival time
-                        mode,                                                                            # departure/arrival mode
-                        ret_ints[row_num,3],                                                             # trip id
-                        ret_ints[row_num,4],                                                             # successor/predecessor
-                        ret_ints[row_num,5],                                                             # sequence
-                        ret_ints[row_num,6],                                                             # sequence succ/pred
-                        datetime.timedelta(minutes=ret_doubles[row_num,2]),                              # link time
-                        ret_doubles[row_num,3],                                                          # link fare
-                        ret_doubles[row_num,4],                                                          # link cost
-                        ret_doubles[row_num,5],                                                          # link distance
-                        ret_doubles[row_num,6],                                                          # cost
-                        Assignment.NETWORK_BUILD_DATE_START_TIME + datetime.timedelta(minutes=ret_doubles[row_num,7])   # arrival/departure time
-                    ] ) )
-                else:
-                    pathdict[path_num][PathSet.PATH_KEY_STATES].append( (ret_ints[row_num, 1], [
-                        datetime.timedelta(minutes=ret_doubles[row_num,0]),                              # label,
-                        Assignment.NETWORK_BUILD_DATE_START_TIME + datetime.timedelta(minutes=ret_doubles[row_num,1]),  # departure/arrival time
-                        mode,                                                                            # departure/arrival mode
-                        ret_ints[row_num,3],                                                             # trip id
-                        ret_ints[row_num,4],                                                             # successor/predecessor
-                        ret_ints[row_num,5],                                                             # sequence
-                        ret_ints[row_num,6],                                                             # sequence succ/pred
-                        datetime.timedelta(minutes=ret_doubles[row_num,2]),                              # link time
-                        ret_doubles[row_num,3],                                                          # link fare
-                        datetime.timedelta(minutes=ret_doubles[row_num,4]),                              # link cost
-                        ret_doubles[row_num,5],                                                          # link dist
-                        datetime.timedelta(minutes=ret_doubles[row_num,6]),                              # cost
-                        Assignment.NETWORK_BUILD_DATE_START_TIME + datetime.timedelta(minutes=ret_doubles[row_num,7])   # arrival/departure time
-                    ] ) )
-                row_num += 1
-
-        perf_dict = { \
-            Performance.PERFORMANCE_PF_COL_PROCESS_NUM           : process_num,
-            Performance.PERFORMANCE_PF_COL_PATHFINDING_STATUS    : pf_returnstatus,
-            Performance.PERFORMANCE_PF_COL_LABEL_ITERATIONS      : label_iterations,
-            Performance.PERFORMANCE_PF_COL_NUM_LABELED_STOPS     : num_labeled_stops,
-            Performance.PERFORMANCE_PF_COL_MAX_STOP_PROCESS_COUNT: max_label_process_count,
-            Performance.PERFORMANCE_PF_COL_TIME_LABELING_MS      : ms_labeling,
-            Performance.PERFORMANCE_PF_COL_TIME_ENUMERATING_MS   : ms_enumerating,
+        (paths_df, links_df) = Assignment.convert_pathset_results([pathset.trip_list_id_num], pathset_results, hyperpath)
+        return (paths_df, links_df, Assignment.get_performance_dict(pathset_results[4][0], trace))
+
+    @staticmethod
+    def find_trip_based_pathsets_batch(FT, iteration, pathfinding_iteration, trip_list_df, num_threads):
+        """
+        Perform trip-based path set search for the person trips in *trip_list_df* (rows of
+        :py:attr:`Passenger.trip_list_df`) using *num_threads* threads in the C++ extension, which
+        share this process's network supply.
+
+        The results are recorded via :py:meth:`Assignment.record_pathset_results`.
+
+        Returns the number of pathsets for which a path was found.
+        """
+        (trip_list_id_nums, spec_strs, spec_ints, spec_doubles) = Assignment.get_pathfinding_specs(trip_list_df)
+
+        pathset_results = _fasttrips.find_pathsets_batch(iteration, pathfinding_iteration, Assignment.get_pathfinding_type_num(), num_threads,
+                                                         spec_strs, spec_ints, spec_doubles)
+        FastTripsLogger.debug("Finished finding paths for batch of %d person trips" % len(trip_list_df))
+
+        return Assignment.record_pathset_results(FT, iteration, pathfinding_iteration, trip_list_df, pathset_results)
+
+    @staticmethod
+    def get_pathfinding_specs(trip_list_df):
+        """
+        Packs the path specifications for the person trips in *trip_list_df* (rows of :py:attr:`Passenger.trip_list_df`)
+        into arrays for :py:func:`_fasttrips.find_pathsets_batch`, straight from its columns.
+
+        Returns (trip_list_id_nums, spec_strs, spec_ints, spec_doubles) where
+
+        * trip_list_id_nums is an int32 array of the trip list ID numbers
+        * spec_strs is a list of (person_id, person_trip_id, user_class, purpose, access_mode, transit_mode, egress_mode)
+        * spec_ints is an int32 array with columns o_taz_num, d_taz_num, outbound, trace
+        * spec_doubles is a float64 array with columns pref_time_min, vot
+        """
+        trip_list_id_nums = trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(np.int32)
+        outbound  = trip_list_df[Passenger.TRIP_LIST_COLUMN_OUTBOUND].values
+        spec_strs = list(zip(trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID].astype(str),
+                             trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID].astype(str),
+                             trip_list_df[Passenger.TRIP_LIST_COLUMN_USER_CLASS],
+                             trip_list_df[Passenger.TRIP_LIST_COLUMN_PURPOSE],
+                             trip_list_df[Passenger.TRIP_LIST_COLUMN_ACCESS_MODE],
+                             trip_list_df[Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE],
+                             trip_list_df[Passenger.TRIP_LIST_COLUMN_EGRESS_MODE]))
+        spec_ints = np.column_stack([trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM].values,
+                                     trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM].values,
+                                     outbound,
+                                     trip_list_df[Passenger.TRIP_LIST_COLUMN_TRACE].values]).astype(np.int32)
+        # the preferred time is the arrival time for outbound, departure time for inbound
+        spec_doubles = np.column_stack([np.where(outbound, trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN].values,
+                                                           trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN].values),
+                                        trip_list_df[Passenger.TRIP_LIST_COLUMN_VOT].values]).astype(np.float64)
+
+        return (trip_list_id_nums, spec_strs, spec_ints, spec_doubles)
+
+    @staticmethod
+    def record_pathset_results(FT, iteration, pathfinding_iteration, trip_list_df, pathset_results):
+        """
+        Records the pathset results returned by the C++ extension for the person trips in *trip_list_df*
+        (rows of :py:attr:`Passenger.trip_list_df`, in the order they were found): the paths and links go to
+        :py:meth:`Passenger.add_pathset_results` and the performance information goes to *FT.performance*.
+
+        Returns the number of pathsets for which a path was found.
+        """
+        trip_list_id_nums = trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(np.int32)
+        (paths_df, links_df) = Assignment.convert_pathset_results(trip_list_id_nums, pathset_results,
+                                                                  Assignment.PATHFINDING_TYPE==Assignment.PATHFINDING_TYPE_STOCHASTIC)
+        if Assignment.pathfinding_duplicates_df is not None and len(Assignment.pathfinding_duplicates_df) > 0:
+            paths_df = Assignment.share_pathset_results(paths_df)
+            links_df = Assignment.share_pathset_results(links_df)
+        FT.passengers.add_pathset_results(paths_df, links_df)
+
+        if Assignment.pathset_cache is not None:
+            Assignment.pathset_cache.add(Assignment.get_pathset_cache_keys(iteration, trip_list_df), pathset_results)
+
+        perf_info = pathset_results[4]
+        for (idx, person_id, person_trip_id, trace) in zip(range(len(trip_list_df)),
+                                                           trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID],
+                                                           trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID],
+                                                           trip_list_df[Passenger.TRIP_LIST_COLUMN_TRACE]):
+            FT.performance.add_info(iteration, pathfinding_iteration, person_id, person_trip_id,
+                                    Assignment.get_performance_dict(perf_info[idx], trace))
+
+        # count the person trips sharing these pathsets too
+        return len(np.unique(paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values))
+
+    @staticmethod
+    def get_pathset_cache_keys(iteration, trip_list_df):
+        """
+        Returns a list of the :py:class:`PathSetCache` trip keys for the person trips in *trip_list_df*
+        (rows of :py:attr:`Passenger.trip_list_df`): a hash of each path specification, including the iteration
+        and person and person trip IDs since hyperpath enumeration's random numbers depend on them.  Traced person
+        trips get None, since they're always found so they're traced.
+        """
+        outbound      = trip_list_df[Passenger.TRIP_LIST_COLUMN_OUTBOUND].values
+        pref_time_min = np.where(outbound, trip_list_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN].values,
+                                           trip_list_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN].values)
+        trip_keys = []
+        for spec in zip(trip_list_df[Passenger.TRIP_LIST_COLUMN_TRACE],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_ID],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_USER_CLASS],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_PURPOSE],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_ACCESS_MODE],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_EGRESS_MODE],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM],
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM],
+                        outbound, pref_time_min,
+                        trip_list_df[Passenger.TRIP_LIST_COLUMN_VOT]):
+            if spec[0]:
+                trip_keys.append(None)
+                continue
+            trip_keys.append(PathSetCache.hash_parts([iteration] + list(spec[1:10]) +
+                                                     [bool(spec[10]), repr(float(spec[11])), repr(float(spec[12]))]))
+        return trip_keys
+
+    @staticmethod
+    def record_cached_pathsets(FT, iteration, pathfinding_iteration, trip_list_df):
+        """
+        Looks up the person trips in *trip_list_df* (rows of :py:attr:`Passenger.trip_list_df`) in
+        :py:attr:`Assignment.pathset_cache` and records the results for those that are cached via
+        :py:meth:`Assignment.record_pathset_results`.  Their performance information has a process number
+        of -1 and is otherwise zero.
+
+        Returns (the number of cached pathsets for which a path was found, the rows of *trip_list_df* that weren't cached).
+        """
+        (hit, pathset_results) = Assignment.pathset_cache.lookup(Assignment.get_pathset_cache_keys(iteration, trip_list_df))
+        if hit.sum() == 0:
+            return (0, trip_list_df)
+
+        perf_info         = np.zeros((hit.sum(), Assignment.EMPTY_PATHSET_RESULTS[4].shape[1]), dtype=np.int64)
+        perf_info[:,0]    = -1
+        num_found = Assignment.record_pathset_results(FT, iteration, pathfinding_iteration, trip_list_df.iloc[np.nonzero(hit)[0]],
+                                                      pathset_results + (perf_info,))
+        return (num_found, trip_list_df.iloc[np.nonzero(~hit)[0]])
+
+    @staticmethod
+    def get_pathfinding_duplicates(trip_list_df):
+        """
+        Groups the person trips in *trip_list_df* by path specification: origin, destination, preferred time,
+        time target, user class, purpose, access, transit and egress modes and value of time.  Traced person
+        trips aren't grouped.
+
+        Returns a :py:class:`pandas.DataFrame` with a row for each person trip that isn't the first in its group,
+        with columns `trip_list_id_num` for the first person trip in the group, whose pathset will be found, and
+        :py:attr:`Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM` for the person trip that will share it.
+        """
+        untraced_df = trip_list_df.loc[trip_list_df[Passenger.TRIP_LIST_COLUMN_TRACE]==False]
+
+        group_df = pd.DataFrame(collections.OrderedDict([
+            (Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM, untraced_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values),
+            (Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM,      untraced_df[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM].values),
+            (Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM, untraced_df[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM].values),
+            (Passenger.TRIP_LIST_COLUMN_OUTBOUND,               untraced_df[Passenger.TRIP_LIST_COLUMN_OUTBOUND].values),
+            # the preferred time is the arrival time for outbound, departure time for inbound
+            ('pref_time_min',                                   np.where(untraced_df[Passenger.TRIP_LIST_COLUMN_OUTBOUND].values,
+                                                                         untraced_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN].values,
+                                                                         untraced_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN].values)),
+            (Passenger.TRIP_LIST_COLUMN_USER_CLASS,             untraced_df[Passenger.TRIP_LIST_COLUMN_USER_CLASS].values),
+            (Passenger.TRIP_LIST_COLUMN_PURPOSE,                untraced_df[Passenger.TRIP_LIST_COLUMN_PURPOSE].values),
+            (Passenger.TRIP_LIST_COLUMN_ACCESS_MODE,            untraced_df[Passenger.TRIP_LIST_COLUMN_ACCESS_MODE].values),
+            (Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE,           untraced_df[Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE].values),
+            (Passenger.TRIP_LIST_COLUMN_EGRESS_MODE,            untraced_df[Passenger.TRIP_LIST_COLUMN_EGRESS_MODE].values),
+            (Passenger.TRIP_LIST_COLUMN_VOT,                    untraced_df[Passenger.TRIP_LIST_COLUMN_VOT].values) ]))
+        key_cols = list(group_df.columns.values)[1:]
+
+        # rows with a null key don't get grouped
+        group_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] = \
+            group_df.groupby(key_cols, sort=False)[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM].transform('first')
+        group_df = group_df.loc[pd.notnull(group_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]) &
+                                (group_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] != group_df[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM])]
+
+        return pd.DataFrame(collections.OrderedDict([
+            (Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,       group_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values.astype(np.int64)),
+            (Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM, group_df[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM].values.astype(np.int64)) ]))
+
+    @staticmethod
+    def share_pathset_results(results_df):
+        """
+        Given paths or links from :py:meth:`Assignment.convert_pathset_results`, adds a copy of the rows
+        for each person trip sharing them, per :py:attr:`Assignment.pathfinding_duplicates_df`.
+
+        Returns the rows with the copies appended.
+        """
+        shared_df = pd.merge(left =results_df,
+                             right=Assignment.pathfinding_duplicates_df,
+                             how  ="inner",
+                             on   =Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM)
+        if len(shared_df) == 0:
+            return results_df
+
+        shared_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] = shared_df[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM]
+        shared_df.drop([Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM], axis=1, inplace=True)
+        return pd.concat([results_df, shared_df], axis=0, ignore_index=True)
+
+    @staticmethod
+    def convert_pathset_results(trip_list_id_nums, pathset_results, hyperpath):
+        """
+        Converts the columnar pathset results returned by the C++ extension for the person trips with the
+        given *trip_list_id_nums* into two :py:class:`pandas.DataFrame` instances, (paths_df, links_df).
+
+        These have the pathfinding columns of pathset_paths_df and pathset_links_df as described in
+        :py:meth:`Passenger.setup_passenger_pathsets`, keyed by `trip_list_id_num`, `pathnum` and
+        (for links) `linknum`.  Times are converted from minutes after midnight on the network build
+        date.  For deterministic pathfinding, link costs are times.
+        """
+        (path_ints, path_doubles, link_ints, link_doubles, perf_info) = pathset_results
+        trip_list_id_nums = np.asarray(trip_list_id_nums, dtype=np.int64)
+
+        paths_df = pd.DataFrame(collections.OrderedDict([
+            (Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, trip_list_id_nums[path_ints[:,0]]),
+            (Passenger.PF_COL_PATH_NUM,                   path_ints[:,1].astype(np.int64)),
+            (PathSet.PATH_KEY_COST,                       path_doubles[:,0]),
+            (PathSet.PATH_KEY_FARE,                       path_doubles[:,1]),
+            (PathSet.PATH_KEY_PROBABILITY,                path_doubles[:,2]),
+            (PathSet.PATH_KEY_INIT_COST,                  path_doubles[:,3]),
+            (PathSet.PATH_KEY_INIT_FARE,                  path_doubles[:,4]) ]))
+
+        # access, egress and transfer links have their mode number in the trip id column
+        link_mode   = link_ints[:,3]
+        is_trip     = (link_mode != -100) & (link_mode != -101) & (link_mode != -102)
+        linkmode    = np.full(len(link_mode), PathSet.STATE_MODE_TRIP, dtype=object)
+        linkmode[link_mode == -100] = PathSet.STATE_MODE_ACCESS
+        linkmode[link_mode == -101] = PathSet.STATE_MODE_EGRESS
+        linkmode[link_mode == -102] = PathSet.STATE_MODE_TRANSFER
+
+        # times are rounded to microseconds, like datetime.timedelta
+        start_time  = np.datetime64(Assignment.NETWORK_BUILD_DATE_START_TIME, 'us')
+        b_time_us   = np.floor(link_doubles[:,0]*60000000.0 + 0.5).astype(np.int64)
+        ab_time_us  = np.floor(link_doubles[:,1]*60000000.0 + 0.5).astype(np.int64)  # board or alight time at the other end
+        linktime_us = np.floor(link_doubles[:,2]*60000000.0 + 0.5).astype(np.int64)
+        # trips: linktime includes wait
+        waittime_us = np.where(is_trip, linktime_us - (b_time_us - ab_time_us), np.iinfo(np.int64).min)
+
+        if hyperpath:
+            link_cost = link_doubles[:,4]
+        else:
+            link_cost = np.floor(link_doubles[:,4]*60000000.0 + 0.5).astype(np.int64).astype('timedelta64[us]').astype('timedelta64[ns]')
+
+        links_df = pd.DataFrame(collections.OrderedDict([
+            (Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, trip_list_id_nums[link_ints[:,0]]),
+            (Passenger.PF_COL_PATH_NUM,                   link_ints[:,1].astype(np.int64)),
+            (Passenger.PF_COL_LINK_MODE,                  linkmode),
+            (Route.ROUTES_COLUMN_MODE_NUM,                np.where(is_trip, np.nan, link_ints[:,4])),
+            (Trip.TRIPS_COLUMN_TRIP_ID_NUM,               np.where(is_trip, link_ints[:,4], np.nan)),
+            ('A_id_num',                                  link_ints[:,5].astype(np.int64)),
+            ('B_id_num',                                  link_ints[:,6].astype(np.int64)),
+            ('A_seq',                                     link_ints[:,7].astype(np.int64)),
+            ('B_seq',                                     link_ints[:,8].astype(np.int64)),
+            (Passenger.PF_COL_PAX_A_TIME,                 (start_time + (b_time_us - linktime_us).astype('timedelta64[us]')).astype('datetime64[ns]')),
+            (Passenger.PF_COL_PAX_B_TIME,                 (start_time + b_time_us.astype('timedelta64[us]')).astype('datetime64[ns]')),
+            (Passenger.PF_COL_LINK_TIME,                  linktime_us.astype('timedelta64[us]').astype('timedelta64[ns]')),
+            (Passenger.PF_COL_LINK_FARE,                  link_doubles[:,3]),
+            (Passenger.PF_COL_LINK_COST,                  link_cost),
+            (Passenger.PF_COL_LINK_DIST,                  link_doubles[:,5]),
+            (Passenger.PF_COL_WAIT_TIME,                  waittime_us.astype('timedelta64[us]').astype('timedelta64[ns]')),
+            (Passenger.PF_COL_LINK_NUM,                   link_ints[:,2].astype(np.int64)) ]))
+
+        return (paths_df, links_df)
+
+    @staticmethod
+    def get_performance_dict(perf_row, trace):
+        """
+        Converts a row of the performance information returned by the C++ extension into a dictionary
+        for :py:meth:`Performance.add_info`.
+        """
+        perf_row = perf_row.tolist()
+        return { \
+            Performance.PERFORMANCE_PF_COL_PROCESS_NUM           : perf_row[0],
+            Performance.PERFORMANCE_PF_COL_PATHFINDING_STATUS    : perf_row[1],
+            Performance.PERFORMANCE_PF_COL_LABEL_ITERATIONS      : perf_row[2],
+            Performance.PERFORMANCE_PF_COL_NUM_LABELED_STOPS     : perf_row[3],
+            Performance.PERFORMANCE_PF_COL_MAX_STOP_PROCESS_COUNT: perf_row[4],
+            Performance.PERFORMANCE_PF_COL_TIME_LABELING_MS      : perf_row[5],
+            Performance.PERFORMANCE_PF_COL_TIME_ENUMERATING_MS   : perf_row[6],
             Performance.PERFORMANCE_PF_COL_TRACED                : trace,
-            Performance.PERFORMANCE_PF_COL_WORKING_SET_BYTES     : bytes_workingset,
-            Performance.PERFORMANCE_PF_COL_PRIVATE_USAGE_BYTES   : bytes_privateusage,
-            Performance.PERFORMANCE_PF_COL_MEM_TIMESTAMP         : datetime.datetime.fromtimestamp(mem_timestamp)
+            Performance.PERFORMANCE_PF_COL_WORKING_SET_BYTES     : perf_row[7],
+            Performance.PERFORMANCE_PF_COL_PRIVATE_USAGE_BYTES   : perf_row[8],
+            Performance.PERFORMANCE_PF_COL_MEM_TIMESTAMP         : datetime.datetime.fromtimestamp(perf_row[9]),
+            Performance.PERFORMANCE_PF_COL_QUEUE_PUSHES          : perf_row[10],
+            Performance.PERFORMANCE_PF_COL_QUEUE_DECREASE_KEYS   : perf_row[11],
+            Performance.PERFORMANCE_PF_COL_QUEUE_POPS            : perf_row[12],
+            Performance.PERFORMANCE_PF_COL_PRUNED_STOPS          : perf_row[13],
+            Performance.PERFORMANCE_PF_COL_CACHE_HITS            : perf_row[14],
+            Performance.PERFORMANCE_PF_COL_CACHE_MISSES          : perf_row[15],
+            Performance.PERFORMANCE_PF_COL_CACHE_EVICTIONS       : perf_row[16]
         }
-        return (pathdict, perf_dict)
 
     @staticmethod
     def find_passenger_vehicle_times(pathset_links_df, veh_trips_df):
@@ -1856,7 +2636,7 @@ class Assignment:
         ######################################################################################################
         FastTripsLogger.info("  Step 2. Calculate costs and probabilities for all pathset paths")
         (pathset_paths_df, pathset_links_df) = PathSet.calculate_cost(
-            Assignment.STOCH_DISPERSION, pathset_paths_df, pathset_links_df, FT.veh_trips_df,
+            Assignment.STOCH_DISPERSION, pathset_paths_df, pathset_links_df, veh_trips_df,
             FT.passengers.trip_list_df, FT.routes, FT.tazs, FT.transfers, stops=FT.stops,
             reset_bump_iter=simulation_iteration==0)
 
@@ -2004,11 +2784,20 @@ class Assignment:
 
 
 def find_trip_based_paths_process_worker(iteration, pathfinding_iteration, worker_num, input_network_dir, input_demand_dir, run_config, func_file,
-                                         output_dir, todo_pathset_queue, done_queue, hyperpath, bump_wait_df, stop_times_df):
+                                         output_dir, update_queue, todo_pathset_queue, done_queue):
     """
-    Process worker function.  Processes all the paths in queue.
+    Process worker function.  This lives across pathfinding iterations; see :py:meth:`Assignment.start_worker_processes`.
+
+    update_queue has (iteration, pathfinding_iteration, pathfinding_type_num, bump_wait_df, stop_times_changes) for each
+    pathfinding iteration, or 'EXIT'.  If stop_times_changes is None, the stop times for that iteration are memory-mapped
+    from the arrays written by :py:meth:`Assignment.write_stop_times_arrays` and copied by the C++ extension.  Otherwise
+    it has the stop times that changed since the last iteration, as returned by :py:meth:`Assignment.get_stop_times_changes`.
 
-    todo_queue has (passenger_id, path object)
+    todo_queue has chunks of person trips to find, as returned by :py:meth:`Assignment.get_pathfinding_specs`,
+    followed by a 'DONE' for each worker.  The worker sends STARTING once per pathfinding iteration, and the
+    results for each chunk are sent back as the columnar arrays returned by :py:func:`_fasttrips.find_pathsets_batch`.
+
+    *iteration* and *pathfinding_iteration* are the ones during which the worker was started.
     """
     worker_str = "_worker%02d" % worker_num
 
@@ -2020,45 +2809,65 @@ def find_trip_based_paths_process_worker(iteration, pathfinding_iteration, worke
     FastTripsLogger.info("Iteration %d Pathfinding Iteration %d Worker %2d starting" % (iteration, pathfinding_iteration, worker_num))
 
     # the child process doesn't have these set so read them
+    # run_config is the output copy of the configuration so it includes any overrides
     Assignment.CONFIGURATION_FILE           = run_config
     Assignment.CONFIGURATION_FUNCTIONS_FILE = func_file
     Assignment.read_functions(func_file)
     Assignment.read_configuration(run_config)
 
-    # this passes those read parameters and the stop times to the C++ extension
-    Assignment.initialize_fasttrips_extension(worker_num, output_dir, stop_times_df)
+    supply_initialized = False
+    while True:
+        update = update_queue.get()
+        if update == 'EXIT':
+            FastTripsLogger.debug("Received EXIT from the update_queue")
+            return
 
-    # the extension has it now, so we're done
-    stop_times_df = None
+        (iteration, pathfinding_iteration, pathfinding_type_num, bump_wait_df, stop_times_changes) = update
+        FastTripsLogger.info("Iteration %d Pathfinding Iteration %d Worker %2d updating supply" % (iteration, pathfinding_iteration, worker_num))
 
-    if iteration > 1:
-        Assignment.set_fasttrips_bump_wait(bump_wait_df)
+        if stop_times_changes is not None:
+            # the network and trip stops are the same, just some stop times have changed
+            FastTripsLogger.debug("Updating %d changed stop times" % len(stop_times_changes[0]))
+            if len(stop_times_changes[0]) > 0:
+                _fasttrips.update_stop_times(stop_times_changes[0], stop_times_changes[1])
+        else:
+            stop_times_arrays = Assignment.read_stop_times_arrays(output_dir)
+            if supply_initialized:
+                # the network is the same, but the trip stops have changed
+                _fasttrips.update_supply(stop_times_arrays[0], stop_times_arrays[1])
+            else:
+                # this passes those read parameters and the stop times to the C++ extension
+                Assignment.initialize_fasttrips_extension(worker_num, output_dir, stop_times_arrays=stop_times_arrays)
+                supply_initialized = True
+            # the extension has copied them; release the mapping since the files may get rewritten
+            del stop_times_arrays
+            Assignment.extension_stop_times_arrays = None
 
-    while True:
-        # go through my queue -- check if we're done
-        todo = todo_pathset_queue.get()
-        if todo == 'DONE':
-            done_queue.put( (worker_num, 'DONE') )
-            FastTripsLogger.debug("Received DONE from the todo_pathset_queue")
-            return
+        if iteration > 1:
+            Assignment.set_fasttrips_bump_wait(bump_wait_df)
 
-        # do the work
-        pathset = todo
+        # communicate it to the parent; the chunks are logged as they're started
+        done_queue.put( (worker_num, "STARTING", iteration, pathfinding_iteration) )
 
-        FastTripsLogger.info("Processing person %20s trip %20s" % (pathset.person_id, pathset.person_trip_id))
-        # communicate it to the parent
-        done_queue.put( (worker_num, "STARTING", pathset.person_id, pathset.person_trip_id ))
+        while True:
+            # go through my queue -- check if we're done
+            todo = todo_pathset_queue.get()
+            if type(todo) == str and todo == 'DONE':
+                done_queue.put( (worker_num, 'DONE') )
+                FastTripsLogger.debug("Received DONE from the todo_pathset_queue")
+                break
 
-        trace_person = False
-        if (pathset.person_id, pathset.person_trip_id) in Assignment.TRACE_IDS:
-            FastTripsLogger.debug("Tracing assignment of person %s trip %s" % (pathset.person_id, pathset.person_trip_id))
-            trace_person = True
+            # do the work
+            (trip_list_id_nums, spec_strs, spec_ints, spec_doubles) = todo
 
-        try:
-            (pathdict, perf_dict) = Assignment.find_trip_based_pathset(iteration, pathfinding_iteration, pathset, hyperpath, trace=trace_person)
-            done_queue.put( (worker_num, "COMPLETED", pathset.trip_list_id_num, pathdict, perf_dict) )
-        except:
-            FastTripsLogger.exception("Exception")
-            # call it a day
-            done_queue.put( (worker_num, "EXCEPTION", str(sys.exc_info()) ) )
-            return
+            FastTripsLogger.info("Processing %d person trips starting with person %20s trip %20s" % (len(spec_strs), spec_strs[0][0], spec_strs[0][1]))
+
+            try:
+                pathset_results = _fasttrips.find_pathsets_batch(iteration, pathfinding_iteration, pathfinding_type_num, 1,
+                                                                 spec_strs, spec_ints, spec_doubles)
+                done_queue.put( (worker_num, "COMPLETED", trip_list_id_nums, pathset_results) )
+            except:
+                FastTripsLogger.exception("Exception")
+                # call it a day
+                done_queue.put( (worker_num, "EXCEPTION", str(sys.exc_info()) ) )
+                return
@@ -13,6 +13,7 @@ __license__   = """
     limitations under the License.
 """
 import os
+import shutil
 import sys
 
 import partridge as ptg
@@ -20,8 +21,10 @@ import partridge as ptg
 from .Assignment  import Assignment
 from .Logger      import FastTripsLogger, setupLogging
 from .Passenger   import Passenger
+from .PathSet     import PathSet
 from .Performance import Performance
 from .Route       import Route
+from .Skimming    import Skimming
 from .Stop        import Stop
 from .TAZ         import TAZ
 from .Transfer    import Transfer
@@ -173,6 +176,10 @@ class FastTrips:
 
             r = Assignment.assign_paths(output_dir, self)
 
+            if Assignment.CREATE_SKIMS:
+                self.performance.record_step_start(-1,-1,-1,"skimming")
+                Skimming.create_skims(output_dir, self, self.trips.stop_times_df)
+
         except:
             print("Unexpected error:", sys.exc_info()[0])
             FastTripsLogger.fatal("Unexpected error: %s" % str(sys.exc_info()[0]))
@@ -182,4 +189,51 @@ class FastTrips:
         self.performance.write(output_dir)
 
         FastTripsLogger.info("Successfully completed!")
-        return r
\ No newline at end of file
+        return r
+
+    def run_recosting(self, output_dir, pathset_dir, weights_files):
+        """
+        Re-costs the pathsets found by a previous run, read from *pathset_dir*, with each of the
+        pathweight files in *weights_files* in turn, choosing and simulating paths without finding any.
+
+        The network, demand and pathsets are read and prepared once and reused for each weights file.
+        Results for the nth weights file are written to the subdirectory ``recost_n`` of *output_dir*,
+        along with a copy of the weights file.
+
+        Returns a list of results (see :py:meth:`Assignment.recost_paths`), one per weights file.
+        """
+        self.performance.record_step_start(-1,-1,-1,"read_pathsets")
+
+        results = []
+        try:
+            (pathset_paths_df, pathset_links_df) = self.passengers.read_passenger_pathsets(pathset_dir, self.stops, self.routes.modes_df, include_asgn=False)
+            (pathset_paths_df, pathset_links_df) = Assignment.get_recosting_pathsets(self, pathset_paths_df, pathset_links_df)
+            veh_trips_df = self.trips.get_full_trips()
+
+            for weights_num, weights_file in enumerate(weights_files):
+                self.performance.record_step_start(-1,-1,-1,"recosting %s" % weights_file)
+                FastTripsLogger.info("***************************** RE-COSTING WITH %s **************************************" % weights_file)
+
+                recost_dir = os.path.join(output_dir, "recost_%d" % weights_num)
+                if not os.path.exists(recost_dir):
+                    os.mkdir(recost_dir)
+
+                Assignment.INPUT_WEIGHTS = weights_file
+                Assignment.read_weights(weights_file=weights_file)
+                # the trip list was verified with the first weights; this adds the supply mode numbers and fare weights
+                PathSet.verify_weight_config(self.passengers.modes_df, recost_dir, self.routes,
+                                             Assignment.CAPACITY_CONSTRAINT, self.passengers.trip_list_df)
+                Assignment.write_configuration(recost_dir)
+                shutil.copy(weights_file, recost_dir)
+
+                results.append(Assignment.recost_paths(recost_dir, self, pathset_paths_df.copy(), pathset_links_df.copy(), veh_trips_df.copy()))
+
+        except:
+            FastTripsLogger.fatal("Unexpected error: %s" % str(sys.exc_info()[0]))
+            raise
+
+        self.performance.record_step_end(-1,-1,-1)
+        self.performance.write(output_dir)
+
+        FastTripsLogger.info("Successfully completed!")
+        return results
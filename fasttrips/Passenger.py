@@ -12,7 +12,6 @@ __license__   = """
     See the License for the specific language governing permissions and
     limitations under the License.
 """
-import collections
 import os
 import sys
 
@@ -116,6 +115,7 @@ class Passenger:
 
     #: Column names from pathfinding
     PF_COL_PF_ITERATION             = 'pf_iteration' #: 0.01*pathfinding_iteration + iteration during which this path was found
+    PF_COL_PATHFINDING_ITERATION    = 'pf_pathfinding_iteration' #: pathfinding iteration during which this path was found
     PF_COL_PAX_A_TIME               = 'pf_A_time'    #: time path-finder thinks passenger arrived at A
     PF_COL_PAX_B_TIME               = 'pf_B_time'    #: time path-finder thinks passenger arrived at B
     PF_COL_LINK_TIME                = 'pf_linktime'  #: time path-finder thinks passenger spent on link
@@ -405,21 +405,23 @@ class Passenger:
         FastTripsLogger.debug("Final trip_list_df\n"+str(self.trip_list_df.index.dtype)+"\n"+str(self.trip_list_df.dtypes))
         FastTripsLogger.debug("\n"+self.trip_list_df.head().to_string())
 
-        #: Maps trip_list_id to :py:class:`PathSet` instance.  Use trip_list_id instead of (person_id, person_trip_id) for simplicity and to iterate sequentially
-        #: in setup_passenger_pathsets()
-        self.id_to_pathset = collections.OrderedDict()
+        #: Stores the current pathset paths and links, keyed by trip_list_id_num.
+        #: Use trip_list_id_num instead of (person_id, person_trip_id) so replacements are array operations.
+        from .PathSetStore import PathSetStore
+        self.pathset_store = PathSetStore(len(self.trip_list_df))
 
-    def add_pathset(self, trip_list_id, pathset):
-        """
-        Stores this path set for the trip_list_id.
-        """
-        self.id_to_pathset[trip_list_id] = pathset
+        #: Pathfinding results for the person trips sought in this pathfinding iteration, as lists of
+        #: :py:class:`pandas.DataFrame` instances from :py:meth:`Assignment.convert_pathset_results`.
+        #: See :py:meth:`Passenger.add_pathset_results`.
+        self.pathfinding_paths_dfs = []
+        self.pathfinding_links_dfs = []
 
-    def get_pathset(self, trip_list_id):
+    def add_pathset_results(self, paths_df, links_df):
         """
-        Retrieves a stored path set for the given trip_list_id
+        Stores pathfinding results for some person trips, to be put together by :py:meth:`Passenger.setup_passenger_pathsets`.
         """
-        return self.id_to_pathset[trip_list_id]
+        self.pathfinding_paths_dfs.append(paths_df)
+        self.pathfinding_links_dfs.append(links_df)
 
     def get_person_id(self, trip_list_id):
         to_ret = self.trip_list_df.loc[self.trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]==trip_list_id,
@@ -471,10 +473,13 @@ class Passenger:
         links_file = os.path.join(pathset_dir, Passenger.PATHSET_LINKS_CSV if include_asgn else Passenger.PF_LINKS_CSV)
         pathset_links_df = pd.read_csv(links_file, skipinitialspace=True, dtype=links_dtypes)
 
-        # convert time strings to datetimes
+        # convert time strings to datetimes; pathsets written by fast-trips include the date
         for date_col in date_cols:
             if date_col in pathset_links_df.columns.values:
-                pathset_links_df[date_col] = pathset_links_df[date_col].map(lambda x: Util.read_time(x))
+                if pathset_links_df[date_col].str.contains(" ", na=False).any():
+                    pathset_links_df[date_col] = pd.to_datetime(pathset_links_df[date_col])
+                else:
+                    pathset_links_df[date_col] = pathset_links_df[date_col].map(lambda x: Util.read_time(x))
 
         # convert time duration columns to time durations
         link_cols = list(pathset_links_df.columns.values)
@@ -543,7 +548,7 @@ class Passenger:
     def setup_passenger_pathsets(self, iteration, pathfinding_iteration, stops, trip_id_df, trips_df, modes_df,
                                  transfers, tazs, prepend_route_id_to_trip_id):
         """
-        Converts pathfinding results (which is stored in each Passenger :py:class:`PathSet`) into two
+        Converts pathfinding results (which are stored via :py:meth:`Passenger.add_pathset_results`) into two
         :py:class:`pandas.DataFrame` instances.
 
         Returns two :py:class:`pandas.DataFrame` instances: pathset_paths_df and pathset_links_df.
@@ -562,6 +567,7 @@ class Passenger:
         `pathdir`                     int64  the :py:attr:`PathSet.direction`
         `pathmode`                   object  the :py:attr:`PathSet.mode`
         `pf_iteration`              float64  iteration + 0.01*pathfinding_iteration in which these paths were found
+        `pf_pathfinding_iteration`    int32  pathfinding iteration in which these paths were found
         `pathnum`                     int64  the path number for the path within the pathset
         `pf_cost`                   float64  the cost of the entire path
         `pf_fare`                   float64  the fare of the entire path
@@ -611,141 +617,37 @@ class Passenger:
         """
         from .Assignment import Assignment
         from .PathSet import PathSet
-        pathlist = []
-        linklist = []
-
-        trip_list_id_nums = self.pathfind_trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].tolist()
-
-        for trip_list_id,pathset in self.id_to_pathset.iteritems():
-            # only process if we just did pathfinding for this person trip
-            if trip_list_id not in trip_list_id_nums: continue
-
-            if not pathset.goes_somewhere():   continue
-            if not pathset.path_found():       continue
-
-            for pathnum in range(pathset.num_paths()):
-                # OUTBOUND passengers have states like this:
-                #    stop:          label    departure   dep_mode  successor linktime
-                # orig_taz                                 Access    b stop1
-                #  b stop1                                  trip1    a stop2
-                #  a stop2                               Transfer    b stop3
-                #  b stop3                                  trip2    a stop4
-                #  a stop4                                 Egress   dest_taz
-                #
-                #  stop:         label  dep_time    dep_mode   successor  seq  suc       linktime             cost  arr_time
-                #   460:  0:20:49.4000  17:41:10      Access        3514   -1   -1   0:03:08.4000     0:03:08.4000  17:44:18
-                #  3514:  0:17:41.0000  17:44:18     5131292        4313   30   40   0:06:40.0000     0:12:21.8000  17:50:59
-                #  4313:  0:05:19.2000  17:50:59    Transfer        5728   -1   -1   0:00:19.2000     0:00:19.2000  17:51:18
-                #  5728:  0:04:60.0000  17:57:00     5154302        5726   16   17   0:07:33.8000     0:03:02.4000  17:58:51
-                #  5726:  0:01:57.6000  17:58:51      Egress         231   -1   -1   0:01:57.6000     0:01:57.6000  18:00:49
-
-                # INBOUND passengers have states like this
-                #   stop:          label      arrival   arr_mode predecessor linktime
-                # dest_taz                                 Egress    a stop4
-                #  a stop4                                  trip2    b stop3
-                #  b stop3                               Transfer    a stop2
-                #  a stop2                                  trip1    b stop1
-                #  b stop1                                 Access   orig_taz
-                #
-                #  stop:         label  arr_time    arr_mode predecessor  seq pred       linktime             cost  dep_time
-                #    15:  0:36:38.4000  17:30:38      Egress        3772   -1   -1   0:02:38.4000     0:02:38.4000  17:28:00
-                #  3772:  0:34:00.0000  17:28:00     5123368        6516   22   14   0:24:17.2000     0:24:17.2000  17:05:50
-                #  6516:  0:09:42.8000  17:03:42    Transfer        4766   -1   -1   0:00:16.8000     0:00:16.8000  17:03:25
-                #  4766:  0:09:26.0000  17:03:25     5138749        5671    7    3   0:05:30.0000     0:05:33.2000  16:57:55
-                #  5671:  0:03:52.8000  16:57:55      Access         943   -1   -1   0:03:52.8000     0:03:52.8000  16:54:03
-                prev_linkmode = None
-                prev_state_id = None
-
-                state_list = pathset.pathdict[pathnum][PathSet.PATH_KEY_STATES]
-                if not pathset.outbound: state_list = list(reversed(state_list))
-
-                pathlist.append([\
-                    pathset.person_id,
-                    pathset.person_trip_id,
-                    trip_list_id,
-                    (pathset.person_id,pathset.person_trip_id) in Assignment.TRACE_IDS,
-                    pathset.direction,
-                    pathset.mode,
-                    0.01*pathfinding_iteration+iteration,
-                    pathnum,
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_COST],
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_FARE],
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_PROBABILITY],
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_INIT_COST],
-                    pathset.pathdict[pathnum][PathSet.PATH_KEY_INIT_FARE]
-                ])
-
-                link_num   = 0
-                for (state_id, state) in state_list:
-
-                    linkmode        = state[PathSet.STATE_IDX_DEPARRMODE]
-                    mode_num        = None
-                    trip_id         = None
-                    waittime        = None
-
-                    if linkmode in [PathSet.STATE_MODE_ACCESS, PathSet.STATE_MODE_TRANSFER, PathSet.STATE_MODE_EGRESS]:
-                        mode_num    = state[PathSet.STATE_IDX_TRIP]
-                    else:
-                        # trip mode_num will need to be joined
-                        trip_id     = state[PathSet.STATE_IDX_TRIP]
-                        linkmode    = PathSet.STATE_MODE_TRIP
-
-                    if pathset.outbound:
-                        a_id_num    = state_id
-                        b_id_num    = state[PathSet.STATE_IDX_SUCCPRED]
-                        a_seq       = state[PathSet.STATE_IDX_SEQ]
-                        b_seq       = state[PathSet.STATE_IDX_SEQ_SUCCPRED]
-                        b_time      = state[PathSet.STATE_IDX_ARRDEP]
-                        a_time      = b_time - state[PathSet.STATE_IDX_LINKTIME]
-                        trip_time   = state[PathSet.STATE_IDX_ARRDEP] - state[PathSet.STATE_IDX_DEPARR]
-                    else:
-                        a_id_num    = state[PathSet.STATE_IDX_SUCCPRED]
-                        b_id_num    = state_id
-                        a_seq       = state[PathSet.STATE_IDX_SEQ_SUCCPRED]
-                        b_seq       = state[PathSet.STATE_IDX_SEQ]
-                        b_time      = state[PathSet.STATE_IDX_DEPARR]
-                        a_time      = b_time - state[PathSet.STATE_IDX_LINKTIME]
-                        trip_time   = state[PathSet.STATE_IDX_DEPARR] - state[PathSet.STATE_IDX_ARRDEP]
-
-                    # trips: linktime includes wait
-                    if linkmode == PathSet.STATE_MODE_TRIP:
-                        waittime    = state[PathSet.STATE_IDX_LINKTIME] - trip_time
-
-                    # two trips in a row -- this shouldn't happen
-                    if linkmode == PathSet.STATE_MODE_TRIP and prev_linkmode == PathSet.STATE_MODE_TRIP:
-                        FastTripsLogger.warn("Two trip links in a row... this shouldn't happen. person_id is %s trip is %s\npathnum is %d\nstatelist (%d): %s\n" % (person_id, person_trip_id, pathnum, len(state_list), str(state_list)))
-                        sys.exit()
-
-                    linklist.append([\
-                        pathset.person_id,
-                        pathset.person_trip_id,
-                        trip_list_id,
-                        (pathset.person_id,pathset.person_trip_id) in Assignment.TRACE_IDS,
-                        0.01*pathfinding_iteration + iteration,
-                        pathnum,
-                        linkmode,
-                        mode_num,
-                        trip_id,
-                        a_id_num,
-                        b_id_num,
-                        a_seq,
-                        b_seq,
-                        a_time,
-                        b_time,
-                        state[PathSet.STATE_IDX_LINKTIME],
-                        state[PathSet.STATE_IDX_LINKFARE],
-                        state[PathSet.STATE_IDX_LINKCOST],
-                        state[PathSet.STATE_IDX_LINKDIST],
-                        waittime,
-                        link_num ])
-
-                    prev_linkmode = linkmode
-                    prev_state_id = state_id
-                    link_num     += 1
-
-        FastTripsLogger.debug("setup_passenger_pathsets(): pathlist and linklist constructed")
-
-        pathset_paths_df = pd.DataFrame(pathlist, columns=[\
+
+        # put together the pathfinding results, which come back in chunks of person trips
+        if len(self.pathfinding_paths_dfs) > 0:
+            pathset_paths_df = pd.concat(self.pathfinding_paths_dfs, ignore_index=True)
+            pathset_links_df = pd.concat(self.pathfinding_links_dfs, ignore_index=True)
+        else:
+            (pathset_paths_df, pathset_links_df) = Assignment.convert_pathset_results([], Assignment.EMPTY_PATHSET_RESULTS, True)
+        self.pathfinding_paths_dfs = []
+        self.pathfinding_links_dfs = []
+
+        # chunks may have come back in any order
+        pathset_paths_df.sort_values(by=[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM],
+                                     kind="mergesort", inplace=True)
+        pathset_links_df.sort_values(by=[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM, Passenger.PF_COL_LINK_NUM],
+                                     kind="mergesort", inplace=True)
+
+        # add the person trip information
+        trip_info_df = self.pathfind_trip_list_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                                   Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                                                   Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                                   Passenger.TRIP_LIST_COLUMN_TRACE,
+                                                   Passenger.TRIP_LIST_COLUMN_OUTBOUND,
+                                                   Passenger.TRIP_LIST_COLUMN_MODE]].copy()
+        trip_info_df[Passenger.TRIP_LIST_COLUMN_TRACE] = trip_info_df[Passenger.TRIP_LIST_COLUMN_TRACE].astype(bool)
+        trip_info_df['pathdir']  = np.where(trip_info_df[Passenger.TRIP_LIST_COLUMN_OUTBOUND], PathSet.DIR_OUTBOUND, PathSet.DIR_INBOUND)
+        trip_info_df['pathmode'] = trip_info_df[Passenger.TRIP_LIST_COLUMN_MODE]
+        trip_info_df[Passenger.PF_COL_PF_ITERATION] = 0.01*pathfinding_iteration + iteration
+        trip_info_df[Passenger.PF_COL_PATHFINDING_ITERATION] = np.int32(pathfinding_iteration)
+
+        pathset_paths_df = pd.merge(left=trip_info_df, right=pathset_paths_df, how="inner", on=Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM)
+        pathset_paths_df = pathset_paths_df[[\
             Passenger.TRIP_LIST_COLUMN_PERSON_ID,
             Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
             Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
@@ -753,14 +655,16 @@ class Passenger:
             'pathdir',  # for debugging
             'pathmode', # for output
             Passenger.PF_COL_PF_ITERATION,
+            Passenger.PF_COL_PATHFINDING_ITERATION,
             Passenger.PF_COL_PATH_NUM,
             PathSet.PATH_KEY_COST,
             PathSet.PATH_KEY_FARE,
             PathSet.PATH_KEY_PROBABILITY,
             PathSet.PATH_KEY_INIT_COST,
-            PathSet.PATH_KEY_INIT_FARE])
+            PathSet.PATH_KEY_INIT_FARE]]
 
-        pathset_links_df = pd.DataFrame(linklist, columns=[\
+        pathset_links_df = pd.merge(left=trip_info_df, right=pathset_links_df, how="inner", on=Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM)
+        pathset_links_df = pathset_links_df[[\
             Passenger.TRIP_LIST_COLUMN_PERSON_ID,
             Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
             Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
@@ -779,7 +683,17 @@ class Passenger:
             Passenger.PF_COL_LINK_COST,
             Passenger.PF_COL_LINK_DIST,
             Passenger.PF_COL_WAIT_TIME,
-            Passenger.PF_COL_LINK_NUM ])
+            Passenger.PF_COL_LINK_NUM ]]
+
+        # two trips in a row -- this shouldn't happen
+        next_links_df = pathset_links_df[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM, Passenger.PF_COL_LINK_MODE]].shift(-1)
+        trip_trip_df  = pathset_links_df.loc[(pathset_links_df[Passenger.PF_COL_LINK_MODE] == PathSet.STATE_MODE_TRIP) &
+                                             (next_links_df[Passenger.PF_COL_LINK_MODE] == PathSet.STATE_MODE_TRIP) &
+                                             (next_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] == pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]) &
+                                             (next_links_df[Passenger.PF_COL_PATH_NUM] == pathset_links_df[Passenger.PF_COL_PATH_NUM])]
+        if len(trip_trip_df) > 0:
+            FastTripsLogger.warn("Two trip links in a row... this shouldn't happen.\n%s" % trip_trip_df.head().to_string())
+            sys.exit()
 
         FastTripsLogger.debug("setup_passenger_pathsets(): pathset_paths_df(%d) and pathset_links_df(%d) dataframes constructed" % (len(pathset_paths_df), len(pathset_links_df)))
 
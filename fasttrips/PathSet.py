@@ -19,6 +19,8 @@ import sys
 import numpy as np
 import pandas as pd
 
+import _fasttrips
+
 from .Error     import NotImplementedError, UnexpectedError
 from .Logger    import FastTripsLogger
 from .Passenger import Passenger
@@ -53,6 +55,9 @@ class PathSet:
     WEIGHTS_FILE                    = 'pathweight_ft.txt'
     #: Path weights
     WEIGHTS_DF                      = None
+    #: Path weights compiled by :py:meth:`PathSet.compile_weights`: (weights_df, weight_keys_df, compiled_weights),
+    #: where *weights_df* is the :py:attr:`PathSet.WEIGHTS_DF` they were compiled from
+    COMPILED_WEIGHTS                = None
     #: Read weights file as fixed-width format.  If false, standard CSV format is read.
     WEIGHTS_FIXED_WIDTH             = False
 
@@ -76,14 +81,18 @@ class PathSet:
                                        OVERLAP_COUNT,
                                        OVERLAP_DISTANCE,
                                        OVERLAP_TIME]
-    #: Overlap chunk size.  How many person's trips to process at a time in overlap calculations
-    #: in python simulation
-    OVERLAP_CHUNK_SIZE              = None
+    #: Working memory for :py:meth:`PathSet.calculate_cost`, as a multiple of the size of the pathset links,
+    #: until some is observed.  See :py:meth:`Util.get_chunk_rows`.
+    CALCULATE_COST_WORKING_COPIES   = 4
 
     #: Overlap option: Split transit leg into component parts?  e.g. split A-E
     #: into A-B-C-D-E for overlap calculations?
     OVERLAP_SPLIT_TRANSIT           = None
 
+    #: Configuration: Cost pathset links with the C++ extension's cost model, the same one path-finding uses,
+    #: rather than with pandas.  See :py:meth:`PathSet.calculate_link_costs_native`.
+    NATIVE_COSTING                  = None
+
     #: Allow departures and arrivals before / after preferred time
     ARRIVE_LATE_ALLOWED_MIN         = datetime.timedelta(minutes = 0)
     DEPART_EARLY_ALLOWED_MIN        = datetime.timedelta(minutes = 0)
@@ -139,6 +148,8 @@ class PathSet:
     # ========== Added by fasttrips =======================================================
     #: Weights column: Supply Mode number
     WEIGHTS_COLUMN_SUPPLY_MODE_NUM  = "supply_mode_num"
+    #: Weights column: Weight key number, for user class, purpose, demand mode type, demand mode, supply mode
+    WEIGHTS_COLUMN_WEIGHT_KEY_NUM   = "weight_key_num"
 
     #: File with weights for c++
     OUTPUT_WEIGHTS_FILE             = "ft_intermediate_weights.txt"
@@ -151,21 +162,6 @@ class PathSet:
     PATH_KEY_PROBABILITY    = "pf_probability"  #: path probability according to pathfinder
     PATH_KEY_INIT_COST      = "pf_initcost"     #: initial cost (in pathfinding, before path was finalized)
     PATH_KEY_INIT_FARE      = "pf_initfare"     #: initial fare (in pathfinding, before path was finalized)
-    PATH_KEY_STATES         = "states"
-
-    STATE_IDX_LABEL         = 0  #: :py:class:`datetime.timedelta` instance
-    STATE_IDX_DEPARR        = 1  #: :py:class:`datetime.datetime` instance. Departure if outbound/backwards, arrival if inbound/forwards.
-    STATE_IDX_DEPARRMODE    = 2  #: mode id
-    STATE_IDX_TRIP          = 3  #: trip id
-    STATE_IDX_SUCCPRED      = 4  #: stop identifier or TAZ identifier
-    STATE_IDX_SEQ           = 5  #: sequence (for trip)
-    STATE_IDX_SEQ_SUCCPRED  = 6  #: sequence for successor/predecessor
-    STATE_IDX_LINKTIME      = 7  #: :py:class:`datetime.timedelta` instance
-    STATE_IDX_LINKFARE      = 8  #: fare cost, float
-    STATE_IDX_LINKCOST      = 9  #: link generalized cost, float for hyperpath/stochastic,
-    STATE_IDX_LINKDIST      = 10 #: link distance, float
-    STATE_IDX_COST          = 11 #: cost float, for hyperpath/stochastic assignment
-    STATE_IDX_ARRDEP        = 12 #: :py:class:`datetime.datetime` instance. Arrival if outbound/backwards, departure if inbound/forwards.
 
     # these are also the demand_mode_type values
     STATE_MODE_ACCESS   = "access"
@@ -197,33 +193,12 @@ class PathSet:
         else:
             raise Exception("Don't understand trip_list %s: %s" % (Passenger.TRIP_LIST_COLUMN_TIME_TARGET, str(trip_list_dict)))
 
-        #: Dict of path-num -> { cost:, probability:, states: [List of (stop_id, stop_state)]}
-        self.pathdict = {}
-
     def goes_somewhere(self):
         """
         Does this path go somewhere?  Does the destination differ from the origin?
         """
         return (self.__dict__[Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID] != self.__dict__[Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID])
 
-    def path_found(self):
-        """
-        Was a a transit path found from the origin to the destination with the constraints?
-        """
-        return len(self.pathdict) > 0
-
-    def num_paths(self):
-        """
-        Number of paths in the PathSet
-        """
-        return len(self.pathdict)
-
-    def reset(self):
-        """
-        Delete my states, something went wrong and it won't work out.
-        """
-        self.pathdict = []
-
     @staticmethod
     def set_user_class(trip_list_df, new_colname):
         """
@@ -413,6 +388,9 @@ class PathSet:
         fare_weights[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME ] = "fare"  # SIM_COL_PAX_FARE
         PathSet.WEIGHTS_DF = PathSet.WEIGHTS_DF.append(fare_weights)
         FastTripsLogger.debug("PathSet.WEIGHTS_DF with fare weights: \n%s" % PathSet.WEIGHTS_DF)
+
+        # these are the weights for costing, so compile them once here
+        PathSet.get_compiled_weights()
         return trip_list_df
 
 
@@ -486,6 +464,252 @@ class PathSet:
 
         return (not error_str), error_str
 
+    @staticmethod
+    def compile_weights(weights_df):
+        """
+        Compiles the given path weights for costing links with :py:meth:`PathSet.calculate_link_costs`.
+
+        Returns (weight_keys_df, compiled_weights).  *weight_keys_df* has a row for each user class, purpose,
+        demand mode type, demand mode and supply mode combination, with its supply mode number and a
+        :py:attr:`PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM`.
+
+        *compiled_weights* is a list with an entry for each weight name (and each repeat of a weight name within
+        a weight key), a tuple of (weight name, has weight, weight value, growth type, log base, logistic max,
+        logistic mid).  All but the weight name are :py:class:`numpy.ndarray` instances indexed by weight key number.
+        """
+        key_cols = [PathSet.WEIGHTS_COLUMN_USER_CLASS,
+                    PathSet.WEIGHTS_COLUMN_PURPOSE,
+                    PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
+                    PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
+                    PathSet.WEIGHTS_COLUMN_SUPPLY_MODE]
+        weight_keys_df = weights_df[key_cols + [PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM]].drop_duplicates(subset=key_cols).reset_index(drop=True)
+        weight_keys_df[PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM] = np.arange(len(weight_keys_df))
+
+        weights_df = pd.merge(left =weights_df,
+                              right=weight_keys_df[key_cols + [PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM]],
+                              on   =key_cols,
+                              how  ="left")
+        weights_df["weight_repeat"] = weights_df.groupby([PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM,
+                                                          PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]).cumcount()
+
+        compiled_weights = []
+        for (weight_name, weight_repeat), weight_group_df in weights_df.groupby([PathSet.WEIGHTS_COLUMN_WEIGHT_NAME, "weight_repeat"]):
+            key_nums = weight_group_df[PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM].values
+
+            has_weight = np.zeros(len(weight_keys_df), dtype=bool)
+            has_weight[key_nums] = True
+
+            # no growth type (e.g. for fares) means constant
+            growth_type = np.full(len(weight_keys_df), PathSet.CONSTANT_GROWTH_MODEL, dtype=object)
+            if PathSet.WEIGHTS_GROWTH_TYPE in weight_group_df:
+                growth_type[key_nums] = weight_group_df[PathSet.WEIGHTS_GROWTH_TYPE].fillna(PathSet.CONSTANT_GROWTH_MODEL).values
+
+            weight_arrays = []
+            for colname in [PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE,
+                            PathSet.WEIGHTS_GROWTH_LOG_BASE,
+                            PathSet.WEIGHTS_GROWTH_LOGISTIC_MAX,
+                            PathSet.WEIGHTS_GROWTH_LOGISTIC_MID]:
+                weight_array = np.full(len(weight_keys_df), np.nan)
+                if colname in weight_group_df:
+                    weight_array[key_nums] = weight_group_df[colname].values
+                weight_arrays.append(weight_array)
+
+            compiled_weights.append( (weight_name, has_weight, weight_arrays[0], growth_type,
+                                      weight_arrays[1], weight_arrays[2], weight_arrays[3]) )
+
+        FastTripsLogger.debug("compile_weights: %d weight keys, %d compiled weights" % (len(weight_keys_df), len(compiled_weights)))
+        return (weight_keys_df, compiled_weights)
+
+    @staticmethod
+    def get_compiled_weights():
+        """
+        Returns (weight_keys_df, compiled_weights) as :py:meth:`PathSet.compile_weights` does for :py:attr:`PathSet.WEIGHTS_DF`,
+        compiling them only if :py:attr:`PathSet.WEIGHTS_DF` has been set since they were last compiled.
+        """
+        if (PathSet.COMPILED_WEIGHTS is None) or (PathSet.COMPILED_WEIGHTS[0] is not PathSet.WEIGHTS_DF):
+            (weight_keys_df, compiled_weights) = PathSet.compile_weights(PathSet.WEIGHTS_DF)
+            PathSet.COMPILED_WEIGHTS = (PathSet.WEIGHTS_DF, weight_keys_df, compiled_weights)
+        return PathSet.COMPILED_WEIGHTS[1:]
+
+    @staticmethod
+    def calculate_link_costs(links_df, compiled_weights, var_values):
+        """
+        Calculates the cost of each link in *links_df*, which has a :py:attr:`PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM`
+        column, using the *compiled_weights* from :py:meth:`PathSet.compile_weights`.  *var_values* is a dictionary
+        of weight name to :py:class:`numpy.ndarray` of variable values, one per link; weight names that aren't
+        included have no values.
+
+        Returns (costs, num_weights, missing_df) where *costs* and *num_weights* are :py:class:`numpy.ndarray`
+        instances with the cost and the number of weights applied for each link, and *missing_df* has the links
+        and weight names for applicable weights without a variable value.
+        """
+        from .Assignment import Assignment
+
+        key_nums    = links_df[PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM].values
+        costs       = np.zeros(len(links_df))
+        num_weights = np.zeros(len(links_df), dtype=np.int64)
+        missing_dfs = []
+
+        # TODO: option: make these more subtle?
+        # missed_xfer has huge cost, bump iter means over capacity
+        huge_cost = np.zeros(len(links_df), dtype=bool)
+        if Assignment.SIM_COL_MISSED_XFER in links_df:
+            huge_cost |= (links_df[Assignment.SIM_COL_MISSED_XFER]==1).values
+        if Assignment.SIM_COL_PAX_BUMP_ITER in links_df:
+            huge_cost |= (links_df[Assignment.SIM_COL_PAX_BUMP_ITER]>=0).values
+
+        for (weight_name, has_weight, weight_value, growth_type, log_base, logistic_max, logistic_mid) in compiled_weights:
+            applies = has_weight[key_nums]
+            if not applies.any(): continue
+            num_weights += applies
+
+            link_key_nums = key_nums[applies]
+            link_weight   = weight_value[link_key_nums]
+            if weight_name == Assignment.SIM_COL_PAX_FARE:
+                # update the fare weight placeholder (ivt pathweight - utils per min)) based on value of time (currency per hour)
+                # since generalized cost is in utils, (ivt utils/min)x(60 min/1 hour)x(hour/vot currency) is the weight (utils/currency)
+                link_weight = link_weight*60.0/links_df[Passenger.TRIP_LIST_COLUMN_VOT].values[applies]
+
+            if weight_name in var_values:
+                link_var_value = var_values[weight_name][applies]
+            else:
+                link_var_value = np.full(len(link_key_nums), np.nan)
+
+            missing = np.isnan(link_var_value)
+            if missing.any():
+                missing_df = links_df.loc[applies].loc[missing].copy()
+                missing_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME ] = weight_name
+                missing_df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE] = link_weight[missing]
+                missing_dfs.append(missing_df)
+
+            link_cost = Util.calculate_pathweight_cost_values(link_var_value, link_weight, growth_type[link_key_nums],
+                                                              log_base[link_key_nums], logistic_max[link_key_nums], logistic_mid[link_key_nums])
+            link_cost[huge_cost[applies]] = PathSet.HUGE_COST
+
+            # negative cost is invalid
+            with np.errstate(invalid="ignore"):
+                negative = link_cost < 0
+            if negative.any():
+                FastTripsLogger.warn("---Pathweight costs for %s has negative values. Setting to zero.---\n%s" % \
+                                     (weight_name, links_df.loc[applies].loc[negative].to_string()))
+                link_cost[negative] = 0.0
+
+            # like summing, skip unset costs
+            costs[applies] += np.where(np.isnan(link_cost), 0.0, link_cost)
+
+        if len(missing_dfs) > 0:
+            missing_df = pd.concat(missing_dfs, axis=0)
+        else:
+            missing_df = pd.DataFrame()
+        return (costs, num_weights, missing_df)
+
+    @staticmethod
+    def calculate_link_costs_native(pathset_links_df, trip_list_df, reset_bump_iter=False):
+        """
+        Costs the links in *pathset_links_df* with :py:func:`_fasttrips.calculate_costs`, which uses the C++
+        extension's Path::calculateCost with the weights, access/egress, transfer and fare tables it loaded for
+        path-finding.  The extension must already have the current vehicle times; :py:meth:`PathSet.calculate_cost`
+        takes care of that.
+
+        What simulation found goes along with the links: the simulated board and arrival times for transit links
+        (path-finding times for the rest), their overcap, passengers that boarded aren't at capacity, and missed
+        transfers and bumped links (unless *reset_bump_iter*) cost :py:attr:`PathSet.HUGE_COST`.
+
+        Fares come from the extension's fare rules.
+
+        Returns (cost_df, link_fares) where *cost_df* has columns `person_id`, `person_trip_id`, `trip_list_id_num`,
+        `trace`, `pathnum`, `linknum` and :py:attr:`Assignment.SIM_COL_PAX_COST`, and *link_fares* is a
+        :py:class:`numpy.ndarray` with the fare for each row of *pathset_links_df*.
+        """
+        from .Assignment import Assignment
+
+        # path specifications, one per person trip with links
+        trip_list_id_nums = np.unique(pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values)
+        specs_df = trip_list_df.loc[trip_list_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].isin(trip_list_id_nums)]
+        specs_df = specs_df.sort_values(by=Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM)
+        assert(len(specs_df) == len(trip_list_id_nums))
+
+        (spec_strs, spec_ints, spec_doubles) = Assignment.get_pathfinding_specs(specs_df)[1:]
+
+        # the links, with each path's links together in order
+        spec_idx = np.searchsorted(trip_list_id_nums, pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values)
+        order    = np.lexsort((pathset_links_df[Passenger.PF_COL_LINK_NUM].values,
+                               pathset_links_df[Passenger.PF_COL_PATH_NUM].values,
+                               spec_idx))
+        links_df = pathset_links_df.iloc[order]
+        spec_idx = spec_idx[order]
+
+        linkmode = links_df[Passenger.PF_COL_LINK_MODE].values
+        is_trip  = (linkmode == PathSet.STATE_MODE_TRIP)
+        mode     = np.full(len(links_df), -103, dtype=np.int32)  # MODE_TRANSIT
+        mode[linkmode == PathSet.STATE_MODE_ACCESS  ] = -100
+        mode[linkmode == PathSet.STATE_MODE_EGRESS  ] = -101
+        mode[linkmode == PathSet.STATE_MODE_TRANSFER] = -102
+
+        def minutes(colname):
+            return ((links_df[colname] - Assignment.NETWORK_BUILD_DATE_START_TIME)/np.timedelta64(1,'m')).values
+
+        # transit links use the simulated times; the rest use the path-finding times, as the pandas costing does
+        a_time      = minutes(Passenger.PF_COL_PAX_A_TIME)
+        b_time      = minutes(Passenger.PF_COL_PAX_B_TIME)
+        link_time   = (links_df[Passenger.PF_COL_LINK_TIME]/np.timedelta64(1,'m')).values
+        sim_a_time  = minutes(Assignment.SIM_COL_PAX_A_TIME)
+        board_time  = minutes(Assignment.SIM_COL_PAX_BOARD_TIME)
+        has_board   = is_trip & pd.notnull(board_time)
+        # a transit link departs A when the passenger boards and its link time includes the wait before that
+        trip_a_time = np.where(has_board, board_time, sim_a_time)
+        trip_b_time = minutes(Assignment.SIM_COL_PAX_B_TIME)
+        # off by 1 day error
+        trip_b_time = np.where(trip_b_time < trip_a_time, trip_b_time + 24*60, trip_b_time)
+        link_time   = np.where(is_trip, trip_b_time - np.where(has_board, sim_a_time, trip_a_time), link_time)
+        a_time      = np.where(is_trip, trip_a_time, a_time)
+        b_time      = np.where(is_trip, trip_b_time, b_time)
+
+        link_ints = np.column_stack([spec_idx,
+                                     links_df[Passenger.PF_COL_PATH_NUM].values,
+                                     links_df[Passenger.PF_COL_LINK_NUM].values,
+                                     mode,
+                                     np.where(is_trip, links_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values, links_df[Route.ROUTES_COLUMN_MODE_NUM].values),
+                                     links_df["A_id_num"].values,
+                                     links_df["B_id_num"].values,
+                                     links_df["A_seq"].values,
+                                     links_df["B_seq"].values]).astype(np.int32)
+        # B time, A time (the departure from A), link time, fare, cost, distance
+        link_doubles = np.column_stack([b_time, a_time, link_time,
+                                        np.zeros(len(links_df)), np.zeros(len(links_df)),
+                                        links_df[Passenger.PF_COL_LINK_DIST].values]).astype(np.float64)
+
+        # overcap, at capacity, link cost; NaN means the extension figures it out
+        link_overrides = np.full((len(links_df), 3), np.nan)
+        overcap_col = Trip.SIM_COL_VEH_OVERCAP
+        if Assignment.MSA_RESULTS and Trip.SIM_COL_VEH_MSA_OVERCAP in links_df: overcap_col = Trip.SIM_COL_VEH_MSA_OVERCAP
+        if overcap_col in links_df:
+            link_overrides[:,0] = np.where(is_trip, links_df[overcap_col].values.astype(np.float64), np.nan)
+        if Assignment.SIM_COL_PAX_BOARD_STATE in links_df:
+            link_overrides[:,1] = np.where(is_trip & links_df[Assignment.SIM_COL_PAX_BOARD_STATE].isin(["board_easy","boarded"]).values, 0.0, np.nan)
+        huge_cost = np.zeros(len(links_df), dtype=bool)
+        if Assignment.SIM_COL_MISSED_XFER in links_df:
+            huge_cost |= (links_df[Assignment.SIM_COL_MISSED_XFER]==1).values
+        if Assignment.SIM_COL_PAX_BUMP_ITER in links_df and not reset_bump_iter:
+            huge_cost |= (links_df[Assignment.SIM_COL_PAX_BUMP_ITER]>=0).values
+        link_overrides[huge_cost,2] = PathSet.HUGE_COST
+
+        (link_results, path_ints, path_doubles) = _fasttrips.calculate_costs(spec_strs, spec_ints, spec_doubles,
+                                                                             link_ints, link_doubles, link_overrides)
+        FastTripsLogger.debug("calculate_link_costs_native: costed %d links on %d paths" % (len(links_df), len(path_ints)))
+
+        cost_df = links_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                            Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                            Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                            Passenger.TRIP_LIST_COLUMN_TRACE,
+                            Passenger.PF_COL_PATH_NUM,
+                            Passenger.PF_COL_LINK_NUM]].copy()
+        cost_df[Assignment.SIM_COL_PAX_COST] = link_results[:,0]
+
+        # back in pathset_links_df order
+        link_fares = np.zeros(len(links_df))
+        link_fares[order] = link_results[:,1]
+        return (cost_df, link_fares)
 
     def __str__(self):
         """
@@ -661,6 +885,11 @@ class PathSet:
         So if a transit trip goes from stop A to D but passes stop B and C in between, the
         row A->D will now be replaced by rows A->B, B->C, and C->D.
 
+        Each transit link's (trip_id_num, A_seq, B_seq) is looked up in the vehicle stop times, sorted by trip and
+        stop sequence, to get the positions of its board and alight stops; the rows between are its component links,
+        so they're expanded directly (numpy repeat and arange) without building every vehicle link of the trip.
+        Transit links whose stops aren't found are dropped.
+
         Adds "split_first" bool - True on the first veh link only
 
         Note that this does *not* renumber the linknum field.
@@ -672,95 +901,78 @@ class PathSet:
                                   pathset_links_df.loc[pathset_links_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True].to_string()))
             FastTripsLogger.debug("split_transit_links: pathset_links_df columns\n%s" % str(pathset_links_df.dtypes))
 
-        veh_links_df = Trip.linkify_vehicle_trips(veh_trips_df, stops)
-        veh_links_df["linkmode"] = "transit"
-
-        FastTripsLogger.debug("split_transit_links: veh_links_df\n%s" % veh_links_df.head(20).to_string())
-
-        # join the pathset links with the vehicle links
-        drop_cols  = []
-        merge_cols = [Passenger.PF_COL_LINK_MODE,
-                      Route.ROUTES_COLUMN_MODE,
-                      Trip.TRIPS_COLUMN_ROUTE_ID,
-                      Trip.TRIPS_COLUMN_TRIP_ID]
+        # the vehicle stop times by trip and stop sequence, keyed by trip_id_num and stop sequence
+        veh_stops_df = veh_trips_df[[Trip.TRIPS_COLUMN_TRIP_ID,
+                                     Trip.TRIPS_COLUMN_TRIP_ID_NUM,
+                                     Trip.STOPTIMES_COLUMN_STOP_SEQUENCE,
+                                     Trip.STOPTIMES_COLUMN_STOP_ID,
+                                     "stop_id_num",
+                                     Trip.STOPTIMES_COLUMN_ARRIVAL_TIME]].sort_values(
+                                        by=[Trip.TRIPS_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE], kind="mergesort")
+        veh_stops_df = stops.add_stop_lat_lon(veh_stops_df, id_colname=Trip.STOPTIMES_COLUMN_STOP_ID, new_lat_colname="lat", new_lon_colname="lon")
+        max_seq      = veh_stops_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE].max() + 1
+        veh_keys     = veh_stops_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values.astype(np.int64)*max_seq + veh_stops_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE].values
+
+        # find the board and alight stops for the transit links
+        is_transit    = (pathset_links_df[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT).values
+        transit_rows  = np.flatnonzero(is_transit)
+        transit_df    = pathset_links_df.iloc[transit_rows]
         if Trip.TRIPS_COLUMN_TRIP_ID_NUM in pathset_links_df.columns.values:
-            merge_cols.append(Trip.TRIPS_COLUMN_TRIP_ID_NUM)
-        if Route.ROUTES_COLUMN_MODE_NUM in pathset_links_df.columns.values:
-            merge_cols.append(Route.ROUTES_COLUMN_MODE_NUM)
-
-        path2 = pd.merge(left    =pathset_links_df,
-                             right   =veh_links_df,
-                             on      =merge_cols,
-                             how     ="left",
-                             suffixes=["","_veh"])
-        path2["split_first"] = False
-
-        # delete anything irrelevant -- so keep non-transit links, and transit links WITH valid sequences
-        path2 = path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]!=Route.MODE_TYPE_TRANSIT) |
-                           ( (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT) &
-                             (path2["A_seq_veh"]>=path2["A_seq"]) &
-                             (path2["B_seq_veh"]<=path2["B_seq"]) ) ]
-        # These are the new columns -- incorporate them
-        path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT)&(path2["A_seq_veh"]==path2["A_seq"]), "split_first"] = True
+            trip_id_nums = transit_df[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values
+        else:
+            trip_id_nums = pd.merge(left =transit_df[[Trip.TRIPS_COLUMN_TRIP_ID]],
+                                    right=veh_stops_df[[Trip.TRIPS_COLUMN_TRIP_ID, Trip.TRIPS_COLUMN_TRIP_ID_NUM]].drop_duplicates(),
+                                    how  ="left")[Trip.TRIPS_COLUMN_TRIP_ID_NUM].values
+        trip_id_nums  = trip_id_nums.astype(np.float64)
+        trip_id_nums  = np.where(np.isnan(trip_id_nums), -1, trip_id_nums).astype(np.int64)
+        A_keys        = trip_id_nums*max_seq + transit_df["A_seq"].values
+        B_keys        = trip_id_nums*max_seq + transit_df["B_seq"].values
+        A_pos         = np.minimum(np.searchsorted(veh_keys, A_keys), len(veh_keys)-1)
+        B_pos         = np.minimum(np.searchsorted(veh_keys, B_keys), len(veh_keys)-1)
+        num_split     = np.where((veh_keys[A_pos]==A_keys)&(veh_keys[B_pos]==B_keys)&(B_pos>A_pos), B_pos - A_pos, 0)
+
+        # repeat each transit link once per component link, keeping the rest as they are
+        num_rows                 = np.ones(len(pathset_links_df), dtype=np.int64)
+        num_rows[transit_rows]   = num_split
+        path2                    = pathset_links_df.iloc[np.repeat(np.arange(len(pathset_links_df)), num_rows)].reset_index(drop=True)
+        is_transit               = np.repeat(is_transit, num_rows)
+        # the vehicle stop positions of the component links' A stops
+        split_num    = np.arange(num_split.sum()) - np.repeat(np.cumsum(num_split) - num_split, num_split)
+        veh_A_pos    = np.repeat(A_pos, num_split) + split_num
+        veh_B_pos    = veh_A_pos + 1
+        split_first  = split_num == 0
+        split_last   = split_num == np.repeat(num_split, num_split) - 1
 
-        # A_arrival_time       datetime64[ns] => A time for intermediate links
+        path2["split_first"] = False
+        path2.loc[is_transit, "split_first"] = split_first
 
-        path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT)&(path2["A_id"]!=path2["A_id_veh"]), Assignment.SIM_COL_PAX_A_TIME     ] = path2["A_arrival_time"]
+        # A_arrival_time => A time for intermediate links
         # no waittime, boardtime, missed_xfer except on first link
-        path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT)&(path2["A_id"]!=path2["A_id_veh"]), Assignment.SIM_COL_PAX_WAIT_TIME  ] = None
-        path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT)&(path2["A_id"]!=path2["A_id_veh"]), Assignment.SIM_COL_PAX_BOARD_TIME ] = None
-        path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT)&(path2["A_id"]!=path2["A_id_veh"]), Assignment.SIM_COL_PAX_MISSED_XFER] = 0
+        intermediate = np.flatnonzero(is_transit)[~split_first]
+        veh_arrival  = veh_stops_df[Trip.STOPTIMES_COLUMN_ARRIVAL_TIME].values
+        path2.loc[intermediate, Assignment.SIM_COL_PAX_A_TIME     ] = veh_arrival[veh_A_pos[~split_first]]
+        path2.loc[intermediate, Assignment.SIM_COL_PAX_WAIT_TIME  ] = None
+        path2.loc[intermediate, Assignment.SIM_COL_PAX_BOARD_TIME ] = None
+        path2.loc[intermediate, Assignment.SIM_COL_PAX_MISSED_XFER] = 0
         # no alighttime except on last link
-        path2.loc[ (path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT)&(path2["B_id"]!=path2["B_id_veh"]), Assignment.SIM_COL_PAX_ALIGHT_TIME] = None
-
-        # route_id_num                float64 => ignore
-        # A_id_veh                     object => A_id
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "A_id"       ] = path2["A_id_veh"]
-        # A_id_num_veh                float64 => A_id_num
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "A_id_num"   ] = path2["A_id_num_veh"]
-        # A_seq_veh                   float64 => A_seq
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "A_seq"      ] = path2["A_seq_veh"]
-
-        if "A_lat_veh" in path2.columns.values:
-            # A_lat_veh                   float64 => A_lat
-            path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "A_lat"  ] = path2["A_lat_veh"]
-            # A_lon_veh                   float64 => A_lon
-            path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "A_lon"  ] = path2["A_lon_veh"]
-            # drop these later
-            drop_cols.extend(["A_lat_veh","A_lon_veh"])
-
-        # B_id_veh                     object => B_id
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "B_id"       ] = path2["B_id_veh"]
-        # B_id_num_veh                float64 => B_id_num
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "B_id_num"   ] = path2["B_id_num_veh"]
-        # B_seq_veh                   float64 => B_seq
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "B_seq"      ] = path2["B_seq_veh"]
-        # B_arrival_time       datetime64[ns] => new_B_time
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "new_B_time" ] = path2["B_arrival_time"]
-        # B_departure_time     datetime64[ns] => ignore
-
-        if "B_lat_veh" in path2.columns.values:
-            # B_lat_veh                   float64 => B_lat
-            path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "B_lat"  ] = path2["B_lat_veh"]
-            # B_lon_veh                   float64 => B_lon
-            path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT, "B_lon"  ] = path2["B_lon_veh"]
-            # drop these later
-            drop_cols.extend(["B_lat_veh","B_lon_veh"])
+        path2.loc[np.flatnonzero(is_transit)[~split_last], Assignment.SIM_COL_PAX_ALIGHT_TIME] = None
+
+        # the component links' stops
+        for (end, veh_pos) in [("A", veh_A_pos), ("B", veh_B_pos)]:
+            path2.loc[is_transit, "%s_id"     % end] = veh_stops_df[Trip.STOPTIMES_COLUMN_STOP_ID       ].values[veh_pos]
+            path2.loc[is_transit, "%s_id_num" % end] = veh_stops_df["stop_id_num"                       ].values[veh_pos]
+            path2.loc[is_transit, "%s_seq"    % end] = veh_stops_df[Trip.STOPTIMES_COLUMN_STOP_SEQUENCE ].values[veh_pos]
+            path2.loc[is_transit, "%s_lat"    % end] = veh_stops_df["lat"                               ].values[veh_pos]
+            path2.loc[is_transit, "%s_lon"    % end] = veh_stops_df["lon"                               ].values[veh_pos]
+        # B_arrival_time => new_B_time
+        path2.loc[is_transit, Assignment.SIM_COL_PAX_B_TIME] = veh_arrival[veh_B_pos]
 
         # update the link time
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT,Assignment.SIM_COL_PAX_LINK_TIME] = path2[Assignment.SIM_COL_PAX_B_TIME] - path2[Assignment.SIM_COL_PAX_A_TIME]
+        path2.loc[is_transit, Assignment.SIM_COL_PAX_LINK_TIME] = path2[Assignment.SIM_COL_PAX_B_TIME] - path2[Assignment.SIM_COL_PAX_A_TIME]
         # update transit distance
         Util.calculate_distance_miles(path2, "A_lat","A_lon","B_lat","B_lon", "transit_distance")
-        path2.loc[path2[Passenger.PF_COL_LINK_MODE]==Route.MODE_TYPE_TRANSIT,Assignment.SIM_COL_PAX_DISTANCE ] = path2["transit_distance"]
-
-        # revert these back to ints
-        path2[["A_id_num","B_id_num","A_seq","B_seq"]] = path2[["A_id_num","B_id_num","A_seq","B_seq"]].astype(int)
-
-        # we're done with the fields - drop them
-        drop_cols.extend(["transit_distance", "route_id_num",
-                          "A_id_veh","A_id_num_veh","A_seq_veh","A_arrival_time","A_departure_time",
-                          "B_id_veh","B_id_num_veh","B_seq_veh","B_arrival_time","B_departure_time"])
-        path2.drop(drop_cols, axis=1, inplace=True)
+        path2.loc[is_transit, Assignment.SIM_COL_PAX_DISTANCE ] = path2["transit_distance"]
+        path2.drop(["transit_distance"], axis=1, inplace=True)
 
         # renumber linknum?  Let's not bother
 
@@ -775,12 +987,118 @@ class PathSet:
     def calculate_cost(STOCH_DISPERSION, pathset_paths_df, pathset_links_df, veh_trips_df,
                        trip_list_df, routes, tazs, transfers, stops=None, reset_bump_iter=False):
         """
-        This is equivalent to the C++ Path::calculateCost() method.  Would it be faster to do it in C++?
-        It would require us to package up the networks and paths and send back and forth.  :p
+        Calculates the costs and probabilities of the given pathsets via :py:meth:`PathSet.calculate_cost_for_trips`.
 
-        I think if we can do it using vectorized pandas operations, it should be fast, but we can compare/test.
+        If :py:attr:`Assignment.MAX_MEMORY_GB` is configured, that's done for chunks of person trips at a time,
+        sized by :py:meth:`Util.get_chunk_rows` to fit the budget, and the results are concatenated.  A person trip's
+        costs and probabilities only depend on its own pathset so the results are the same.
 
-        It's also messier to have this in two places.  Maybe we should delete it from the C++; the overlap calcs are only in here right now.
+        Costing puts the links in person trip order, and the chunks are ranges of trip list ID numbers, so the
+        pathsets are costed sorted by trip list ID number, path number and link number.  Either way, the returned
+        pathsets are then put back in the order of *pathset_paths_df* and *pathset_links_df*, with their index.
+
+        If :py:attr:`PathSet.NATIVE_COSTING` is configured, the C++ extension is brought up to date with the vehicle
+        times in *veh_trips_df* once, up front, rather than for each chunk.
+
+        Returns the same as :py:meth:`PathSet.calculate_cost_for_trips`.
+        """
+        from .Assignment import Assignment
+
+        if PathSet.NATIVE_COSTING:
+            Assignment.update_fasttrips_extension_supply(Assignment.OUTPUT_DIR, veh_trips_df)
+
+        paths_order = PathSet.person_trip_order(pathset_paths_df, [Passenger.PF_COL_PATH_NUM])
+        links_order = PathSet.person_trip_order(pathset_links_df, [Passenger.PF_COL_PATH_NUM, Passenger.PF_COL_LINK_NUM])
+        sorted_paths_df = pathset_paths_df if paths_order is None else pathset_paths_df.take(paths_order).reset_index(drop=True)
+        sorted_links_df = pathset_links_df if links_order is None else pathset_links_df.take(links_order).reset_index(drop=True)
+
+        if Assignment.MAX_MEMORY_GB <= 0:
+            (cost_paths_df, cost_links_df) = PathSet.calculate_cost_for_trips(STOCH_DISPERSION, sorted_paths_df, sorted_links_df, veh_trips_df,
+                                                                              trip_list_df, routes, tazs, transfers, stops, reset_bump_iter)
+            return (PathSet.restore_pathset_order(pathset_paths_df, paths_order, cost_paths_df),
+                    PathSet.restore_pathset_order(pathset_links_df, links_order, cost_links_df))
+
+        # the person trips and the number of links in each, cumulative
+        (trip_list_id_nums, trip_num_links) = np.unique(sorted_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values, return_counts=True)
+        trip_links_end = np.cumsum(trip_num_links)
+
+        paths_trip_list_id_nums = sorted_paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+        links_trip_list_id_nums = sorted_links_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+
+        chunk_paths_dfs = []
+        chunk_links_dfs = []
+        trip_start      = 0
+        while trip_start < len(trip_list_id_nums):
+            chunk_rows = Util.get_chunk_rows("calculate_cost", sorted_links_df, Assignment.MAX_MEMORY_GB, PathSet.CALCULATE_COST_WORKING_COPIES)
+            links_start = trip_links_end[trip_start-1] if trip_start > 0 else 0
+            # at least one person trip
+            trip_end    = max(np.searchsorted(trip_links_end, links_start + chunk_rows, side="right"), trip_start+1)
+
+            if trip_start == 0 and trip_end >= len(trip_list_id_nums):
+                FastTripsLogger.debug("calculate_cost(): %d links fit in %d rows; not chunking" % (len(sorted_links_df), chunk_rows))
+                (cost_paths_df, cost_links_df) = PathSet.calculate_cost_for_trips(STOCH_DISPERSION, sorted_paths_df, sorted_links_df, veh_trips_df,
+                                                                                  trip_list_df, routes, tazs, transfers, stops, reset_bump_iter)
+                return (PathSet.restore_pathset_order(pathset_paths_df, paths_order, cost_paths_df),
+                        PathSet.restore_pathset_order(pathset_links_df, links_order, cost_links_df))
+
+            # the chunk covers the trip list ID nums after the previous chunk's, through its last one
+            chunk_paths = paths_trip_list_id_nums <= trip_list_id_nums[trip_end-1]
+            chunk_links = links_trip_list_id_nums <= trip_list_id_nums[trip_end-1]
+            if trip_start > 0:
+                chunk_paths = chunk_paths & (paths_trip_list_id_nums > trip_list_id_nums[trip_start-1])
+                chunk_links = chunk_links & (links_trip_list_id_nums > trip_list_id_nums[trip_start-1])
+            if trip_end >= len(trip_list_id_nums):
+                chunk_paths = paths_trip_list_id_nums > trip_list_id_nums[trip_start-1]
+
+            FastTripsLogger.info("          Calculating cost for person trips %7d-%7d of %7d (%8d links); mem_use=%8s" %
+                                 (trip_start+1, trip_end, len(trip_list_id_nums), trip_links_end[trip_end-1] - links_start, Util.get_process_mem_use_str()))
+            mem_before_bytes = Util.get_process_mem_use_bytes()
+            (chunk_paths_df, chunk_links_df) = PathSet.calculate_cost_for_trips(STOCH_DISPERSION,
+                sorted_paths_df.loc[chunk_paths].copy(), sorted_links_df.loc[chunk_links].copy(), veh_trips_df,
+                trip_list_df, routes, tazs, transfers, stops, reset_bump_iter)
+            Util.record_chunk_memory("calculate_cost", trip_links_end[trip_end-1] - links_start, mem_before_bytes)
+
+            chunk_paths_dfs.append(chunk_paths_df)
+            chunk_links_dfs.append(chunk_links_df)
+            trip_start = trip_end
+
+        return (PathSet.restore_pathset_order(pathset_paths_df, paths_order, pd.concat(chunk_paths_dfs, ignore_index=True)),
+                PathSet.restore_pathset_order(pathset_links_df, links_order, pd.concat(chunk_links_dfs, ignore_index=True)))
+
+    @staticmethod
+    def person_trip_order(pathset_df, sort_cols):
+        """
+        Returns the row positions that sort the given pathset paths or links by trip list ID number and then
+        *sort_cols*, or None if they're sorted already.
+        """
+        # lexsort sorts by the last key first
+        sort_keys = [pathset_df[col].values for col in reversed([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM] + sort_cols)]
+        order     = np.lexsort(sort_keys)
+        if (order == np.arange(len(order))).all():
+            return None
+        return order
+
+    @staticmethod
+    def restore_pathset_order(pathset_df, order, cost_df):
+        """
+        Costing merges onto the pathsets, which keeps their rows in order but not their index.  Given *cost_df*,
+        the costed version of *pathset_df* sorted by the row positions *order* from :py:meth:`PathSet.person_trip_order`,
+        returns it in the order of *pathset_df*, with its index.
+        """
+        assert(len(cost_df) == len(pathset_df))
+        if order is not None:
+            cost_df = cost_df.take(np.argsort(order))
+        cost_df.index = pathset_df.index
+        return cost_df
+
+    @staticmethod
+    def calculate_cost_for_trips(STOCH_DISPERSION, pathset_paths_df, pathset_links_df, veh_trips_df,
+                                 trip_list_df, routes, tazs, transfers, stops=None, reset_bump_iter=False):
+        """
+        This is equivalent to the C++ Path::calculateCost() method, using vectorized pandas operations.
+        If :py:attr:`PathSet.NATIVE_COSTING` is configured, the links are costed by the C++ extension instead
+        (see :py:meth:`PathSet.calculate_link_costs_native`), so there's one cost model for path-finding and simulation;
+        the overlap calcs are only in here either way.
 
         Returns pathset_paths_df with additional columns, Assignment.SIM_COL_PAX_FARE, Assignment.SIM_COL_PAX_COST, Assignment.SIM_COL_PAX_PROBABILITY, Assignment.SIM_COL_PAX_LOGSUM
         And pathset_links_df with additional columns, Assignment.SIM_COL_PAX_FARE, Assignment.SIM_COL_PAX_FARE_PERIOD, Assignment.SIM_COL_PAX_COST and Assignment.SIM_COL_PAX_DISTANCE
@@ -826,6 +1144,12 @@ class PathSet:
         else:
             pathset_links_to_use["split_first"] = True  # all transit links are first
 
+        if PathSet.NATIVE_COSTING:
+            (cost_df, link_fares) = PathSet.calculate_link_costs_native(pathset_links_df, trip_list_df, reset_bump_iter)
+            # so the fares match the costs
+            pathset_links_df[Assignment.SIM_COL_PAX_FARE] = link_fares
+            return PathSet.calculate_path_costs(STOCH_DISPERSION, pathset_paths_df, pathset_links_df, pathset_links_to_use, cost_df)
+
         # First, we need user class, purpose, demand modes, and value of time
         pathset_links_cost_df = pd.merge(left =pathset_links_to_use,
                                              right=trip_list_df[[
@@ -863,41 +1187,41 @@ class PathSet:
         if len(Assignment.TRACE_IDS) > 0:
             FastTripsLogger.debug("calculate_cost: pathset_links_cost_df trace\n%s" % str(pathset_links_cost_df.loc[pathset_links_cost_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]))
 
-        # Inner join with the weights - now each weight has a row
-        cost_df = pd.merge(left    =pathset_links_cost_df,
-                               right   =PathSet.WEIGHTS_DF,
-                               left_on =[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                                         Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                                         Passenger.PF_COL_LINK_MODE,
-                                         PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
-                                         Passenger.TRIP_LIST_COLUMN_MODE],
-                               right_on=[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                                         Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                                         PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
-                                         PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
-                                         PathSet.WEIGHTS_COLUMN_SUPPLY_MODE],
-                               how     ="inner")
-
-        # update the fare weight placeholder (ivt pathweight - utils per min)) based on value of time (currency per hour)
-        # since generalized cost is in utils, (ivt utils/min)x(60 min/1 hour)x(hour/vot currency) is the weight (utils/currency)
-        cost_df.loc[ cost_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]==Assignment.SIM_COL_PAX_FARE, "weight_value" ] *= 60.0/cost_df[Passenger.TRIP_LIST_COLUMN_VOT]
+        # Join with the weight keys - each link gets the number of the compiled weights that apply to it
+        # Links without any configured weights drop out here
+        (weight_keys_df, compiled_weights) = PathSet.get_compiled_weights()
+        weight_names = set([compiled_weight[0] for compiled_weight in compiled_weights])
+        pathset_links_cost_df = pd.merge(left    =pathset_links_cost_df,
+                                             right   =weight_keys_df,
+                                             left_on =[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
+                                                       Passenger.TRIP_LIST_COLUMN_PURPOSE,
+                                                       Passenger.PF_COL_LINK_MODE,
+                                                       PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
+                                                       Passenger.TRIP_LIST_COLUMN_MODE],
+                                             right_on=[Passenger.TRIP_LIST_COLUMN_USER_CLASS,
+                                                       Passenger.TRIP_LIST_COLUMN_PURPOSE,
+                                                       PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
+                                                       PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
+                                                       PathSet.WEIGHTS_COLUMN_SUPPLY_MODE],
+                                             how     ="inner")
 
         if len(Assignment.TRACE_IDS) > 0:
-            FastTripsLogger.debug("calculate_cost: cost_df\n%s" % str(cost_df.loc[cost_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True].sort_values([
+            FastTripsLogger.debug("calculate_cost: pathset_links_cost_df with weight keys\n%s" % str(pathset_links_cost_df.loc[pathset_links_cost_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True].sort_values([
                                   Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
                                   Passenger.PF_COL_PATH_NUM,Passenger.PF_COL_LINK_NUM]).head(20)))
 
         # NOW we split it into 3 lists -- access/egress, transit, and transfer
         # This is because they will each be joined to tables specific to those kinds of mode categories, and so we don't want all the transit nulls on the other tables, etc.
-        cost_columns = list(cost_df.columns.values)
-        cost_df["var_value"] = np.nan  # This means unset
-        cost_accegr_df       = cost_df.loc[(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_ACCESS  )|(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_EGRESS)]
-        cost_trip_df         = cost_df.loc[(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRIP    )]
-        cost_transfer_df     = cost_df.loc[(cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRANSFER)]
-        del cost_df
+        # Each gets a dict of weight name -> numpy array of variable values, one per link
+        cost_accegr_df       = pathset_links_cost_df.loc[(pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_ACCESS  )|(pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_EGRESS)]
+        cost_trip_df         = pathset_links_cost_df.loc[(pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRIP    )]
+        cost_transfer_df     = pathset_links_cost_df.loc[(pathset_links_cost_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRANSFER)]
+        del pathset_links_cost_df
 
         ##################### First, handle Access/Egress link costs
 
+        # weight name -> list of (walk|bike|drive column name, supply mode numbers it applies to)
+        accegr_var_columns = {}
         for accegr_type in ["walk","bike","drive"]:
 
             # make copies; we don't want to mess with originals
@@ -946,8 +1270,8 @@ class PathSet:
                 cost_accegr_df.rename(columns={colname:new_colname}, inplace=True)
 
                 # use it, if relevant
-                cost_accegr_df.loc[ (cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == colname)&
-                                    (cost_accegr_df[PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM].isin(mode_list)), "var_value"] = cost_accegr_df[new_colname]
+                if colname not in accegr_var_columns: accegr_var_columns[colname] = []
+                accegr_var_columns[colname].append( (new_colname, mode_list) )
 
         # Access/egress needs passenger trip departure, arrival and time_target
         cost_accegr_df = pd.merge(left =cost_accegr_df,
@@ -973,93 +1297,67 @@ class PathSet:
                                ((cost_accegr_df["check_time"] <  cost_accegr_df["%s %s" % (TAZ.DRIVE_ACCESS_COLUMN_START_TIME_MIN, "drive")])|
                                 (cost_accegr_df["check_time"] >= cost_accegr_df["%s %s" % (TAZ.DRIVE_ACCESS_COLUMN_END_TIME_MIN,   "drive")])), "to_drop"] = True
 
-        # if len(Assignment.TRACE_IDS) > 0:
-        #     FastTripsLogger.debug("cost_accegr_df=\n%s\ndtypes=\n%s" % (cost_accegr_df.loc[cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]].to_string(), str(cost_accegr_df.dtypes)))
-
         FastTripsLogger.debug("Dropping %d rows from cost_accegr_df" % cost_accegr_df["to_drop"].sum())
         cost_accegr_df = cost_accegr_df.loc[ cost_accegr_df["to_drop"]==False ]
         cost_accegr_df.drop(["check_time","to_drop"], axis=1, inplace=True)
 
-        # penalty for arriving before preferred arrival time.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN    )&
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS), "var_value"] = 0.0
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN) &
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS) &
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'departure'), "var_value"] = 0.0
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS)& \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'arrival'), "var_value"] = (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME] - cost_accegr_df[Passenger.PF_COL_PAX_B_TIME])/np.timedelta64(1,'m')
-        # arrive early is not negative - that would be arriving late
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN)&(cost_accegr_df["var_value"] < 0), "var_value"] = 0.0
-
-        # penalty for departing after preferred departure time.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_LATE_MIN) &
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS), "var_value"] = 0.0
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_LATE_MIN    )&
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS)&
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'arrival'), "var_value"] = 0.0
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_LATE_MIN) &
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS) &
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == 'departure'), "var_value"] = (cost_accegr_df[Passenger.PF_COL_PAX_A_TIME] - cost_accegr_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME]) / np.timedelta64(1, 'm')
-        # depart late is not negative - that would be departing early
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_LATE_MIN)&(cost_accegr_df["var_value"] < 0), "var_value"] = 0.0
-
-        # constant growth = exponential growth with 0 percent growth rate
-
-        # depart before preferred or arrive after preferred means the passenger just missed something important
-        # Arrive late only impacts the egress link, so set the var_value equal to zero for the access link
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN    ) & \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS), "var_value"] = 0.0
-
-        # Arrive late only impacts those that have a preferred arrival time. If preferred departure time,
-        # set arrive late equal to zero. --This could have been done with previous line, but it would
-        # look ugly mixing and matching 'and' and 'or'.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN) & \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == Passenger.TIME_TARGET_DEPARTURE), "var_value"] = 0.0
-
-        # Calculate how late the person arrives after preferred time.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS)& \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == Passenger.TIME_TARGET_ARRIVAL), "var_value"] = \
-            (cost_accegr_df[Passenger.PF_COL_PAX_B_TIME] - cost_accegr_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME])/np.timedelta64(1,'m')
-
-        # If arrived before preferred time, set the arrive late field to zero. You don't get a
-        # discount for arriving early.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]    == PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN) & \
-                           (cost_accegr_df['var_value'] < 0), "var_value"] = 0
-
-        # preferred delay_min - departure means want to depart after that time
-        # Depart early only impacts the access link, so set the var_value equal to zero for the egress link
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_EARLY_MIN    )& \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS), "var_value"] = 0.0
-
-        # Depart early only impacts those that have a preferred departure time. If preferred arrive time,
-        # set depart early equal to zero. --This could have been done with previous line, but it would
-        # look ugly mixing and matching 'and' and 'or'.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_EARLY_MIN) & \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == Passenger.TIME_TARGET_ARRIVAL), "var_value"] = 0.0
-
-        # Calculate how early the person departs before the preferred time.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]     == PathSet.WEIGHT_NAME_DEPART_EARLY_MIN) & \
-                           (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS) & \
-                           (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == Passenger.TIME_TARGET_DEPARTURE), "var_value"] = \
-            (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME] - cost_accegr_df[Passenger.PF_COL_PAX_A_TIME]) / np.timedelta64(1, 'm')
-
-        # If departing after preferred time, set the depart early field to zero. You don't get a
-        # discount for taking your time.
-        cost_accegr_df.loc[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == PathSet.WEIGHT_NAME_DEPART_EARLY_MIN) & \
-                           (cost_accegr_df['var_value'] < 0), "var_value"] = 0
-
-        assert 0 == cost_accegr_df[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME].isin([PathSet.WEIGHT_NAME_DEPART_EARLY_MIN, PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN])) & \
-                                   (cost_accegr_df['var_value'].isnull())].shape[0]
-        assert 0 == cost_accegr_df[(cost_accegr_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME].isin([PathSet.WEIGHT_NAME_DEPART_EARLY_MIN, PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN])) & \
-                                   (cost_accegr_df['var_value']<0)].shape[0]
+        accegr_var_values = {}
+        for weight_name in weight_names:
+            var_value = np.full(len(cost_accegr_df), np.nan)
+            for (colname, mode_list) in accegr_var_columns.get(weight_name, []):
+                var_value = np.where(cost_accegr_df[PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM].isin(mode_list).values,
+                                     cost_accegr_df[colname].values, var_value)
+            accegr_var_values[weight_name] = var_value
+
+        is_access        = (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_ACCESS).values
+        is_egress        = (cost_accegr_df[Passenger.PF_COL_LINK_MODE]             == PathSet.STATE_MODE_EGRESS).values
+        target_arrival   = (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == Passenger.TIME_TARGET_ARRIVAL).values
+        target_departure = (cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TIME_TARGET] == Passenger.TIME_TARGET_DEPARTURE).values
+        # minutes after the preferred arrival and departure times
+        arrival_diff_min   = ((cost_accegr_df[Passenger.PF_COL_PAX_B_TIME] - cost_accegr_df[Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME  ])/np.timedelta64(1,'m')).values
+        departure_diff_min = ((cost_accegr_df[Passenger.PF_COL_PAX_A_TIME] - cost_accegr_df[Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME])/np.timedelta64(1,'m')).values
+
+        with np.errstate(invalid="ignore"):
+            # penalty for arriving before preferred arrival time.
+            # arrive early is not negative - that would be arriving late
+            if PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN in accegr_var_values:
+                var_value = accegr_var_values[PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN]
+                var_value = np.where(is_access|(is_egress&target_departure), 0.0,               var_value)
+                var_value = np.where(is_egress&target_arrival,               -arrival_diff_min, var_value)
+                accegr_var_values[PathSet.WEIGHT_NAME_ARRIVE_EARLY_MIN] = np.where(var_value < 0, 0.0, var_value)
+
+            # penalty for departing after preferred departure time.
+            # depart late is not negative - that would be departing early
+            if PathSet.WEIGHT_NAME_DEPART_LATE_MIN in accegr_var_values:
+                var_value = accegr_var_values[PathSet.WEIGHT_NAME_DEPART_LATE_MIN]
+                var_value = np.where(is_egress|(is_access&target_arrival), 0.0,                var_value)
+                var_value = np.where(is_access&target_departure,           departure_diff_min, var_value)
+                accegr_var_values[PathSet.WEIGHT_NAME_DEPART_LATE_MIN] = np.where(var_value < 0, 0.0, var_value)
+
+            # depart before preferred or arrive after preferred means the passenger just missed something important
+            # Arrive late only impacts the egress link of those that have a preferred arrival time.
+            # If arrived before preferred time, set the arrive late field to zero. You don't get a
+            # discount for arriving early.
+            if PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN in accegr_var_values:
+                var_value = accegr_var_values[PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN]
+                var_value = np.where(is_access|target_departure,  0.0,              var_value)
+                var_value = np.where(is_egress&target_arrival,    arrival_diff_min, var_value)
+                accegr_var_values[PathSet.WEIGHT_NAME_ARRIVE_LATE_MIN] = np.where(var_value < 0, 0.0, var_value)
+
+            # Depart early only impacts the access link of those that have a preferred departure time.
+            # If departing after preferred time, set the depart early field to zero. You don't get a
+            # discount for taking your time.
+            if PathSet.WEIGHT_NAME_DEPART_EARLY_MIN in accegr_var_values:
+                var_value = accegr_var_values[PathSet.WEIGHT_NAME_DEPART_EARLY_MIN]
+                var_value = np.where(is_egress|target_arrival,    0.0,                 var_value)
+                var_value = np.where(is_access&target_departure,  -departure_diff_min, var_value)
+                accegr_var_values[PathSet.WEIGHT_NAME_DEPART_EARLY_MIN] = np.where(var_value < 0, 0.0, var_value)
 
         if len(Assignment.TRACE_IDS) > 0:
             FastTripsLogger.debug("cost_accegr_df trace\n%s\ndtypes=\n%s" % (cost_accegr_df.loc[cost_accegr_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True].to_string(), str(cost_accegr_df.dtypes)))
 
-        missing_accegr_costs = cost_accegr_df.loc[ pd.isnull(cost_accegr_df["var_value"]) ]
-        error_accegr_msg = "Missing %d out of %d access/egress var_value values" % (len(missing_accegr_costs), len(cost_accegr_df))
+        (accegr_costs, accegr_num_weights, missing_accegr_costs) = PathSet.calculate_link_costs(cost_accegr_df, compiled_weights, accegr_var_values)
+        error_accegr_msg = "Missing %d out of %d access/egress var_value values" % (len(missing_accegr_costs), accegr_num_weights.sum())
         FastTripsLogger.debug(error_accegr_msg)
 
         if len(missing_accegr_costs) > 0:
@@ -1068,53 +1366,47 @@ class PathSet:
 
         ##################### Next, handle Transit Trip link costs
 
-
-        # set the fare var_values for split_first only
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "fare")&(cost_trip_df["split_first"]==True), "var_value"]  = cost_trip_df[Assignment.SIM_COL_PAX_FARE]
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "fare")&(cost_trip_df["split_first"]==False), "var_value"] = 0
-
         if len(Assignment.TRACE_IDS) > 0:
             FastTripsLogger.debug("cost_trip_df trace\n%s\ndtypes=\n%s" % (cost_trip_df.loc[cost_trip_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True].to_string(), str(cost_trip_df.dtypes)))
 
-        # if there's a board time, in_vehicle_time = new_B_time - board_time
-        #               otherwise, in_vehicle_time = B time - A time (for when we split)
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "in_vehicle_time_min")&pd.notnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = \
-            (cost_trip_df[Assignment.SIM_COL_PAX_B_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME])/np.timedelta64(1,'m')
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "in_vehicle_time_min")& pd.isnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = \
-            (cost_trip_df[Assignment.SIM_COL_PAX_B_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_A_TIME])/np.timedelta64(1,'m')
-
-        # if in vehicle time is less than 0 then off by 1 day error
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "in_vehicle_time_min")&(cost_trip_df["var_value"]<0), "var_value"] = cost_trip_df["var_value"] + (24*60)
-
-        # if there's a board time, wait time = board_time - A time
-        #               otherwise, wait time = 0 (for when we split transit links)
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "wait_time_min")&pd.notnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = \
-            (cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_A_TIME])/np.timedelta64(1,'m')
-        cost_trip_df.loc[(cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "wait_time_min")& pd.isnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]), "var_value"] = 0
-
         # which overcap column to use?
         overcap_col = Trip.SIM_COL_VEH_OVERCAP
         if Assignment.MSA_RESULTS and Trip.SIM_COL_VEH_MSA_OVERCAP in list(cost_trip_df.columns.values): overcap_col = Trip.SIM_COL_VEH_MSA_OVERCAP
 
-        # at cap is a binary, 1 if overcap >= 0 and they're not one of the lucky few that boarded
-        cost_trip_df["at_capacity"] = 0.0
-        if Assignment.SIM_COL_PAX_BOARD_STATE in list(cost_trip_df.columns.values):
-            cost_trip_df.loc[ (cost_trip_df[overcap_col] >= 0)&
-                              (cost_trip_df[Assignment.SIM_COL_PAX_BOARD_STATE] != "board_easy")&
-                              (cost_trip_df[Assignment.SIM_COL_PAX_BOARD_STATE] != "boarded"), "at_capacity" ] = 1.0
-        else:
-            cost_trip_df.loc[ (cost_trip_df[overcap_col] >= 0)                               , "at_capacity" ] = 1.0
-
-        cost_trip_df.loc[cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "at_capacity"    , "var_value"] = cost_trip_df["at_capacity"]
-        cost_trip_df.loc[cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "overcap"        , "var_value"] = cost_trip_df[overcap_col]
-        # overcap shouldn't be negative
-        cost_trip_df.loc[ (cost_trip_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "overcap")&(cost_trip_df["var_value"]<0), "var_value"] = 0.0
-
-        if len(Assignment.TRACE_IDS) > 0:
-            FastTripsLogger.debug("cost_trip_df trace\n%s\ndtypes=\n%s" % (cost_trip_df.loc[cost_trip_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True].to_string(), str(cost_trip_df.dtypes)))
-
-        missing_trip_costs = cost_trip_df.loc[ pd.isnull(cost_trip_df["var_value"]) ]
-        error_trip_msg = "Missing %d out of %d transit trip var_value values" % (len(missing_trip_costs), len(cost_trip_df))
+        has_board_time = pd.notnull(cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME]).values
+        overcap        = cost_trip_df[overcap_col].values.astype(np.float64)
+
+        trip_var_values = {}
+        with np.errstate(invalid="ignore"):
+            # set the fare var_values for split_first only
+            trip_var_values["fare"] = np.where((cost_trip_df["split_first"]==True).values, cost_trip_df[Assignment.SIM_COL_PAX_FARE].values,
+                                      np.where((cost_trip_df["split_first"]==False).values, 0.0, np.nan))
+
+            # if there's a board time, in_vehicle_time = new_B_time - board_time
+            #               otherwise, in_vehicle_time = B time - A time (for when we split)
+            # if in vehicle time is less than 0 then off by 1 day error
+            var_value = np.where(has_board_time,
+                                 ((cost_trip_df[Assignment.SIM_COL_PAX_B_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME])/np.timedelta64(1,'m')).values,
+                                 ((cost_trip_df[Assignment.SIM_COL_PAX_B_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_A_TIME    ])/np.timedelta64(1,'m')).values)
+            trip_var_values["in_vehicle_time_min"] = np.where(var_value < 0, var_value + (24*60), var_value)
+
+            # if there's a board time, wait time = board_time - A time
+            #               otherwise, wait time = 0 (for when we split transit links)
+            trip_var_values["wait_time_min"] = np.where(has_board_time,
+                                                        ((cost_trip_df[Assignment.SIM_COL_PAX_BOARD_TIME] - cost_trip_df[Assignment.SIM_COL_PAX_A_TIME])/np.timedelta64(1,'m')).values,
+                                                        0.0)
+
+            # at cap is a binary, 1 if overcap >= 0 and they're not one of the lucky few that boarded
+            at_capacity = overcap >= 0
+            if Assignment.SIM_COL_PAX_BOARD_STATE in list(cost_trip_df.columns.values):
+                at_capacity = at_capacity & ~cost_trip_df[Assignment.SIM_COL_PAX_BOARD_STATE].isin(["board_easy","boarded"]).values
+            trip_var_values["at_capacity"] = at_capacity.astype(np.float64)
+
+            # overcap shouldn't be negative
+            trip_var_values["overcap"] = np.where(overcap < 0, 0.0, overcap)
+
+        (trip_costs, trip_num_weights, missing_trip_costs) = PathSet.calculate_link_costs(cost_trip_df, compiled_weights, trip_var_values)
+        error_trip_msg = "Missing %d out of %d transit trip var_value values" % (len(missing_trip_costs), trip_num_weights.sum())
         FastTripsLogger.debug(error_trip_msg)
 
         if len(missing_trip_costs) > 0:
@@ -1123,24 +1415,33 @@ class PathSet:
 
         ##################### Finally, handle Transfer link costs
         cost_transfer_df = transfers.add_transfer_attributes(cost_transfer_df, pathset_links_df)
-        cost_transfer_df.loc[cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "walk_time_min", "var_value"] = cost_transfer_df[Passenger.PF_COL_LINK_TIME]/np.timedelta64(1,'m')
 
         # any numeric column can be used
-        for colname in list(cost_transfer_df.select_dtypes(include=['float64','int64']).columns.values):
-            FastTripsLogger.debug("Using numeric column %s" % colname)
-            cost_transfer_df.loc[cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == colname, "var_value"] = cost_transfer_df[colname]
-
-        # make zero walk transfers have default var_values 0
-        cost_transfer_df.loc[ (cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] != "transfer_penalty")&
-                              (cost_transfer_df["A_id_num"]==cost_transfer_df["B_id_num"]), "var_value"] = 0.0
-        # zero walk transfers have a transfer penalty although they're not otherwise configured
-        cost_transfer_df.loc[ (cost_transfer_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME] == "transfer_penalty")&
-                              (pd.isnull(cost_transfer_df["var_value"])), "var_value"] = 1.0
+        numeric_colnames = list(cost_transfer_df.select_dtypes(include=['float64','int64']).columns.values)
+        zero_walk        = (cost_transfer_df["A_id_num"]==cost_transfer_df["B_id_num"]).values
+
+        transfer_var_values = {}
+        for weight_name in weight_names:
+            if weight_name in numeric_colnames:
+                FastTripsLogger.debug("Using numeric column %s" % weight_name)
+                var_value = cost_transfer_df[weight_name].values.astype(np.float64)
+            elif weight_name == "walk_time_min":
+                var_value = (cost_transfer_df[Passenger.PF_COL_LINK_TIME]/np.timedelta64(1,'m')).values
+            else:
+                var_value = np.full(len(cost_transfer_df), np.nan)
 
-        # FastTripsLogger.debug("cost_transfer_df=\n%s\ndtypes=\n%s" % (cost_transfer_df.head().to_string(), str(cost_transfer_df.dtypes)))
+            if weight_name == "transfer_penalty":
+                # zero walk transfers have a transfer penalty although they're not otherwise configured;
+                # the extension gives them 0.1 (see PathFinder::getTransferAttributes())
+                var_value = np.where(np.isnan(var_value) & zero_walk, 0.1, var_value)
+                var_value = np.where(np.isnan(var_value), 1.0, var_value)
+            else:
+                # make zero walk transfers have default var_values 0
+                var_value = np.where(zero_walk, 0.0, var_value)
+            transfer_var_values[weight_name] = var_value
 
-        missing_transfer_costs = cost_transfer_df.loc[ pd.isnull(cost_transfer_df["var_value"]) ]
-        error_transfer_msg = "Missing %d out of %d transfer var_value values" % (len(missing_transfer_costs), len(cost_transfer_df))
+        (transfer_costs, transfer_num_weights, missing_transfer_costs) = PathSet.calculate_link_costs(cost_transfer_df, compiled_weights, transfer_var_values)
+        error_transfer_msg = "Missing %d out of %d transfer var_value values" % (len(missing_transfer_costs), transfer_num_weights.sum())
         FastTripsLogger.debug(error_transfer_msg)
 
         if len(missing_transfer_costs) > 0:
@@ -1154,38 +1455,21 @@ class PathSet:
             raise NotImplementedError("Missing var_values; See log")
 
         ##################### Put them back together into a single dataframe
+        # links without any applicable weights are left out, as they have no cost
         cost_columns = [Passenger.TRIP_LIST_COLUMN_PERSON_ID,
                         Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
                         Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
                         Passenger.TRIP_LIST_COLUMN_TRACE,
-                        Passenger.TRIP_LIST_COLUMN_USER_CLASS,
-                        Passenger.TRIP_LIST_COLUMN_PURPOSE,
-                        Passenger.TRIP_LIST_COLUMN_VOT,
                         Passenger.PF_COL_PATH_NUM,
-                        Passenger.PF_COL_LINK_NUM,
-                        PathSet.WEIGHTS_COLUMN_DEMAND_MODE_TYPE,
-                        PathSet.WEIGHTS_COLUMN_DEMAND_MODE,
-                        PathSet.WEIGHTS_COLUMN_SUPPLY_MODE,
-                        PathSet.WEIGHTS_COLUMN_SUPPLY_MODE_NUM,
-                        PathSet.WEIGHTS_COLUMN_WEIGHT_NAME,
-                        PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE,
-                        PathSet.WEIGHTS_GROWTH_TYPE,
-                        PathSet.WEIGHTS_GROWTH_LOG_BASE,
-                        PathSet.WEIGHTS_GROWTH_LOGISTIC_MAX,
-                        PathSet.WEIGHTS_GROWTH_LOGISTIC_MID,
-                        "var_value",
-                        Assignment.SIM_COL_MISSED_XFER,
-                        Assignment.SIM_COL_PAX_BUMP_ITER,
-                        Assignment.SIM_COL_PAX_FARE]
-        cost_accegr_df   = cost_accegr_df.loc[:, cost_accegr_df.columns.isin(cost_columns)]
-        cost_trip_df     = cost_trip_df.loc[:, cost_trip_df.columns.isin(cost_columns)]
-        cost_transfer_df = cost_transfer_df.loc[:, cost_transfer_df.columns.isin(cost_columns)]
-        cost_df          = pd.concat([cost_accegr_df, cost_trip_df, cost_transfer_df], axis=0, ignore_index=True)
-
-        # FastTripsLogger.debug("calculate_cost: cost_df=\n%s\ndtypes=\n%s" % (cost_df.to_string(), str(cost_df.dtypes)))
-
-        # calculate link cost a function of the variable, weight and weight type
-        Util.calculate_pathweight_costs(cost_df, Assignment.SIM_COL_PAX_COST)
+                        Passenger.PF_COL_LINK_NUM]
+        cost_dfs = []
+        for (links_df, link_costs, link_num_weights) in [(cost_accegr_df,   accegr_costs,   accegr_num_weights),
+                                                         (cost_trip_df,     trip_costs,     trip_num_weights),
+                                                         (cost_transfer_df, transfer_costs, transfer_num_weights)]:
+            links_df = links_df.loc[link_num_weights > 0, cost_columns].copy()
+            links_df[Assignment.SIM_COL_PAX_COST] = link_costs[link_num_weights > 0]
+            cost_dfs.append(links_df)
+        cost_df = pd.concat(cost_dfs, axis=0, ignore_index=True)
 
         cost_df.sort_values([Passenger.TRIP_LIST_COLUMN_PERSON_ID,
                              Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
@@ -1199,6 +1483,19 @@ class PathSet:
             FastTripsLogger.fatal(msg)
             raise UnexpectedError(msg)
 
+        return PathSet.calculate_path_costs(STOCH_DISPERSION, pathset_paths_df, pathset_links_df, pathset_links_to_use, cost_df)
+
+    @staticmethod
+    def calculate_path_costs(STOCH_DISPERSION, pathset_paths_df, pathset_links_df, pathset_links_to_use, cost_df):
+        """
+        Sums the link costs in *cost_df*, which has columns `person_id`, `person_trip_id`, `trip_list_id_num`, `trace`,
+        `pathnum`, `linknum` and :py:attr:`Assignment.SIM_COL_PAX_COST`, to the links and paths, and adds the overlap
+        path size variable and the path probabilities and logsums.
+
+        Returns (pathset_paths_df, pathset_links_df) as described in :py:meth:`PathSet.calculate_cost`.
+        """
+        from .Assignment import Assignment
+
         ###################### sum linkcost to links
         cost_link_df = cost_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
                                 Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
@@ -1295,146 +1592,76 @@ class PathSet:
         """
         Given a set of pathset links, returns a the results of overlap calculations.
 
+        The path size for path *i* is SUM_a (l_a/L_i) x 1/(SUM_j (L_i/L_j)^gamma x delta_aj).
+        Since (L_i/L_j)^gamma = L_i^gamma x L_j^-gamma, the sum over paths *j* is L_i^gamma times the
+        sum of L_j^-gamma over the person trip's links sharing link *a*'s A, B and mode -- so it's
+        a grouped reduction on those keys rather than a self-join of every link in the pathset with
+        every other, and memory use is linear in the number of links.
+
         This return dataframe will have colums person_id, person_trip_id, pathnum, and ln_PS
         """
         from .Assignment import Assignment
 
         FastTripsLogger.debug("calculate_overlap() pathset_links_to_use (%d) head=\n%s" % (len(pathset_links_to_use), str(pathset_links_to_use.head(30))))
-        # CHUNKING because we run into memory problems
-        # TODO: figure out more sophisticated chunk size
-        chunk_list = pathset_links_to_use[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]].drop_duplicates().reset_index(drop=True)
-        num_chunks = len(chunk_list)/PathSet.OVERLAP_CHUNK_SIZE + 1
-        chunk_list["chunk_num"] = np.floor_divide(chunk_list.index, PathSet.OVERLAP_CHUNK_SIZE)
-        FastTripsLogger.debug("calculate_overlap() chunk_list size=%d head=\n%s\ntail=\n%s" % (len(chunk_list), chunk_list.head().to_string(), chunk_list.tail().to_string()))
-        pathset_links_to_use = pd.merge(left  =pathset_links_to_use,
-                                            right =chunk_list,
-                                            how   ='left')
-        FastTripsLogger.debug("calculate_overlap() mem_use=%s pathset_links_to_use has length %d, head=\n%s" % (Util.get_process_mem_use_str(),
-                              len(pathset_links_to_use), pathset_links_to_use.head().to_string()))
-        full_overlap_df = pd.DataFrame()
-
-        for chunk_num in range(num_chunks):
-
-            # get the person trips in the chunk
-            overlap_df = pathset_links_to_use.loc[ pathset_links_to_use["chunk_num"] == chunk_num]
-
-            FastTripsLogger.info("          Calculating overlap for chunk %4d/%4d (len %6d);  mem_use=%8s" % (chunk_num+1, num_chunks, len(overlap_df), Util.get_process_mem_use_str()))
-
-            overlap_df = overlap_df[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                     Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                     Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                     Passenger.TRIP_LIST_COLUMN_TRACE,
-                                     Passenger.PF_COL_PATH_NUM,
-                                     Passenger.PF_COL_LINK_NUM,
-                                     "A_id_num","B_id_num",
-                                     Route.ROUTES_COLUMN_MODE,
-                                     "new_linktime",
-                                     Assignment.SIM_COL_PAX_DISTANCE]].copy()
-            # get ready to count, time, dist to path and add path sum version to overlap_df -- this is L
-            FastTripsLogger.debug("calculate_overlap() chunk_num %d: mem_use=%s overlap_df has length %d, head=\n%s" %
-                                  (chunk_num+1, Util.get_process_mem_use_str(), len(overlap_df), overlap_df.head().to_string()))
-
-            # sum to path
-            overlap_df["count"] = 1
-            overlap_path_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, # sort by this
-                                                  Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                                  Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                                  Passenger.TRIP_LIST_COLUMN_TRACE,
-                                                  Passenger.PF_COL_PATH_NUM]).aggregate({'count':'sum','new_linktime':'sum',Assignment.SIM_COL_PAX_DISTANCE:'sum'}).reset_index(drop=False)
-            overlap_path_df.rename(columns={"count":"path_count", "new_linktime":"path_time", Assignment.SIM_COL_PAX_DISTANCE:"path_distance"}, inplace=True)
-            overlap_df.drop(["count"], axis=1, inplace=True)
-
-            FastTripsLogger.debug("calculate_overlap() chunk_num %d: Added path summed count,time,distance. mem_use=%s overlap_path_df has length %d, head=\n%s" %
-                                  (chunk_num+1, Util.get_process_mem_use_str(), len(overlap_path_df), overlap_path_df.head().to_string()))
-
-            # add the path summed variables to the link dataframe
-            overlap_df = pd.merge(overlap_df, overlap_path_df,
-                                      how="left",
-                                      on=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                          Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                          Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                          Passenger.TRIP_LIST_COLUMN_TRACE,
-                                          Passenger.PF_COL_PATH_NUM])
-            del overlap_path_df # we're done with this
-
-            # outer join on trip_list_id_num means when they match, we'll get a cartesian product of the links
-            overlap_df = pd.merge(overlap_df, overlap_df.copy(),
-                                      on=[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                          Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                          Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
-                                          Passenger.TRIP_LIST_COLUMN_TRACE], how="outer")
-
-            # count matches -- matching A,B,mode
-            overlap_df["match"] = 0
-            overlap_df.loc[ (overlap_df["A_id_num_x"]==overlap_df["A_id_num_y"])&
-                            (overlap_df["B_id_num_x"]==overlap_df["B_id_num_y"])&
-                            (overlap_df["mode_x"    ]==overlap_df["mode_y"    ])  , "match"] = 1
-
-            if PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_COUNT:
-                overlap_df["link_prop_x"] = 1.0/overlap_df["path_count_x"]                         # l_a/L_i
-                overlap_df["pathlen_x_y"] = overlap_df["path_count_x"]/overlap_df["path_count_y"]  # L_i/L_j
-            elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_TIME:
-                overlap_df["link_prop_x"] = overlap_df["new_linktime_x"]/overlap_df["path_time_x"] # l_a/L_i
-                overlap_df["pathlen_x_y"] = overlap_df["path_time_x"]/overlap_df["path_time_y"]    # L_i/L_j
-            elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_DISTANCE:
-                overlap_df["link_prop_x"] = overlap_df["distance_x"]/overlap_df["path_distance_x"] # l_a/L_i
-                overlap_df["pathlen_x_y"] = overlap_df["path_distance_x"]/overlap_df["path_distance_y"]    # L_i/L_j
-
-            overlap_df["pathlen_x_y_scale"] = overlap_df[["pathlen_x_y"]].pow(PathSet.OVERLAP_SCALE_PARAMETER)  # (L_i/L_j)^gamma
-            # zero it out if it's not a match
-            overlap_df.loc[overlap_df["match"]==0, "pathlen_x_y_scale"] = 0
-            # now pathlen_x_y_scale = (L_i/L_j)^gamma x delta_aj
-
-            if len(Assignment.TRACE_IDS) > 0:
-                FastTripsLogger.debug("calculate_overlap(): overlap_df trace\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]))
-
-            # debug
-            # overlap_df_temp = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID, "pathnum_x","linknum_x","link_prop_x","pathnum_y"]).aggregate({"match":"sum", "pathlen_x_y_scale":"sum"})
-            # FastTripsLogger.debug("calculate_cost: overlap_df_temp\n%s" % str(overlap_df_temp.head(50)))
-
-            # group by pathnum_x, linknum_x -- so this sums over paths P_j in equation (or pathnum_y here)
-            overlap_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,  # sort by this
-                                             Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                             Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                             Passenger.TRIP_LIST_COLUMN_TRACE,
-                                             "pathnum_x","linknum_x","link_prop_x"]).aggregate({"pathlen_x_y_scale":"sum"}).reset_index()
-            # now pathlen_x_y_scale = SUM_j (L_i/L_j)^gamma x delta_aj
-            overlap_df["PS"] = overlap_df["link_prop_x"]/overlap_df["pathlen_x_y_scale"]  # l_a/L_i * 1/(SUM_j (L_i/L_j)^gamma x delta_aj)
-            if len(Assignment.TRACE_IDS) > 0:
-                FastTripsLogger.debug("calculate_overlap() trace overlap_df\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]))
 
-            FastTripsLogger.debug("calculate_overlap() chunk_num %d: Cartesian product of links. mem_use=%s overlap_df has length %d, head=\n%s" %
-                                  (chunk_num+1, Util.get_process_mem_use_str(), len(overlap_df), overlap_df.head().to_string()))
+        overlap_df = pathset_links_to_use[[Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                           Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                                           Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                           Passenger.TRIP_LIST_COLUMN_TRACE,
+                                           Passenger.PF_COL_PATH_NUM,
+                                           Passenger.PF_COL_LINK_NUM,
+                                           "A_id_num","B_id_num",
+                                           Route.ROUTES_COLUMN_MODE]].copy()
+
+        # the overlap variable for each link -- this is l_a
+        if PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_COUNT:
+            overlap_df["link_len"] = 1.0
+        elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_TIME:
+            overlap_df["link_len"] = pathset_links_to_use["new_linktime"]/np.timedelta64(1,'m')
+        elif PathSet.OVERLAP_VARIABLE == PathSet.OVERLAP_DISTANCE:
+            overlap_df["link_len"] = pathset_links_to_use[Assignment.SIM_COL_PAX_DISTANCE]
+
+        # sum to path -- this is L_i
+        overlap_df["path_len"] = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                                     Passenger.PF_COL_PATH_NUM])["link_len"].transform("sum")
+        overlap_df["link_prop"] = overlap_df["link_len"]/overlap_df["path_len"]  # l_a/L_i
+
+        # sum L_j^-gamma over the links matching A,B,mode in the pathset -- this is SUM_j L_j^-gamma x delta_aj
+        overlap_df["path_len_scale"] = np.power(overlap_df["path_len"], -PathSet.OVERLAP_SCALE_PARAMETER)
+        overlap_df["path_len_scale"] = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM,
+                                                           "A_id_num","B_id_num",
+                                                           Route.ROUTES_COLUMN_MODE])["path_len_scale"].transform("sum")
+        # l_a/L_i * 1/(SUM_j (L_i/L_j)^gamma x delta_aj)
+        overlap_df["PS"] = overlap_df["link_prop"]/(np.power(overlap_df["path_len"], PathSet.OVERLAP_SCALE_PARAMETER)*overlap_df["path_len_scale"])
+        if len(Assignment.TRACE_IDS) > 0:
+            FastTripsLogger.debug("calculate_overlap() trace overlap_df\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]))
+
+        FastTripsLogger.debug("calculate_overlap(): mem_use=%s overlap_df has length %d, head=\n%s" %
+                              (Util.get_process_mem_use_str(), len(overlap_df), overlap_df.head().to_string()))
+
+        # sum across link in path
+        overlap_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, # preserve ordering
+                                         Passenger.TRIP_LIST_COLUMN_PERSON_ID,
+                                         Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
+                                         Passenger.TRIP_LIST_COLUMN_TRACE,
+                                         Passenger.PF_COL_PATH_NUM]).aggregate({"PS":"sum"}).reset_index(drop=False)
+
+        # Check all pathsizes are in [0,1]
+        min_PS = overlap_df["PS"].min()
+        max_PS = overlap_df["PS"].max()
+        FastTripsLogger.debug("PathSize min=%f max=%f" % (min_PS, max_PS))
+        if min_PS < 0:
+            FastTripsLogger.fatal("Min pathsize = %f < 0:\n%s" % (min_PS, overlap_df.loc[overlap_df["PS"]==min_PS].to_string()))
+        if max_PS > 1.0001:
+            FastTripsLogger.fatal("Max pathsize = %f > 1:\n%s" % (max_PS, overlap_df.loc[overlap_df["PS"]==max_PS].to_string()))
+
+        overlap_df[Assignment.SIM_COL_PAX_LNPS] = np.log(overlap_df["PS"])
+        if len(Assignment.TRACE_IDS) > 0:
+            FastTripsLogger.debug("calculate_overlap() overlap_df trace\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]))
 
-            # sum across link in path
-            overlap_df = overlap_df.groupby([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, # preserve ordering
-                                             Passenger.TRIP_LIST_COLUMN_PERSON_ID,
-                                             Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID,
-                                             Passenger.TRIP_LIST_COLUMN_TRACE,"pathnum_x"]).aggregate({"PS":"sum"}).reset_index(drop=False)
-
-            # Check all pathsizes are in [0,1]
-            min_PS = overlap_df["PS"].min()
-            max_PS = overlap_df["PS"].max()
-            FastTripsLogger.debug("PathSize min=%f max=%f" % (min_PS, max_PS))
-            if min_PS < 0:
-                FastTripsLogger.fatal("Min pathsize = %f < 0:\n%s" % (min_PS, overlap_df.loc[overlap_df["PS"]==min_PS].to_string()))
-            if max_PS > 1.0001:
-                FastTripsLogger.fatal("Max pathsize = %f > 1:\n%s" % (max_PS, overlap_df.loc[overlap_df["PS"]==max_PS].to_string()))
-
-            overlap_df[Assignment.SIM_COL_PAX_LNPS] = np.log(overlap_df["PS"])
-            if len(Assignment.TRACE_IDS) > 0:
-                FastTripsLogger.debug("calculate_overlap() overlap_df trace\n%s" % str(overlap_df.loc[overlap_df[Passenger.TRIP_LIST_COLUMN_TRACE]==True]))
-
-            # rename pathnum_x to pathnum and drop PS.  Now overlap_df has columns trip_list_id_num, pathnum, ln_PS
-            overlap_df.rename(columns={"pathnum_x":Passenger.PF_COL_PATH_NUM}, inplace=True)
-            overlap_df.drop(["PS"], axis=1, inplace=True) # we have ln_PS
-
-            if len(full_overlap_df) == 0:
-                full_overlap_df = overlap_df
-            else:
-                full_overlap_df = full_overlap_df.append(overlap_df)
-            FastTripsLogger.debug("calculate_overlap() chunk_num %d: mem_use=%s full_overlap_df has length %d" % (chunk_num+1, Util.get_process_mem_use_str(), len(full_overlap_df)))
+        # drop PS.  Now overlap_df has columns trip_list_id_num, pathnum, ln_PS
+        overlap_df.drop(["PS"], axis=1, inplace=True) # we have ln_PS
 
-        FastTripsLogger.debug("calculate_overlap() complete: full_overlap_df head=\n%s" % full_overlap_df.head(30))
+        FastTripsLogger.debug("calculate_overlap() complete: overlap_df head=\n%s" % overlap_df.head(30))
 
-        return full_overlap_df
+        return overlap_df
@@ -0,0 +1,281 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from .Logger import FastTripsLogger
+
+
+class PathSetCache:
+    """
+    On-disk cache of pathfinding results that persists across runs, so rerunning the same network and demand
+    with different simulation or choice parameters doesn't have to find the same pathsets again.
+
+    Entries are the columnar pathset results as returned by the C++ extension (see
+    :py:meth:`Assignment.convert_pathset_results`), content-addressed in two levels:
+
+    * The *supply key* hashes everything path-finding sees other than the person trip: the network and
+      weights as written for the extension, the pathfinding parameters, the stop times and the bump waits.
+      Each supply key has its own segment file, read in bulk when the supply is set.
+    * The *trip key* hashes the path specification of a person trip, including the iteration,
+      since the random numbers for hyperpath enumeration depend on it.
+
+    Segments are evicted least recently used first to keep the cache directory under its size cap.
+    """
+    #: Segment file name template, by supply key
+    SEGMENT_FILE_TEMPLATE   = "pathsets_%s.npz"
+    #: Segment file name prefix and suffix, for finding segments to evict
+    SEGMENT_FILE_PREFIX     = "pathsets_"
+    SEGMENT_FILE_SUFFIX     = ".npz"
+    #: Suffix for a segment file while it's being written
+    TEMP_FILE_SUFFIX        = ".tmp.npz"
+
+    #: Result arrays in each segment, as returned by the C++ extension.  The first column of the path and link
+    #: ints is the index of the person trip in the results; in segments it's the index in the segment's trip keys.
+    RESULT_ARRAYS           = ["path_ints", "path_doubles", "link_ints", "link_doubles"]
+
+    def __init__(self, cache_dir, max_mb):
+        """
+        Constructor.  The segments are kept in *cache_dir*, which is created if needed, and
+        limited to *max_mb* megabytes in total.
+        """
+        self.cache_dir  = cache_dir
+        self.max_bytes  = max_mb*1024*1024
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        #: The current supply key
+        self.supply_key = None
+        #: Sorted trip keys in the current segment
+        self.trip_keys  = np.zeros(0, dtype="S40")
+        #: Result arrays for the current segment, by name
+        self.results    = PathSetCache.empty_results()
+        #: Trip keys and results added since the segment was read: list of (trip_keys, results)
+        self.added      = []
+        #: Trip keys added since the segment was read, so they aren't added twice
+        self.added_keys = set()
+
+        self.hits       = 0
+        self.misses     = 0
+
+    @staticmethod
+    def empty_results():
+        """
+        Returns a dictionary of empty result arrays.
+        """
+        return { "path_ints"   :np.zeros((0,2), dtype=np.int32),
+                 "path_doubles":np.zeros((0,5), dtype=np.float64),
+                 "link_ints"   :np.zeros((0,9), dtype=np.int32),
+                 "link_doubles":np.zeros((0,6), dtype=np.float64) }
+
+    @staticmethod
+    def hash_parts(parts):
+        """
+        Returns the hex SHA-1 digest of the given list of strings and numpy arrays.
+        """
+        sha = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                sha.update(str(part.dtype))
+                sha.update(str(part.shape))
+                sha.update(np.ascontiguousarray(part).tobytes())
+            else:
+                sha.update(str(part))
+            sha.update("\0")
+        return sha.hexdigest()
+
+    def get_segment_path(self, supply_key):
+        """
+        Returns the path of the segment file for the given supply key.
+        """
+        return os.path.join(self.cache_dir, PathSetCache.SEGMENT_FILE_TEMPLATE % supply_key)
+
+    def set_supply(self, supply_parts):
+        """
+        Sets the supply for lookups to the one hashed from *supply_parts* (see :py:meth:`PathSetCache.hash_parts`),
+        writing any results added for the previous one and reading the segment for this one if it exists.
+        """
+        supply_key = PathSetCache.hash_parts(supply_parts)
+        if supply_key == self.supply_key: return
+
+        self.write()
+        self.supply_key = supply_key
+        self.trip_keys  = np.zeros(0, dtype="S40")
+        self.results    = PathSetCache.empty_results()
+        self.added      = []
+        self.added_keys = set()
+
+        segment_path = self.get_segment_path(supply_key)
+        if not os.path.exists(segment_path):
+            FastTripsLogger.debug("PathSetCache: no segment for supply %s" % supply_key)
+            return
+
+        segment = np.load(segment_path)
+        self.trip_keys = segment["trip_keys"]
+        for name in PathSetCache.RESULT_ARRAYS:
+            self.results[name] = segment[name]
+        segment.close()
+
+        # it's been used, so it's the last to be evicted
+        os.utime(segment_path, None)
+        FastTripsLogger.info("PathSetCache: read %d cached pathsets from %s" % (len(self.trip_keys), segment_path))
+
+    def find(self, trip_key):
+        """
+        Returns the position of the given trip key in the segment, or -1 if it isn't there (or is None).
+        """
+        if trip_key is None: return -1
+        pos = np.searchsorted(self.trip_keys, trip_key)
+        if pos < len(self.trip_keys) and self.trip_keys[pos] == trip_key:
+            return pos
+        return -1
+
+    def lookup(self, trip_keys):
+        """
+        Looks up the given trip keys, which may include None for person trips that shouldn't be cached.
+
+        Returns (hit, pathset_results) where *hit* is a bool array for the trip keys that were found, and
+        *pathset_results* is (path_ints, path_doubles, link_ints, link_doubles) for those, with the first
+        column of the ints indexing the trip keys that were found in order.
+        """
+        positions = np.array([self.find(trip_key) for trip_key in trip_keys], dtype=np.int64)
+        hit       = positions >= 0
+
+        self.hits   += hit.sum()
+        self.misses += len([trip_key for trip_key in trip_keys if trip_key is not None]) - hit.sum()
+
+        # segment index -> index in the hits
+        hit_index = np.full(len(self.trip_keys), -1, dtype=np.int64)
+        hit_index[positions[hit]] = np.arange(hit.sum())
+
+        pathset_results = []
+        for ints_name, doubles_name in [("path_ints","path_doubles"), ("link_ints","link_doubles")]:
+            rows       = hit_index[self.results[ints_name][:,0]] >= 0
+            ints       = self.results[ints_name][rows].copy()
+            ints[:,0]  = hit_index[ints[:,0]]
+            # keep the results in the order of the trip keys
+            order      = np.argsort(ints[:,0], kind="mergesort")
+            pathset_results.append(ints[order])
+            pathset_results.append(self.results[doubles_name][rows][order])
+        return (hit, tuple(pathset_results))
+
+    def add(self, trip_keys, pathset_results):
+        """
+        Adds the results for the given trip keys, as returned by the C++ extension for person trips in that order.
+        Trip keys that are None or already cached are skipped.
+        """
+        keep = np.array([(trip_key is not None) and (trip_key not in self.added_keys) and (self.find(trip_key) < 0)
+                         for trip_key in trip_keys], dtype=bool)
+        if keep.sum() == 0: return
+
+        # trip index -> index in the kept trip keys
+        keep_index = np.full(len(trip_keys), -1, dtype=np.int64)
+        keep_index[keep] = np.arange(keep.sum())
+
+        results = {}
+        for name, array in zip(PathSetCache.RESULT_ARRAYS, pathset_results[:4]):
+            results[name] = array
+        for ints_name, doubles_name in [("path_ints","path_doubles"), ("link_ints","link_doubles")]:
+            rows                  = keep_index[results[ints_name][:,0]] >= 0
+            results[ints_name]    = results[ints_name][rows].copy()
+            results[ints_name][:,0] = keep_index[results[ints_name][:,0]]
+            results[doubles_name] = results[doubles_name][rows]
+
+        kept_keys = [trip_keys[idx] for idx in np.nonzero(keep)[0]]
+        self.added.append( (np.array(kept_keys, dtype="S40"), results) )
+        self.added_keys.update(kept_keys)
+
+    def write(self):
+        """
+        Writes the segment for the current supply if results were added, then evicts segments over the size cap.
+        """
+        if len(self.added) == 0: return
+
+        # put the segment and the added results together, with the trip indices offset to the combined trip keys
+        trip_keys_list = [self.trip_keys]
+        results_lists  = dict([(name, [self.results[name]]) for name in PathSetCache.RESULT_ARRAYS])
+        offset         = len(self.trip_keys)
+        for (trip_keys, results) in self.added:
+            trip_keys_list.append(trip_keys)
+            for name in PathSetCache.RESULT_ARRAYS:
+                array = results[name]
+                if name.endswith("_ints"):
+                    array = array.copy()
+                    array[:,0] += offset
+                results_lists[name].append(array)
+            offset += len(trip_keys)
+        trip_keys = np.concatenate(trip_keys_list)
+
+        # sort by trip key for lookups
+        order       = np.argsort(trip_keys, kind="mergesort")
+        new_index   = np.empty(len(order), dtype=np.int32)
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+        segment     = { "trip_keys":trip_keys[order] }
+        for name in PathSetCache.RESULT_ARRAYS:
+            segment[name] = np.concatenate(results_lists[name], axis=0)
+            if name.endswith("_ints"):
+                segment[name][:,0] = new_index[segment[name][:,0]]
+
+        # write to a temporary file first so a reader never sees a partial segment
+        segment_path = self.get_segment_path(self.supply_key)
+        temp_path    = segment_path + PathSetCache.TEMP_FILE_SUFFIX
+        try:
+            np.savez(temp_path, **segment)
+            PathSetCache.replace_file(temp_path, segment_path)
+        except:
+            if os.path.exists(temp_path): os.remove(temp_path)
+            raise
+        FastTripsLogger.info("PathSetCache: wrote %d cached pathsets to %s" % (len(trip_keys), segment_path))
+
+        self.trip_keys  = segment["trip_keys"]
+        self.results    = dict([(name, segment[name]) for name in PathSetCache.RESULT_ARRAYS])
+        self.added      = []
+        self.added_keys = set()
+
+        self.evict()
+
+    @staticmethod
+    def replace_file(src_path, dst_path):
+        """
+        Renames *src_path* to *dst_path*, replacing it if it exists.  On Windows, :py:func:`os.rename` won't
+        replace an existing file, so it's removed first.
+        """
+        if os.name == 'nt' and os.path.exists(dst_path):
+            os.remove(dst_path)
+        os.rename(src_path, dst_path)
+
+    def evict(self):
+        """
+        Deletes the least recently used segments, other than the current one, until the cache is under its size cap.
+        """
+        segments = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.startswith(PathSetCache.SEGMENT_FILE_PREFIX): continue
+            if not filename.endswith(PathSetCache.SEGMENT_FILE_SUFFIX): continue
+            # being written, or left by a failed write
+            if filename.endswith(PathSetCache.TEMP_FILE_SUFFIX): continue
+            segment_path = os.path.join(self.cache_dir, filename)
+            segments.append( (os.path.getmtime(segment_path), os.path.getsize(segment_path), segment_path) )
+
+        total_bytes = sum([segment[1] for segment in segments])
+        current     = self.get_segment_path(self.supply_key) if self.supply_key else None
+        for (mtime, size, segment_path) in sorted(segments):
+            if total_bytes <= self.max_bytes: break
+            if segment_path == current: continue
+            os.remove(segment_path)
+            total_bytes -= size
+            FastTripsLogger.info("PathSetCache: evicted %s" % segment_path)
@@ -0,0 +1,141 @@
+__copyright__ = "Copyright 2015-2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import numpy as np
+import pandas as pd
+
+from .Logger    import FastTripsLogger
+from .Passenger import Passenger
+
+
+class PathSetStore:
+    """
+    Stores the current pathset paths and links for the person trips, as described in
+    :py:meth:`Passenger.setup_passenger_pathsets`, keyed by trip list ID number (`trip_list_id_num`).
+
+    The paths and links are kept in blocks, where each block is a (pathset_paths_df, pathset_links_df) pair,
+    and each person trip records which block holds its current rows.  Replacing the paths for some person trips
+    adds a block and updates the block number for just those person trips, so rows that have been replaced
+    are left in place until :py:meth:`PathSetStore.get_pathsets` puts the blocks together.  That's a pass over
+    all the stored rows, so replacing is cheap but getting the pathsets after a replacement is not.
+    """
+    #: Block number for person trips without paths
+    NO_BLOCK = -1
+
+    def __init__(self, num_trips=0):
+        """
+        Constructor.  *num_trips* is the number of person trips expected; the store grows if there are more.
+        """
+        #: The block number for each person trip's paths and links, indexed by trip list ID number
+        self.trip_block = np.full(num_trips+1, PathSetStore.NO_BLOCK, dtype=np.int32)
+
+        #: List of (pathset_paths_df, pathset_links_df), oldest first
+        self.blocks     = []
+
+    def reserve(self, max_trip_list_id_num):
+        """
+        Makes sure the store has room for trip list ID numbers up to *max_trip_list_id_num*.
+        """
+        if max_trip_list_id_num < len(self.trip_block): return
+
+        new_size   = max(max_trip_list_id_num+1, 2*len(self.trip_block))
+        trip_block = np.full(new_size, PathSetStore.NO_BLOCK, dtype=np.int32)
+        trip_block[:len(self.trip_block)] = self.trip_block
+        self.trip_block = trip_block
+
+    def set_pathsets(self, pathset_paths_df, pathset_links_df):
+        """
+        Replaces all the paths and links with the given ones, which become the only block.
+        """
+        trip_list_id_nums = pathset_paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+        if len(trip_list_id_nums) > 0:
+            self.reserve(trip_list_id_nums.max())
+
+        self.trip_block.fill(PathSetStore.NO_BLOCK)
+        self.trip_block[trip_list_id_nums] = 0
+        self.blocks = [ (pathset_paths_df, pathset_links_df) ]
+
+    def replace_pathsets(self, trip_list_id_nums, pathset_paths_df, pathset_links_df):
+        """
+        Replaces the paths and links for the person trips with the given *trip_list_id_nums*.  These person trips
+        are dropped from the existing paths and links, even if they aren't in *pathset_paths_df*.
+        """
+        trip_list_id_nums = np.asarray(trip_list_id_nums, dtype=np.int64)
+        if len(trip_list_id_nums) > 0:
+            self.reserve(trip_list_id_nums.max())
+
+        # person trips we looked for but didn't find paths for have no block
+        self.trip_block[trip_list_id_nums] = PathSetStore.NO_BLOCK
+
+        new_trip_list_id_nums = pathset_paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+        self.trip_block[new_trip_list_id_nums] = len(self.blocks)
+        self.blocks.append( (pathset_paths_df, pathset_links_df) )
+
+        FastTripsLogger.debug("replace_pathsets(): replaced %d person trips with %d paths and %d links in block %d" %
+                              (len(trip_list_id_nums), len(pathset_paths_df), len(pathset_links_df), len(self.blocks)-1))
+
+    def get_pathsets(self):
+        """
+        Returns the current (pathset_paths_df, pathset_links_df), sorted by trip list ID number and path number,
+        with a fresh index.
+
+        If pathsets were replaced since the last call, every block with current rows is masked and they're
+        concatenated and sorted, which takes time in proportion to all the stored rows, not just the replaced
+        ones.  Blocks with no current rows are dropped.  With nothing replaced, the same dataframes are returned.
+        """
+        if len(self.blocks) == 0:
+            return (None, None)
+
+        if len(self.blocks) > 1:
+            paths_dfs = []
+            links_dfs = []
+            for block_num, (paths_df, links_df) in enumerate(self.blocks):
+                if not (self.trip_block == block_num).any(): continue
+                paths_dfs.append(self._current_rows(block_num, paths_df))
+                links_dfs.append(self._current_rows(block_num, links_df))
+
+            if len(paths_dfs) == 1:
+                self.blocks = [ (paths_dfs[0], links_dfs[0]) ]
+            else:
+                self.blocks = [ (pd.concat(paths_dfs, axis=0, ignore_index=True),
+                                 pd.concat(links_dfs, axis=0, ignore_index=True)) ]
+            self.trip_block[self.trip_block != PathSetStore.NO_BLOCK] = 0
+
+        (paths_df, links_df) = self.blocks[0]
+        self.blocks = [ (PathSetStore._sorted(paths_df), PathSetStore._sorted(links_df)) ]
+        return self.blocks[0]
+
+    def _current_rows(self, block_num, df):
+        """
+        Returns the rows of the given block dataframe for the person trips whose current rows are in that block.
+        """
+        is_current = self.trip_block[df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values] == block_num
+        if is_current.all(): return df
+        return df.loc[is_current]
+
+    @staticmethod
+    def _sorted(df):
+        """
+        Returns the given paths or links sorted by trip list ID number and path number, keeping the order of the
+        links within a path, with a fresh index.  If it's sorted already, it's returned as it is.
+        """
+        trip_list_id_nums = df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].values
+        pathnums          = df[Passenger.PF_COL_PATH_NUM].values
+        is_sorted = (np.diff(trip_list_id_nums) >= 0) & ((np.diff(trip_list_id_nums) > 0) | (np.diff(pathnums) >= 0))
+        if is_sorted.all():
+            if df.index.equals(pd.RangeIndex(len(df))): return df
+            return df.reset_index(drop=True)
+
+        # lexsort is stable and sorts by the last key first
+        return df.take(np.lexsort((pathnums, trip_list_id_nums))).reset_index(drop=True)
@@ -61,6 +61,20 @@ class Performance:
     PERFORMANCE_PF_COL_PRIVATE_USAGE_BYTES    = "private usage bytes"
     #: Performance column: Timestamp of memory query, in a datetime.datetime
     PERFORMANCE_PF_COL_MEM_TIMESTAMP          = "mem_timestamp"
+    #: Performance column: Number of stops pushed onto the label stop queue
+    PERFORMANCE_PF_COL_QUEUE_PUSHES           = "label queue pushes"
+    #: Performance column: Number of pushes that lowered the label of a stop already in the label stop queue
+    PERFORMANCE_PF_COL_QUEUE_DECREASE_KEYS    = "label queue decrease keys"
+    #: Performance column: Number of stops popped from the label stop queue
+    PERFORMANCE_PF_COL_QUEUE_POPS             = "label queue pops"
+    #: Performance column: Number of stops popped from the label stop queue but skipped by lower bound pruning
+    PERFORMANCE_PF_COL_PRUNED_STOPS           = "pruned label stops"
+    #: Performance column: 1 if the labeling came from the hyperpath cache
+    PERFORMANCE_PF_COL_CACHE_HITS             = "hyperpath cache hits"
+    #: Performance column: 1 if the labeling was done and added to the hyperpath cache
+    PERFORMANCE_PF_COL_CACHE_MISSES           = "hyperpath cache misses"
+    #: Performance column: Number of labelings evicted from the hyperpath cache to make room
+    PERFORMANCE_PF_COL_CACHE_EVICTIONS        = "hyperpath cache evictions"
 
     #: File to write performance results
     OUTPUT_PERFORMANCE_PF_FILE                = 'ft_output_performance_pathfinding.csv'
@@ -105,7 +119,14 @@ class Performance:
             Performance.PERFORMANCE_PF_COL_TIME_ENUMERATING_MS      :[],
             Performance.PERFORMANCE_PF_COL_WORKING_SET_BYTES        :[],
             Performance.PERFORMANCE_PF_COL_PRIVATE_USAGE_BYTES      :[],
-            Performance.PERFORMANCE_PF_COL_MEM_TIMESTAMP            :[]
+            Performance.PERFORMANCE_PF_COL_MEM_TIMESTAMP            :[],
+            Performance.PERFORMANCE_PF_COL_QUEUE_PUSHES             :[],
+            Performance.PERFORMANCE_PF_COL_QUEUE_DECREASE_KEYS      :[],
+            Performance.PERFORMANCE_PF_COL_QUEUE_POPS               :[],
+            Performance.PERFORMANCE_PF_COL_PRUNED_STOPS             :[],
+            Performance.PERFORMANCE_PF_COL_CACHE_HITS               :[],
+            Performance.PERFORMANCE_PF_COL_CACHE_MISSES             :[],
+            Performance.PERFORMANCE_PF_COL_CACHE_EVICTIONS          :[]
         }
 
         # maps PERFORMANCE_COLUMN* to arrays of values
@@ -144,7 +165,14 @@ class Performance:
                     Performance.PERFORMANCE_PF_COL_TIME_ENUMERATING_MS,
                     Performance.PERFORMANCE_PF_COL_WORKING_SET_BYTES,
                     Performance.PERFORMANCE_PF_COL_PRIVATE_USAGE_BYTES,
-                    Performance.PERFORMANCE_PF_COL_MEM_TIMESTAMP]:
+                    Performance.PERFORMANCE_PF_COL_MEM_TIMESTAMP,
+                    Performance.PERFORMANCE_PF_COL_QUEUE_PUSHES,
+                    Performance.PERFORMANCE_PF_COL_QUEUE_DECREASE_KEYS,
+                    Performance.PERFORMANCE_PF_COL_QUEUE_POPS,
+                    Performance.PERFORMANCE_PF_COL_PRUNED_STOPS,
+                    Performance.PERFORMANCE_PF_COL_CACHE_HITS,
+                    Performance.PERFORMANCE_PF_COL_CACHE_MISSES,
+                    Performance.PERFORMANCE_PF_COL_CACHE_EVICTIONS]:
             self.performance_pf_dict[key].append(perf_dict[key])
 
         # convert milliseconds time to timedeltas
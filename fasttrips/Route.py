@@ -886,12 +886,13 @@ class Route(object):
         # rename price to fare
         trip_links_df.rename(columns={Route.FARE_ATTR_COLUMN_PRICE:Assignment.SIM_COL_PAX_FARE}, inplace=True)
 
+        # reorder columns; they're missing if nothing matched, as for a chunk of walk-only trips
+        trip_links_df = trip_links_df.reindex(columns=orig_columns + fare_columns + [Route.FARE_ATTR_COLUMN_TRANSFERS, Route.FARE_ATTR_COLUMN_TRANSFER_DURATION])
+        trip_links_df[Assignment.SIM_COL_PAX_FARE_PERIOD] = trip_links_df[Assignment.SIM_COL_PAX_FARE_PERIOD].astype(object)
+
         # join fails mean 0
         trip_links_df.fillna(value={Assignment.SIM_COL_PAX_FARE:0.0}, inplace=True)
 
-        # reorder columns
-        trip_links_df = trip_links_df[orig_columns + fare_columns + [Route.FARE_ATTR_COLUMN_TRANSFERS, Route.FARE_ATTR_COLUMN_TRANSFER_DURATION]]
-
         FastTripsLogger.debug("trip_links_df (%d):\n%s" % (len(trip_links_df), str(trip_links_df.head())))
 
         # make sure we didn't lose or add any
@@ -30,7 +30,7 @@ def run_setup(input_network_dir,
               run_config,
               iters,
               output_dir,
-              pathfinding_type  = 'stochastic',
+              pathfinding_type  = None,
               input_functions   = None,
               output_folder     = None,
               trace_only        = False,
@@ -49,7 +49,7 @@ def run_setup(input_network_dir,
         iters -- number of global iterations, integer (required)
         output_dir -- where to put the output folder (required). Will be created if it doesn't already exist.
 
-        pathfinding_type -- one of ['stochastic','deterministic','file'] (default: stochastic)
+        pathfinding_type -- one of ['stochastic','deterministic','connection_scan','file'] (default: the run configuration's)
         input_functions -- the file with user functions
         output_folder -- where to put the outputs.  Will be created if it doesn't already exist.
         trace_only -- will only run demand for the trace.  Will not overwrite other output (default: False)
@@ -60,15 +60,27 @@ def run_setup(input_network_dir,
         pf_iters -- Integer. If specified, will set the maximum number of pathfinding iterations(default: 10)
         dispersion -- theta parameter; essentially the nesting parameter. Good value is between 0.5-1. (default: 1.0)
         max_stop_process_count = maximum number of times you will re-processe a node (default: 20)
+        deduplicate_pathfinding = Boolean. Find one pathset for each group of person trips with identical path specifications and share it.  For performance. (default: False)
+        hyperpath_cache_mb = Float. Memory budget in MB for each path-finding thread's cache of labeled hyperpaths; 0 to turn it off.  For performance. (default: 0)
+        hyperpath_cache_time_bucket_min = Float. Width in minutes of the preferred time buckets that share a cached hyperpath labeling, labeled for the start of the bucket; 0 for exact times. (default: 0)
+        incremental_pathfinding = Boolean. After the first iteration, only re-find pathsets that the supply changes could affect.  For performance. (default: False)
+        pathset_cache_dir = String. Directory for the on-disk pathset cache, which reuses pathfinding results across runs.  For performance. (default: None)
+        lower_bound_pruning = Boolean. In path-finding, skip stops too far from the other end of the trip to be on a useful path.  For performance. (default: False)
+        max_memory_gb = Float. Memory budget in GB for simulation; costing is done for chunks of person trips sized to fit.  0 for no budget. (default: 0)
         capacity -- Boolean to activate capacity constraints (default: False)
+        create_skims -- Boolean. Write zone-to-zone skims after assignment (default: False)
+        skim_start_time -- String, 'HH:MM'. First departure time to skim (default: '5:00')
+        skim_end_time -- String, 'HH:MM'. End of the departure times to skim (default: '10:00')
 
         overlap_variable -- One of ['None','count','distance','time']. Variable to use for overlap penalty calculation (default: 'count')
         overlap_split_transit -- Boolean.Split transit for path overlap penalty calculation (default: False)
+        native_costing -- Boolean. Cost simulated pathset links with the C++ extension's cost model, as in path-finding (default: False)
 
         time_window = Integer. The time window in minutes where a passenger searches for a eminating transit route at each node.
         transfer_fare_ignore_pathfinding = Boolean. In path-finding, suppress trying to adjust fares using transfer rules.  For performance.
         transfer_fare_ignore_pathenum = Boolean. In path-enumeration, suppress trying to adjust fares using transfer rules.  For performance.
         number_of_processes = Integer. Number of processes to run at once (default: 1)
+        number_of_threads = Integer. Number of threads to use for pathfinding in this process; overrides number_of_processes if greater than 1 (default: 1)
         output_pathset_per_sim_iter = Boolean. Output pathsets per simulation iteration?  (default: false)
 
         debug_output_columnns -- boolean to activate extra columns for debugging (default: False)
@@ -95,15 +107,15 @@ def run_setup(input_network_dir,
         FastTripsLogger.fatal(msg)
         raise fasttrips.ConfigurationError("external input", msg)
 
-    if pathfinding_type not in ['deterministic','stochastic','file']:
-        msg = "pathfinding.type [%s] not defined. Expected values: %s" % (pathfinding_type,['deterministic','stochastic','file'])
+    if pathfinding_type and pathfinding_type not in ['deterministic','stochastic','connection_scan','file']:
+        msg = "pathfinding.type [%s] not defined. Expected values: %s" % (pathfinding_type,['deterministic','stochastic','connection_scan','file'])
         FastTripsLogger.fatal(msg)
         raise fasttrips.ConfigurationError("external override", msg)
 
 
     # Setup Output Directory
     if not output_folder:
-        output_folder = "output_%s_iter%d_%s" % (pathfinding_type, iters, "cap" if (kwargs.has_key("capacity") and kwargs["capacity"]==True) else "nocap")
+        output_folder = "output_%s_iter%d_%s" % (pathfinding_type if pathfinding_type else "config", iters, "cap" if (kwargs.has_key("capacity") and kwargs["capacity"]==True) else "nocap")
 
     # don't override full run results
     if trace_only:
@@ -137,6 +149,9 @@ def run_setup(input_network_dir,
     if kwargs.has_key("number_of_processes"):
         fasttrips.Assignment.NUMBER_OF_PROCESSES = kwargs["number_of_processes"]
 
+    if kwargs.has_key("number_of_threads"):
+        fasttrips.Assignment.NUMBER_OF_THREADS = kwargs["number_of_threads"]
+
     if "trace_ids" in kwargs.keys():
         fasttrips.Assignment.TRACE_IDS = kwargs["trace_ids"]
 
@@ -146,13 +161,44 @@ def run_setup(input_network_dir,
             sys.exit(2)
         fasttrips.Assignment.DEBUG_TRACE_ONLY    = True
         fasttrips.Assignment.NUMBER_OF_PROCESSES = 1
+        fasttrips.Assignment.NUMBER_OF_THREADS   = 1
 
-    if "pathfinding_type" in kwargs.keys():
-        fasttrips.Assignment.PATHFINDING_TYPE        = kwargs["pathfinding_type"]
+    if pathfinding_type:
+        fasttrips.Assignment.PATHFINDING_TYPE        = pathfinding_type
 
     if "max_stop_process_count" in kwargs.keys():
         fasttrips.Assignment.STOCH_MAX_STOP_PROCESS_COUNT = kwargs["max_stop_process_count"]
 
+    if "deduplicate_pathfinding" in kwargs.keys():
+        fasttrips.Assignment.DEDUPLICATE_PATHFINDING = kwargs["deduplicate_pathfinding"]
+
+    if "hyperpath_cache_mb" in kwargs.keys():
+        fasttrips.Assignment.HYPERPATH_CACHE_MB = kwargs["hyperpath_cache_mb"]
+
+    if "hyperpath_cache_time_bucket_min" in kwargs.keys():
+        fasttrips.Assignment.HYPERPATH_CACHE_TIME_BUCKET_MIN = kwargs["hyperpath_cache_time_bucket_min"]
+
+    if "incremental_pathfinding" in kwargs.keys():
+        fasttrips.Assignment.INCREMENTAL_PATHFINDING = kwargs["incremental_pathfinding"]
+
+    if "pathset_cache_dir" in kwargs.keys():
+        fasttrips.Assignment.PATHSET_CACHE_DIR = kwargs["pathset_cache_dir"]
+
+    if "lower_bound_pruning" in kwargs.keys():
+        fasttrips.Assignment.LOWER_BOUND_PRUNING = kwargs["lower_bound_pruning"]
+
+    if "max_memory_gb" in kwargs.keys():
+        fasttrips.Assignment.MAX_MEMORY_GB = kwargs["max_memory_gb"]
+
+    if "create_skims" in kwargs.keys():
+        fasttrips.Assignment.CREATE_SKIMS = kwargs["create_skims"]
+
+    if "skim_start_time" in kwargs.keys():
+        fasttrips.Assignment.SKIM_START_TIME = datetime.datetime.strptime(kwargs["skim_start_time"], '%H:%M')
+
+    if "skim_end_time" in kwargs.keys():
+        fasttrips.Assignment.SKIM_END_TIME   = datetime.datetime.strptime(kwargs["skim_end_time"], '%H:%M')
+
     if "debug_output_columns" in kwargs.keys():
         fasttrips.Assignment.DEBUG_OUTPUT_COLUMNS = kwargs["debug_output_columns"]
 
@@ -166,6 +212,9 @@ def run_setup(input_network_dir,
     if "overlap_split_transit" in kwargs.keys():
         fasttrips.PathSet.OVERLAP_SPLIT_TRANSIT  = kwargs["overlap_split_transit"]
 
+    if "native_costing" in kwargs.keys():
+        fasttrips.PathSet.NATIVE_COSTING         = kwargs["native_costing"]
+
     if "transfer_fare_ignore_pathfinding" in kwargs.keys():
         fasttrips.Assignment.TRANSFER_FARE_IGNORE_PATHFINDING = kwargs["transfer_fare_ignore_pathfinding"]
 
@@ -215,6 +264,26 @@ def run_fasttrips(**kwargs):
     return r
 
 
+def run_recosting(pathset_dir, weights_files, **kwargs):
+    """
+    Wrapper function to set up fast-trips and re-cost the pathsets found by a previous run in
+    *pathset_dir* with each of the pathweight files in *weights_files*, without finding paths.
+    See :py:meth:`fasttrips.FastTrips.run_recosting`.
+
+    Other parameters are as for :py:func:`run_setup`; *input_weights* defaults to the first weights file.
+    """
+    if "input_weights" not in kwargs.keys():
+        kwargs["input_weights"] = weights_files[0]
+
+    # instantiate and read configuration
+    ft = run_setup(**kwargs)
+    # Read the networks and demand
+    ft.read_input_files()
+    # Re-cost with each set of weights
+    r = ft.run_recosting(fasttrips.Assignment.OUTPUT_DIR, pathset_dir, weights_files)
+    return r
+
+
 USAGE = r"""
 
   Run Fast-Trips from the command line with required inputs as command line parameters.
@@ -243,7 +312,7 @@ def main():
     parser.add_argument('--overlap_split_transit',            action='store_true', help="Split transit for path overlap penalty calculation")
     parser.add_argument('--transfer_fare_ignore_pathfinding', action='store_true', help="In path-finding, suppress trying to adjust fares using transfer rules.  For performance.")
     parser.add_argument('--transfer_fare_ignore_pathenum',    action='store_true', help="In path-enumeration, suppress trying to adjust fares using transfer rules.  For performance.")
-    parser.add_argument("pathfinding_type",  choices=['deterministic','stochastic','file'], help="Type of pathfinding")
+    parser.add_argument("pathfinding_type",  choices=['deterministic','stochastic','connection_scan','file'], help="Type of pathfinding")
     parser.add_argument("iters",             type=int,  help="Number of iterations to run")
     parser.add_argument("run_config",        type=str,  help="The run configuration file")
     parser.add_argument("input_network_dir", type=str,  help="Location of the input network")
@@ -0,0 +1,136 @@
+__copyright__ = "Copyright 2016 Contributing Entities"
+__license__   = """
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+import _fasttrips
+
+from .Assignment import Assignment
+from .Logger     import FastTripsLogger
+from .TAZ        import TAZ
+
+
+class Skimming:
+    """
+    Skimming class.  Creates zone-to-zone skims for the departure times from
+    :py:attr:`Assignment.SKIM_START_TIME` up to :py:attr:`Assignment.SKIM_END_TIME`, every
+    :py:attr:`Assignment.SKIM_SAMPLE_INTERVAL` minutes, for the user class, purpose, modes
+    and value of time configured by :py:attr:`Assignment.SKIM_USER_CLASS` and the like.
+
+    Rather than labeling from each origin for each destination and departure time, the extension
+    labels the stops from each origin once per departure time with the stochastic (hyperpath)
+    labeling, then finishes the labels to each destination (see PathFinder::findSkims).  The skims
+    are for the least generalized cost path enumerated from each hyperpath, and ``cost`` is that
+    path's generalized cost.  Each skim is the average over the departure times for which there
+    is a path; zone pairs without any are NaN.
+
+    The skims are written as memory-mapped NumPy arrays (one ``.npy`` file per skim, indexed by
+    origin and destination in the order of :py:attr:`Skimming.OUTPUT_SKIM_ZONES_FILE`), so they
+    can be read with ``numpy.load(filename, mmap_mode='r')`` without reading them all into memory.
+    """
+    #: The skims, in the order the extension returns them
+    SKIMS = ["ivt", "wait", "walk", "transfers", "fare", "cost"]
+
+    #: Skim output file, by skim name
+    OUTPUT_SKIM_FILE_TEMPLATE   = "skim_%s.npy"
+    #: Skim zones output file: the TAZ for each skim index
+    OUTPUT_SKIM_ZONES_FILE      = "skim_zones.csv"
+
+    #: Skim zones column: index into the skims
+    SKIM_ZONES_COLUMN_INDEX     = "skim_index"
+    #: Skim zones column: TAZ id
+    SKIM_ZONES_COLUMN_TAZ       = TAZ.WALK_ACCESS_COLUMN_TAZ
+    #: Skim zones column: TAZ numeric id
+    SKIM_ZONES_COLUMN_TAZ_NUM   = TAZ.WALK_ACCESS_COLUMN_TAZ_NUM
+
+    @staticmethod
+    def get_skim_zones(tazs):
+        """
+        Returns a :py:class:`pandas.DataFrame` of the TAZs with walk or drive access links, with columns
+        :py:attr:`Skimming.SKIM_ZONES_COLUMN_INDEX`, :py:attr:`Skimming.SKIM_ZONES_COLUMN_TAZ` and
+        :py:attr:`Skimming.SKIM_ZONES_COLUMN_TAZ_NUM`, in numeric TAZ id order.
+        """
+        zones_df = tazs.walk_access_df[[TAZ.WALK_ACCESS_COLUMN_TAZ, TAZ.WALK_ACCESS_COLUMN_TAZ_NUM]]
+        if tazs.has_drive_access:
+            drive_zones_df = tazs.drive_access_df[[TAZ.DRIVE_ACCESS_COLUMN_TAZ, TAZ.DRIVE_ACCESS_COLUMN_TAZ_NUM]]
+            drive_zones_df.columns = [TAZ.WALK_ACCESS_COLUMN_TAZ, TAZ.WALK_ACCESS_COLUMN_TAZ_NUM]
+            zones_df = pd.concat([zones_df, drive_zones_df], axis=0)
+
+        zones_df = zones_df.drop_duplicates().sort_values(by=TAZ.WALK_ACCESS_COLUMN_TAZ_NUM).reset_index(drop=True)
+        zones_df.rename(columns={TAZ.WALK_ACCESS_COLUMN_TAZ    :Skimming.SKIM_ZONES_COLUMN_TAZ,
+                                 TAZ.WALK_ACCESS_COLUMN_TAZ_NUM:Skimming.SKIM_ZONES_COLUMN_TAZ_NUM}, inplace=True)
+        zones_df[Skimming.SKIM_ZONES_COLUMN_INDEX] = zones_df.index
+        return zones_df[[Skimming.SKIM_ZONES_COLUMN_INDEX, Skimming.SKIM_ZONES_COLUMN_TAZ, Skimming.SKIM_ZONES_COLUMN_TAZ_NUM]]
+
+    @staticmethod
+    def get_skim_times():
+        """
+        Returns the departure times to skim, in minutes after midnight, as a numpy array.
+        """
+        start_min = Assignment.SKIM_START_TIME.hour*60.0 + Assignment.SKIM_START_TIME.minute
+        end_min   = Assignment.SKIM_END_TIME.hour*60.0   + Assignment.SKIM_END_TIME.minute
+        return np.arange(start_min, end_min, Assignment.SKIM_SAMPLE_INTERVAL, dtype=np.float64)
+
+    @staticmethod
+    def create_skims(output_dir, FT, veh_trips_df):
+        """
+        Creates the skims for the network with the given vehicle trips, writing them and the
+        skim zones to *output_dir*.
+
+        Returns a dictionary of skim name to the memory-mapped skim.
+        """
+        zones_df   = Skimming.get_skim_zones(FT.tazs)
+        skim_times = Skimming.get_skim_times()
+        taz_nums   = zones_df[Skimming.SKIM_ZONES_COLUMN_TAZ_NUM].values.astype(np.int32)
+        num_zones  = len(taz_nums)
+        FastTripsLogger.info("Skimming %d zones for %d departure times from %s to %s" %
+                             (num_zones, len(skim_times), Assignment.SKIM_START_TIME.strftime('%H:%M'),
+                              Assignment.SKIM_END_TIME.strftime('%H:%M')))
+
+        zones_df.to_csv(os.path.join(output_dir, Skimming.OUTPUT_SKIM_ZONES_FILE), index=False)
+
+        skims = {}
+        for skim_name in Skimming.SKIMS:
+            skims[skim_name] = np.lib.format.open_memmap(os.path.join(output_dir, Skimming.OUTPUT_SKIM_FILE_TEMPLATE % skim_name),
+                                                         mode="w+", dtype=np.float64, shape=(num_zones, num_zones))
+
+        # the skims use this process's extension, with the supply as it was at the end of assignment
+        Assignment.initialize_fasttrips_extension(0, output_dir, veh_trips_df)
+        Assignment.set_fasttrips_bump_wait(Assignment.bump_wait_df)
+
+        num_threads = Assignment.NUMBER_OF_THREADS
+        if num_threads < 1:
+            num_threads = multiprocessing.cpu_count()
+
+        # origins go to the extension in chunks, so only a chunk of skim rows is in memory at once
+        chunk_size = max(Assignment.PATHFINDING_CHUNK_SIZE, num_threads)
+        for chunk_start in range(0, num_zones, chunk_size):
+            chunk_end  = min(chunk_start + chunk_size, num_zones)
+            skim_chunk = _fasttrips.find_skims(num_threads, 0,
+                                               Assignment.SKIM_USER_CLASS, Assignment.SKIM_PURPOSE,
+                                               Assignment.SKIM_ACCESS_MODE, Assignment.SKIM_TRANSIT_MODE,
+                                               Assignment.SKIM_EGRESS_MODE, Assignment.SKIM_VALUE_OF_TIME,
+                                               taz_nums[chunk_start:chunk_end], taz_nums, skim_times)
+            for skim_num, skim_name in enumerate(Skimming.SKIMS):
+                skims[skim_name][chunk_start:chunk_end, :] = skim_chunk[:, :, skim_num]
+            FastTripsLogger.info(" %6d / %6d origins skimmed" % (chunk_end, num_zones))
+
+        for skim_name in Skimming.SKIMS:
+            skims[skim_name].flush()
+            FastTripsLogger.info("Wrote %s" % os.path.join(output_dir, Skimming.OUTPUT_SKIM_FILE_TEMPLATE % skim_name))
+        return skims
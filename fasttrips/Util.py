@@ -59,9 +59,13 @@ class Util:
     ]
     DROP_PATHFINDING_COLUMNS = [
         # pathfinding debugging
-        "pf_iteration","pf_A_time","pf_B_time","pf_linktime","pf_linkcost","pf_linkdist","pf_waittime","pf_linkfare","pf_cost","pf_fare","pf_initcost","pf_initfare"
+        "pf_iteration","pf_pathfinding_iteration","pf_A_time","pf_B_time","pf_linktime","pf_linkcost","pf_linkdist","pf_waittime","pf_linkfare","pf_cost","pf_fare","pf_initcost","pf_initfare"
     ]
 
+    #: Estimated working memory, in bytes per input row, for each stage that's chunked via :py:meth:`Util.get_chunk_rows`.
+    #: These only go up, when :py:meth:`Util.record_chunk_memory` sees the process grow by more.
+    CHUNK_BYTES_PER_ROW = {}
+
     @staticmethod
     def add_numeric_column(input_df, id_colname, numeric_newcolname):
         """
@@ -398,6 +402,46 @@ class Util:
             return "%.1f MB" % (bytes/(1000.0*1000.0))
         return "%.1f GB" % (bytes/(1000.0*1000.0*1000.0))
 
+    @staticmethod
+    def get_chunk_rows(stage, input_df, max_memory_gb, working_copies):
+        """
+        Returns how many rows of input_df the given stage should process at a time to stay within max_memory_gb.
+
+        The working memory per row starts at working_copies times the size of a row of input_df (from a sample
+        of rows), and is raised by :py:meth:`Util.record_chunk_memory`.  A chunk gets what's left of the budget
+        after the current process memory use -- but never less than a tenth of the whole budget, so running
+        over budget slows things down rather than grinding them to a halt.
+        """
+        if stage not in Util.CHUNK_BYTES_PER_ROW:
+            sample_df = input_df.head(1000)
+            row_bytes = sample_df.memory_usage(index=True, deep=True).sum()/float(max(len(sample_df),1))
+            Util.CHUNK_BYTES_PER_ROW[stage] = working_copies*row_bytes
+            FastTripsLogger.debug("get_chunk_rows() %s: estimating %.1f bytes per row" % (stage, Util.CHUNK_BYTES_PER_ROW[stage]))
+
+        budget_bytes    = max_memory_gb*1000.0*1000.0*1000.0
+        mem_use_bytes   = Util.get_process_mem_use_bytes()
+        available_bytes = budget_bytes - max(mem_use_bytes, 0)
+        if available_bytes < 0.1*budget_bytes:
+            FastTripsLogger.warn("%s: process memory use %s is close to or over the budget of %.1f GB" % (stage, Util.get_process_mem_use_str(), max_memory_gb))
+            available_bytes = 0.1*budget_bytes
+
+        return max(int(available_bytes/Util.CHUNK_BYTES_PER_ROW[stage]), 1)
+
+    @staticmethod
+    def record_chunk_memory(stage, num_rows, mem_before_bytes):
+        """
+        Given the process memory use in bytes from before the given stage processed a chunk of num_rows rows,
+        raises the stage's working memory estimate for :py:meth:`Util.get_chunk_rows` if the process grew by more than that.
+        """
+        mem_after_bytes = Util.get_process_mem_use_bytes()
+        if mem_before_bytes < 0 or mem_after_bytes < 0 or num_rows == 0:
+            return
+
+        bytes_per_row = (mem_after_bytes - mem_before_bytes)/float(num_rows)
+        if bytes_per_row > Util.CHUNK_BYTES_PER_ROW[stage]:
+            FastTripsLogger.debug("record_chunk_memory() %s: raising estimate from %.1f to %.1f bytes per row" % (stage, Util.CHUNK_BYTES_PER_ROW[stage], bytes_per_row))
+            Util.CHUNK_BYTES_PER_ROW[stage] = bytes_per_row
+
     @staticmethod
     def merge_two_dicts(x, y):
         """A helper method for Python 2.7 to 'zip' two dictionary objects
@@ -437,22 +481,23 @@ class Util:
         """
         from fasttrips import PathSet
 
-        # default is constant (constant weight)
-        df[result_col] = df['var_value']*df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE]
-
-        if PathSet.EXP_GROWTH_MODEL in df[PathSet.WEIGHTS_GROWTH_TYPE].values:
-            df.loc[df[PathSet.WEIGHTS_GROWTH_TYPE] == PathSet.EXP_GROWTH_MODEL,  result_col] = \
-                Util.exponential_integration(df['var_value'], df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE])
-
         if PathSet.LOGARITHMIC_GROWTH_MODEL in df[PathSet.WEIGHTS_GROWTH_TYPE].values:
             assert {'var_value', PathSet.WEIGHTS_GROWTH_LOG_BASE}.issubset(df), "Logarithmic pathweight growth_type formula specified. Missing var_value, or growth_log_base."
-            df.loc[df[PathSet.WEIGHTS_GROWTH_TYPE] == PathSet.LOGARITHMIC_GROWTH_MODEL, result_col] = \
-                Util.logarithmic_integration(df['var_value'], df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE], df[PathSet.WEIGHTS_GROWTH_LOG_BASE])
 
         if PathSet.LOGISTIC_GROWTH_MODEL in df[PathSet.WEIGHTS_GROWTH_TYPE].values:
             assert {'var_value', PathSet.WEIGHTS_GROWTH_LOGISTIC_MAX, PathSet.WEIGHTS_GROWTH_LOGISTIC_MID}.issubset(df), "Logistic pathweight growth_type formula specified. Missing var_value, growth_logistic_max, or growth_logistic_mid."
-            df.loc[df[PathSet.WEIGHTS_GROWTH_TYPE] == PathSet.LOGISTIC_GROWTH_MODEL, result_col] = \
-                Util.logistic_integration(df['var_value'], df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE], df[PathSet.WEIGHTS_GROWTH_LOGISTIC_MAX], df[PathSet.WEIGHTS_GROWTH_LOGISTIC_MID])
+
+        growth_params = []
+        for colname in [PathSet.WEIGHTS_GROWTH_LOG_BASE, PathSet.WEIGHTS_GROWTH_LOGISTIC_MAX, PathSet.WEIGHTS_GROWTH_LOGISTIC_MID]:
+            if colname in df:
+                growth_params.append(df[colname].values.astype(np.float64))
+            else:
+                growth_params.append(np.full(len(df), np.nan))
+
+        df[result_col] = Util.calculate_pathweight_cost_values(df['var_value'].values.astype(np.float64),
+                                                               df[PathSet.WEIGHTS_COLUMN_WEIGHT_VALUE].values.astype(np.float64),
+                                                               df[PathSet.WEIGHTS_GROWTH_TYPE].values,
+                                                               *growth_params)
 
         # TODO: option: make these more subtle?
         # missed_xfer has huge cost
@@ -471,6 +516,32 @@ class Util:
             df.loc[ df[result_col] < 0, result_col ] = 0.0
 
 
+    @staticmethod
+    def calculate_pathweight_cost_values(var_value, weight_value, growth_type, log_base, logistic_max, logistic_mid):
+        """
+        Returns the weighted costs as a :py:class:`numpy.ndarray` given :py:class:`numpy.ndarray` instances of
+        the values to weight, the weights and their growth types.  The log base is used for logarithmic growth
+        and the logistic max and mid for logistic growth; any other growth type is constant.
+        """
+        from fasttrips import PathSet
+
+        # default is constant (constant weight)
+        cost = var_value*weight_value
+
+        growth = (growth_type == PathSet.EXP_GROWTH_MODEL)
+        if growth.any():
+            cost[growth] = Util.exponential_integration(var_value[growth], weight_value[growth])
+
+        growth = (growth_type == PathSet.LOGARITHMIC_GROWTH_MODEL)
+        if growth.any():
+            cost[growth] = Util.logarithmic_integration(var_value[growth], weight_value[growth], log_base[growth])
+
+        growth = (growth_type == PathSet.LOGISTIC_GROWTH_MODEL)
+        if growth.any():
+            cost[growth] = Util.logistic_integration(var_value[growth], weight_value[growth], logistic_max[growth], logistic_mid[growth])
+
+        return cost
+
     @staticmethod
     def exponential_integration(penalty_min, growth_rate):
         """
@@ -19,9 +19,12 @@ from .FastTrips   import FastTrips
 from .Logger      import FastTripsLogger, setupLogging
 from .Passenger   import Passenger
 from .PathSet     import PathSet
+from .PathSetCache import PathSetCache
+from .PathSetStore import PathSetStore
 from .Performance import Performance
 from .Route       import Route
 from .Run         import run_fasttrips, main
+from .Skimming    import Skimming
 from .Stop        import Stop
 from .TAZ         import TAZ
 from .Transfer    import Transfer
@@ -34,8 +37,11 @@ __all__ = [
     'FastTripsLogger','setupLogging',
     'Passenger',
     'PathSet',
+    'PathSetCache',
+    'PathSetStore',
     'Route',
     'Run',
+    'Skimming',
     'Stop',
     'TAZ',
     'Trip',
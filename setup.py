@@ -40,13 +40,16 @@ setup(name          = 'fasttrips',
                         'scripts/run_example.py'],
       ext_modules   = [Extension('_fasttrips',
                                  sources=['src/fasttrips.cpp',
+                                          'src/attributes.cpp',
                                           'src/hyperlink.cpp',
+                                          'src/hyperpath_cache.cpp',
+                                          'src/node_pool.cpp',
                                           'src/access_egress.cpp',
                                           'src/path.cpp',
                                           'src/pathfinder.cpp',
                                           ],
                                  include_dirs=[numpy.get_include()],
-                                 libraries=['psapi'] if sys.platform=='win32' else []
+                                 libraries=['psapi'] if sys.platform=='win32' else ['pthread']
                                  )
                       ]
       )
@@ -1,6 +1,8 @@
+#include <algorithm>
 #include <cassert>
 #include <exception>
 #include <stdexcept>
+#include <vector>
 
 // Uncomment for debug detail for LabelStopQueue
 // #define DEBUG_LSQ
@@ -58,146 +60,166 @@ namespace fasttrips {
      * This is to save work; if we mark a stop for processing by adding it onto the queue, and then do that again shortly
      * after, we don't actually want to process twice.  We only want to process it once, for the lowest label.
      *
+     * It's implemented as an indexed d-ary heap over the (stop ID, is trip bool) keys, which are dense, so
+     * pushing a lower label for a stop that's already in the queue moves it up in place (decrease-key)
+     * rather than leaving a stale entry behind to be popped later.
      **/
     class LabelStopQueue
     {
 
     private:
-        // underlying priority queue, contains (label, stop id, is trip bool)
-        std::priority_queue<LabelStop, std::vector<LabelStop>, struct LabelStopCompare> labelstop_priority_queue_;
+        enum {
+            /// Number of children per heap node.  Wider heaps are shallower, which helps since we push more than we pop.
+            ARITY       = 4,
+            /// For LabelStopQueue::heap_pos_, the key isn't in the heap
+            NOT_IN_HEAP = -1
+        };
+
+        /// The heap, contains (label, stop id, is trip bool)
+        std::vector<LabelStop> heap_;
+
+        /// The position in heap_ for each key (2*stop id + is trip), or LabelStopQueue::NOT_IN_HEAP
+        std::vector<int> heap_pos_;
+
+        /// Counters for performance reporting
+        int push_count_;            ///< number of calls to push()
+        int decrease_key_count_;    ///< number of pushes that lowered the label of a stop already in the queue
+        int pop_count_;             ///< number of calls to pop_top()
+
+        static int key(const LabelStop& ls) {
+            return 2*ls.stop_id_ + (ls.is_trip_ ? 1 : 0);
+        }
+
+        /// Does *ls1* come out of the queue before *ls2*?
+        static bool before(const LabelStop& ls1, const LabelStop& ls2) {
+            return LabelStopCompare()(ls2, ls1);
+        }
 
-        typedef struct {
-            double label_;  ///< lowest label for this stop in the labelstop_priority_queue_ (e.g. the only valid one)
-            bool   valid_;  ///< is this stop valid in the queue?
-            int    count_;  ///< number of instances of this stop in the labelstop_priority_queue_ (valid and invalid)
-        } LabelCount;
+        void place(int pos, const LabelStop& ls) {
+            heap_[pos] = ls;
+            heap_pos_[key(ls)] = pos;
+        }
 
-        /** Keep track of the lowest label and the count for each (stop, is_trip bool) */
-        std::map< std::pair<int, bool>, LabelCount> labelstop_map_;
+        void sift_up(int pos) {
+            LabelStop ls = heap_[pos];
+            while (pos > 0) {
+                int parent = (pos - 1)/ARITY;
+                if (!before(ls, heap_[parent])) { break; }
+                place(pos, heap_[parent]);
+                pos = parent;
+            }
+            place(pos, ls);
+        }
 
-        int valid_count_;
+        void sift_down(int pos) {
+            LabelStop ls = heap_[pos];
+            int       size = (int)heap_.size();
+            while (true) {
+                int first_child = ARITY*pos + 1;
+                if (first_child >= size) { break; }
+
+                int best_child = first_child;
+                int last_child = std::min(first_child + ARITY, size);
+                for (int child = first_child + 1; child < last_child; ++child) {
+                    if (before(heap_[child], heap_[best_child])) { best_child = child; }
+                }
+                if (!before(heap_[best_child], ls)) { break; }
+                place(pos, heap_[best_child]);
+                pos = best_child;
+            }
+            place(pos, ls);
+        }
 
     public:
-        LabelStopQueue() : valid_count_(0) {}
+        /// *num_stops* is a hint for the number of stops; the queue grows if it sees bigger stop IDs.
+        LabelStopQueue(int num_stops = 0) :
+            heap_pos_(2*num_stops, (int)NOT_IN_HEAP), push_count_(0), decrease_key_count_(0), pop_count_(0) {}
         ~LabelStopQueue() {}
 
         void push(const LabelStop& val) {
-            // if the stop is not in here, no problem!
-            std::pair<int,bool> full_stop_id = std::make_pair(val.stop_id_, val.is_trip_);
+            push_count_++;
 
-            if (labelstop_map_.find(full_stop_id) == labelstop_map_.end()) {
-                labelstop_priority_queue_.push(val);
-                LabelCount lc = { val.label_, true, 1 };
-                labelstop_map_[full_stop_id] = lc;
-                valid_count_++;
-                return;
+            int k = key(val);
+            if (k >= (int)heap_pos_.size()) {
+                heap_pos_.resize(k+1, (int)NOT_IN_HEAP);
             }
 
-            // if not valid in the queue, then we've popped out all valid instances from the priority queue so it's like it's not here
-            if (!labelstop_map_[full_stop_id].valid_) {
-                labelstop_priority_queue_.push(val);
-                labelstop_map_[full_stop_id].label_     = val.label_;
-                labelstop_map_[full_stop_id].valid_     = true;
-                labelstop_map_[full_stop_id].count_    += 1;
-                valid_count_++;
+            // if the stop is not in here, no problem!
+            int pos = heap_pos_[k];
+            if (pos == NOT_IN_HEAP) {
+                heap_.push_back(val);
+                sift_up((int)heap_.size() - 1);
                 return;
             }
 
-            // The stop is in the queue, valid.  Look at the label.
-            // If the label is smaller, add this one and invalidate the other
-            if (val.label_ < labelstop_map_[full_stop_id].label_) {
-                labelstop_priority_queue_.push(val);
-                labelstop_map_[full_stop_id].label_ = val.label_;
-                labelstop_map_[full_stop_id].count_ += 1;
-                // no additional valid counts
+            // The stop is in the queue.  Look at the label.
+            // If the label is smaller, replace the other one
+            if (val.label_ < heap_[pos].label_) {
+                heap_[pos].label_ = val.label_;
+                sift_up(pos);
+                decrease_key_count_++;
             }
             // otherwise the label is bigger -- don't add it since the smaller one will cause reprocessing
-            else {
-                // we're ok
-            }
         }
 
-        /** Pop the top *valid* LabelStop */
-        LabelStop pop_top(const std::map<int, Stop>& stop_num_to_stop, bool trace, std::ofstream& trace_file) {
-            // this will crash if labelstop_priority_queue_ is empty.  I'm terrible.
-
-            while (true) {
-                // get the lowest cost stop
-                const LabelStop& ls = labelstop_priority_queue_.top();
-                std::pair<int, bool> full_stop_id = std::make_pair(ls.stop_id_, ls.is_trip_);
-
-                std::map< std::pair<int, bool>, LabelCount>::iterator ls_iter = labelstop_map_.find(full_stop_id);
-
-                // assert we have the count info
-                if (ls_iter == labelstop_map_.end()) {
-                    std::cerr << "LabelStopQueueError FATAL ERROR 1" << std::endl;
-                    throw LabelStopQueueError("FATAL ERROR 1");
-                }
+        /** Pop the top LabelStop */
+        LabelStop pop_top(const std::vector<Stop>& stop_num_to_stop, bool trace, std::ofstream& trace_file) {
+            if (heap_.empty()) {
+                std::cerr << "LabelStopQueueError FATAL ERROR: pop_top() on empty queue" << std::endl;
+                throw LabelStopQueueError("FATAL ERROR: pop_top() on empty queue");
+            }
 
-                // assert that the count is positive
-                if (ls_iter->second.count_ <= 0) {
-                    std::cerr << "LabelStopQueueError FATAL ERROR 2" << std::endl;
-                    throw LabelStopQueueError("FATAL ERROR 2");
-                }
+            LabelStop to_ret = heap_[0];
+            heap_pos_[key(to_ret)] = NOT_IN_HEAP;
+            pop_count_++;
 
-                // if it's not valid then continue
-                if (!ls_iter->second.valid_) {
-                    D_LSQ(
-                        trace_file << "Skipping stop A (" << stop_num_to_stop.find(ls.stop_id_)->second.stop_str_ << "," << ls.is_trip_ << ")";
-                        trace_file << "; valid " << ls_iter->second.valid_;
-                        trace_file << "; count " << ls_iter->second.count_;
-                        trace_file << "; map label " << ls_iter->second.label_;
-                        trace_file << "; priq label " << ls.label_;
-                        trace_file << "; priq size " << labelstop_priority_queue_.size() << std::endl;
-                    );
-                    ls_iter->second.count_ -= 1;
-                    labelstop_priority_queue_.pop();
-                    continue;
-                }
+            LabelStop last = heap_.back();
+            heap_.pop_back();
+            if (!heap_.empty()) {
+                place(0, last);
+                sift_down(0);
+            }
 
-                // this stop id is in the queue as valid
-                // but only the matching label is valid
-                if (ls_iter->second.label_ != ls.label_) {
-                    D_LSQ(
-                        trace_file << "Skipping stop B (" << stop_num_to_stop.find(ls.stop_id_)->second.stop_str_ << "," << ls.is_trip_ << ")";
-                        trace_file << "; valid " << ls_iter->second.valid_;
-                        trace_file << "; count " << ls_iter->second.count_;
-                        trace_file << "; map label " << ls_iter->second.label_;
-                        trace_file << "; priq label " << ls.label_;
-                        trace_file << "; priq size " << labelstop_priority_queue_.size() << std::endl;
-                    );
-                    ls_iter->second.count_ -= 1;
-                    labelstop_priority_queue_.pop();
-                    continue;
-                }
+            D_LSQ(
+                trace_file << "LabelStopQueue returning (" << stop_num_to_stop[to_ret.stop_id_].stop_str_ << "," << to_ret.is_trip_ << ")";
+                trace_file << "; label " << to_ret.label_;
+                trace_file << "; size " << heap_.size() << std::endl;
+            );
+            return to_ret;
+        }
 
-                D_LSQ(
-                    trace_file << "LabelStopQueue returning (" << stop_num_to_stop.find(ls.stop_id_)->second.stop_str_ << "," << ls.is_trip_ << ")";
-                    trace_file << "; valid " << ls_iter->second.valid_;
-                    trace_file << "; count " << ls_iter->second.count_;
-                    trace_file << "; map label " << ls_iter->second.label_;
-                    trace_file << "; priq label " << ls.label_;
-                    trace_file << "; priq size " << labelstop_priority_queue_.size();
-                    trace_file << "; valid count " << valid_count_ << std::endl;
-                );
-                // else the map label is equal to the priority queue one, it's the valid one -- return it
-                LabelStop to_ret = ls;
-                labelstop_priority_queue_.pop();
-                ls_iter->second.valid_  = false; // not valid any longer
-                ls_iter->second.count_ -= 1;     // decrement count
-                valid_count_ -= 1;
-                return to_ret;
+        /// Empties the queue and resets the counters, keeping the memory for the next path search
+        void clear() {
+            for (size_t pos = 0; pos < heap_.size(); ++pos) {
+                heap_pos_[key(heap_[pos])] = NOT_IN_HEAP;
+            }
+            heap_.clear();
+            push_count_         = 0;
+            decrease_key_count_ = 0;
+            pop_count_          = 0;
+        }
 
+        /// Makes room for stop IDs up to num_stops-1
+        void reserve(int num_stops) {
+            if (2*num_stops > (int)heap_pos_.size()) {
+                heap_pos_.resize(2*num_stops, (int)NOT_IN_HEAP);
             }
         }
 
         size_t size() const {
-            return valid_count_;
+            return heap_.size();
         }
 
         bool empty() const {
-            return (valid_count_ == 0);
+            return heap_.empty();
         }
+
+        /// Number of calls to push()
+        int push_count() const { return push_count_; }
+        /// Number of pushes that lowered the label of a stop that was already in the queue
+        int decrease_key_count() const { return decrease_key_count_; }
+        /// Number of calls to pop_top()
+        int pop_count() const { return pop_count_; }
     };
 
 };
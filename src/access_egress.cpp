@@ -111,6 +111,14 @@ namespace fasttrips {
         return map_.upper_bound( AccessEgressLinkKey(taz_id, supply_mode_num, stop_id, 100*24,  100*24));
     }
 
+    void AccessEgressLinks::getStopsForTaz(int taz_id, std::set<int>& stop_ids) const
+    {
+        for (AccessEgressLinkAttr::const_iterator iter = map_.lower_bound( AccessEgressLinkKey(taz_id, supply_mode_num_min_-1, 0, 0, 0) );
+             (iter != map_.end()) && (iter->first.taz_id_ == taz_id); ++iter) {
+            stop_ids.insert(iter->first.stop_id_);
+        }
+    }
+
     /// Accessor
     const Attributes* AccessEgressLinks::getAccessAttributes(int taz_id, int supply_mode_num, int stop_id, double tp_time) const
     {
@@ -7,10 +7,11 @@
 #include <iostream>
 #include <map>
 #include <ostream>
+#include <set>
+
+#include "attributes.h"
 
 namespace fasttrips {
-    /// Generic attributes
-    typedef std::map<std::string, double> Attributes;
 
     /// Key for access egress links map
     struct AccessEgressLinkKey {
@@ -95,6 +96,9 @@ namespace fasttrips {
         AccessEgressLinkAttr::const_iterator lower_bound(int taz_id, int supply_mode_num, int stop_id) const;
         AccessEgressLinkAttr::const_iterator upper_bound(int taz_id, int supply_mode_num, int stop_id) const;
 
+        /// Fills stop_ids with the stops linked to the taz id by any supply mode
+        void getStopsForTaz(int taz_id, std::set<int>& stop_ids) const;
+
         /// accessor
         const Attributes* getAccessAttributes(int taz_id, int supply_mode_num, int stop_id, double tp_time) const;
     };
@@ -0,0 +1,79 @@
+/**
+ * \file attributes.cpp
+ *
+ * Attribute slot registry implementation
+ **/
+
+#include "attributes.h"
+
+namespace fasttrips {
+
+    namespace {
+        /// Names for the fasttrips::AttributeSlot values, in order
+        const char* FIXED_ATTRIBUTE_NAMES[NUM_FIXED_ATTRIBUTES] = {
+            "time_min",
+            "dist",
+            "walk_time_min",
+            "drive_time_min",
+            "elevation_gain",
+            "in_vehicle_time_min",
+            "wait_time_min",
+            "overcap",
+            "at_capacity",
+            "fare",
+            "transfer_penalty",
+            "depart_late_min",
+            "arrive_early_min",
+            "depart_early_min",
+            "arrive_late_min"
+        };
+
+        struct AttributeRegistry {
+            std::map<std::string, int> slots_;
+            std::vector<std::string>   names_;
+
+            AttributeRegistry() {
+                for (int slot = 0; slot < NUM_FIXED_ATTRIBUTES; ++slot) {
+                    slots_[FIXED_ATTRIBUTE_NAMES[slot]] = slot;
+                    names_.push_back(FIXED_ATTRIBUTE_NAMES[slot]);
+                }
+            }
+        };
+
+        AttributeRegistry& registry() {
+            static AttributeRegistry the_registry;
+            return the_registry;
+        }
+    }
+
+    int AttributeIndex::slot(const std::string& name)
+    {
+        AttributeRegistry& reg = registry();
+        std::map<std::string, int>::const_iterator it = reg.slots_.find(name);
+        if (it != reg.slots_.end()) { return it->second; }
+
+        int new_slot = (int)reg.names_.size();
+        reg.slots_[name] = new_slot;
+        reg.names_.push_back(name);
+        return new_slot;
+    }
+
+    int AttributeIndex::find(const std::string& name)
+    {
+        const AttributeRegistry& reg = registry();
+        std::map<std::string, int>::const_iterator it = reg.slots_.find(name);
+        if (it == reg.slots_.end()) { return -1; }
+        return it->second;
+    }
+
+    const std::string& AttributeIndex::name(int slot)
+    {
+        return registry().names_[slot];
+    }
+
+    int AttributeIndex::size()
+    {
+        return (int)registry().names_.size();
+    }
+
+}
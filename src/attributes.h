@@ -0,0 +1,86 @@
+/**
+ * \file attributes.h
+ *
+ * Defines the link attribute storage used for link costs.
+ */
+#include <map>
+#include <string>
+#include <vector>
+
+#ifndef ATTRIBUTES_H
+#define ATTRIBUTES_H
+
+namespace fasttrips {
+
+    /**
+     * Attributes that the path finder sets or reads itself get fixed slots so that
+     * they can be used without looking up the name.  Other attributes (from the network
+     * files or the weights) are given slots after these as they're read.
+     */
+    enum AttributeSlot {
+        ATTR_TIME_MIN               = 0,
+        ATTR_DIST,
+        ATTR_WALK_TIME_MIN,
+        ATTR_DRIVE_TIME_MIN,
+        ATTR_ELEVATION_GAIN,
+        ATTR_IN_VEHICLE_TIME_MIN,
+        ATTR_WAIT_TIME_MIN,
+        ATTR_OVERCAP,
+        ATTR_AT_CAPACITY,
+        ATTR_FARE,
+        ATTR_TRANSFER_PENALTY,
+        ATTR_DEPART_LATE_MIN,
+        ATTR_ARRIVE_EARLY_MIN,
+        ATTR_DEPART_EARLY_MIN,
+        ATTR_ARRIVE_LATE_MIN,
+        NUM_FIXED_ATTRIBUTES
+    };
+
+    /**
+     * Maps attribute names to slots.  New names are only added while reading the
+     * network and weights, so lookups during path finding are read-only.
+     */
+    class AttributeIndex {
+    public:
+        /// Returns the slot for the given attribute name, adding it if it's new.
+        static int slot(const std::string& name);
+        /// Returns the slot for the given attribute name, or -1 if there isn't one.
+        static int find(const std::string& name);
+        /// Returns the name for the given slot.
+        static const std::string& name(int slot);
+        /// Returns the number of slots.
+        static int size();
+    };
+
+    /**
+     * Generic attributes: a numeric value for each attribute slot that's been set.
+     */
+    class Attributes {
+    protected:
+        std::vector<double> values_;
+        std::vector<char>   is_set_;
+
+    public:
+        Attributes() : values_(NUM_FIXED_ATTRIBUTES, 0.0), is_set_(NUM_FIXED_ATTRIBUTES, 0) {}
+
+        /// Is there a value for this slot?
+        bool has(int slot) const { return (slot < (int)is_set_.size()) && is_set_[slot]; }
+        /// Returns the value for this slot.  Assumes has(slot).
+        double get(int slot) const { return values_[slot]; }
+
+        /// Accessor by slot; this sets the attribute if it wasn't already.
+        double& operator[](int slot) {
+            if (slot >= (int)values_.size()) {
+                values_.resize(slot+1, 0.0);
+                is_set_.resize(slot+1, 0);
+            }
+            is_set_[slot] = 1;
+            return values_[slot];
+        }
+        /// Accessor by name; this sets the attribute if it wasn't already.
+        double& operator[](const std::string& name) { return (*this)[AttributeIndex::slot(name)]; }
+    };
+
+}
+
+#endif
@@ -27,17 +27,22 @@ _fasttrips_initialize_parameters(PyObject *self, PyObject *args)
     int        transfer_fare_ignore_pe;
     int        max_num_paths;
     double     min_path_probability;
+    int        lower_bound_pruning;
+    double     hyperpath_cache_mb;
+    double     hyperpath_cache_time_bucket_min;
 
-    if (!PyArg_ParseTuple(args, "dddddidiiiid", &time_window, &bump_buffer, &utils_conversion, &depart_early_allowed_min,
+    if (!PyArg_ParseTuple(args, "dddddidiiiididd", &time_window, &bump_buffer, &utils_conversion, &depart_early_allowed_min,
                                                &arrive_late_allowed_min, &stoch_pathset_size, &stoch_dispersion, 
                                                &stoch_max_stop_process_count, &transfer_fare_ignore_pf, 
-                                               &transfer_fare_ignore_pe, &max_num_paths, &min_path_probability)) {
+                                               &transfer_fare_ignore_pe, &max_num_paths, &min_path_probability,
+                                               &lower_bound_pruning, &hyperpath_cache_mb, &hyperpath_cache_time_bucket_min)) {
         return NULL;
     }
     pathfinder.initializeParameters(time_window, bump_buffer, utils_conversion, depart_early_allowed_min, arrive_late_allowed_min, stoch_pathset_size, 
                                     stoch_dispersion, stoch_max_stop_process_count, 
                                     (transfer_fare_ignore_pf==1), (transfer_fare_ignore_pe==1),
-                                    max_num_paths, min_path_probability);
+                                    max_num_paths, min_path_probability, (lower_bound_pruning==1),
+                                    hyperpath_cache_mb, hyperpath_cache_time_bucket_min);
     Py_RETURN_NONE;
 
 }
@@ -45,39 +50,101 @@ _fasttrips_initialize_parameters(PyObject *self, PyObject *args)
 static PyObject *
 _fasttrips_initialize_supply(PyObject *self, PyObject *args)
 {
-    PyArrayObject *pyo;
     const char* output_dir;
     int proc_num;
-    PyObject *input3, *input4, *input5, *input6;
+    PyObject *input3, *input4;
     if (!PyArg_ParseTuple(args, "siOO", &output_dir, &proc_num,
                           &input3, &input4)) {
         return NULL;
     }
 
     // trip stop times index: trip id, sequence, stop id
-    pyo                 = (PyArrayObject*)PyArray_ContiguousFromObject(input3, NPY_INT32, 2, 2);
-    if (pyo == NULL) return NULL;
-    int* stop_indexes   = (int*)PyArray_DATA(pyo);
-    int num_stop_ind    = PyArray_DIMS(pyo)[0];
-    assert(3 == PyArray_DIMS(pyo)[1]);
+    PyArrayObject *pyo_index = (PyArrayObject*)PyArray_ContiguousFromObject(input3, NPY_INT32, 2, 2);
+    if (pyo_index == NULL) return NULL;
+    int* stop_indexes   = (int*)PyArray_DATA(pyo_index);
+    int num_stop_ind    = PyArray_DIMS(pyo_index)[0];
+    assert(3 == PyArray_DIMS(pyo_index)[1]);
 
     // trip stop times data: arrival time, departure time, shape_dist_traveled, overcap
-    pyo                 = (PyArrayObject*)PyArray_ContiguousFromObject(input4, NPY_DOUBLE, 2, 2);
-    if (pyo == NULL) return NULL;
-    double* stop_times  = (double*)PyArray_DATA(pyo);
-    int num_stop_times  = PyArray_DIMS(pyo)[0];
-    assert(4 == PyArray_DIMS(pyo)[1]);
+    PyArrayObject *pyo_times = (PyArrayObject*)PyArray_ContiguousFromObject(input4, NPY_DOUBLE, 2, 2);
+    if (pyo_times == NULL) { Py_DECREF(pyo_index); return NULL; }
+    double* stop_times  = (double*)PyArray_DATA(pyo_times);
+    int num_stop_times  = PyArray_DIMS(pyo_times)[0];
+    assert(4 == PyArray_DIMS(pyo_times)[1]);
 
     // these better be the same length
     assert(num_stop_ind == num_stop_times);
 
-    // keep them
+    // keep them; the pathfinder copies them
     pathfinder.initializeSupply(output_dir, proc_num,
                                 stop_indexes, stop_times, num_stop_ind);
 
-    if (proc_num <= 1) {
-        std::cout << "RAND_MAX = " << RAND_MAX << std::endl;
+    Py_DECREF(pyo_index);
+    Py_DECREF(pyo_times);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+_fasttrips_update_supply(PyObject *self, PyObject *args)
+{
+    PyObject *input1, *input2;
+    if (!PyArg_ParseTuple(args, "OO", &input1, &input2)) {
+        return NULL;
     }
+
+    // trip stop times index: trip id, sequence, stop id
+    PyArrayObject *pyo_index = (PyArrayObject*)PyArray_ContiguousFromObject(input1, NPY_INT32, 2, 2);
+    if (pyo_index == NULL) return NULL;
+    int* stop_indexes   = (int*)PyArray_DATA(pyo_index);
+    int num_stop_ind    = PyArray_DIMS(pyo_index)[0];
+    assert(3 == PyArray_DIMS(pyo_index)[1]);
+
+    // trip stop times data: arrival time, departure time, shape_dist_traveled, overcap
+    PyArrayObject *pyo_times = (PyArrayObject*)PyArray_ContiguousFromObject(input2, NPY_DOUBLE, 2, 2);
+    if (pyo_times == NULL) { Py_DECREF(pyo_index); return NULL; }
+    double* stop_times  = (double*)PyArray_DATA(pyo_times);
+    int num_stop_times  = PyArray_DIMS(pyo_times)[0];
+    assert(4 == PyArray_DIMS(pyo_times)[1]);
+
+    // these better be the same length
+    assert(num_stop_ind == num_stop_times);
+
+    pathfinder.updateSupply(stop_indexes, stop_times, num_stop_ind);
+
+    Py_DECREF(pyo_index);
+    Py_DECREF(pyo_times);
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+_fasttrips_update_stop_times(PyObject *self, PyObject *args)
+{
+    PyObject *input1, *input2;
+    if (!PyArg_ParseTuple(args, "OO", &input1, &input2)) {
+        return NULL;
+    }
+
+    // changed trip stop times index: trip id, sequence, stop id
+    PyArrayObject *pyo_index = (PyArrayObject*)PyArray_ContiguousFromObject(input1, NPY_INT32, 2, 2);
+    if (pyo_index == NULL) return NULL;
+    int* stop_indexes   = (int*)PyArray_DATA(pyo_index);
+    int num_stop_ind    = PyArray_DIMS(pyo_index)[0];
+    assert(3 == PyArray_DIMS(pyo_index)[1]);
+
+    // their new data: arrival time, departure time, shape_dist_traveled, overcap
+    PyArrayObject *pyo_times = (PyArrayObject*)PyArray_ContiguousFromObject(input2, NPY_DOUBLE, 2, 2);
+    if (pyo_times == NULL) { Py_DECREF(pyo_index); return NULL; }
+    double* stop_times  = (double*)PyArray_DATA(pyo_times);
+    int num_stop_times  = PyArray_DIMS(pyo_times)[0];
+    assert(4 == PyArray_DIMS(pyo_times)[1]);
+
+    // these better be the same length
+    assert(num_stop_ind == num_stop_times);
+
+    pathfinder.updateStopTimes(stop_indexes, stop_times, num_stop_ind);
+
+    Py_DECREF(pyo_index);
+    Py_DECREF(pyo_times);
     Py_RETURN_NONE;
 }
 
@@ -108,20 +175,148 @@ _fasttrips_set_bump_wait(PyObject* self, PyObject *args)
     Py_RETURN_NONE;
 }
 
+/**
+ * Package the given pathsets into columnar numpy arrays, with a row per path and a row per link,
+ * plus a row of performance information per path specification.  Links are ordered from origin
+ * to destination regardless of the path direction.  This is the return value for find_pathset
+ * and find_pathsets_batch.
+ *
+ * Returns (path_ints, path_doubles, link_ints, link_doubles, perf_info) where
+ * - path_ints has columns spec index, path number
+ * - path_doubles has columns cost, fare, probability, initial cost, initial fare
+ * - link_ints has columns spec index, path number, link number, mode, trip id (or mode number for
+ *   non-trip links), A stop id, B stop id, A sequence, B sequence
+ * - link_doubles has columns B time, the other end's departure/arrival time, link time, link fare,
+ *   link cost, link distance.  Times are in minutes after midnight.
+ * - perf_info has columns process number, pathfinding return status, label iterations, labeled stops,
+ *   max stop process count, milliseconds labeling, milliseconds enumerating, working set bytes,
+ *   private usage bytes, memory timestamp, label queue pushes, label queue decrease keys, label queue pops,
+ *   pruned label stops, hyperpath cache hits, hyperpath cache misses and hyperpath cache evictions
+ */
+static PyObject *
+_fasttrips_package_pathsets(const std::vector<fasttrips::PathSpecification>& path_specs,
+                            const std::vector<fasttrips::PathSet>&           pathsets,
+                            const std::vector<int>&                          pf_returnstatuses,
+                            const std::vector<fasttrips::PerformanceInfo>&   perf_infos)
+{
+    // count paths and links
+    npy_intp num_specs = (npy_intp)pathsets.size();
+    npy_intp num_paths = 0;
+    npy_intp num_links = 0;
+    for (npy_intp spec_idx = 0; spec_idx < num_specs; ++spec_idx) {
+        num_paths += (npy_intp)pathsets[spec_idx].size();
+        for (fasttrips::PathSet::const_iterator psi=pathsets[spec_idx].begin(); psi != pathsets[spec_idx].end(); ++psi) {
+            num_links += (npy_intp)psi->first.size();
+        }
+    }
+
+    npy_intp dims[2];
+    dims[0] = num_paths; dims[1] = 2;
+    PyArrayObject *path_ints    = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_INT32);
+    dims[0] = num_paths; dims[1] = 5;
+    PyArrayObject *path_doubles = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_DOUBLE);
+    dims[0] = num_links; dims[1] = 9;
+    PyArrayObject *link_ints    = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_INT32);
+    dims[0] = num_links; dims[1] = 6;
+    PyArrayObject *link_doubles = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_DOUBLE);
+    dims[0] = num_specs; dims[1] = 17;
+    PyArrayObject *perf_info    = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_INT64);
+
+    // these are new so they're contiguous
+    npy_int32  *pi = (npy_int32 *)PyArray_DATA(path_ints);
+    npy_double *pd = (npy_double*)PyArray_DATA(path_doubles);
+    npy_int32  *li = (npy_int32 *)PyArray_DATA(link_ints);
+    npy_double *ld = (npy_double*)PyArray_DATA(link_doubles);
+    npy_int64  *pf = (npy_int64 *)PyArray_DATA(perf_info);
+
+    for (npy_intp spec_idx = 0; spec_idx < num_specs; ++spec_idx) {
+        const fasttrips::PathSpecification& path_spec = path_specs[spec_idx];
+        const fasttrips::PerformanceInfo&   perf      = perf_infos[spec_idx];
+
+        *pf++ = pathfinder.processNumber();
+        *pf++ = pf_returnstatuses[spec_idx];
+        *pf++ = perf.label_iterations_;
+        *pf++ = perf.num_labeled_stops_;
+        *pf++ = perf.max_process_count_;
+        *pf++ = perf.milliseconds_labeling_;
+        *pf++ = perf.milliseconds_enumerating_;
+        *pf++ = perf.workingset_bytes_;
+        *pf++ = perf.privateusage_bytes_;
+        *pf++ = perf.mem_timestamp_;
+        *pf++ = perf.queue_pushes_;
+        *pf++ = perf.queue_decrease_keys_;
+        *pf++ = perf.queue_pops_;
+        *pf++ = perf.pruned_stops_;
+        *pf++ = perf.cache_hits_;
+        *pf++ = perf.cache_misses_;
+        *pf++ = perf.cache_evictions_;
+
+        int path_num = 0;
+        for (fasttrips::PathSet::const_iterator psi=pathsets[spec_idx].begin(); psi != pathsets[spec_idx].end(); ++psi) {
+            const fasttrips::Path& path = psi->first;
+
+            *pi++ = (npy_int32)spec_idx;
+            *pi++ = path_num;
+            *pd++ = path.cost();
+            *pd++ = path.fare();
+            *pd++ = psi->second.probability_;
+            *pd++ = path.initialCost();
+            *pd++ = path.initialFare();
+
+            int path_size = path.size();
+            for (int link_num = 0; link_num < path_size; ++link_num) {
+                // inbound paths are stored from the destination back to the origin
+                int path_idx = path_spec.outbound_ ? link_num : path_size - 1 - link_num;
+                int                         stop_id = path[path_idx].first;
+                const fasttrips::StopState& ss      = path[path_idx].second;
+
+                *li++ = (npy_int32)spec_idx;
+                *li++ = path_num;
+                *li++ = link_num;
+                *li++ = ss.deparr_mode_;
+                *li++ = ss.trip_id_;
+                if (path_spec.outbound_) {
+                    *li++ = stop_id;
+                    *li++ = ss.stop_succpred_;
+                    *li++ = ss.seq_;
+                    *li++ = ss.seq_succpred_;
+                    *ld++ = ss.arrdep_time_;
+                    *ld++ = ss.deparr_time_;
+                } else {
+                    *li++ = ss.stop_succpred_;
+                    *li++ = stop_id;
+                    *li++ = ss.seq_succpred_;
+                    *li++ = ss.seq_;
+                    *ld++ = ss.deparr_time_;
+                    *ld++ = ss.arrdep_time_;
+                }
+                *ld++ = ss.link_time_;
+                *ld++ = ss.link_fare_;
+                *ld++ = ss.link_cost_;
+                *ld++ = ss.link_dist_;
+            }
+            path_num += 1;
+        }
+    }
+
+    // N means the tuple steals our references to the arrays
+    return Py_BuildValue("(NNNNN)", path_ints, path_doubles, link_ints, link_doubles, perf_info);
+}
+
 static PyObject *
 _fasttrips_find_pathset(PyObject *self, PyObject *args)
 {
-    PyArrayObject *pyo;
     fasttrips::PathSpecification path_spec;
-    int   hyperpath_i, outbound_i, trace_i;
+    int   pathfinding_type_i, outbound_i, trace_i;
     char *person_id, *person_trip_id, *user_class, *purpose, *access_mode, *transit_mode, *egress_mode;
-    if (!PyArg_ParseTuple(args, "iiisssssssiiiddi", &path_spec.iteration_, &path_spec.pathfinding_iteration_, &hyperpath_i,
+    if (!PyArg_ParseTuple(args, "iiisssssssiiiddi", &path_spec.iteration_, &path_spec.pathfinding_iteration_, &pathfinding_type_i,
                           &person_id, &person_trip_id, &user_class, &purpose, &access_mode, &transit_mode, &egress_mode,
                           &path_spec.origin_taz_id_, &path_spec.destination_taz_id_,
                           &outbound_i, &path_spec.preferred_time_, &path_spec.value_of_time_, &trace_i)) {
         return NULL;
     }
-    path_spec.hyperpath_      = (hyperpath_i != 0);
+    path_spec.hyperpath_      = (pathfinding_type_i == 1);
+    path_spec.connection_scan_ = (pathfinding_type_i == 2);
     path_spec.outbound_       = (outbound_i  != 0);
     path_spec.trace_          = (trace_i     != 0);
     path_spec.person_id_      = person_id;
@@ -132,72 +327,276 @@ _fasttrips_find_pathset(PyObject *self, PyObject *args)
     path_spec.transit_mode_   = transit_mode;
     path_spec.egress_mode_    = egress_mode;
 
-    fasttrips::PathSet pathset;
-    fasttrips::PerformanceInfo perf_info = { 0, 0, 0, 0, 0, 0};
-    int pf_returnstatus = pathfinder.findPathSet(path_spec, pathset, perf_info);
-
-    // count links
-    int num_links = 0;
-    for (fasttrips::PathSet::const_iterator psi=pathset.begin(); psi != pathset.end(); ++psi) {
-        num_links += (int)psi->first.size();
-    }
-
-    // package for returning.  We'll separate ints and doubles.
-    npy_intp dims_int[2];
-    dims_int[0] = num_links;
-    dims_int[1] = 7; // path_num, stop_id, deparr_mode_, trip_id_, stop_succpred_, seq_, seq_succpred_
-    PyArrayObject *ret_int = (PyArrayObject *)PyArray_SimpleNew(2, dims_int, NPY_INT32);
-
-    npy_intp dims_double[2];
-    dims_double[0] = num_links;
-    dims_double[1] = 8; // label_, deparr_time_, link_time_, link_cost_, link_dist_, cost_, arrdep_time_
-    PyArrayObject *ret_double = (PyArrayObject *)PyArray_SimpleNew(2, dims_double, NPY_DOUBLE);
-
-    // cost, fare, probability, initial cost, initial fare
-    npy_intp dims_paths[2];
-    dims_paths[0] = pathset.size();
-    dims_paths[1] = 5;
-    PyArrayObject *ret_paths = (PyArrayObject*)PyArray_SimpleNew(2, dims_paths, NPY_DOUBLE);
-
-    int ind      = 0;
-    int path_num = 0;
-    for (fasttrips::PathSet::const_iterator psi=pathset.begin(); psi != pathset.end(); ++psi) {
-        const fasttrips::Path& path = psi->first;
-
-        *(npy_double*)PyArray_GETPTR2(ret_paths, path_num, 0) = path.cost();
-        *(npy_double*)PyArray_GETPTR2(ret_paths, path_num, 1) = path.fare();
-        *(npy_double*)PyArray_GETPTR2(ret_paths, path_num, 2) = psi->second.probability_;
-        *(npy_double*)PyArray_GETPTR2(ret_paths, path_num, 3) = path.initialCost();
-        *(npy_double*)PyArray_GETPTR2(ret_paths, path_num, 4) = path.initialFare();
-
-        for (int link_num = 0; link_num < path.size(); ++link_num) {
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 0) = path_num;
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 1) = path[link_num].first;
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 2) = path[link_num].second.deparr_mode_;
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 3) = path[link_num].second.trip_id_;
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 4) = path[link_num].second.stop_succpred_;
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 5) = path[link_num].second.seq_;
-            *(npy_int32*)PyArray_GETPTR2(ret_int, ind, 6) = path[link_num].second.seq_succpred_;
-
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 0) = 0.0; // TODO: label
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 1) = path[link_num].second.deparr_time_;
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 2) = path[link_num].second.link_time_;
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 3) = path[link_num].second.link_fare_;
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 4) = path[link_num].second.link_cost_;
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 5) = path[link_num].second.link_dist_;
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 6) = path[link_num].second.cost_;
-            *(npy_double*)PyArray_GETPTR2(ret_double, ind, 7) = path[link_num].second.arrdep_time_;
-
-            ind += 1;
+    std::vector<fasttrips::PathSpecification> path_specs(1, path_spec);
+    std::vector<fasttrips::PathSet>           pathsets(1);
+    std::vector<fasttrips::PerformanceInfo>   perf_infos(1);
+    std::vector<int>                          pf_returnstatuses(1);
+    pf_returnstatuses[0] = pathfinder.findPathSet(path_spec, pathsets[0], perf_infos[0]);
+
+    return _fasttrips_package_pathsets(path_specs, pathsets, pf_returnstatuses, perf_infos);
+}
+
+/**
+ * Reads the path specifications for a batch from the sequence of path spec strings (person_id, person_trip_id,
+ * user_class, purpose, access_mode, transit_mode, egress_mode), the path spec ints (origin taz id, destination
+ * taz id, outbound, trace) and the path spec doubles (preferred time, value of time).
+ *
+ * Returns false with the python error set if they can't be read.
+ */
+static bool
+_fasttrips_read_path_specs(int iteration, int pathfinding_iteration, int pathfinding_type_i,
+                           PyObject *input_strs, PyObject *input_ints, PyObject *input_doubles,
+                           std::vector<fasttrips::PathSpecification>& path_specs)
+{
+    PyArrayObject *pyo_ints, *pyo_doubles;
+
+    PyObject* spec_strs = PySequence_Fast(input_strs, "path spec strings must be a sequence");
+    if (spec_strs == NULL) return false;
+    Py_ssize_t num_specs = PySequence_Fast_GET_SIZE(spec_strs);
+
+    pyo_ints            = (PyArrayObject*)PyArray_ContiguousFromObject(input_ints, NPY_INT32, 2, 2);
+    if (pyo_ints == NULL) { Py_DECREF(spec_strs); return false; }
+    int* spec_ints      = (int*)PyArray_DATA(pyo_ints);
+    assert(num_specs == PyArray_DIMS(pyo_ints)[0]);
+    assert(4 == PyArray_DIMS(pyo_ints)[1]);
+
+    pyo_doubles         = (PyArrayObject*)PyArray_ContiguousFromObject(input_doubles, NPY_DOUBLE, 2, 2);
+    if (pyo_doubles == NULL) { Py_DECREF(spec_strs); Py_DECREF(pyo_ints); return false; }
+    double* spec_doubles= (double*)PyArray_DATA(pyo_doubles);
+    assert(num_specs == PyArray_DIMS(pyo_doubles)[0]);
+    assert(2 == PyArray_DIMS(pyo_doubles)[1]);
+
+    path_specs.resize(num_specs);
+    for (Py_ssize_t i=0; i<num_specs; ++i) {
+        char *person_id, *person_trip_id, *user_class, *purpose, *access_mode, *transit_mode, *egress_mode;
+        if (!PyArg_ParseTuple(PySequence_Fast_GET_ITEM(spec_strs, i), "sssssss", &person_id, &person_trip_id,
+                              &user_class, &purpose, &access_mode, &transit_mode, &egress_mode)) {
+            Py_DECREF(spec_strs);
+            Py_DECREF(pyo_ints);
+            Py_DECREF(pyo_doubles);
+            return false;
         }
-        path_num += 1;
+        fasttrips::PathSpecification& path_spec = path_specs[i];
+        path_spec.iteration_              = iteration;
+        path_spec.pathfinding_iteration_  = pathfinding_iteration;
+        path_spec.hyperpath_              = (pathfinding_type_i == 1);
+        path_spec.connection_scan_        = (pathfinding_type_i == 2);
+        path_spec.person_id_              = person_id;
+        path_spec.person_trip_id_         = person_trip_id;
+        path_spec.user_class_             = user_class;
+        path_spec.purpose_                = purpose;
+        path_spec.access_mode_            = access_mode;
+        path_spec.transit_mode_           = transit_mode;
+        path_spec.egress_mode_            = egress_mode;
+        path_spec.origin_taz_id_          = spec_ints[4*i];
+        path_spec.destination_taz_id_     = spec_ints[4*i+1];
+        path_spec.outbound_               = (spec_ints[4*i+2] != 0);
+        path_spec.trace_                  = (spec_ints[4*i+3] != 0);
+        path_spec.preferred_time_         = spec_doubles[2*i];
+        path_spec.value_of_time_          = spec_doubles[2*i+1];
+    }
+    Py_DECREF(spec_strs);
+    Py_DECREF(pyo_ints);
+    Py_DECREF(pyo_doubles);
+    return true;
+}
+
+static PyObject *
+_fasttrips_find_pathsets_batch(PyObject *self, PyObject *args)
+{
+    int   iteration, pathfinding_iteration, pathfinding_type_i, num_threads;
+    PyObject *input5, *input6, *input7;
+    if (!PyArg_ParseTuple(args, "iiiiOOO", &iteration, &pathfinding_iteration, &pathfinding_type_i, &num_threads,
+                          &input5, &input6, &input7)) {
+        return NULL;
+    }
+
+    std::vector<fasttrips::PathSpecification> path_specs;
+    if (!_fasttrips_read_path_specs(iteration, pathfinding_iteration, pathfinding_type_i, input5, input6, input7, path_specs)) {
+        return NULL;
+    }
+
+    std::vector<fasttrips::PathSet>         pathsets;
+    std::vector<fasttrips::PerformanceInfo> perf_infos;
+    std::vector<int>                        pf_returnstatuses;
+
+    // the network is read-only while we find paths so let other python threads run
+    Py_BEGIN_ALLOW_THREADS
+    pathfinder.findPathSets(path_specs, pathsets, perf_infos, pf_returnstatuses, num_threads);
+    Py_END_ALLOW_THREADS
+
+    return _fasttrips_package_pathsets(path_specs, pathsets, pf_returnstatuses, perf_infos);
+}
+
+/**
+ * Costs paths that were already found; see fasttrips::PathFinder::calculatePathCosts.
+ *
+ * Takes the path spec strings, ints and doubles as _fasttrips_find_pathsets_batch does, the link ints and
+ * link doubles laid out as it returns them (the fare and cost are ignored), and optionally an array of
+ * fasttrips::NUM_LINK_COST_OVERRIDES link cost overrides per link, NaN where not overridden.
+ *
+ * Returns (link_doubles, path_ints, path_doubles) where
+ * - link_doubles has link cost, link fare for each link
+ * - path_ints has path spec index, first link index for each path
+ * - path_doubles has cost, fare, probability, logsum for each path
+ */
+static PyObject *
+_fasttrips_calculate_costs(PyObject *self, PyObject *args)
+{
+    PyObject *input1, *input2, *input3, *input4, *input5, *input6 = NULL;
+    if (!PyArg_ParseTuple(args, "OOOOO|O", &input1, &input2, &input3, &input4, &input5, &input6)) {
+        return NULL;
     }
 
-    PyObject *returnobj = Py_BuildValue("(OOOiiiiilllll)",ret_int,ret_double,ret_paths, pathfinder.processNumber(), pf_returnstatus,
-                                        perf_info.label_iterations_, perf_info.num_labeled_stops_, perf_info.max_process_count_,
-                                        perf_info.milliseconds_labeling_, perf_info.milliseconds_enumerating_,
-                                        perf_info.workingset_bytes_, perf_info.privateusage_bytes_, perf_info.mem_timestamp_);
-    return returnobj;
+    std::vector<fasttrips::PathSpecification> path_specs;
+    if (!_fasttrips_read_path_specs(0, 0, 0, input1, input2, input3, path_specs)) {
+        return NULL;
+    }
+
+    PyArrayObject *pyo_link_ints    = (PyArrayObject*)PyArray_ContiguousFromObject(input4, NPY_INT32, 2, 2);
+    if (pyo_link_ints == NULL) { return NULL; }
+    PyArrayObject *pyo_link_doubles = (PyArrayObject*)PyArray_ContiguousFromObject(input5, NPY_DOUBLE, 2, 2);
+    if (pyo_link_doubles == NULL) { Py_DECREF(pyo_link_ints); return NULL; }
+    PyArrayObject *pyo_overrides    = NULL;
+    if ((input6 != NULL) && (input6 != Py_None)) {
+        pyo_overrides = (PyArrayObject*)PyArray_ContiguousFromObject(input6, NPY_DOUBLE, 2, 2);
+        if (pyo_overrides == NULL) { Py_DECREF(pyo_link_ints); Py_DECREF(pyo_link_doubles); return NULL; }
+        assert(fasttrips::NUM_LINK_COST_OVERRIDES == PyArray_DIMS(pyo_overrides)[1]);
+    }
+    size_t num_links = (size_t)PyArray_DIMS(pyo_link_ints)[0];
+    assert(9 == PyArray_DIMS(pyo_link_ints)[1]);
+    assert(6 == PyArray_DIMS(pyo_link_doubles)[1]);
+
+    const int*    link_ints      = (const int*   )PyArray_DATA(pyo_link_ints);
+    const double* link_doubles   = (const double*)PyArray_DATA(pyo_link_doubles);
+    const double* link_overrides = (pyo_overrides ? (const double*)PyArray_DATA(pyo_overrides) : NULL);
+
+    std::vector<double> link_costs, link_fares, path_costs, path_fares, path_probabilities, path_logsums;
+    std::vector<int>    path_links;
+
+    // the network is read-only while we cost paths so let other python threads run
+    Py_BEGIN_ALLOW_THREADS
+    pathfinder.calculatePathCosts(path_specs, num_links, link_ints, link_doubles, link_overrides,
+                                  link_costs, link_fares, path_links, path_costs, path_fares, path_probabilities, path_logsums);
+    Py_END_ALLOW_THREADS
+
+    npy_intp num_paths = (npy_intp)path_links.size();
+    npy_intp dims[2];
+    dims[0] = (npy_intp)num_links; dims[1] = 2;
+    PyArrayObject *out_link_doubles = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_DOUBLE);
+    dims[0] = num_paths; dims[1] = 2;
+    PyArrayObject *out_path_ints    = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_INT32);
+    dims[0] = num_paths; dims[1] = 4;
+    PyArrayObject *out_path_doubles = (PyArrayObject*)PyArray_SimpleNew(2, dims, NPY_DOUBLE);
+
+    npy_double *ld = (npy_double*)PyArray_DATA(out_link_doubles);
+    for (size_t link_idx = 0; link_idx < num_links; ++link_idx) {
+        *ld++ = link_costs[link_idx];
+        *ld++ = link_fares[link_idx];
+    }
+    npy_int32  *pi = (npy_int32 *)PyArray_DATA(out_path_ints);
+    npy_double *pd = (npy_double*)PyArray_DATA(out_path_doubles);
+    for (npy_intp path_idx = 0; path_idx < num_paths; ++path_idx) {
+        *pi++ = link_ints[9*path_links[path_idx]];
+        *pi++ = path_links[path_idx];
+        *pd++ = path_costs[path_idx];
+        *pd++ = path_fares[path_idx];
+        *pd++ = path_probabilities[path_idx];
+        *pd++ = path_logsums[path_idx];
+    }
+    Py_DECREF(pyo_link_ints);
+    Py_DECREF(pyo_link_doubles);
+    Py_XDECREF(pyo_overrides);
+
+    // N means the tuple steals our references to the arrays
+    return Py_BuildValue("(NNN)", out_link_doubles, out_path_ints, out_path_doubles);
+}
+
+/**
+ * Zone-to-zone skims; see fasttrips::PathFinder::findSkims.
+ *
+ * Takes the number of threads, outbound (0 to skim from each start TAZ at departure times, 1 to skim to each
+ * start TAZ at arrival times), the user class, purpose, access mode, transit mode and egress mode, the value of
+ * time, and arrays of the start TAZ ids, the end TAZ ids and the skim times.
+ *
+ * Returns a (start TAZ, end TAZ, skim attribute) array of doubles, with the attributes in fasttrips::SkimAttribute order.
+ */
+static PyObject *
+_fasttrips_find_skims(PyObject *self, PyObject *args)
+{
+    fasttrips::PathSpecification path_spec;
+    int   num_threads, outbound_i;
+    char *user_class, *purpose, *access_mode, *transit_mode, *egress_mode;
+    PyObject *input8, *input9, *input10;
+    if (!PyArg_ParseTuple(args, "iisssssdOOO", &num_threads, &outbound_i,
+                          &user_class, &purpose, &access_mode, &transit_mode, &egress_mode, &path_spec.value_of_time_,
+                          &input8, &input9, &input10)) {
+        return NULL;
+    }
+    PyArrayObject *pyo_start = (PyArrayObject*)PyArray_ContiguousFromObject(input8, NPY_INT32, 1, 1);
+    if (pyo_start == NULL) { return NULL; }
+    PyArrayObject *pyo_end   = (PyArrayObject*)PyArray_ContiguousFromObject(input9, NPY_INT32, 1, 1);
+    if (pyo_end   == NULL) { Py_DECREF(pyo_start); return NULL; }
+    PyArrayObject *pyo_times = (PyArrayObject*)PyArray_ContiguousFromObject(input10, NPY_DOUBLE, 1, 1);
+    if (pyo_times == NULL) { Py_DECREF(pyo_start); Py_DECREF(pyo_end); return NULL; }
+
+    int*    start_taz_ids = (int*   )PyArray_DATA(pyo_start);
+    int*    end_taz_ids   = (int*   )PyArray_DATA(pyo_end);
+    double* skim_times    = (double*)PyArray_DATA(pyo_times);
+    std::vector<int>    end_taz_vec(end_taz_ids, end_taz_ids + PyArray_DIMS(pyo_end)[0]);
+    std::vector<double> skim_time_vec(skim_times, skim_times + PyArray_DIMS(pyo_times)[0]);
+
+    path_spec.iteration_             = 0;
+    path_spec.pathfinding_iteration_ = 0;
+    path_spec.hyperpath_             = true;
+    path_spec.connection_scan_       = false;
+    path_spec.outbound_              = (outbound_i != 0);
+    path_spec.trace_                 = false;
+    path_spec.person_id_             = "skim";
+    path_spec.person_trip_id_        = "skim";
+    path_spec.user_class_            = user_class;
+    path_spec.purpose_               = purpose;
+    path_spec.access_mode_           = access_mode;
+    path_spec.transit_mode_          = transit_mode;
+    path_spec.egress_mode_           = egress_mode;
+    path_spec.preferred_time_        = 0;
+
+    std::vector<fasttrips::PathSpecification> path_specs(PyArray_DIMS(pyo_start)[0], path_spec);
+    for (size_t i = 0; i < path_specs.size(); ++i) {
+        path_specs[i].origin_taz_id_      = start_taz_ids[i];
+        path_specs[i].destination_taz_id_ = start_taz_ids[i];
+    }
+    Py_DECREF(pyo_start);
+    Py_DECREF(pyo_end);
+    Py_DECREF(pyo_times);
+
+    std::vector<double> skims;
+
+    // the network is read-only while we skim so let other python threads run
+    Py_BEGIN_ALLOW_THREADS
+    pathfinder.findSkims(path_specs, end_taz_vec, skim_time_vec, skims, num_threads);
+    Py_END_ALLOW_THREADS
+
+    npy_intp dims[3];
+    dims[0] = (npy_intp)path_specs.size();
+    dims[1] = (npy_intp)end_taz_vec.size();
+    dims[2] = fasttrips::NUM_SKIM_ATTRIBUTES;
+    PyArrayObject *skims_array = (PyArrayObject*)PyArray_SimpleNew(3, dims, NPY_DOUBLE);
+    if (!skims.empty()) {
+        std::copy(skims.begin(), skims.end(), (npy_double*)PyArray_DATA(skims_array));
+    }
+    return PyArray_Return(skims_array);
+}
+
+static PyObject *
+_fasttrips_reload_weights(PyObject *self, PyObject *args)
+{
+    const char* weights_dir;
+    if (!PyArg_ParseTuple(args, "s", &weights_dir)) {
+        return NULL;
+    }
+    pathfinder.reloadWeights(weights_dir);
+    Py_RETURN_NONE;
 }
 
 static PyObject *
@@ -211,8 +610,14 @@ _fasttrips_reset(PyObject *self, PyObject *args)
 static PyMethodDef fasttripsMethods[] = {
     {"initialize_parameters",   _fasttrips_initialize_parameters, METH_VARARGS, "Initialize path finding parameters" },
     {"initialize_supply",       _fasttrips_initialize_supply,     METH_VARARGS, "Initialize network supply" },
+    {"update_supply",           _fasttrips_update_supply,         METH_VARARGS, "Update network supply stop times" },
+    {"update_stop_times",       _fasttrips_update_stop_times,     METH_VARARGS, "Update the changed network supply stop times" },
     {"set_bump_wait",           _fasttrips_set_bump_wait,         METH_VARARGS, "Update bump wait"          },
+    {"reload_weights",          _fasttrips_reload_weights,        METH_VARARGS, "Update path weights"       },
     {"find_pathset",            _fasttrips_find_pathset,          METH_VARARGS, "Find trip-based path set"  },
+    {"find_pathsets_batch",     _fasttrips_find_pathsets_batch,   METH_VARARGS, "Find trip-based path sets using threads" },
+    {"find_skims",              _fasttrips_find_skims,            METH_VARARGS, "Find zone-to-zone skims using threads" },
+    {"calculate_costs",         _fasttrips_calculate_costs,       METH_VARARGS, "Cost paths that were already found" },
     {"reset",                   _fasttrips_reset,                 METH_VARARGS, "Reset pathfinder - done"   },
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
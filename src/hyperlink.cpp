@@ -50,6 +50,11 @@ namespace fasttrips {
         stop_id_(0), linkset_trip_(false), linkset_nontrip_(false)
     {}
 
+    // Default constructor with a pool for the links
+    Hyperlink::Hyperlink(NodePool* pool) :
+        stop_id_(0), linkset_trip_(false, pool), linkset_nontrip_(false, pool)
+    {}
+
     // Constructor we should call
     Hyperlink::Hyperlink(int stop_id, bool outbound) :
         stop_id_(stop_id), linkset_trip_(outbound), linkset_nontrip_(outbound)
@@ -441,6 +446,25 @@ namespace fasttrips {
         // don't reset process counts
     }
 
+    void Hyperlink::reset()
+    {
+        const StopStateKey zero_ssk = { 0.0, 0, 0, 0, 0.0 };
+
+        this->clear(true);
+        this->clear(false);
+
+        stop_id_ = 0;
+        LinkSet* linksets[2] = { &linkset_trip_, &linkset_nontrip_ };
+        for (int ls_num = 0; ls_num < 2; ++ls_num) {
+            linksets[ls_num]->latest_dep_earliest_arr_ = 0;
+            linksets[ls_num]->lder_ssk_                = zero_ssk;
+            linksets[ls_num]->sum_exp_cost_            = 0;
+            linksets[ls_num]->hyperpath_cost_          = MAX_COST;
+            linksets[ls_num]->process_count_           = 0;
+            linksets[ls_num]->max_cum_prob_i_          = 0;
+        }
+    }
+
     const StopState& Hyperlink::lowestCostStopState(bool of_trip_links) const
     {
         const LinkSet& linkset = (of_trip_links ? linkset_trip_ : linkset_nontrip_);
@@ -848,11 +872,12 @@ namespace fasttrips {
     const StopState& Hyperlink::chooseState(
         const PathSpecification& path_spec,
         std::ostream& trace_file,
+        PathRandom& path_random,
         const StopState* prev_link) const
     {
         const LinkSet& linkset = (prev_link && !isTrip(prev_link->deparr_mode_) ? linkset_trip_ : linkset_nontrip_);
 
-        int random_num  = rand();
+        int random_num  = path_random.next();
         //printf("INIT: %d, ",random_num);
         if (path_spec.trace_) { trace_file << "random_num " << random_num << " -> "; }
 
@@ -997,7 +1022,7 @@ namespace fasttrips {
         std::ostream& trace_file,
         const PathFinder& pf,
         const FarePeriod& fare_period,
-        const std::map<int, Hyperlink>& stop_states) const
+        const StopStates& stop_states) const
     {
         // if we opted not to do this through configuration, just return the fare
         if (Hyperlink::TRANSFER_FARE_IGNORE_PATHFINDING_) {
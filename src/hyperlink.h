@@ -3,11 +3,14 @@
  *
  * Defines the Hyperlink class that holds the links (stop states) for a stop.
  */
+#include <algorithm>
+#include <deque>
 #include <iostream>
 #include <map>
 #include <set>
 #include <vector>
 
+#include "node_pool.h"
 #include "pathspec.h"
 #include "path.h"
 
@@ -38,9 +41,14 @@ namespace fasttrips {
 
     bool isTrip(const int& mode);
 
-    typedef std::map<StopStateKey, StopState> StopStateMap;
-    // cost to stop state key
-    typedef std::multimap< double, StopStateKey> CostToStopState;
+    class StopStates;
+
+    /// Stop state key to stop state.  Nodes come from the fasttrips::NodePool for the search, if there is one.
+    typedef std::map<StopStateKey, StopState, std::less<StopStateKey>,
+                     PoolAllocator< std::pair<const StopStateKey, StopState> > > StopStateMap;
+    /// Cost to stop state key
+    typedef std::multimap<double, StopStateKey, std::less<double>,
+                          PoolAllocator< std::pair<const double, StopStateKey> > > CostToStopState;
 
     struct LinkSet {
         double          latest_dep_earliest_arr_;  ///< latest departure time from this stop for outbound trips, earliest arrival time to this stop for inbound trips
@@ -53,7 +61,10 @@ namespace fasttrips {
         StopStateMap    stop_state_map_;           ///< the links.  (or a set of stop states where compare means the key is unique)
         CostToStopState cost_map_;                 ///< multimap of cost -> stop state pointers into the stop_state_set_ above
 
-        LinkSet(bool outbound) : latest_dep_earliest_arr_(0), sum_exp_cost_(0), hyperpath_cost_(MAX_COST), process_count_(0) {}
+        LinkSet(bool outbound, NodePool* pool = NULL) :
+            latest_dep_earliest_arr_(0), sum_exp_cost_(0), hyperpath_cost_(MAX_COST), process_count_(0),
+            stop_state_map_(std::less<StopStateKey>(), StopStateMap::allocator_type(pool)),
+            cost_map_(std::less<double>(), CostToStopState::allocator_type(pool)) {}
     } ;
 
     class PathFinder;
@@ -105,6 +116,8 @@ namespace fasttrips {
 
         /// Default constructor
         Hyperlink();
+        /// Default constructor with a pool for the links
+        explicit Hyperlink(NodePool* pool);
         /// Constructor we should call
         Hyperlink(int stop_id, bool outbound);
         /// Destructor
@@ -132,6 +145,9 @@ namespace fasttrips {
         /// Clears data
         void clear(bool of_trip_links);
 
+        /// Clears everything, leaving the hyperlink as if it had just been default constructed (but keeping its pool)
+        void reset();
+
         /// Returns the lowest cost stop state (link) in this hyperlink
         /// If for_trip_link, lowest trip link. Otherwise, lowest non-trip link.
         const StopState& lowestCostStopState(bool of_trip_links) const;
@@ -187,6 +203,7 @@ namespace fasttrips {
          */
         const StopState& chooseState(const PathSpecification& path_spec,
                                      std::ostream& trace_file,
+                                     PathRandom& path_random,
                                      const StopState* prev_link = NULL) const;
 
         /**
@@ -216,14 +233,108 @@ namespace fasttrips {
                                    std::ostream& trace_file,
                                    const PathFinder& pf,
                                    const FarePeriod& fare_period,
-                                   const std::map<int, Hyperlink>& stop_states) const;
+                                   const StopStates& stop_states) const;
 
     };
 
     /**
      * The path finding algorithm stores StopState data in this structure.
+     *
+     * Stop ids are dense, so rather than a std::map this keeps a vector indexed by stop id
+     * giving the slot of the stop's Hyperlink in a deque.  The deque keeps references stable
+     * as stops are added, and clearing only resets the slots and the Hyperlinks that were used,
+     * keeping the Hyperlinks around so the structure can be reused from one path specification
+     * to the next.
+     *
+     * Iterators point to (stop id, Hyperlink) pairs like the std::map this replaced.
      */
-    typedef std::map<int, Hyperlink> StopStates;
+    class StopStates
+    {
+    protected:
+        typedef std::deque< std::pair<int, Hyperlink> > HyperlinkStorage;
+
+        /// stop id -> index into hyperlinks_, or -1 if the stop has no state
+        std::vector<int> slots_;
+        /// (stop id, Hyperlink) in the order they were added.  Only the first num_used_ are in use.
+        HyperlinkStorage hyperlinks_;
+        /// Number of hyperlinks_ in use
+        size_t           num_used_;
+        /// Pool for the Hyperlinks' links
+        NodePool*        pool_;
+
+    public:
+        typedef HyperlinkStorage::iterator       iterator;
+        typedef HyperlinkStorage::const_iterator const_iterator;
+
+        StopStates(NodePool* pool = NULL) : num_used_(0), pool_(pool) {}
+
+        /// Size the slot index for stop ids up to num_stops-1
+        void reserve(int num_stops) {
+            if (num_stops > (int)slots_.size()) { slots_.resize(num_stops, -1); }
+        }
+
+        iterator       end()       { return hyperlinks_.end(); }
+        const_iterator end() const { return hyperlinks_.end(); }
+
+        iterator find(int stop_id) {
+            if ((stop_id < 0) || (stop_id >= (int)slots_.size()) || (slots_[stop_id] < 0)) { return hyperlinks_.end(); }
+            return hyperlinks_.begin() + slots_[stop_id];
+        }
+        const_iterator find(int stop_id) const {
+            if ((stop_id < 0) || (stop_id >= (int)slots_.size()) || (slots_[stop_id] < 0)) { return hyperlinks_.end(); }
+            return hyperlinks_.begin() + slots_[stop_id];
+        }
+
+        /// Returns the Hyperlink for the given stop, default constructing it if there isn't one.
+        Hyperlink& operator[](int stop_id) {
+            reserve(stop_id+1);
+            if (slots_[stop_id] < 0) {
+                slots_[stop_id] = (int)num_used_;
+                if (num_used_ == hyperlinks_.size()) {
+                    hyperlinks_.push_back(std::make_pair(stop_id, Hyperlink(pool_)));
+                } else {
+                    // reuse one that was cleared
+                    hyperlinks_[num_used_].first = stop_id;
+                }
+                ++num_used_;
+            }
+            return hyperlinks_[slots_[stop_id]].second;
+        }
+
+        size_t size() const { return num_used_; }
+
+        /// Removes the Hyperlink for the given stop, if there is one.  This is cheapest for the most recently added stop.
+        void erase(int stop_id) {
+            if (find(stop_id) == end()) { return; }
+            size_t slot = (size_t)slots_[stop_id];
+            size_t last = num_used_ - 1;
+            if (slot != last) {
+                std::swap(hyperlinks_[slot], hyperlinks_[last]);
+                slots_[hyperlinks_[slot].first] = (int)slot;
+            }
+            slots_[stop_id] = -1;
+            hyperlinks_[last].second.reset();
+            num_used_ = last;
+        }
+
+        /// Rough number of bytes used, counting the Hyperlinks and a map node in each LinkSet map for each link
+        size_t estimateBytes() const {
+            size_t link_bytes = sizeof(StopStateMap::value_type) + sizeof(CostToStopState::value_type) + 8*sizeof(void*);
+            size_t bytes      = slots_.size()*sizeof(int) + hyperlinks_.size()*sizeof(HyperlinkStorage::value_type);
+            for (size_t slot = 0; slot < num_used_; ++slot) {
+                bytes += hyperlinks_[slot].second.size()*link_bytes;
+            }
+            return bytes;
+        }
+
+        void clear() {
+            for (size_t slot = 0; slot < num_used_; ++slot) {
+                slots_[hyperlinks_[slot].first] = -1;
+                hyperlinks_[slot].second.reset();
+            }
+            num_used_ = 0;
+        }
+    };
 
 }
 
@@ -0,0 +1,93 @@
+/**
+ * \file hyperpath_cache.cpp
+ *
+ * HyperpathCache implementation
+ **/
+
+#include "hyperpath_cache.h"
+
+#include <cmath>
+
+namespace fasttrips {
+
+    HyperpathCacheKey::HyperpathCacheKey(const PathSpecification& path_spec, double time_bucket_min) :
+        start_taz_id_ (path_spec.outbound_ ? path_spec.destination_taz_id_ : path_spec.origin_taz_id_),
+        outbound_     (path_spec.outbound_),
+        hyperpath_    (path_spec.hyperpath_),
+        time_bucket_  (time_bucket_min > 0 ? (int)std::floor(path_spec.preferred_time_/time_bucket_min) : 0),
+        value_of_time_(path_spec.value_of_time_),
+        user_class_   (path_spec.user_class_),
+        purpose_      (path_spec.purpose_),
+        access_mode_  (path_spec.access_mode_),
+        transit_mode_ (path_spec.transit_mode_),
+        egress_mode_  (path_spec.egress_mode_)
+    {
+        // without buckets, only exactly the same preferred time will do
+        if (time_bucket_min <= 0) { time_bucket_ = (int)std::floor(path_spec.preferred_time_*60.0); }
+    }
+
+    double HyperpathCacheKey::bucketStartTime(double time_bucket_min) const
+    {
+        if (time_bucket_min <= 0) { return time_bucket_/60.0; }
+        return time_bucket_*time_bucket_min;
+    }
+
+    HyperpathCache::HyperpathCache(NodePool* pool) : pool_(pool), bytes_(0), max_bytes_(0)
+    {}
+
+    StopStates* HyperpathCache::find(const HyperpathCacheKey& key)
+    {
+        EntryIndex::iterator index_iter = index_.find(key);
+        if (index_iter == index_.end()) { return NULL; }
+
+        // most recently used goes first
+        entries_.splice(entries_.begin(), entries_, index_iter->second);
+        return &(index_iter->second->stop_states_);
+    }
+
+    StopStates& HyperpathCache::insert(const HyperpathCacheKey& key)
+    {
+        erase(key);
+        entries_.push_front(Entry(key, pool_));
+        index_[key] = entries_.begin();
+        return entries_.front().stop_states_;
+    }
+
+    void HyperpathCache::erase(const HyperpathCacheKey& key)
+    {
+        EntryIndex::iterator index_iter = index_.find(key);
+        if (index_iter == index_.end()) { return; }
+
+        bytes_ -= index_iter->second->bytes_;
+        entries_.erase(index_iter->second);
+        index_.erase(index_iter);
+    }
+
+    int HyperpathCache::updateSize()
+    {
+        if (entries_.empty()) { return 0; }
+
+        Entry& latest = entries_.front();
+        bytes_        -= latest.bytes_;
+        latest.bytes_  = latest.stop_states_.estimateBytes();
+        bytes_        += latest.bytes_;
+
+        // evict from the back, but keep the latest even if it's over budget by itself
+        int num_evicted = 0;
+        while ((bytes_ > max_bytes_) && (entries_.size() > 1)) {
+            bytes_ -= entries_.back().bytes_;
+            index_.erase(entries_.back().key_);
+            entries_.pop_back();
+            num_evicted += 1;
+        }
+        return num_evicted;
+    }
+
+    void HyperpathCache::clear()
+    {
+        entries_.clear();
+        index_.clear();
+        bytes_ = 0;
+    }
+
+}
@@ -0,0 +1,143 @@
+/**
+ * \file hyperpath_cache.h
+ *
+ * Defines a least-recently-used cache of labeled stop states, so path searches that
+ * start from the same TAZ for the same kind of traveler around the same time can
+ * share one labeling.
+ */
+#include <list>
+#include <map>
+#include <string>
+
+#include "pathspec.h"
+#include "hyperlink.h"
+
+#ifndef HYPERPATH_CACHE_H
+#define HYPERPATH_CACHE_H
+
+namespace fasttrips {
+
+    /**
+     * What the labeling depends on, apart from the end TAZ: the start TAZ (destination for outbound,
+     * origin for inbound), the direction, the user class, purpose and modes, the value of time,
+     * and the preferred time, rounded down to a time bucket.
+     */
+    struct HyperpathCacheKey {
+        int         start_taz_id_;
+        bool        outbound_;
+        bool        hyperpath_;
+        int         time_bucket_;
+        double      value_of_time_;
+        std::string user_class_;
+        std::string purpose_;
+        std::string access_mode_;
+        std::string transit_mode_;
+        std::string egress_mode_;
+
+        /// Key for the given path specification with time buckets of *time_bucket_min* minutes
+        HyperpathCacheKey(const PathSpecification& path_spec, double time_bucket_min);
+
+        /**
+         * The preferred time the key's stop states are labeled for: the start of its time bucket.
+         * Labeling for that rather than for the first trip's preferred time means the cached labels
+         * don't depend on which trip in the bucket was found first.
+         */
+        double bucketStartTime(double time_bucket_min) const;
+    };
+
+    /// Comparator so the fasttrips::HyperpathCacheKey can be used as a std::map key
+    struct HyperpathCacheKeyCompare {
+        bool operator()(const HyperpathCacheKey& key1, const HyperpathCacheKey& key2) const {
+            if (key1.start_taz_id_  < key2.start_taz_id_ ) { return true;  }
+            if (key1.start_taz_id_  > key2.start_taz_id_ ) { return false; }
+            if (key1.outbound_      < key2.outbound_     ) { return true;  }
+            if (key1.outbound_      > key2.outbound_     ) { return false; }
+            if (key1.hyperpath_     < key2.hyperpath_    ) { return true;  }
+            if (key1.hyperpath_     > key2.hyperpath_    ) { return false; }
+            if (key1.time_bucket_   < key2.time_bucket_  ) { return true;  }
+            if (key1.time_bucket_   > key2.time_bucket_  ) { return false; }
+            if (key1.value_of_time_ < key2.value_of_time_) { return true;  }
+            if (key1.value_of_time_ > key2.value_of_time_) { return false; }
+            if (key1.user_class_    < key2.user_class_   ) { return true;  }
+            if (key1.user_class_    > key2.user_class_   ) { return false; }
+            if (key1.purpose_       < key2.purpose_      ) { return true;  }
+            if (key1.purpose_       > key2.purpose_      ) { return false; }
+            if (key1.access_mode_   < key2.access_mode_  ) { return true;  }
+            if (key1.access_mode_   > key2.access_mode_  ) { return false; }
+            if (key1.transit_mode_  < key2.transit_mode_ ) { return true;  }
+            if (key1.transit_mode_  > key2.transit_mode_ ) { return false; }
+            if (key1.egress_mode_   < key2.egress_mode_  ) { return true;  }
+            if (key1.egress_mode_   > key2.egress_mode_  ) { return false; }
+            return false;
+        }
+    };
+
+    /**
+     * Labeled fasttrips::StopStates by fasttrips::HyperpathCacheKey, evicting the least recently
+     * used ones when their estimated size goes over the budget.  The stop states' links come from
+     * the given fasttrips::NodePool, so like the pool, a cache is not thread-safe; each thread
+     * should use its own.
+     */
+    class HyperpathCache
+    {
+    private:
+        struct Entry {
+            HyperpathCacheKey key_;
+            size_t            bytes_;           ///< estimated size of stop_states_
+            StopStates        stop_states_;
+
+            Entry(const HyperpathCacheKey& key, NodePool* pool) : key_(key), bytes_(0), stop_states_(pool) {}
+        };
+        typedef std::list<Entry> EntryList;
+        typedef std::map<HyperpathCacheKey, EntryList::iterator, struct HyperpathCacheKeyCompare> EntryIndex;
+
+        /// Pool for the cached stop states' links
+        NodePool*   pool_;
+        /// Entries, most recently used first
+        EntryList   entries_;
+        /// Key to entry
+        EntryIndex  index_;
+        /// Total estimated bytes
+        size_t      bytes_;
+        /// Budget for bytes_
+        size_t      max_bytes_;
+
+        // not copyable
+        HyperpathCache(const HyperpathCache&);
+        HyperpathCache& operator=(const HyperpathCache&);
+
+    public:
+        HyperpathCache(NodePool* pool);
+
+        /// Sets the budget, in bytes.  Zero turns the cache off.
+        void setMaxBytes(size_t max_bytes) { max_bytes_ = max_bytes; }
+        /// Is the cache on?
+        bool enabled() const { return max_bytes_ > 0; }
+
+        /// Returns the cached stop states for the key, making them the most recently used, or NULL if there aren't any.
+        StopStates* find(const HyperpathCacheKey& key);
+
+        /// Adds empty stop states for the key, as the most recently used, and returns them to be labeled.
+        StopStates& insert(const HyperpathCacheKey& key);
+
+        /// Removes the stop states for the key.
+        void erase(const HyperpathCacheKey& key);
+
+        /**
+         * Records the size of the most recently used stop states, once they're labeled, and evicts
+         * the least recently used others until the total is within budget.
+         *
+         * @return the number of entries evicted.
+         */
+        int updateSize();
+
+        /// Removes everything
+        void clear();
+
+        /// Number of entries
+        size_t size() const { return entries_.size(); }
+    };
+
+}
+
+#endif
@@ -0,0 +1,81 @@
+/**
+ * \file node_pool.cpp
+ *
+ * NodePool implementation
+ **/
+
+#include "node_pool.h"
+
+namespace fasttrips {
+
+    namespace {
+        /// Size of the chunks the nodes come from
+        const size_t CHUNK_BYTES = 64*1024;
+
+        /// For aligning nodes
+        union MaxAlign {
+            double      d_;
+            long double ld_;
+            void*       p_;
+            long        l_;
+        };
+    }
+
+    size_t NodePool::alignment()
+    {
+        return sizeof(MaxAlign);
+    }
+
+    NodePool::NodePool() : chunk_next_(NULL), chunk_left_(0)
+    {}
+
+    NodePool::~NodePool()
+    {
+        for (size_t chunk_num = 0; chunk_num < chunks_.size(); ++chunk_num) {
+            ::operator delete(chunks_[chunk_num]);
+        }
+    }
+
+    void* NodePool::allocate(size_t size)
+    {
+        size_t slots = (size + alignment() - 1)/alignment();
+        if (slots == 0) { slots = 1; }
+        size_t bytes = slots*alignment();
+
+        // big things aren't nodes
+        if (bytes > CHUNK_BYTES/16) { return ::operator new(size); }
+
+        // reuse a freed node if there is one
+        if (slots < free_lists_.size() && free_lists_[slots]) {
+            FreeNode* node     = free_lists_[slots];
+            free_lists_[slots] = node->next_;
+            return node;
+        }
+
+        // otherwise carve it out of the current chunk
+        if (bytes > chunk_left_) {
+            chunk_next_ = static_cast<char*>(::operator new(CHUNK_BYTES));
+            chunk_left_ = CHUNK_BYTES;
+            chunks_.push_back(chunk_next_);
+        }
+        void* node   = chunk_next_;
+        chunk_next_ += bytes;
+        chunk_left_ -= bytes;
+        return node;
+    }
+
+    void NodePool::deallocate(void* p, size_t size)
+    {
+        if (p == NULL) { return; }
+
+        size_t slots = (size + alignment() - 1)/alignment();
+        if (slots == 0) { slots = 1; }
+        if (slots*alignment() > CHUNK_BYTES/16) { ::operator delete(p); return; }
+
+        if (slots >= free_lists_.size()) { free_lists_.resize(slots+1, NULL); }
+        FreeNode* node     = static_cast<FreeNode*>(p);
+        node->next_        = free_lists_[slots];
+        free_lists_[slots] = node;
+    }
+
+}
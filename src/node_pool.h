@@ -0,0 +1,109 @@
+/**
+ * \file node_pool.h
+ *
+ * Defines a pool for small fixed-size nodes and an allocator using it, so the
+ * containers built up during labeling can recycle their nodes from one path
+ * search to the next instead of going back to the heap.
+ */
+#include <cstddef>
+#include <new>
+#include <vector>
+
+#ifndef NODE_POOL_H
+#define NODE_POOL_H
+
+namespace fasttrips {
+
+    /**
+     * Hands out memory for small nodes (e.g. std::map nodes) from large chunks and
+     * keeps a free list for each node size, so freed nodes are reused rather than
+     * returned to the heap.  The chunks are only released when the pool is destroyed.
+     *
+     * A pool is not thread-safe; each thread should use its own.
+     */
+    class NodePool
+    {
+    private:
+        /// A freed node, linked into the free list for its size
+        struct FreeNode {
+            FreeNode* next_;
+        };
+
+        /// Node sizes are rounded up to a multiple of this
+        static size_t alignment();
+
+        /// Free list heads, indexed by rounded node size / alignment()
+        std::vector<FreeNode*> free_lists_;
+        /// Chunks allocated so far
+        std::vector<char*>     chunks_;
+        /// Next unused byte in the current chunk
+        char*                  chunk_next_;
+        /// Bytes left in the current chunk
+        size_t                 chunk_left_;
+
+        // not copyable
+        NodePool(const NodePool&);
+        NodePool& operator=(const NodePool&);
+
+    public:
+        NodePool();
+        ~NodePool();
+
+        /// Returns memory for a node of the given size.
+        void* allocate(size_t size);
+        /// Returns the node to the free list for its size.
+        void  deallocate(void* p, size_t size);
+    };
+
+    /**
+     * Standard allocator using a fasttrips::NodePool for single objects.  Arrays, and
+     * allocators without a pool, fall back to operator new.
+     */
+    template <typename T>
+    class PoolAllocator
+    {
+    public:
+        typedef T               value_type;
+        typedef T*              pointer;
+        typedef const T*        const_pointer;
+        typedef T&              reference;
+        typedef const T&        const_reference;
+        typedef size_t          size_type;
+        typedef ptrdiff_t       difference_type;
+
+        template <typename U> struct rebind { typedef PoolAllocator<U> other; };
+
+        /// The pool this allocates from.  NULL means use operator new.
+        NodePool* pool_;
+
+        PoolAllocator(NodePool* pool = NULL) throw() : pool_(pool) {}
+        PoolAllocator(const PoolAllocator& other) throw() : pool_(other.pool_) {}
+        template <typename U> PoolAllocator(const PoolAllocator<U>& other) throw() : pool_(other.pool_) {}
+        ~PoolAllocator() throw() {}
+
+        pointer       address(reference x)       const { return &x; }
+        const_pointer address(const_reference x) const { return &x; }
+
+        pointer allocate(size_type n, const void* hint = 0) {
+            if ((n == 1) && pool_) { return static_cast<pointer>(pool_->allocate(sizeof(T))); }
+            return static_cast<pointer>(::operator new(n*sizeof(T)));
+        }
+        void deallocate(pointer p, size_type n) {
+            if ((n == 1) && pool_) { pool_->deallocate(p, sizeof(T)); return; }
+            ::operator delete(p);
+        }
+
+        size_type max_size() const throw() { return size_t(-1)/sizeof(T); }
+
+        void construct(pointer p, const T& val) { new(static_cast<void*>(p)) T(val); }
+        void destroy(pointer p) { p->~T(); }
+    };
+
+    template <typename T, typename U>
+    bool operator==(const PoolAllocator<T>& a, const PoolAllocator<U>& b) { return a.pool_ == b.pool_; }
+    template <typename T, typename U>
+    bool operator!=(const PoolAllocator<T>& a, const PoolAllocator<U>& b) { return a.pool_ != b.pool_; }
+
+}
+
+#endif
@@ -298,6 +298,21 @@ namespace fasttrips {
         return feasible;
     }
 
+    // Add link to the path as is
+    void Path::appendLink(int stop_id, const StopState& link)
+    {
+        StopState new_link      = link;
+        new_link.low_cost_path_ = NULL;
+        cost_                  += new_link.link_cost_;
+        fare_                  += new_link.link_fare_;
+        new_link.cost_          = cost_;
+        links_.push_back( std::make_pair(stop_id, new_link) );
+
+        if (link.fare_period_) {
+            boards_per_fareperiod_[link.fare_period_->fare_period_] += 1;
+        }
+    }
+
     // Returns the fare given the relevant fare period, adjusting for transfer from last fare period as applicable
     double Path::getFareWithTransfer(const PathFinder&  pf,
                                      const std::string& last_fare_period,
@@ -343,7 +358,8 @@ namespace fasttrips {
         std::ostream& trace_file,
         const PathSpecification& path_spec,
         const PathFinder& pf,
-        bool hush)
+        bool hush,
+        const double* link_overrides)
     {
         // no stops - nothing to do
         if (links_.size()==0) { return; }
@@ -380,6 +396,8 @@ namespace fasttrips {
         {
             int stop_id             = links_[index].first;
             StopState& stop_state   = links_[index].second;
+            // NaN isn't equal to itself, so those aren't overridden
+            const double* overrides = (link_overrides ? &link_overrides[index*NUM_LINK_COST_OVERRIDES] : NULL);
 
             int orig_stop           = (path_spec.outbound_? stop_id : stop_state.stop_succpred_);
             int dest_stop           = (path_spec.outbound_? stop_state.stop_succpred_ : stop_id);
@@ -394,18 +412,18 @@ namespace fasttrips {
                 const NamedWeights* named_weights = pf.getNamedWeights( path_spec.user_class_, path_spec.purpose_, MODE_ACCESS, path_spec.access_mode_, stop_state.trip_id_);
                 Attributes          attributes    = *(pf.getAccessAttributes( path_spec.origin_taz_id_, stop_state.trip_id_, transit_stop, orig_departure_time ));
 
-                attributes["arrive_early_min"]     = 0;
-                attributes["arrive_late_min"]      = 0;
-                attributes["depart_early_min"]     = 0;
-                attributes["depart_late_min"]      = 0;
+                attributes[ATTR_ARRIVE_EARLY_MIN]     = 0;
+                attributes[ATTR_ARRIVE_LATE_MIN]      = 0;
+                attributes[ATTR_DEPART_EARLY_MIN]     = 0;
+                attributes[ATTR_DEPART_LATE_MIN]      = 0;
 
                 if (!path_spec.outbound_) {
                   // early -- use early function
                   if (orig_departure_time < path_spec.preferred_time_) {
-                    attributes["depart_early_min"] = path_spec.preferred_time_ - orig_departure_time;
+                    attributes[ATTR_DEPART_EARLY_MIN] = path_spec.preferred_time_ - orig_departure_time;
                   }
                   else {
-                    attributes["depart_late_min"]  = orig_departure_time - path_spec.preferred_time_;
+                    attributes[ATTR_DEPART_LATE_MIN]  = orig_departure_time - path_spec.preferred_time_;
                   }
                 }
 
@@ -423,18 +441,18 @@ namespace fasttrips {
                 const NamedWeights* named_weights = pf.getNamedWeights(  path_spec.user_class_, path_spec.purpose_, MODE_EGRESS, path_spec.egress_mode_, stop_state.trip_id_);
                 Attributes          attributes    = *(pf.getAccessAttributes( path_spec.destination_taz_id_, stop_state.trip_id_, transit_stop, fmod(dest_arrival_time,24.0*60.0)));
 
-                attributes["arrive_early_min"]    = 0;
-                attributes["arrive_late_min"]     = 0;
-                attributes["depart_early_min"]    = 0;
-                attributes["depart_late_min"]     = 0;
+                attributes[ATTR_ARRIVE_EARLY_MIN]    = 0;
+                attributes[ATTR_ARRIVE_LATE_MIN]     = 0;
+                attributes[ATTR_DEPART_EARLY_MIN]    = 0;
+                attributes[ATTR_DEPART_LATE_MIN]     = 0;
 
                 if (path_spec.outbound_) {
                   // late -- use late function
                   if (dest_arrival_time > path_spec.preferred_time_) {
-                    attributes["arrive_late_min"] = dest_arrival_time - path_spec.preferred_time_;
+                    attributes[ATTR_ARRIVE_LATE_MIN] = dest_arrival_time - path_spec.preferred_time_;
                   }
                   else {
-                    attributes["arrive_early_min"]= path_spec.preferred_time_ - dest_arrival_time;
+                    attributes[ATTR_ARRIVE_EARLY_MIN]= path_spec.preferred_time_ - dest_arrival_time;
                   }
                 }
 
@@ -461,12 +479,18 @@ namespace fasttrips {
                 int supply_mode_num               = trip_info.supply_mode_num_;
                 const NamedWeights* named_weights = pf.getNamedWeights( path_spec.user_class_, path_spec.purpose_, MODE_TRANSIT, path_spec.transit_mode_, supply_mode_num);
                 Attributes link_attr              = trip_info.trip_attr_;
-                link_attr["in_vehicle_time_min"]  = trip_ivt_min;
-                link_attr["wait_time_min"]        = wait_min;
-                link_attr["overcap"]              = pf.getTripStopTime(stop_state.trip_id_, stop_state.seq_).overcap_;
-                link_attr["at_capacity"]          = (link_attr["overcap"] >= 0 ? 1.0 : 0.0);  // binary, 0 means at capacity
+                link_attr[ATTR_IN_VEHICLE_TIME_MIN]  = trip_ivt_min;
+                link_attr[ATTR_WAIT_TIME_MIN]        = wait_min;
+                link_attr[ATTR_OVERCAP]              = pf.getTripStopTime(stop_state.trip_id_, stop_state.seq_).overcap_;
+                if (overrides && (overrides[OVERRIDE_OVERCAP] == overrides[OVERRIDE_OVERCAP])) {
+                    link_attr[ATTR_OVERCAP]          = overrides[OVERRIDE_OVERCAP];
+                }
+                link_attr[ATTR_AT_CAPACITY]          = (link_attr[ATTR_OVERCAP] >= 0 ? 1.0 : 0.0);  // binary, 0 means at capacity
+                if (overrides && (overrides[OVERRIDE_AT_CAPACITY] == overrides[OVERRIDE_AT_CAPACITY])) {
+                    link_attr[ATTR_AT_CAPACITY]      = overrides[OVERRIDE_AT_CAPACITY];
+                }
                 // overcap should be non-negative
-                if (link_attr["overcap"] < 0) { link_attr["overcap"] = 0; }
+                if (link_attr[ATTR_OVERCAP] < 0) { link_attr[ATTR_OVERCAP] = 0; }
 
                 const FarePeriod* fp              = stop_state.fare_period_;
                 if (fp) {
@@ -495,7 +519,7 @@ namespace fasttrips {
                         fp_for_freexfers[fp->fare_period_].second += 1;
                     }
 
-                    link_attr["fare"]             = stop_state.link_fare_;
+                    link_attr[ATTR_FARE]             = stop_state.link_fare_;
                     // store last fare period
                     last_fare_period              = fp->fare_period_;
                 } else {
@@ -506,6 +530,9 @@ namespace fasttrips {
 
                 first_trip = false;
             }
+            if (overrides && (overrides[OVERRIDE_LINK_COST] == overrides[OVERRIDE_LINK_COST])) {
+                stop_state.link_cost_             = overrides[OVERRIDE_LINK_COST];
+            }
             cost_                            += stop_state.link_cost_;
             fare_                            += stop_state.link_fare_;
             stop_state.cost_                  = cost_;
@@ -24,6 +24,17 @@ namespace fasttrips {
         int     prob_i_;            ///< Cumulative probability * INT_MULT (for stochastic)
     } PathInfo;
 
+    /**
+     * Per-link values that Path::calculateCost takes in place of the ones it would otherwise use, so that
+     * simulation can re-cost paths with what it found.  NaN means there's no override.
+     */
+    enum LinkCostOverride {
+        OVERRIDE_OVERCAP        = 0,    ///< Trip overcap, instead of the supply's overcap at the stop
+        OVERRIDE_AT_CAPACITY    = 1,    ///< Trip at capacity binary, e.g. 0 for passengers that boarded
+        OVERRIDE_LINK_COST      = 2,    ///< Link cost, e.g. a huge cost for missed transfers and bumps
+        NUM_LINK_COST_OVERRIDES = 3
+    };
+
     // Forward declarations
     class PathFinder;
     struct FarePeriod;
@@ -97,13 +108,19 @@ namespace fasttrips {
             const PathSpecification& path_spec,
             const PathFinder& pf);
 
+        /// Add link to the path as is, without adjusting times.
+        /// For paths that were already found, like simulated paths that we're re-costing.
+        void appendLink(int stop_id, const StopState& link);
+
         /** Calculates the cost for the entire given path, and checks for capacity issues.
          *  Sets the resulting cost and also updates link costs
+         *  If link_overrides is given, it has fasttrips::NUM_LINK_COST_OVERRIDES values for each link, in link order.
          **/
         void calculateCost(std::ostream& trace_file,
             const PathSpecification& path_spec,
             const PathFinder& pf,
-            bool hush = false);
+            bool hush = false,
+            const double* link_overrides = NULL);
 
         void print(std::ostream& ostr,
             const PathSpecification& path_spec,
@@ -6,6 +6,7 @@
 #include <psapi.h>
 #else
 #include <sys/time.h>
+#include <pthread.h>
 #endif
 
 #include <assert.h>
@@ -19,6 +20,10 @@
 #include <string>
 #include <math.h>
 #include <algorithm>
+#include <climits>
+#include <limits>
+#include <functional>
+#include <set>
 
 const char kPathSeparator =
 #ifdef _WIN32
@@ -44,13 +49,137 @@ static std::ofstream stopids_file;
 
 namespace fasttrips {
 
+    /// Shared state for the threads working on a PathFinder::findPathSets batch
+    typedef struct {
+        const PathFinder*                     pathfinder_;
+        const std::vector<PathSpecification>* path_specs_;
+        std::vector<PathSet>*                 pathsets_;
+        std::vector<PerformanceInfo>*         performance_infos_;
+        std::vector<int>*                     return_statuses_;
+        std::vector<LabelingWorkspace*>*      workspaces_;      ///< one per thread
+        size_t                                next_index_;      ///< next path spec to work on; guarded by lock_
+        size_t                                next_workspace_;  ///< next workspace for a thread to take; guarded by lock_
+#ifdef _WIN32
+        CRITICAL_SECTION                      lock_;
+#else
+        pthread_mutex_t                       lock_;
+#endif
+    } PathSetBatch;
+
+    /// Thread function: pull path specifications off the batch until there are none left.
+#ifdef _WIN32
+    static DWORD WINAPI findPathSetsWorker(LPVOID arg)
+#else
+    static void* findPathSetsWorker(void* arg)
+#endif
+    {
+        PathSetBatch* batch = (PathSetBatch*)arg;
+
+        // take a workspace to reuse for each path specification this thread finds
+#ifdef _WIN32
+        EnterCriticalSection(&batch->lock_);
+#else
+        pthread_mutex_lock(&batch->lock_);
+#endif
+        LabelingWorkspace& workspace = *(*batch->workspaces_)[batch->next_workspace_++];
+#ifdef _WIN32
+        LeaveCriticalSection(&batch->lock_);
+#else
+        pthread_mutex_unlock(&batch->lock_);
+#endif
+
+        while (true) {
+#ifdef _WIN32
+            EnterCriticalSection(&batch->lock_);
+#else
+            pthread_mutex_lock(&batch->lock_);
+#endif
+            size_t index = batch->next_index_;
+            // traced specs were done already
+            while ((index < batch->path_specs_->size()) && (*batch->path_specs_)[index].trace_) { ++index; }
+            batch->next_index_ = index + 1;
+#ifdef _WIN32
+            LeaveCriticalSection(&batch->lock_);
+#else
+            pthread_mutex_unlock(&batch->lock_);
+#endif
+            if (index >= batch->path_specs_->size()) { break; }
+
+            (*batch->return_statuses_)[index] = batch->pathfinder_->findPathSet((*batch->path_specs_)[index],
+                                                                                 (*batch->pathsets_)[index],
+                                                                                 (*batch->performance_infos_)[index],
+                                                                                 workspace);
+        }
+        return 0;
+    }
+
+    /// Shared state for the threads working on a PathFinder::findSkims batch
+    typedef struct {
+        const PathFinder*                     pathfinder_;
+        const std::vector<PathSpecification>* path_specs_;
+        const std::vector<int>*               end_taz_ids_;
+        const std::vector<double>*            skim_times_;
+        std::vector<double>*                  skims_;
+        std::vector<LabelingWorkspace*>*      workspaces_;      ///< one per thread
+        size_t                                next_index_;      ///< next path spec to work on; guarded by lock_
+        size_t                                next_workspace_;  ///< next workspace for a thread to take; guarded by lock_
+#ifdef _WIN32
+        CRITICAL_SECTION                      lock_;
+#else
+        pthread_mutex_t                       lock_;
+#endif
+    } SkimBatch;
+
+    /// Thread function: pull start TAZs off the batch and skim from them until there are none left.
+#ifdef _WIN32
+    static DWORD WINAPI findSkimsWorker(LPVOID arg)
+#else
+    static void* findSkimsWorker(void* arg)
+#endif
+    {
+        SkimBatch* batch = (SkimBatch*)arg;
+
+#ifdef _WIN32
+        EnterCriticalSection(&batch->lock_);
+#else
+        pthread_mutex_lock(&batch->lock_);
+#endif
+        LabelingWorkspace& workspace = *(*batch->workspaces_)[batch->next_workspace_++];
+#ifdef _WIN32
+        LeaveCriticalSection(&batch->lock_);
+#else
+        pthread_mutex_unlock(&batch->lock_);
+#endif
+
+        size_t skims_per_spec = batch->end_taz_ids_->size()*NUM_SKIM_ATTRIBUTES;
+        while (true) {
+#ifdef _WIN32
+            EnterCriticalSection(&batch->lock_);
+#else
+            pthread_mutex_lock(&batch->lock_);
+#endif
+            size_t index = batch->next_index_++;
+#ifdef _WIN32
+            LeaveCriticalSection(&batch->lock_);
+#else
+            pthread_mutex_unlock(&batch->lock_);
+#endif
+            if (index >= batch->path_specs_->size()) { break; }
+
+            batch->pathfinder_->skimFromTaz((*batch->path_specs_)[index], *batch->end_taz_ids_, *batch->skim_times_,
+                                            &(*batch->skims_)[index*skims_per_spec], workspace);
+        }
+        return 0;
+    }
+
     // access this through getTransferAttributes()
     Attributes* PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_ = NULL;
 
     /**
      * This doesn't really do anything.
      */
-    PathFinder::PathFinder() : process_num_(-1), BUMP_BUFFER_(-1), STOCH_PATHSET_SIZE_(-1)
+    PathFinder::PathFinder() : BUMP_BUFFER_(-1), STOCH_PATHSET_SIZE_(-1), LOWER_BOUND_PRUNING_(false),
+        HYPERPATH_CACHE_MB_(0), HYPERPATH_CACHE_TIME_BUCKET_MIN_(0), process_num_(-1)
     {
     }
 
@@ -66,7 +195,10 @@ namespace fasttrips {
         bool       transfer_fare_ignore_pf,
         bool       transfer_fare_ignore_pe,
         int        max_num_paths,
-        double     min_path_probability)
+        double     min_path_probability,
+        bool       lower_bound_pruning,
+        double     hyperpath_cache_mb,
+        double     hyperpath_cache_time_bucket_min)
     {
         BUMP_BUFFER_                    = bump_buffer;
         DEPART_EARLY_ALLOWED_MIN_       = depart_early_allowed_min;
@@ -75,12 +207,18 @@ namespace fasttrips {
         STOCH_MAX_STOP_PROCESS_COUNT_   = stoch_max_stop_process_count;
         MAX_NUM_PATHS_                  = max_num_paths;
         MIN_PATH_PROBABILITY_           = min_path_probability;
+        LOWER_BOUND_PRUNING_            = lower_bound_pruning;
+        HYPERPATH_CACHE_MB_             = hyperpath_cache_mb;
+        HYPERPATH_CACHE_TIME_BUCKET_MIN_= hyperpath_cache_time_bucket_min;
 
         Hyperlink::TIME_WINDOW_         = time_window;
         Hyperlink::STOCH_DISPERSION_    = stoch_dispersion;
         Hyperlink::UTILS_CONVERSION_    = utils_conversion;
         Hyperlink::TRANSFER_FARE_IGNORE_PATHFINDING_ = transfer_fare_ignore_pf;
         Hyperlink::TRANSFER_FARE_IGNORE_PATHENUM_    = transfer_fare_ignore_pe;
+
+        // labels depend on these
+        clearHyperpathCaches();
     }
 
     void PathFinder::readIntermediateFiles()
@@ -93,7 +231,7 @@ namespace fasttrips {
         readAccessLinks();
         readTransferLinks();
         readTripInfo();
-        readWeights();
+        readWeights(output_dir_);
     }
 
     void PathFinder::readTripIds() {
@@ -141,15 +279,22 @@ namespace fasttrips {
             std::cout << "[" << string_zone_num      << "] ";
             std::cout << "[" << string_zone_id       << "] ";
         }
+        int stops_read = 0;
         while (!stop_id_file.eof()) {
             getline(stop_id_file, line);
             std::istringstream iss(line);
-            iss >> stop_id_num >> string_stop_id >> zone_num >> string_zone_id;
+            if (!(iss >> stop_id_num >> string_stop_id >> zone_num >> string_zone_id)) { continue; }
+            // stop ids are dense so index by them
+            if (stop_id_num >= (int)stop_num_to_stop_.size()) {
+                Stop no_stop = { "", -1 };
+                stop_num_to_stop_.resize(stop_id_num+1, no_stop);
+            }
             stop_num_to_stop_[stop_id_num].stop_str_ = string_stop_id;
             stop_num_to_stop_[stop_id_num].zone_num_ = zone_num;  // -1 means none
+            stops_read++;
         }
         if (process_num_ <= 1) {
-            std::cout << " => Read " << stop_num_to_stop_.size() << " lines" << std::endl;
+            std::cout << " => Read " << stops_read << " lines" << std::endl;
         }
         stop_id_file.close();
     }
@@ -349,6 +494,12 @@ namespace fasttrips {
         int attrs_read = 0;
         while (tripinfo_file >> trip_id_num >> attr_name >> attr_value) {
 
+            // trip ids are dense so index by them
+            if (trip_id_num >= (int)trip_info_.size()) {
+                TripInfo no_trip_info = { -1, -1 };
+                trip_info_.resize(trip_id_num+1, no_trip_info);
+            }
+
             // these are special
             if (attr_name == "mode_num") {
                 trip_info_[trip_id_num].supply_mode_num_ = int(attr_value);
@@ -365,11 +516,11 @@ namespace fasttrips {
         tripinfo_file.close();
     }
 
-    void PathFinder::readWeights() {
+    void PathFinder::readWeights(const std::string& weights_dir) {
         // Weights
         std::ifstream weights_file;
         std::ostringstream ss_weights;
-        ss_weights << output_dir_ << kPathSeparator << "ft_intermediate_weights.txt";
+        ss_weights << weights_dir << kPathSeparator << "ft_intermediate_weights.txt";
         weights_file.open(ss_weights.str().c_str(), std::ios_base::in);
 
         std::string user_class, purpose, demand_mode_type, demand_mode, string_supply_mode_num, weight_name, string_weight_value,
@@ -423,13 +574,70 @@ namespace fasttrips {
                 std::cerr << "Do not understand weight type [" << weight_type << "] in " << ss_weights.str() << std::endl;
                 exit(2);
             }
-            weight_lookup_[ucpm][supply_mode_num][weight_name] = the_weight;
+            weight_lookup_[ucpm][supply_mode_num].by_name_[weight_name] = the_weight;
             weights_read++;
         }
         if (process_num_ <= 1) {
             std::cout << " => Read " << weights_read << " lines" << std::endl;
         }
         weights_file.close();
+
+        // compile the weights into attribute slots for tallyLinkCost
+        for (WeightLookup::iterator iter_wl = weight_lookup_.begin(); iter_wl != weight_lookup_.end(); ++iter_wl) {
+            for (SupplyModeToNamedWeights::iterator iter_sm2nw = iter_wl->second.begin(); iter_sm2nw != iter_wl->second.end(); ++iter_sm2nw) {
+                iter_sm2nw->second.compile();
+            }
+        }
+    }
+
+    void NamedWeights::compile()
+    {
+        slots_.clear();
+        weights_.clear();
+        ivt_index_ = -1;
+        for (std::map<std::string, Weight>::const_iterator iter_weight = by_name_.begin(); iter_weight != by_name_.end(); ++iter_weight) {
+            int attr_slot = AttributeIndex::slot(iter_weight->first);
+            if (attr_slot == ATTR_IN_VEHICLE_TIME_MIN) { ivt_index_ = (int)weights_.size(); }
+            slots_.push_back(attr_slot);
+            weights_.push_back(iter_weight->second);
+        }
+    }
+
+    void PathFinder::getPathWeights(const PathSpecification& path_spec, PathWeights& path_weights) const
+    {
+        UserClassPurposeMode final_ucpm = {
+            path_spec.user_class_,
+            path_spec.purpose_,
+            path_spec.outbound_ ? MODE_ACCESS: MODE_EGRESS,
+            path_spec.outbound_ ? path_spec.access_mode_ : path_spec.egress_mode_
+        };
+        WeightLookup::const_iterator iter_wl = weight_lookup_.find(final_ucpm);
+        path_weights.final_weights_ = (iter_wl == weight_lookup_.end() ? NULL : &(iter_wl->second));
+
+        UserClassPurposeMode delay_ucpm = {
+            path_spec.user_class_,
+            path_spec.purpose_,
+            path_spec.outbound_ ? MODE_EGRESS: MODE_ACCESS,
+            path_spec.outbound_ ? path_spec.egress_mode_ : path_spec.access_mode_
+        };
+        iter_wl = weight_lookup_.find(delay_ucpm);
+        path_weights.delay_weights_ = (iter_wl == weight_lookup_.end() ? NULL : &(iter_wl->second));
+
+        // transit weights by supply mode number
+        path_weights.transit_weights_.clear();
+        UserClassPurposeMode transit_ucpm = { path_spec.user_class_, path_spec.purpose_, MODE_TRANSIT, path_spec.transit_mode_ };
+        iter_wl = weight_lookup_.find(transit_ucpm);
+        if (iter_wl != weight_lookup_.end()) {
+            for (SupplyModeToNamedWeights::const_iterator iter_sm2nw = iter_wl->second.begin(); iter_sm2nw != iter_wl->second.end(); ++iter_sm2nw) {
+                if (iter_sm2nw->first < 0) { continue; }
+                if (iter_sm2nw->first >= (int)path_weights.transit_weights_.size()) {
+                    path_weights.transit_weights_.resize(iter_sm2nw->first+1, NULL);
+                }
+                path_weights.transit_weights_[iter_sm2nw->first] = &(iter_sm2nw->second);
+            }
+        }
+
+        path_weights.transfer_weights_ = getNamedWeights(path_spec.user_class_, path_spec.purpose_, MODE_TRANSFER, "transfer", transfer_supply_mode_);
     }
 
     const NamedWeights* PathFinder::getNamedWeights(
@@ -464,9 +672,9 @@ namespace fasttrips {
         if (PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_ == NULL) {
             PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_ = new Attributes();
             // TODO: make this configurable
-            (*PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_)["walk_time_min"   ] = 0.0;
-            (*PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_)["transfer_penalty"] = 0.1;
-            (*PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_)["elevation_gain"  ] = 0.0;
+            (*PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_)[ATTR_WALK_TIME_MIN   ] = 0.0;
+            (*PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_)[ATTR_TRANSFER_PENALTY] = 0.1;
+            (*PathFinder::ZERO_WALK_TRANSFER_ATTRIBUTES_)[ATTR_ELEVATION_GAIN  ] = 0.0;
         }
 
         if (origin_stop_id == destination_stop_id) {
@@ -485,10 +693,9 @@ namespace fasttrips {
 
     const TripInfo* PathFinder::getTripInfo(int trip_id_num) const
     {
-        std::map<int, TripInfo>::const_iterator it = trip_info_.find(trip_id_num);
-        if (it == trip_info_.end()) { return NULL; }
+        if ((trip_id_num < 0) || (trip_id_num >= (int)trip_info_.size())) { return NULL; }
 
-        return &(it->second);
+        return &(trip_info_[trip_id_num]);
     }
 
     int PathFinder::getRouteIdForTripId(int trip_id_num) const
@@ -500,7 +707,7 @@ namespace fasttrips {
     // Accessor for TripStopTime for given trip id, stop sequence
     const TripStopTime& PathFinder::getTripStopTime(int trip_id, int stop_seq) const
     {
-        const TripStopTime& tst = trip_stop_times_.find(trip_id)->second[stop_seq-1];  // stop sequences start at 1
+        const TripStopTime& tst = trip_stop_times_[trip_stop_times_offsets_[trip_id] + stop_seq-1];  // stop sequences start at 1
         if (tst.seq_ != stop_seq) {
             printf("getTripStopTime: this shouldn't happen!");
         }
@@ -516,17 +723,57 @@ namespace fasttrips {
     {
         output_dir_  = output_dir;
         process_num_ = process_num;
-        if (trip_stop_times_.size() == 0)
+
+        // initialize this here rather than lazily so that concurrent PathFinder::findPathSet calls only read it
+        getTransferAttributes(-1, -1);
+        if (stop_num_to_stop_.size() == 0)
         {
             // nothing has run yet -- read intermediate files
             readIntermediateFiles();
-        } else
-        {
-            // previous iterations have run so the network is still valid, but we need to update the stop times
-            // reset these
-            trip_stop_times_.clear();
-            stop_trip_times_.clear();
         }
+        // if previous iterations have run, the network is still valid but we need to update the stop times
+        updateSupply(stoptime_index, stoptime_times, num_stoptimes);
+    }
+
+    void PathFinder::updateSupply(
+        int*        stoptime_index,
+        double*     stoptime_times,
+        int         num_stoptimes)
+    {
+        // reset these
+        trip_stop_times_.clear();
+        trip_stop_times_offsets_.clear();
+        trip_stop_times_stop_idx_.clear();
+        stop_trip_times_.clear();
+        stop_trip_times_offsets_.clear();
+        stop_arrive_index_.clear();
+        stop_depart_index_.clear();
+
+        // count the stop times for each trip and stop to lay them out contiguously
+        int max_trip_id = (int)trip_info_.size() - 1;
+        int max_stop_id = (int)stop_num_to_stop_.size() - 1;
+        for (int i=0; i<num_stoptimes; ++i) {
+            max_trip_id = std::max(max_trip_id, stoptime_index[3*i]);
+            max_stop_id = std::max(max_stop_id, stoptime_index[3*i+2]);
+        }
+        trip_stop_times_offsets_.assign(max_trip_id+2, 0);
+        stop_trip_times_offsets_.assign(max_stop_id+2, 0);
+        for (int i=0; i<num_stoptimes; ++i) {
+            trip_stop_times_offsets_[stoptime_index[3*i]+1]   += 1;
+            stop_trip_times_offsets_[stoptime_index[3*i+2]+1] += 1;
+        }
+        for (int trip_id = 0; trip_id <= max_trip_id; ++trip_id) {
+            trip_stop_times_offsets_[trip_id+1] += trip_stop_times_offsets_[trip_id];
+        }
+        for (int stop_id = 0; stop_id <= max_stop_id; ++stop_id) {
+            stop_trip_times_offsets_[stop_id+1] += stop_trip_times_offsets_[stop_id];
+        }
+        trip_stop_times_.resize(num_stoptimes);
+        trip_stop_times_stop_idx_.resize(num_stoptimes);
+        stop_trip_times_.resize(num_stoptimes);
+        // next free position for each trip and stop
+        std::vector<int> trip_fill(trip_stop_times_offsets_.begin(), trip_stop_times_offsets_.end()-1);
+        std::vector<int> stop_fill(stop_trip_times_offsets_.begin(), stop_trip_times_offsets_.end()-1);
 
         for (int i=0; i<num_stoptimes; ++i) {
             TripStopTime stt = {
@@ -539,10 +786,11 @@ namespace fasttrips {
                 stoptime_times[4*i+3]   // overcap
             };
             // verify the sequence number makes sense: sequential, starts with 1
-            assert(stt.sequence_ == trip_stop_times_[stt.trip_id_].size()+1);
+            assert(stt.seq_ == trip_fill[stt.trip_id_] - trip_stop_times_offsets_[stt.trip_id_] + 1);
 
-            trip_stop_times_[stt.trip_id_].push_back(stt);
-            stop_trip_times_[stt.stop_id_].push_back(stt);
+            trip_stop_times_stop_idx_[trip_fill[stt.trip_id_]] = stop_fill[stt.stop_id_];
+            trip_stop_times_[trip_fill[stt.trip_id_]++] = stt;
+            stop_trip_times_[stop_fill[stt.stop_id_]++] = stt;
             // if (false && (process_num <= 1) && ((i<5) || (i>num_stoptimes-5))) {
             if (stt.overcap_ > 0) {
                 std::cerr << "stoptimes[" << tripStringForId(stt.trip_id_) << "," << stt.seq_ << "," << stopStringForId(stt.stop_id_) << "] = ";
@@ -553,12 +801,238 @@ namespace fasttrips {
                 std::cerr << ", overcap:" << stt.overcap_ << std::endl;
             }
         }
+
+        // index the stop times at each stop by time so getTripsWithinTime can binary search
+        stop_arrive_index_.resize(num_stoptimes);
+        stop_depart_index_.resize(num_stoptimes);
+        for (int stt_idx = 0; stt_idx < num_stoptimes; ++stt_idx) {
+            stop_arrive_index_[stt_idx] = std::make_pair(stop_trip_times_[stt_idx].arrive_time_, stt_idx);
+            stop_depart_index_[stt_idx] = std::make_pair(stop_trip_times_[stt_idx].depart_time_, stt_idx);
+        }
+        for (int stop_id = 0; stop_id <= max_stop_id; ++stop_id) {
+            std::sort(stop_arrive_index_.begin() + stop_trip_times_offsets_[stop_id],
+                      stop_arrive_index_.begin() + stop_trip_times_offsets_[stop_id+1]);
+            std::sort(stop_depart_index_.begin() + stop_trip_times_offsets_[stop_id],
+                      stop_depart_index_.begin() + stop_trip_times_offsets_[stop_id+1]);
+        }
+
+        setStopHops();
+        setConnections();
+        // these depend on the stop times
+        stop_lower_bounds_.clear();
+        clearHyperpathCaches();
+    }
+
+    void PathFinder::updateStopTimes(
+        int*        stoptime_index,
+        double*     stoptime_times,
+        int         num_stoptimes)
+    {
+        // the stops whose time indices need sorting again
+        std::vector<bool> stop_changed(stop_trip_times_offsets_.size(), false);
+
+        for (int i=0; i<num_stoptimes; ++i) {
+            int trip_id = stoptime_index[3*i];
+            int seq     = stoptime_index[3*i+1];
+            if ((trip_id < 0) || (trip_id+1 >= (int)trip_stop_times_offsets_.size()) ||
+                (seq < 1) || (seq > trip_stop_times_offsets_[trip_id+1] - trip_stop_times_offsets_[trip_id])) {
+                std::cerr << "updateStopTimes: no stop time for trip " << trip_id << " sequence " << seq << std::endl;
+                continue;
+            }
+            int stt_idx = trip_stop_times_offsets_[trip_id] + seq - 1;
+            TripStopTime& trip_stt = trip_stop_times_[stt_idx];
+            assert(trip_stt.stop_id_ == stoptime_index[3*i+2]);
+
+            trip_stt.arrive_time_     = stoptime_times[4*i];
+            trip_stt.depart_time_     = stoptime_times[4*i+1];
+            trip_stt.shape_dist_trav_ = stoptime_times[4*i+2];
+            trip_stt.overcap_         = stoptime_times[4*i+3];
+            stop_trip_times_[trip_stop_times_stop_idx_[stt_idx]] = trip_stt;
+            stop_changed[trip_stt.stop_id_] = true;
+        }
+
+        for (int stop_id = 0; stop_id+1 < (int)stop_trip_times_offsets_.size(); ++stop_id) {
+            if (!stop_changed[stop_id]) { continue; }
+            for (int stt_idx = stop_trip_times_offsets_[stop_id]; stt_idx < stop_trip_times_offsets_[stop_id+1]; ++stt_idx) {
+                stop_arrive_index_[stt_idx] = std::make_pair(stop_trip_times_[stt_idx].arrive_time_, stt_idx);
+                stop_depart_index_[stt_idx] = std::make_pair(stop_trip_times_[stt_idx].depart_time_, stt_idx);
+            }
+            std::sort(stop_arrive_index_.begin() + stop_trip_times_offsets_[stop_id],
+                      stop_arrive_index_.begin() + stop_trip_times_offsets_[stop_id+1]);
+            std::sort(stop_depart_index_.begin() + stop_trip_times_offsets_[stop_id],
+                      stop_depart_index_.begin() + stop_trip_times_offsets_[stop_id+1]);
+        }
+
+        setStopHops();
+        setConnections();
+        // these depend on the stop times
+        stop_lower_bounds_.clear();
+        clearHyperpathCaches();
+    }
+
+    LabelingWorkspace& PathFinder::getWorkspace(size_t workspace_num) const
+    {
+        while (workspace_num >= workspaces_.size()) {
+            workspaces_.push_back(new LabelingWorkspace());
+        }
+        workspaces_[workspace_num]->hyperpath_cache_.setMaxBytes((size_t)(HYPERPATH_CACHE_MB_*1024*1024));
+        return *workspaces_[workspace_num];
+    }
+
+    void PathFinder::clearHyperpathCaches()
+    {
+        for (size_t workspace_num = 0; workspace_num < workspaces_.size(); ++workspace_num) {
+            workspaces_[workspace_num]->hyperpath_cache_.clear();
+        }
+    }
+
+    void PathFinder::setStopHops()
+    {
+        // shortest run time for each (stop, next stop) over all trips
+        std::map< std::pair<int,int>, double > hop_times;
+        for (int trip_id = 0; trip_id+1 < (int)trip_stop_times_offsets_.size(); ++trip_id) {
+            for (int stt_idx = trip_stop_times_offsets_[trip_id]; stt_idx+1 < trip_stop_times_offsets_[trip_id+1]; ++stt_idx) {
+                const TripStopTime& from_stt = trip_stop_times_[stt_idx];
+                const TripStopTime& to_stt   = trip_stop_times_[stt_idx+1];
+
+                double run_time = to_stt.arrive_time_ - from_stt.depart_time_;
+                // the schedule crossed midnight
+                if (run_time < 0) { run_time += 24*60; }
+
+                std::pair<int,int> hop(from_stt.stop_id_, to_stt.stop_id_);
+                std::map< std::pair<int,int>, double >::iterator hop_iter = hop_times.find(hop);
+                if (hop_iter == hop_times.end()) {
+                    hop_times[hop] = run_time;
+                } else {
+                    hop_iter->second = std::min(hop_iter->second, run_time);
+                }
+            }
+        }
+
+        stop_hops_next_.assign(stop_trip_times_offsets_.size(), std::vector< std::pair<int, double> >());
+        stop_hops_prev_.assign(stop_trip_times_offsets_.size(), std::vector< std::pair<int, double> >());
+        for (std::map< std::pair<int,int>, double >::const_iterator hop_iter = hop_times.begin(); hop_iter != hop_times.end(); ++hop_iter) {
+            stop_hops_next_[hop_iter->first.first ].push_back(std::make_pair(hop_iter->first.second, hop_iter->second));
+            stop_hops_prev_[hop_iter->first.second].push_back(std::make_pair(hop_iter->first.first,  hop_iter->second));
+        }
+    }
+
+    void PathFinder::setConnections()
+    {
+        connections_.clear();
+        connections_by_arrival_.clear();
+        trip_connection_times_.assign(trip_stop_times_offsets_.size(), std::make_pair(0.0, 0.0));
+
+        std::vector<double> arrive_times, depart_times;
+        for (int trip_id = 0; trip_id+1 < (int)trip_stop_times_offsets_.size(); ++trip_id) {
+            int trip_begin = trip_stop_times_offsets_[trip_id];
+            int trip_end   = trip_stop_times_offsets_[trip_id+1];
+            if (trip_end - trip_begin < 2) { continue; }
+
+            // keep the times increasing if the schedule crosses midnight
+            arrive_times.clear();
+            depart_times.clear();
+            double day_offset = 0;
+            double last_time  = -MAX_DATETIME;
+            for (int stt_idx = trip_begin; stt_idx < trip_end; ++stt_idx) {
+                double arrive_time = trip_stop_times_[stt_idx].arrive_time_ + day_offset;
+                if (arrive_time < last_time) {
+                    day_offset  += 24*60;
+                    arrive_time += 24*60;
+                }
+                double depart_time = trip_stop_times_[stt_idx].depart_time_ + day_offset;
+                if (depart_time < arrive_time) {
+                    day_offset  += 24*60;
+                    depart_time += 24*60;
+                }
+                arrive_times.push_back(arrive_time);
+                depart_times.push_back(depart_time);
+                last_time = depart_time;
+            }
+
+            for (int stt_idx = trip_begin; stt_idx+1 < trip_end; ++stt_idx) {
+                Connection conn = {
+                    trip_id,                                // trip id
+                    trip_stop_times_[stt_idx].seq_,         // sequence
+                    trip_stop_times_[stt_idx].stop_id_,     // departure stop id
+                    trip_stop_times_[stt_idx+1].stop_id_,   // arrival stop id
+                    depart_times[stt_idx-trip_begin],       // departure time
+                    arrive_times[stt_idx-trip_begin+1]      // arrival time
+                };
+                connections_.push_back(conn);
+            }
+            trip_connection_times_[trip_id] = std::make_pair(depart_times.front(), arrive_times.back());
+        }
+        std::sort(connections_.begin(), connections_.end(), ConnectionCompare());
+
+        connections_by_arrival_.resize(connections_.size());
+        for (int conn_idx = 0; conn_idx < (int)connections_.size(); ++conn_idx) {
+            connections_by_arrival_[conn_idx] = std::make_pair(connections_[conn_idx].arrive_time_, conn_idx);
+        }
+        std::sort(connections_by_arrival_.begin(), connections_by_arrival_.end());
+    }
+
+    const StopLowerBounds& PathFinder::getStopLowerBounds(int taz_id, bool outbound) const
+    {
+        std::pair<int, bool> key(taz_id, outbound);
+        std::map< std::pair<int, bool>, StopLowerBounds >::const_iterator slb_iter = stop_lower_bounds_.find(key);
+        if (slb_iter != stop_lower_bounds_.end()) { return slb_iter->second; }
+
+        StopLowerBounds& lower_bounds = stop_lower_bounds_[key];
+        lower_bounds.assign(std::max(stop_hops_next_.size(), stop_num_to_stop_.size()), MAX_COST);
+
+        // outbound: the TAZ is the origin, so go forwards from its access stops;
+        // inbound:  the TAZ is the destination, so go backwards from its egress stops
+        const StopHops&       stop_hops      = outbound ? stop_hops_next_ : stop_hops_prev_;
+        const StopStopToAttr& transfer_links = outbound ? transfer_links_o_d_ : transfer_links_d_o_;
+
+        typedef std::pair<double, int> CostStop;
+        std::priority_queue< CostStop, std::vector<CostStop>, std::greater<CostStop> > cost_stop_queue;
+
+        std::set<int> taz_stops;
+        access_egress_links_.getStopsForTaz(taz_id, taz_stops);
+        for (std::set<int>::const_iterator stop_iter = taz_stops.begin(); stop_iter != taz_stops.end(); ++stop_iter) {
+            if ((*stop_iter < 0) || (*stop_iter >= (int)lower_bounds.size())) { continue; }
+            lower_bounds[*stop_iter] = 0;
+            cost_stop_queue.push(CostStop(0, *stop_iter));
+        }
+
+        while (!cost_stop_queue.empty()) {
+            CostStop cost_stop = cost_stop_queue.top();
+            cost_stop_queue.pop();
+            int stop_id = cost_stop.second;
+            if (cost_stop.first > lower_bounds[stop_id]) { continue; }
+
+            // transfers are free
+            StopStopToAttr::const_iterator transfer_iter = transfer_links.find(stop_id);
+            if (transfer_iter != transfer_links.end()) {
+                for (StopToAttr::const_iterator xfer_iter = transfer_iter->second.begin(); xfer_iter != transfer_iter->second.end(); ++xfer_iter) {
+                    int xfer_stop_id = xfer_iter->first;
+                    if ((xfer_stop_id >= 0) && (xfer_stop_id < (int)lower_bounds.size()) && (cost_stop.first < lower_bounds[xfer_stop_id])) {
+                        lower_bounds[xfer_stop_id] = cost_stop.first;
+                        cost_stop_queue.push(CostStop(cost_stop.first, xfer_stop_id));
+                    }
+                }
+            }
+            if (stop_id >= (int)stop_hops.size()) { continue; }
+            for (size_t hop_idx = 0; hop_idx < stop_hops[stop_id].size(); ++hop_idx) {
+                int    hop_stop_id = stop_hops[stop_id][hop_idx].first;
+                double cost        = cost_stop.first + stop_hops[stop_id][hop_idx].second;
+                if (cost < lower_bounds[hop_stop_id]) {
+                    lower_bounds[hop_stop_id] = cost;
+                    cost_stop_queue.push(CostStop(cost, hop_stop_id));
+                }
+            }
+        }
+        return lower_bounds;
     }
 
     void PathFinder::setBumpWait(int*       bw_index,
                                  double*    bw_data,
                                  int        num_bw)
     {
+        // deterministic labels depend on these
+        clearHyperpathCaches();
         for (int i=0; i<num_bw; ++i) {
             TripStop ts = { bw_index[3*i], bw_index[3*i+1], bw_index[3*i+2] };
             bump_wait_[ts] = bw_data[i];
@@ -569,6 +1043,15 @@ namespace fasttrips {
         }
     }
 
+    void PathFinder::reloadWeights(const char* weights_dir)
+    {
+        weight_lookup_.clear();
+        readWeights(weights_dir);
+        // labels and lower bounds depend on these
+        stop_lower_bounds_.clear();
+        clearHyperpathCaches();
+    }
+
     void PathFinder::reset()
     {
         weight_lookup_.clear();
@@ -579,8 +1062,19 @@ namespace fasttrips {
 
         trip_info_.clear();
         trip_stop_times_.clear();
+        trip_stop_times_offsets_.clear();
+        trip_stop_times_stop_idx_.clear();
         stop_trip_times_.clear();
-        route_fares_.clear();
+        stop_trip_times_offsets_.clear();
+        stop_arrive_index_.clear();
+        stop_depart_index_.clear();
+        stop_hops_next_.clear();
+        stop_hops_prev_.clear();
+        connections_.clear();
+        connections_by_arrival_.clear();
+        trip_connection_times_.clear();
+        stop_lower_bounds_.clear();
+        clearHyperpathCaches();
         fare_periods_.clear();
         fare_transfer_rules_.clear();
 
@@ -592,113 +1086,740 @@ namespace fasttrips {
         bump_wait_.clear();
     }
 
-    /// This doesn't really do anything because the instance variables are all STL structures
-    /// which take care of freeing memory.
+    /// The instance variables are almost all STL structures which take care of freeing memory;
+    /// this just deletes the workspaces.
     PathFinder::~PathFinder()
     {
         // std::cout << "PathFinder destructor" << std::endl;
+        for (size_t workspace_num = 0; workspace_num < workspaces_.size(); ++workspace_num) {
+            delete workspaces_[workspace_num];
+        }
+    }
+
+    int PathFinder::findPathSet(
+        PathSpecification path_spec,
+        PathSet           &pathset,
+        PerformanceInfo   &performance_info) const
+    {
+        return findPathSet(path_spec, pathset, performance_info, getWorkspace(0));
+    }
+
+    int PathFinder::findPathSet(
+        PathSpecification path_spec,
+        PathSet           &pathset,
+        PerformanceInfo   &performance_info,
+        LabelingWorkspace &workspace) const
+    {
+        // for now we'll just trace
+        // if (!path_spec.trace_) { return; }
+
+        if (path_spec.user_class_ == "crash") {
+            std::cerr << "Crashing to test" << std::endl;
+            exit(2);
+        }
+
+        std::ofstream trace_file;
+        if (path_spec.trace_) {
+            std::ostringstream ss;
+            ss << output_dir_ << kPathSeparator;
+            ss << "fasttrips_trace_" << path_spec.person_id_ << "-" << path_spec.person_trip_id_ << ".log";
+            // append because this will happen across iterations
+            std::ios_base::openmode omode = std::ios_base::out;
+            if (path_spec.iteration_ > 1 || path_spec.pathfinding_iteration_ > 1) {
+                omode = omode | std::ios_base::app; // append
+            }
+            trace_file.open(ss.str().c_str(), omode);
+            trace_file << "Tracing assignment of person " << path_spec.person_id_ << " with person_trip_id" << path_spec.person_trip_id_ << std::endl;
+            trace_file << "iteration_       = " << path_spec.iteration_ << std::endl;
+            trace_file << "pathfinding_iter = " << path_spec.pathfinding_iteration_ << std::endl;
+            trace_file << "outbound_        = " << path_spec.outbound_  << std::endl;
+            trace_file << "hyperpath_       = " << path_spec.hyperpath_ << std::endl;
+            trace_file << "connection_scan_ = " << path_spec.connection_scan_ << std::endl;
+            trace_file << "preferred_time_  = ";
+            printTime(trace_file, path_spec.preferred_time_);
+            trace_file << " (" << path_spec.preferred_time_ << ")" << std::endl;
+            trace_file << "value_of_time_   = " << path_spec.value_of_time_<< std::endl;
+            trace_file << "user_class_      = " << path_spec.user_class_   << std::endl;
+            trace_file << "purpose_         = " << path_spec.purpose_      << std::endl;
+            trace_file << "access_mode_     = " << path_spec.access_mode_  << std::endl;
+            trace_file << "transit_mode_    = " << path_spec.transit_mode_ << std::endl;
+            trace_file << "egress_mode_     = " << path_spec.egress_mode_  << std::endl;
+            trace_file << "orig_taz_id_     = " << stopStringForId(path_spec.origin_taz_id_     ) << std::endl;
+            trace_file << "dest_taz_id_     = " << stopStringForId(path_spec.destination_taz_id_)<< std::endl;
+
+            std::ostringstream ss2;
+            ss2 << output_dir_ << kPathSeparator;
+            ss2 << "fasttrips_labels_ids_" << path_spec.person_id_ << "-" << path_spec.person_trip_id_ << ".csv";
+            stopids_file.open(ss2.str().c_str(), omode);
+            stopids_file << "stop_id,stop_id_label_iter,is_trip,label_stop_cost" << std::endl;
+        }
+
+        if (path_spec.connection_scan_) {
+            int pf_returnstatus = findPathSetByConnectionScan(path_spec, trace_file, pathset, performance_info,
+                                                              workspace.connection_scan_labels_);
+            if (path_spec.trace_) {
+                trace_file.close();
+                label_file.close();
+                stopids_file.close();
+            }
+            return pf_returnstatus;
+        }
+
+        // with the hyperpath cache, the stop states may be labeled already
+        HyperpathCache&      hyperpath_cache  = workspace.hyperpath_cache_;
+        HyperpathCacheKey    cache_key(path_spec, HYPERPATH_CACHE_TIME_BUCKET_MIN_);
+        bool                 use_cache        = hyperpath_cache.enabled() && !path_spec.trace_ &&
+                                                (path_spec.origin_taz_id_ != path_spec.destination_taz_id_);
+        StopStates*          cached_states    = use_cache ? hyperpath_cache.find(cache_key) : NULL;
+        bool                 cache_hit        = (cached_states != NULL);
+        if (use_cache && !cache_hit) { cached_states = &hyperpath_cache.insert(cache_key); }
+
+        // with time buckets, cached stop states are labeled for the start of the time bucket, whichever trip in it
+        // comes first, so that a trip's pathset doesn't depend on which trips the thread found before it.
+        // without them, only trips with the same preferred time share stop states, so they're labeled for it.
+        PathSpecification    label_spec       = path_spec;
+        if (use_cache && (HYPERPATH_CACHE_TIME_BUCKET_MIN_ > 0)) {
+            label_spec.preferred_time_ = cache_key.bucketStartTime(HYPERPATH_CACHE_TIME_BUCKET_MIN_);
+        }
+
+        StopStates&          stop_states      = use_cache ? *cached_states : workspace.stop_states_;
+        LabelStopQueue&      label_stop_queue = workspace.label_stop_queue_;
+        if (!use_cache) { stop_states.clear(); }
+        label_stop_queue.clear();
+        stop_states.reserve((int)stop_num_to_stop_.size());
+        label_stop_queue.reserve((int)stop_num_to_stop_.size());
+
+#ifdef _WIN32
+        // QueryPerformanceFrequency reference: https://msdn.microsoft.com/en-us/library/windows/desktop/dn553408(v=vs.85).aspx
+        LARGE_INTEGER        frequency;
+        LARGE_INTEGER        labeling_start_time, labeling_end_time, pathfind_end_time;
+        LARGE_INTEGER        label_elapsed, pathfind_elapsed;
+        QueryPerformanceFrequency(&frequency);
+        QueryPerformanceCounter(&labeling_start_time);
+#else
+        // using gettimeofday() since std::chrono is only c++11
+        struct timeval       labeling_start_time, labeling_end_time, pathfind_end_time;
+        gettimeofday(&labeling_start_time, NULL);
+#endif
+
+        int pf_returnstatus = -1;
+        bool success = cache_hit || initializeStopStates(label_spec, trace_file, stop_states, label_stop_queue);
+        if (!success) {
+            pf_returnstatus = PathFinder::RET_FAIL_INIT_STOP_STATES;
+            if (path_spec.trace_) {
+                trace_file << "initializeStopStates() failed.  Skipping labeling." << std::endl;
+            }
+        }
+
+        // These are the stops that are reachable from the final TAZ
+        std::map<int, int> reachable_final_stops;
+        if (success) {
+            success = setReachableFinalStops(path_spec, trace_file, reachable_final_stops);
+            if (!success) {
+                pf_returnstatus = PathFinder::RET_FAIL_SET_REACHABLE;
+                if (path_spec.trace_) {
+                    trace_file << "setReachableFinalStops() failed.  Skipping labeling." << std::endl;
+                }
+            }
+        }
+
+        // don't go further if we failed an earlier step
+        if (!success) {
+            if (!use_cache) {
+                stop_states.clear();
+            } else if (!cache_hit) {
+                hyperpath_cache.erase(cache_key);
+            }
+
+            if (path_spec.trace_) {
+                trace_file.close();
+                label_file.close();
+                stopids_file.close();
+            }
+            return pf_returnstatus;
+        }
+
+        PathWeights path_weights;
+        getPathWeights(path_spec, path_weights);
+        if (!cache_hit) {
+            // cached labels need to work for any end TAZ, so label those without one
+            std::map<int, int> no_final_stops;
+            const StopLowerBounds* stop_lower_bounds = NULL;
+            if (LOWER_BOUND_PRUNING_ && !use_cache) {
+                stop_lower_bounds = &getStopLowerBounds(path_spec.outbound_ ? path_spec.origin_taz_id_ : path_spec.destination_taz_id_,
+                                                        path_spec.outbound_);
+            }
+            performance_info.label_iterations_ = labelStops(label_spec, trace_file, path_weights,
+                                                            use_cache ? no_final_stops : reachable_final_stops, stop_lower_bounds,
+                                                            stop_states, label_stop_queue, performance_info.max_process_count_,
+                                                            performance_info.pruned_stops_);
+            performance_info.queue_pushes_        = label_stop_queue.push_count();
+            performance_info.queue_decrease_keys_ = label_stop_queue.decrease_key_count();
+            performance_info.queue_pops_          = label_stop_queue.pop_count();
+        }
+        performance_info.num_labeled_stops_   = stop_states.size();
+
+        if (use_cache) {
+            performance_info.cache_hits_   = cache_hit ? 1 : 0;
+            performance_info.cache_misses_ = cache_hit ? 0 : 1;
+            if (!cache_hit) { performance_info.cache_evictions_ = hyperpath_cache.updateSize(); }
+
+            labelFinalStops(path_spec, trace_file, path_weights, reachable_final_stops, stop_states, label_stop_queue);
+        }
+
+#ifdef _WIN32
+        QueryPerformanceCounter(&labeling_end_time);
+#else
+        gettimeofday(&labeling_end_time, NULL);
+#endif
+
+        pf_returnstatus = getPathSet(path_spec, trace_file, stop_states, pathset);
+
+#ifdef _WIN32
+        QueryPerformanceCounter(&pathfind_end_time);
+
+        label_elapsed.QuadPart                = labeling_end_time.QuadPart - labeling_start_time.QuadPart;
+        pathfind_elapsed.QuadPart             = pathfind_end_time.QuadPart - labeling_end_time.QuadPart;
+
+        // We now have the elapsed number of ticks, along with the
+        // number of ticks-per-second. We use these values
+        // to convert to the number of elapsed milliseconds.
+        // To guard against loss-of-precision, we convert
+        // to microseconds *before* dividing by ticks-per-second.
+        label_elapsed.QuadPart    *= 1000;
+        label_elapsed.QuadPart    /= frequency.QuadPart;
+        pathfind_elapsed.QuadPart *= 1000;
+        pathfind_elapsed.QuadPart /= frequency.QuadPart;
+
+        performance_info.milliseconds_labeling_    = (long)label_elapsed.QuadPart;
+        performance_info.milliseconds_enumerating_ = (long)pathfind_elapsed.QuadPart;
+
+        PROCESS_MEMORY_COUNTERS_EX pmc;
+        if ( GetProcessMemoryInfo(GetCurrentProcess(), (PROCESS_MEMORY_COUNTERS*)&pmc, sizeof(pmc)) )
+        {
+            performance_info.workingset_bytes_   = pmc.WorkingSetSize;
+            performance_info.privateusage_bytes_ = pmc.PrivateUsage;
+            performance_info.mem_timestamp_      = (long)time((time_t*)0);
+        }
+#else
+        gettimeofday(&pathfind_end_time, NULL);
+
+        // microseconds
+        long int diff = (labeling_end_time.tv_usec   + 1000000*labeling_end_time.tv_sec) -
+                        (labeling_start_time.tv_usec + 1000000*labeling_start_time.tv_sec);
+        performance_info.milliseconds_labeling_ = 0.001*diff;
+
+        diff = (pathfind_end_time.tv_usec   + 1000000*pathfind_end_time.tv_sec) -
+               (labeling_end_time.tv_usec   + 1000000*labeling_end_time.tv_sec);
+        performance_info.milliseconds_enumerating_ = 0.001*diff;
+#endif
+
+        // clear stop states since they have path pointers; cached ones just lose this end TAZ
+        if (use_cache) {
+            stop_states.erase(path_spec.outbound_ ? path_spec.origin_taz_id_ : path_spec.destination_taz_id_);
+        } else {
+            stop_states.clear();
+        }
+
+        if (path_spec.trace_) {
+
+            trace_file << "        label iterations: " << performance_info.label_iterations_    << std::endl;
+            trace_file << "       max process count: " << performance_info.max_process_count_   << std::endl;
+            trace_file << "      label queue pushes: " << performance_info.queue_pushes_        << std::endl;
+            trace_file << "label queue decrease keys: " << performance_info.queue_decrease_keys_ << std::endl;
+            trace_file << "        label queue pops: " << performance_info.queue_pops_          << std::endl;
+            trace_file << "    pruned label stops: " << performance_info.pruned_stops_         << std::endl;
+            trace_file << "   milliseconds labeling: " << performance_info.milliseconds_labeling_    << std::endl;
+            trace_file << "milliseconds enumerating: " << performance_info.milliseconds_enumerating_ << std::endl;
+            trace_file.close();
+            label_file.close();
+            stopids_file.close();
+        }
+        return pf_returnstatus;
+    }
+
+    /**
+     * For the connection scan: sets the trip (or walk) label and link for the stop if the time is
+     * better than the one there -- later for outbound, earlier for inbound -- and notes the stop as touched.
+     *
+     * @return true if the label was set.
+     */
+    static bool setConnectionScanLabel(ConnectionScanLabels& labels,
+                                       bool                  is_trip,
+                                       int                   stop_id,
+                                       double                time,
+                                       double                dir_factor,
+                                       const StopState&      stop_state)
+    {
+        std::vector<double>&    times  = is_trip ? labels.trip_time_  : labels.walk_time_;
+        std::vector<StopState>& states = is_trip ? labels.trip_state_ : labels.walk_state_;
+        if ((states[stop_id].iteration_ >= 0) && (time*dir_factor <= times[stop_id]*dir_factor)) { return false; }
+
+        if ((labels.walk_state_[stop_id].iteration_ < 0) && (labels.trip_state_[stop_id].iteration_ < 0)) {
+            labels.touched_stops_.push_back(stop_id);
+        }
+        times[stop_id]  = time;
+        states[stop_id] = stop_state;
+        return true;
+    }
+
+    /**
+     * For the connection scan: if there's a way to every end TAZ, sets worst_end_time to the worst of them
+     * -- earliest for outbound, latest for inbound.
+     *
+     * @return true if there's a way to every end TAZ.
+     */
+    static bool getWorstConnectionScanEnd(const ConnectionScanLabels& labels, double dir_factor, double& worst_end_time)
+    {
+        if (labels.end_state_.empty()) { return false; }
+        for (size_t end_num = 0; end_num < labels.end_state_.size(); ++end_num) {
+            if (labels.end_state_[end_num].iteration_ < 0) { return false; }
+            if ((end_num == 0) || (labels.end_time_[end_num]*dir_factor < worst_end_time*dir_factor)) {
+                worst_end_time = labels.end_time_[end_num];
+            }
+        }
+        return true;
+    }
+
+    /// For the connection scan: resets what the labels touched, and the end TAZs, for the next search.
+    static void resetConnectionScan(ConnectionScanLabels& labels)
+    {
+        for (size_t touched_num = 0; touched_num < labels.touched_stops_.size(); ++touched_num) {
+            labels.walk_state_[labels.touched_stops_[touched_num]] = StopState();
+            labels.trip_state_[labels.touched_stops_[touched_num]] = StopState();
+        }
+        for (size_t touched_num = 0; touched_num < labels.touched_trips_.size(); ++touched_num) {
+            labels.trip_start_seq_[labels.touched_trips_[touched_num]] = 0;
+        }
+        labels.touched_stops_.clear();
+        labels.touched_trips_.clear();
+        labels.end_taz_ids_.clear();
+        labels.end_time_.clear();
+        labels.end_state_.clear();
+        labels.end_scan_num_.clear();
+        labels.end_links_.clear();
+    }
+
+    bool PathFinder::startConnectionScan(
+        const PathSpecification& path_spec,
+        const PathWeights&       path_weights,
+        double                   start_time,
+        double&                  horizon,
+        ConnectionScanLabels&    labels) const
+    {
+        int    start_taz_id = path_spec.outbound_ ? path_spec.destination_taz_id_ : path_spec.origin_taz_id_;
+        double dir_factor   = path_spec.outbound_ ? 1.0 : -1.0;
+
+        // size the labels for this network; entries are reset after each search so only grow them
+        size_t num_stops = std::max(stop_num_to_stop_.size(), stop_trip_times_offsets_.size());
+        if (labels.walk_state_.size() < num_stops) {
+            labels.walk_time_.resize(num_stops, 0);
+            labels.walk_state_.resize(num_stops, StopState());
+            labels.trip_time_.resize(num_stops, 0);
+            labels.trip_state_.resize(num_stops, StopState());
+        }
+        if (labels.trip_start_seq_.size() < trip_stop_times_offsets_.size()) {
+            labels.trip_start_seq_.resize(trip_stop_times_offsets_.size(), 0);
+            labels.trip_start_time_.resize(trip_stop_times_offsets_.size(), 0);
+            labels.trip_start_wait_.resize(trip_stop_times_offsets_.size(), 0);
+        }
+
+        // the scan needs to go as far as this: a time window past the walk labels, or to the end of trips already on
+        horizon = dir_factor*MAX_DATETIME;
+        bool labeled = false;
+
+        // start with the egress (outbound) or access (inbound) links from the start TAZ
+        if ((path_weights.delay_weights_ == NULL) || !access_egress_links_.hasLinksForTaz(start_taz_id)) { return false; }
+
+        for (SupplyModeToNamedWeights::const_iterator iter_s2w  = path_weights.delay_weights_->begin();
+                                                      iter_s2w != path_weights.delay_weights_->end(); ++iter_s2w)
+        {
+            int supply_mode_num = iter_s2w->first;
+            for (AccessEgressLinkAttr::const_iterator iter_aelk  = access_egress_links_.lower_bound(start_taz_id, supply_mode_num);
+                                                      iter_aelk != access_egress_links_.upper_bound(start_taz_id, supply_mode_num); ++iter_aelk)
+            {
+                // require preferred_time_ in [start_time_, end_time), like PathFinder::initializeStopStates
+                const AccessEgressLinkKey& aelk = iter_aelk->first;
+                if (aelk.start_time_ >  path_spec.preferred_time_) continue;
+                if (aelk.end_time_   <= path_spec.preferred_time_) continue;
+
+                double attr_time = iter_aelk->second.get(ATTR_TIME_MIN);
+                double attr_dist = iter_aelk->second.get(ATTR_DIST);
+                // outbound: departure time = destination - egress
+                // inbound:  arrival time   = origin      + access
+                double deparr_time = start_time - (attr_time*dir_factor);
+                StopState ss(
+                    deparr_time,                                        // departure/arrival time
+                    path_spec.outbound_ ? MODE_EGRESS : MODE_ACCESS,    // departure/arrival mode
+                    supply_mode_num,                                    // trip id
+                    start_taz_id,                                       // successor/predecessor
+                    -1,                                                 // sequence
+                    -1,                                                 // sequence succ/pred
+                    attr_time,                                          // link time
+                    0.0,                                                // link fare
+                    attr_time,                                          // link cost
+                    attr_dist,                                          // link distance
+                    attr_time,                                          // cost
+                    0,                                                  // iteration
+                    path_spec.preferred_time_,                          // arrival/departure time
+                    0.0                                                 // link ivt weight
+                );
+                if (setConnectionScanLabel(labels, false, aelk.stop_id_, deparr_time, dir_factor, ss)) {
+                    labeled = true;
+                    double reach = deparr_time - dir_factor*Hyperlink::TIME_WINDOW_;
+                    if (reach*dir_factor < horizon*dir_factor) { horizon = reach; }
+                }
+            }
+        }
+        return labeled;
+    }
+
+    void PathFinder::setConnectionScanEnds(
+        const PathSpecification& path_spec,
+        const PathWeights&       path_weights,
+        const std::vector<int>&  end_taz_ids,
+        ConnectionScanLabels&    labels) const
+    {
+        labels.end_taz_ids_ = end_taz_ids;
+        labels.end_time_.assign(end_taz_ids.size(), 0);
+        labels.end_state_.assign(end_taz_ids.size(), StopState());
+        labels.end_scan_num_.assign(end_taz_ids.size(), -1);
+        labels.end_links_.clear();
+        if (path_weights.final_weights_ == NULL) { return; }
+
+        // the stops linked to each end TAZ by access (outbound) or egress (inbound) supply modes with weights
+        for (size_t end_num = 0; end_num < end_taz_ids.size(); ++end_num) {
+            for (SupplyModeToNamedWeights::const_iterator iter_s2w  = path_weights.final_weights_->begin();
+                                                          iter_s2w != path_weights.final_weights_->end(); ++iter_s2w)
+            {
+                for (AccessEgressLinkAttr::const_iterator iter_aelk  = access_egress_links_.lower_bound(end_taz_ids[end_num], iter_s2w->first);
+                                                          iter_aelk != access_egress_links_.upper_bound(end_taz_ids[end_num], iter_s2w->first); ++iter_aelk)
+                {
+                    // links for other time periods are the same as far as this goes
+                    std::vector< std::pair<int, int> >& stop_links = labels.end_links_[iter_aelk->first.stop_id_];
+                    std::pair<int, int> end_link((int)end_num, iter_s2w->first);
+                    if (stop_links.empty() || (stop_links.back() != end_link)) { stop_links.push_back(end_link); }
+                }
+            }
+        }
+    }
+
+    int PathFinder::scanConnections(
+        const PathSpecification& path_spec,
+        const PathWeights&       path_weights,
+        double                   start_time,
+        double                   horizon,
+        int                      scan_num,
+        std::ofstream&           trace_file,
+        ConnectionScanLabels&    labels) const
+    {
+        int    start_taz_id = path_spec.outbound_ ? path_spec.destination_taz_id_ : path_spec.origin_taz_id_;
+        // outbound scans backwards from the destination so later is better; inbound scans forwards so earlier is better
+        double dir_factor   = path_spec.outbound_ ? 1.0 : -1.0;
+
+        const StopStopToAttr& transfer_links = (path_spec.outbound_ ? transfer_links_d_o_ : transfer_links_o_d_);
+        size_t    num_ends_found = 0;
+        for (size_t end_num = 0; end_num < labels.end_state_.size(); ++end_num) {
+            if (labels.end_state_[end_num].iteration_ >= 0) { num_ends_found += 1; }
+        }
+        double    worst_end_time = 0;
+        bool      found_all_ends = getWorstConnectionScanEnd(labels, dir_factor, worst_end_time);
+        int       num_scanned = 0;
+        int       num_connections = (int)connections_.size();
+
+        // outbound: by arrival time, latest first, from the preferred arrival; inbound: by departure time from the preferred departure
+        int conn_pos = 0;
+        if (path_spec.outbound_) {
+            conn_pos = (int)(std::upper_bound(connections_by_arrival_.begin(), connections_by_arrival_.end(),
+                                              std::make_pair(start_time, INT_MAX)) - connections_by_arrival_.begin()) - 1;
+        } else {
+            Connection first = { -1, -1, -1, -1, start_time, -MAX_DATETIME };
+            conn_pos = (int)(std::lower_bound(connections_.begin(), connections_.end(), first, ConnectionCompare()) - connections_.begin());
+        }
+        int conn_inc = path_spec.outbound_ ? -1 : 1;
+
+        for (; (conn_pos >= 0) && (conn_pos < num_connections); conn_pos += conn_inc)
+        {
+            const Connection& conn = path_spec.outbound_ ? connections_[connections_by_arrival_[conn_pos].second] : connections_[conn_pos];
+
+            // the "from" end of the connection is the one nearer the start TAZ, the "to" end is nearer the end TAZ
+            int    from_stop = path_spec.outbound_ ? conn.arr_stop_id_  : conn.dep_stop_id_;
+            int    from_seq  = path_spec.outbound_ ? conn.seq_+1        : conn.seq_;
+            double from_time = path_spec.outbound_ ? conn.arrive_time_  : conn.depart_time_;
+            int    to_stop   = path_spec.outbound_ ? conn.dep_stop_id_  : conn.arr_stop_id_;
+            int    to_seq    = path_spec.outbound_ ? conn.seq_          : conn.seq_+1;
+            double to_time   = path_spec.outbound_ ? conn.depart_time_  : conn.arrive_time_;
+
+            // nothing past here can be reached, or improve on the paths found
+            if (from_time*dir_factor < horizon*dir_factor) { break; }
+            if (found_all_ends && (from_time*dir_factor <= worst_end_time*dir_factor)) { break; }
+            num_scanned += 1;
+
+            const TripInfo& trip_info = trip_info_[conn.trip_id_];
+            int trip_offset = trip_stop_times_offsets_[conn.trip_id_];
+
+            // get on the trip here if we aren't on it already -- or if we were only on it from further along,
+            // which happens when the labels are kept from a scan that started later (inbound) or earlier (outbound)
+            bool on_trip = (labels.trip_start_seq_[conn.trip_id_] != 0) &&
+                           (from_time*dir_factor <= labels.trip_start_time_[conn.trip_id_]*dir_factor);
+            if (!on_trip) {
+                const StopState& walk_state = labels.walk_state_[from_stop];
+                if (walk_state.iteration_ < 0) { continue; }
+                double wait_time = (labels.walk_time_[from_stop] - from_time)*dir_factor;
+                if ((wait_time < 0) || (wait_time > Hyperlink::TIME_WINDOW_)) { continue; }
+
+                // this supply mode isn't allowed for the userclass/demand mode
+                if ((trip_info.supply_mode_num_ < 0) ||
+                    (trip_info.supply_mode_num_ >= (int)path_weights.transit_weights_.size()) ||
+                    (path_weights.transit_weights_[trip_info.supply_mode_num_] == NULL)) {
+                    continue;
+                }
+
+                // the access (inbound) or egress (outbound) link has to exist when Path::calculateCost looks for it
+                if (walk_state.deparr_mode_ == MODE_ACCESS) {
+                    double orig_departure_time = trip_stop_times_[trip_offset + conn.seq_ - 1].depart_time_ - walk_state.link_time_;
+                    if (getAccessAttributes(start_taz_id, walk_state.trip_id_, from_stop, orig_departure_time) == NULL) { continue; }
+                } else if (walk_state.deparr_mode_ == MODE_EGRESS) {
+                    double dest_arrival_time = from_time + walk_state.link_time_;
+                    if (getAccessAttributes(start_taz_id, walk_state.trip_id_, from_stop, dest_arrival_time) == NULL) { continue; }
+                }
+
+                // inbound: check that we get here before the bumped passengers start waiting for this trip
+                if (!path_spec.outbound_) {
+                    TripStop ts = { conn.trip_id_, conn.seq_, conn.dep_stop_id_ };
+                    std::map<TripStop, double, struct TripStopCompare>::const_iterator bwi = bump_wait_.find(ts);
+                    if ((bwi != bump_wait_.end()) && (labels.walk_time_[from_stop] + 0.01 >= bwi->second)) {
+                        if (path_spec.trace_) {
+                            trace_file << "bump wait: can't board trip " << tripStringForId(conn.trip_id_) << " at " << stopStringForId(from_stop) << std::endl;
+                        }
+                        continue;
+                    }
+                }
+
+                if (labels.trip_start_seq_[conn.trip_id_] == 0) { labels.touched_trips_.push_back(conn.trip_id_); }
+                labels.trip_start_seq_ [conn.trip_id_] = from_seq;
+                labels.trip_start_time_[conn.trip_id_] = from_time;
+                labels.trip_start_wait_[conn.trip_id_] = wait_time;
+
+                // stay on for the rest of the trip
+                double trip_end = path_spec.outbound_ ? trip_connection_times_[conn.trip_id_].first : trip_connection_times_[conn.trip_id_].second;
+                if (trip_end*dir_factor < horizon*dir_factor) { horizon = trip_end; }
+            }
+
+            // get off (inbound) or on (outbound) at the other end
+            double label_time = to_time;
+            if (path_spec.outbound_) {
+                // get in line before the bumped passengers
+                TripStop ts = { conn.trip_id_, conn.seq_, conn.dep_stop_id_ };
+                std::map<TripStop, double, struct TripStopCompare>::const_iterator bwi = bump_wait_.find(ts);
+                if (bwi != bump_wait_.end()) { label_time = std::min(label_time, bwi->second - BUMP_BUFFER_); }
+            }
+            if ((labels.trip_state_[to_stop].iteration_ >= 0) && (label_time*dir_factor <= labels.trip_time_[to_stop]*dir_factor)) { continue; }
+
+            int    start_seq       = labels.trip_start_seq_[conn.trip_id_];
+            const TripStopTime& start_stt = trip_stop_times_[trip_offset + start_seq - 1];
+            const TripStopTime& to_stt    = trip_stop_times_[trip_offset + to_seq - 1];
+            double in_vehicle_time = (labels.trip_start_time_[conn.trip_id_] - to_time)*dir_factor;
+            double link_time       = in_vehicle_time + labels.trip_start_wait_[conn.trip_id_];
+            double cost            = (start_time - label_time)*dir_factor;
+            StopState trip_ss(
+                to_time,                                        // departure/arrival time
+                MODE_TRANSIT,                                   // departure/arrival mode
+                conn.trip_id_,                                  // trip id
+                start_stt.stop_id_,                             // successor/predecessor
+                to_seq,                                         // sequence
+                start_seq,                                      // sequence succ/pred
+                link_time,                                      // link time
+                0.0,                                            // link fare
+                link_time,                                      // link cost
+                dir_factor*(start_stt.shape_dist_trav_ - to_stt.shape_dist_trav_), // link distance
+                cost,                                           // cost
+                num_scanned,                                    // label iteration
+                labels.trip_start_time_[conn.trip_id_],         // arrival/departure time
+                0.0                                             // link ivt weight
+            );
+            setConnectionScanLabel(labels, true, to_stop, label_time, dir_factor, trip_ss);
+
+            // transfers to (outbound) or from (inbound) here, including the zero-walk transfer
+            if (path_weights.transfer_weights_ != NULL) {
+                std::vector< std::pair<int, const Attributes*> > transfers(1, std::make_pair(to_stop, getTransferAttributes(to_stop, to_stop)));
+                StopStopToAttr::const_iterator transfer_map_it = transfer_links.find(to_stop);
+                if (transfer_map_it != transfer_links.end()) {
+                    for (StopToAttr::const_iterator transfer_it = transfer_map_it->second.begin();
+                         transfer_it != transfer_map_it->second.end(); ++transfer_it) {
+                        transfers.push_back(std::make_pair(transfer_it->first, &(transfer_it->second)));
+                    }
+                }
+                for (size_t xfer_num = 0; xfer_num < transfers.size(); ++xfer_num) {
+                    int    xfer_stop_id  = transfers[xfer_num].first;
+                    double transfer_time = (xfer_num == 0) ? transfers[xfer_num].second->get(ATTR_WALK_TIME_MIN) : transfers[xfer_num].second->get(ATTR_TIME_MIN);
+                    double transfer_dist = (xfer_num == 0) ? 0.0 : transfers[xfer_num].second->get(ATTR_DIST);
+                    // outbound: departure time = boarding - transfer
+                    //  inbound: arrival time   = alighting + transfer
+                    double deparr_time   = label_time - (transfer_time*dir_factor);
+                    StopState xfer_ss(
+                        deparr_time,                            // departure/arrival time
+                        MODE_TRANSFER,                          // departure/arrival mode
+                        1,                                      // trip id
+                        to_stop,                                // successor/predecessor
+                        -1,                                     // sequence
+                        -1,                                     // sequence succ/pred
+                        transfer_time,                          // link time
+                        0.0,                                    // link fare
+                        transfer_time,                          // link cost
+                        transfer_dist,                          // link distance
+                        cost + transfer_time,                   // cost
+                        num_scanned,                            // label iteration
+                        label_time,                             // arrival/departure time
+                        0.0                                     // link ivt weight
+                    );
+                    if (setConnectionScanLabel(labels, false, xfer_stop_id, deparr_time, dir_factor, xfer_ss)) {
+                        double reach = deparr_time - dir_factor*Hyperlink::TIME_WINDOW_;
+                        if (reach*dir_factor < horizon*dir_factor) { horizon = reach; }
+                    }
+                }
+            }
+
+            // access (outbound) or egress (inbound) to the end TAZs
+            std::map< int, std::vector< std::pair<int, int> > >::const_iterator end_links_it = labels.end_links_.find(to_stop);
+            if (end_links_it == labels.end_links_.end()) { continue; }
+            for (size_t link_num = 0; link_num < end_links_it->second.size(); ++link_num)
+            {
+                int    end_num        = end_links_it->second[link_num].first;
+                int    end_taz_id     = labels.end_taz_ids_[end_num];
+                int    supply_mode_num= end_links_it->second[link_num].second;
+                const Attributes* end_attr = getAccessAttributes(end_taz_id, supply_mode_num, to_stop, label_time);
+                if (end_attr == NULL) { continue; }
+                double end_link_time  = end_attr->get(ATTR_TIME_MIN);
+                double end_time       = label_time - (end_link_time*dir_factor);
+
+                // the link has to exist when Path::calculateCost looks for it
+                double cost_time = path_spec.outbound_ ? trip_stop_times_[trip_offset + conn.seq_ - 1].depart_time_ - end_link_time : end_time;
+                if (getAccessAttributes(end_taz_id, supply_mode_num, to_stop, cost_time) == NULL) { continue; }
+
+                StopState& end_state = labels.end_state_[end_num];
+                if ((end_state.iteration_ >= 0) && (end_time*dir_factor <= labels.end_time_[end_num]*dir_factor)) { continue; }
+                if (end_state.iteration_ < 0) { num_ends_found += 1; }
+                labels.end_time_[end_num]     = end_time;
+                labels.end_scan_num_[end_num] = scan_num;
+                end_state = StopState(
+                    end_time,                                   // departure/arrival time
+                    path_spec.outbound_ ? MODE_ACCESS : MODE_EGRESS, // departure/arrival mode
+                    supply_mode_num,                            // trip id
+                    to_stop,                                    // successor/predecessor
+                    -1,                                         // sequence
+                    -1,                                         // sequence succ/pred
+                    end_link_time,                              // link time
+                    0.0,                                        // link fare
+                    end_link_time,                              // link cost
+                    end_attr->get(ATTR_DIST),                   // link distance
+                    cost + end_link_time,                       // cost
+                    num_scanned,                                // label iteration
+                    label_time,                                 // arrival/departure time
+                    0.0                                         // link ivt weight
+                );
+                if (num_ends_found == labels.end_state_.size()) {
+                    found_all_ends = getWorstConnectionScanEnd(labels, dir_factor, worst_end_time);
+                }
+            }
+        }
+        return num_scanned;
     }
 
-    int PathFinder::findPathSet(
-        PathSpecification path_spec,
-        PathSet           &pathset,
-        PerformanceInfo   &performance_info) const
+    int PathFinder::getConnectionScanPath(
+        const PathSpecification&    path_spec,
+        const PathWeights&          path_weights,
+        size_t                      end_num,
+        std::ofstream&              trace_file,
+        const ConnectionScanLabels& labels,
+        Path&                       path) const
     {
-        // for now we'll just trace
-        // if (!path_spec.trace_) { return; }
+        // outbound: origin to destination
+        // inbound:  destination to origin
+        int final_state_type = path_spec.outbound_ ? MODE_EGRESS : MODE_ACCESS;
 
-        if (path_spec.user_class_ == "crash") {
-            std::cerr << "Crashing to test" << std::endl;
-            exit(2);
-        }
+        path.addLink(labels.end_taz_ids_[end_num], labels.end_state_[end_num], trace_file, path_spec, *this);
 
-        std::ofstream trace_file;
-        if (path_spec.trace_) {
-            std::ostringstream ss;
-            ss << output_dir_ << kPathSeparator;
-            ss << "fasttrips_trace_" << path_spec.person_id_ << "-" << path_spec.person_trip_id_ << ".log";
-            // append because this will happen across iterations
-            std::ios_base::openmode omode = std::ios_base::out;
-            if (path_spec.iteration_ > 1 || path_spec.pathfinding_iteration_ > 1) {
-                omode = omode | std::ios_base::app; // append
+        // each stop is passed at most twice, once by trip and once by walking, so more links than that means a cycle
+        size_t max_links = 2*labels.touched_stops_.size() + 1;
+        while (path.back().second.deparr_mode_ != final_state_type)
+        {
+            int       stop_id = path.back().second.stop_succpred_;
+            StopState link    = isTrip(path.back().second.deparr_mode_) ? labels.walk_state_[stop_id] : labels.trip_state_[stop_id];
+            if ((link.iteration_ < 0) || (path.size() >= max_links)) {
+                std::cerr << "Connection scan path broken at stop " << stopStringForId(stop_id) << " for person " << path_spec.person_id_ << " trip " << path_spec.person_trip_id_ << std::endl;
+                return RET_FAIL_NO_PATHS_GEN;
             }
-            trace_file.open(ss.str().c_str(), omode);
-            trace_file << "Tracing assignment of person " << path_spec.person_id_ << " with person_trip_id" << path_spec.person_trip_id_ << std::endl;
-            trace_file << "iteration_       = " << path_spec.iteration_ << std::endl;
-            trace_file << "pathfinding_iter = " << path_spec.pathfinding_iteration_ << std::endl;
-            trace_file << "outbound_        = " << path_spec.outbound_  << std::endl;
-            trace_file << "hyperpath_       = " << path_spec.hyperpath_ << std::endl;
-            trace_file << "preferred_time_  = ";
-            printTime(trace_file, path_spec.preferred_time_);
-            trace_file << " (" << path_spec.preferred_time_ << ")" << std::endl;
-            trace_file << "value_of_time_   = " << path_spec.value_of_time_<< std::endl;
-            trace_file << "user_class_      = " << path_spec.user_class_   << std::endl;
-            trace_file << "purpose_         = " << path_spec.purpose_      << std::endl;
-            trace_file << "access_mode_     = " << path_spec.access_mode_  << std::endl;
-            trace_file << "transit_mode_    = " << path_spec.transit_mode_ << std::endl;
-            trace_file << "egress_mode_     = " << path_spec.egress_mode_  << std::endl;
-            trace_file << "orig_taz_id_     = " << stopStringForId(path_spec.origin_taz_id_     ) << std::endl;
-            trace_file << "dest_taz_id_     = " << stopStringForId(path_spec.destination_taz_id_)<< std::endl;
 
-            std::ostringstream ss2;
-            ss2 << output_dir_ << kPathSeparator;
-            ss2 << "fasttrips_labels_ids_" << path_spec.person_id_ << "-" << path_spec.person_trip_id_ << ".csv";
-            stopids_file.open(ss2.str().c_str(), omode);
-            stopids_file << "stop_id,stop_id_label_iter,is_trip,label_stop_cost" << std::endl;
+            // the labels are just times; fill in the fare period and ivt weight for the trips on the path
+            if (isTrip(link.deparr_mode_)) {
+                const TripInfo& trip_info = trip_info_[link.trip_id_];
+                link.fare_period_ = getFarePeriod(trip_info.route_id_,
+                                                  path_spec.outbound_ ? stop_id : link.stop_succpred_,
+                                                  path_spec.outbound_ ? link.stop_succpred_ : stop_id,
+                                                  path_spec.outbound_ ? link.deparr_time_ : link.arrdep_time_);
+                if (link.fare_period_) { link.link_fare_ = link.fare_period_->price_; }
+                const Weight* ivt_weight = path_weights.transit_weights_[trip_info.supply_mode_num_]->ivtWeight();
+                if (ivt_weight != NULL) { link.link_ivtwt_ = ivt_weight->weight_; }
+            }
+            path.addLink(stop_id, link, trace_file, path_spec, *this);
         }
+        return RET_SUCCESS;
+    }
 
-        StopStates           stop_states;
-        LabelStopQueue       label_stop_queue;
-
+    int PathFinder::findPathSetByConnectionScan(
+        const PathSpecification& path_spec,
+        std::ofstream&           trace_file,
+        PathSet&                 pathset,
+        PerformanceInfo&         performance_info,
+        ConnectionScanLabels&    labels) const
+    {
 #ifdef _WIN32
-        // QueryPerformanceFrequency reference: https://msdn.microsoft.com/en-us/library/windows/desktop/dn553408(v=vs.85).aspx
         LARGE_INTEGER        frequency;
         LARGE_INTEGER        labeling_start_time, labeling_end_time, pathfind_end_time;
         LARGE_INTEGER        label_elapsed, pathfind_elapsed;
         QueryPerformanceFrequency(&frequency);
         QueryPerformanceCounter(&labeling_start_time);
 #else
-        // using gettimeofday() since std::chrono is only c++11
         struct timeval       labeling_start_time, labeling_end_time, pathfind_end_time;
         gettimeofday(&labeling_start_time, NULL);
 #endif
 
-        int pf_returnstatus = -1;
-        bool success = initializeStopStates(path_spec, trace_file, stop_states, label_stop_queue);
-        if (!success) {
-            pf_returnstatus = PathFinder::RET_FAIL_INIT_STOP_STATES;
-            if (path_spec.trace_) {
-                trace_file << "initializeStopStates() failed.  Skipping labeling." << std::endl;
-            }
+        int    end_taz_id   = path_spec.outbound_ ? path_spec.origin_taz_id_ : path_spec.destination_taz_id_;
+        // the stretch pref time -- allow late arrival or early departure
+        double start_time   = path_spec.outbound_ ? path_spec.preferred_time_ + ARRIVE_LATE_ALLOWED_MIN_ : path_spec.preferred_time_ - DEPART_EARLY_ALLOWED_MIN_;
+
+        PathWeights path_weights;
+        getPathWeights(path_spec, path_weights);
+
+        int    pf_returnstatus = RET_SUCCESS;
+        double horizon         = 0;
+        int    num_scanned     = 0;
+        if (!startConnectionScan(path_spec, path_weights, start_time, horizon, labels)) {
+            pf_returnstatus = RET_FAIL_INIT_STOP_STATES;
+            if (path_spec.trace_) { trace_file << "No access/egress links from the start TAZ.  Skipping connection scan." << std::endl; }
         }
 
-        // These are the stops that are reachable from the final TAZ
-        std::map<int, int> reachable_final_stops;
-        if (success) {
-            success = setReachableFinalStops(path_spec, trace_file, reachable_final_stops);
-            if (!success) {
-                pf_returnstatus = PathFinder::RET_FAIL_SET_REACHABLE;
-                if (path_spec.trace_) {
-                    trace_file << "setReachableFinalStops() failed.  Skipping labeling." << std::endl;
-                }
+        if (pf_returnstatus == RET_SUCCESS) {
+            setConnectionScanEnds(path_spec, path_weights, std::vector<int>(1, end_taz_id), labels);
+            if (labels.end_links_.empty()) {
+                pf_returnstatus = RET_FAIL_SET_REACHABLE;
+                if (path_spec.trace_) { trace_file << "No access/egress links to the end TAZ.  Skipping connection scan." << std::endl; }
             }
         }
 
-        // don't go further if we failed an earlier step
-        if (!success) {
-            stop_states.clear();
-
-            if (path_spec.trace_) {
-                trace_file.close();
-                label_file.close();
-                stopids_file.close();
-            }
-            return pf_returnstatus;
+        if (pf_returnstatus == RET_SUCCESS) {
+            num_scanned = scanConnections(path_spec, path_weights, start_time, horizon, 0, trace_file, labels);
         }
 
-        performance_info.label_iterations_ = labelStops(path_spec, trace_file, reachable_final_stops,
-                                                        stop_states, label_stop_queue, performance_info.max_process_count_);
-        performance_info.num_labeled_stops_ = stop_states.size();
+        performance_info.label_iterations_  = num_scanned;
+        performance_info.num_labeled_stops_ = (int)labels.touched_stops_.size();
+
+        if (path_spec.trace_) {
+            trace_file << "Connection scan from ";
+            printTime(trace_file, start_time);
+            trace_file << " scanned " << num_scanned << " connections and labeled " << labels.touched_stops_.size() << " stops" << std::endl;
+        }
 
 #ifdef _WIN32
         QueryPerformanceCounter(&labeling_end_time);
@@ -706,19 +1827,32 @@ namespace fasttrips {
         gettimeofday(&labeling_end_time, NULL);
 #endif
 
-        pf_returnstatus = getPathSet(path_spec, trace_file, stop_states, pathset);
+        if ((pf_returnstatus == RET_SUCCESS) && (labels.end_state_[0].iteration_ < 0)) { pf_returnstatus = RET_FAIL_END_NOT_FOUND; }
+
+        if (pf_returnstatus == RET_SUCCESS) {
+            Path path(path_spec.outbound_, true);
+            pf_returnstatus = getConnectionScanPath(path_spec, path_weights, 0, trace_file, labels, path);
+
+            if (pf_returnstatus == RET_SUCCESS) {
+                PathInfo pi = { 1, 1, 0 };  // count is 1
+                path.calculateCost(trace_file, path_spec, *this);
+                pathset[path] = pi;
+                if (path_spec.trace_)
+                {
+                    trace_file << "Final path" << std::endl;
+                    path.print(trace_file, path_spec, *this);
+                }
+            }
+        }
+
+        // reset what we touched for the next search
+        resetConnectionScan(labels);
 
 #ifdef _WIN32
         QueryPerformanceCounter(&pathfind_end_time);
 
         label_elapsed.QuadPart                = labeling_end_time.QuadPart - labeling_start_time.QuadPart;
         pathfind_elapsed.QuadPart             = pathfind_end_time.QuadPart - labeling_end_time.QuadPart;
-
-        // We now have the elapsed number of ticks, along with the
-        // number of ticks-per-second. We use these values
-        // to convert to the number of elapsed milliseconds.
-        // To guard against loss-of-precision, we convert
-        // to microseconds *before* dividing by ticks-per-second.
         label_elapsed.QuadPart    *= 1000;
         label_elapsed.QuadPart    /= frequency.QuadPart;
         pathfind_elapsed.QuadPart *= 1000;
@@ -747,22 +1881,359 @@ namespace fasttrips {
         performance_info.milliseconds_enumerating_ = 0.001*diff;
 #endif
 
-        // clear stop states since they have path pointers
-        stop_states.clear();
-
         if (path_spec.trace_) {
-
-            trace_file << "        label iterations: " << performance_info.label_iterations_    << std::endl;
-            trace_file << "       max process count: " << performance_info.max_process_count_   << std::endl;
+            trace_file << "     connections scanned: " << performance_info.label_iterations_        << std::endl;
             trace_file << "   milliseconds labeling: " << performance_info.milliseconds_labeling_    << std::endl;
             trace_file << "milliseconds enumerating: " << performance_info.milliseconds_enumerating_ << std::endl;
-            trace_file.close();
-            label_file.close();
-            stopids_file.close();
         }
         return pf_returnstatus;
     }
 
+    void PathFinder::skimFromTaz(
+        PathSpecification          path_spec,
+        const std::vector<int>&    end_taz_ids,
+        const std::vector<double>& skim_times,
+        double*                    skims,
+        LabelingWorkspace&         workspace) const
+    {
+        // skims aren't traced
+        std::ofstream trace_file;
+        path_spec.trace_ = false;
+
+        int    start_taz_id = path_spec.outbound_ ? path_spec.destination_taz_id_ : path_spec.origin_taz_id_;
+        double dir_factor   = path_spec.outbound_ ? 1.0 : -1.0;
+
+        PathWeights path_weights;
+        getPathWeights(path_spec, path_weights);
+
+        StopStates&     stop_states      = workspace.stop_states_;
+        LabelStopQueue& label_stop_queue = workspace.label_stop_queue_;
+
+        std::vector<double> sums(end_taz_ids.size()*NUM_SKIM_ATTRIBUTES, 0.0);
+        std::vector<int>    counts(end_taz_ids.size(), 0);
+
+        for (size_t time_num = 0; time_num < skim_times.size(); ++time_num)
+        {
+            path_spec.preferred_time_ = skim_times[time_num];
+
+            // label without final stops so the labels work for every end TAZ, as the hyperpath cache does
+            stop_states.clear();
+            label_stop_queue.clear();
+            stop_states.reserve((int)stop_num_to_stop_.size());
+            label_stop_queue.reserve((int)stop_num_to_stop_.size());
+            if (!initializeStopStates(path_spec, trace_file, stop_states, label_stop_queue)) { continue; }
+
+            std::map<int, int> no_final_stops;
+            int max_process_count = 0, pruned_stops = 0;
+            labelStops(path_spec, trace_file, path_weights, no_final_stops, NULL, stop_states, label_stop_queue,
+                       max_process_count, pruned_stops);
+
+            for (size_t end_num = 0; end_num < end_taz_ids.size(); ++end_num)
+            {
+                if (end_taz_ids[end_num] == start_taz_id) { continue; }
+
+                if (path_spec.outbound_) { path_spec.origin_taz_id_      = end_taz_ids[end_num]; }
+                else                     { path_spec.destination_taz_id_ = end_taz_ids[end_num]; }
+
+                std::map<int, int> reachable_final_stops;
+                if (!setReachableFinalStops(path_spec, trace_file, reachable_final_stops)) { continue; }
+
+                label_stop_queue.clear();
+                labelFinalStops(path_spec, trace_file, path_weights, reachable_final_stops, stop_states, label_stop_queue);
+
+                // the least cost of the paths enumerated from the hyperpath
+                PathSet     pathset;
+                const Path* path = NULL;
+                if (getPathSet(path_spec, trace_file, stop_states, pathset) == RET_SUCCESS) {
+                    for (PathSet::const_iterator psi = pathset.begin(); psi != pathset.end(); ++psi) {
+                        if ((path == NULL) || (psi->first.cost() < path->cost())) { path = &(psi->first); }
+                    }
+                }
+                // the next end TAZ gets its own final links
+                stop_states.erase(end_taz_ids[end_num]);
+                if (path == NULL) { continue; }
+
+                double* sum = &sums[end_num*NUM_SKIM_ATTRIBUTES];
+                int     num_trips = 0;
+                for (size_t link_num = 0; link_num < path->size(); ++link_num) {
+                    const StopState& link = (*path)[link_num].second;
+                    if (isTrip(link.deparr_mode_)) {
+                        double ivt = (link.arrdep_time_ - link.deparr_time_)*dir_factor;
+                        sum[SKIM_IVT_MIN]  += ivt;
+                        sum[SKIM_WAIT_MIN] += link.link_time_ - ivt;
+                        num_trips += 1;
+                        continue;
+                    }
+                    sum[SKIM_WALK_MIN] += link.link_time_;
+                    // from the skim time until leaving the origin (inbound), or from getting to the destination until the skim time (outbound)
+                    if (!path_spec.outbound_ && (link.deparr_mode_ == MODE_ACCESS)) {
+                        sum[SKIM_WAIT_MIN] += std::max(0.0, link.deparr_time_ - link.link_time_ - path_spec.preferred_time_);
+                    } else if (path_spec.outbound_ && (link.deparr_mode_ == MODE_EGRESS)) {
+                        sum[SKIM_WAIT_MIN] += std::max(0.0, path_spec.preferred_time_ - link.deparr_time_ - link.link_time_);
+                    }
+                }
+                sum[SKIM_TRANSFERS] += std::max(0, num_trips - 1);
+                sum[SKIM_FARE]      += path->fare();
+                sum[SKIM_COST]      += path->cost();
+                counts[end_num]     += 1;
+            }
+        }
+
+        for (size_t end_num = 0; end_num < end_taz_ids.size(); ++end_num) {
+            for (int attr_num = 0; attr_num < NUM_SKIM_ATTRIBUTES; ++attr_num) {
+                skims[end_num*NUM_SKIM_ATTRIBUTES + attr_num] = (counts[end_num] > 0) ?
+                    sums[end_num*NUM_SKIM_ATTRIBUTES + attr_num]/counts[end_num] : std::numeric_limits<double>::quiet_NaN();
+            }
+        }
+
+        stop_states.clear();
+        label_stop_queue.clear();
+    }
+
+    void PathFinder::findPathSets(
+        const std::vector<PathSpecification>& path_specs,
+        std::vector<PathSet>                  &pathsets,
+        std::vector<PerformanceInfo>          &performance_infos,
+        std::vector<int>                      &return_statuses,
+        int                                   num_threads) const
+    {
+        PerformanceInfo empty_perf_info = { 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0 };
+        pathsets.assign(path_specs.size(), PathSet());
+        performance_infos.assign(path_specs.size(), empty_perf_info);
+        return_statuses.assign(path_specs.size(), -1);
+
+        // the threads only read the lower bounds so set up the ones we need now
+        if (LOWER_BOUND_PRUNING_) {
+            for (size_t index = 0; index < path_specs.size(); ++index) {
+                getStopLowerBounds(path_specs[index].outbound_ ? path_specs[index].origin_taz_id_ : path_specs[index].destination_taz_id_,
+                                   path_specs[index].outbound_);
+            }
+        }
+
+        // reused for each path specification found on this thread
+        LabelingWorkspace& workspace = getWorkspace(0);
+
+        // tracing writes to shared files so do those here, one at a time
+        for (size_t index = 0; index < path_specs.size(); ++index) {
+            if (!path_specs[index].trace_) { continue; }
+            return_statuses[index] = findPathSet(path_specs[index], pathsets[index], performance_infos[index], workspace);
+        }
+
+        if (num_threads < 1) { num_threads = 1; }
+        if (num_threads > (int)path_specs.size()) { num_threads = (int)path_specs.size(); }
+
+        PathSetBatch batch;
+        batch.pathfinder_        = this;
+        batch.path_specs_        = &path_specs;
+        batch.pathsets_          = &pathsets;
+        batch.performance_infos_ = &performance_infos;
+        batch.return_statuses_   = &return_statuses;
+        batch.workspaces_        = &workspaces_;
+        batch.next_index_        = 0;
+        batch.next_workspace_    = 0;
+
+        if (num_threads <= 1) {
+            // no need for threads
+            for (size_t index = 0; index < path_specs.size(); ++index) {
+                if (path_specs[index].trace_) { continue; }
+                return_statuses[index] = findPathSet(path_specs[index], pathsets[index], performance_infos[index], workspace);
+            }
+            return;
+        }
+
+        // getWorkspace isn't thread-safe so make sure there are enough for the threads now
+        getWorkspace(num_threads-1);
+
+#ifdef _WIN32
+        InitializeCriticalSection(&batch.lock_);
+        std::vector<HANDLE> threads(num_threads);
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            threads[thread_num] = CreateThread(NULL, 0, findPathSetsWorker, &batch, 0, NULL);
+        }
+        WaitForMultipleObjects(num_threads, &threads[0], TRUE, INFINITE);
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            CloseHandle(threads[thread_num]);
+        }
+        DeleteCriticalSection(&batch.lock_);
+#else
+        pthread_mutex_init(&batch.lock_, NULL);
+        std::vector<pthread_t> threads(num_threads);
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            pthread_create(&threads[thread_num], NULL, findPathSetsWorker, &batch);
+        }
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            pthread_join(threads[thread_num], NULL);
+        }
+        pthread_mutex_destroy(&batch.lock_);
+#endif
+    }
+
+    void PathFinder::findSkims(
+        const std::vector<PathSpecification>& path_specs,
+        const std::vector<int>&               end_taz_ids,
+        const std::vector<double>&            skim_times,
+        std::vector<double>&                  skims,
+        int                                   num_threads) const
+    {
+        skims.assign(path_specs.size()*end_taz_ids.size()*NUM_SKIM_ATTRIBUTES, 0.0);
+        if (path_specs.empty() || end_taz_ids.empty()) { return; }
+
+        if (num_threads < 1) { num_threads = 1; }
+        if (num_threads > (int)path_specs.size()) { num_threads = (int)path_specs.size(); }
+
+        if (num_threads <= 1) {
+            // no need for threads
+            LabelingWorkspace& workspace = getWorkspace(0);
+            for (size_t index = 0; index < path_specs.size(); ++index) {
+                skimFromTaz(path_specs[index], end_taz_ids, skim_times, &skims[index*end_taz_ids.size()*NUM_SKIM_ATTRIBUTES],
+                            workspace);
+            }
+            return;
+        }
+
+        SkimBatch batch;
+        batch.pathfinder_        = this;
+        batch.path_specs_        = &path_specs;
+        batch.end_taz_ids_       = &end_taz_ids;
+        batch.skim_times_        = &skim_times;
+        batch.skims_             = &skims;
+        batch.workspaces_        = &workspaces_;
+        batch.next_index_        = 0;
+        batch.next_workspace_    = 0;
+
+        // getWorkspace isn't thread-safe so make sure there are enough for the threads now
+        getWorkspace(num_threads-1);
+
+#ifdef _WIN32
+        InitializeCriticalSection(&batch.lock_);
+        std::vector<HANDLE> threads(num_threads);
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            threads[thread_num] = CreateThread(NULL, 0, findSkimsWorker, &batch, 0, NULL);
+        }
+        WaitForMultipleObjects(num_threads, &threads[0], TRUE, INFINITE);
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            CloseHandle(threads[thread_num]);
+        }
+        DeleteCriticalSection(&batch.lock_);
+#else
+        pthread_mutex_init(&batch.lock_, NULL);
+        std::vector<pthread_t> threads(num_threads);
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            pthread_create(&threads[thread_num], NULL, findSkimsWorker, &batch);
+        }
+        for (int thread_num = 0; thread_num < num_threads; ++thread_num) {
+            pthread_join(threads[thread_num], NULL);
+        }
+        pthread_mutex_destroy(&batch.lock_);
+#endif
+    }
+
+    void PathFinder::calculatePathCosts(
+        const std::vector<PathSpecification>& path_specs,
+        size_t                                num_links,
+        const int*                            link_ints,
+        const double*                         link_doubles,
+        const double*                         link_overrides,
+        std::vector<double>&                  link_costs,
+        std::vector<double>&                  link_fares,
+        std::vector<int>&                     path_links,
+        std::vector<double>&                  path_costs,
+        std::vector<double>&                  path_fares,
+        std::vector<double>&                  path_probabilities,
+        std::vector<double>&                  path_logsums) const
+    {
+        link_costs.assign(num_links, 0.0);
+        link_fares.assign(num_links, 0.0);
+        path_links.clear();
+        path_costs.clear();
+        path_fares.clear();
+
+        // these paths were traced when they were found, so don't trace them again
+        std::ostringstream  trace_file;
+        std::vector<double> path_overrides;
+
+        size_t link_idx = 0;
+        while (link_idx < num_links) {
+            // this path's links are [first_link, link_idx)
+            size_t first_link = link_idx;
+            while ((link_idx < num_links) &&
+                   (link_ints[9*link_idx  ] == link_ints[9*first_link  ]) &&
+                   (link_ints[9*link_idx+1] == link_ints[9*first_link+1])) { ++link_idx; }
+            size_t num_path_links = link_idx - first_link;
+
+            const PathSpecification& path_spec = path_specs[link_ints[9*first_link]];
+            // enumerated paths are in origin to destination order for outbound trips and the reverse for inbound
+            Path path(path_spec.outbound_, true);
+            if (link_overrides) { path_overrides.resize(num_path_links*NUM_LINK_COST_OVERRIDES); }
+
+            for (size_t num = 0; num < num_path_links; ++num) {
+                size_t        index = (path_spec.outbound_ ? first_link + num : link_idx - 1 - num);
+                const int*    li    = &link_ints[9*index];
+                const double* ld    = &link_doubles[6*index];
+
+                StopState ss;
+                ss.deparr_mode_ = li[3];
+                ss.trip_id_     = li[4];
+                ss.link_time_   = ld[2];
+                ss.link_dist_   = ld[5];
+                if (path_spec.outbound_) {
+                    ss.stop_succpred_ = li[6];
+                    ss.seq_           = li[7];
+                    ss.seq_succpred_  = li[8];
+                    ss.deparr_time_   = ld[1];
+                    ss.arrdep_time_   = ld[0];
+                } else {
+                    ss.stop_succpred_ = li[5];
+                    ss.seq_           = li[8];
+                    ss.seq_succpred_  = li[7];
+                    ss.deparr_time_   = ld[0];
+                    ss.arrdep_time_   = ld[1];
+                }
+                if (isTrip(ss.deparr_mode_)) {
+                    ss.fare_period_ = getFarePeriod(getRouteIdForTripId(ss.trip_id_), li[5], li[6], ld[1]);
+                    if (ss.fare_period_) { ss.link_fare_ = ss.fare_period_->price_; }
+                }
+                path.appendLink(path_spec.outbound_ ? li[5] : li[6], ss);
+
+                if (link_overrides) {
+                    std::copy(&link_overrides[index*NUM_LINK_COST_OVERRIDES], &link_overrides[(index+1)*NUM_LINK_COST_OVERRIDES],
+                              &path_overrides[num*NUM_LINK_COST_OVERRIDES]);
+                }
+            }
+
+            path.calculateCost(trace_file, path_spec, *this, true, link_overrides ? &path_overrides[0] : NULL);
+
+            for (size_t num = 0; num < num_path_links; ++num) {
+                size_t index = (path_spec.outbound_ ? first_link + num : link_idx - 1 - num);
+                link_costs[index] = path[num].second.link_cost_;
+                link_fares[index] = path[num].second.link_fare_;
+            }
+            path_links.push_back((int)first_link);
+            path_costs.push_back(path.cost());
+            path_fares.push_back(path.fare());
+        }
+
+        // probabilities among each path specification's paths, like PathFinder::findPathSet
+        path_probabilities.assign(path_costs.size(), 0.0);
+        path_logsums.assign(path_costs.size(), 0.0);
+        size_t path_idx = 0;
+        while (path_idx < path_costs.size()) {
+            size_t first_path = path_idx;
+            double logsum     = 0;
+            while ((path_idx < path_costs.size()) &&
+                   (link_ints[9*path_links[path_idx]] == link_ints[9*path_links[first_path]])) {
+                logsum += exp(-1.0*path_costs[path_idx]/Hyperlink::STOCH_DISPERSION_);
+                ++path_idx;
+            }
+            for (size_t num = first_path; num < path_idx; ++num) {
+                path_logsums[num] = logsum;
+                if (logsum > 0) {
+                    path_probabilities[num] = exp(-1.0*path_costs[num]/Hyperlink::STOCH_DISPERSION_)/logsum;
+                }
+            }
+        }
+    }
+
     double PathFinder::tallyLinkCost(
         const int supply_mode_num,
         const PathSpecification& path_spec,
@@ -778,65 +2249,63 @@ namespace fasttrips {
             trace_file << std::setw(15) << std::setfill(' ') << std::right << "weight" << " x attribute" <<std::endl;
         );
 
-        NamedWeights::const_iterator iter_weights;
-        for (iter_weights  = weights.begin();
-             iter_weights != weights.end(); ++iter_weights) {
+        for (size_t weight_idx = 0; weight_idx < weights.weights_.size(); ++weight_idx) {
 
             // look for the attribute
-            Attributes::const_iterator iter_attr = attributes.find(iter_weights->first);
-            if (iter_attr == attributes.end()) {
+            int attr_slot = weights.slots_[weight_idx];
+            if (!attributes.has(attr_slot)) {
                 // error out??
                 if (path_spec.trace_) {
-                    trace_file << " => NO ATTRIBUTE CALLED " << iter_weights->first << " for " << modeStringForNum(supply_mode_num) << std::endl;
+                    trace_file << " => NO ATTRIBUTE CALLED " << AttributeIndex::name(attr_slot) << " for " << modeStringForNum(supply_mode_num) << std::endl;
                 }
-                std::cerr << " => NO ATTRIBUTE CALLED " << iter_weights->first << " for " << modeStringForNum(supply_mode_num) << std::endl;
+                std::cerr << " => NO ATTRIBUTE CALLED " << AttributeIndex::name(attr_slot) << " for " << modeStringForNum(supply_mode_num) << std::endl;
                 continue;
             }
+            double attr_value = attributes.get(attr_slot);
 
             D_LINKCOST(
-                trace_file << std::setw(26) << std::setfill(' ') << std::right << iter_weights->first << ":  + ";
+                trace_file << std::setw(26) << std::setfill(' ') << std::right << AttributeIndex::name(attr_slot) << ":  + ";
             );
 
-            if (iter_attr->second == 0.0) {
+            if (attr_value == 0.0) {
                 D_LINKCOST(
-                    trace_file << std::setw(13) << std::setprecision(4) << std::fixed << iter_attr->second << std::endl;
+                    trace_file << std::setw(13) << std::setprecision(4) << std::fixed << attr_value << std::endl;
                 );
                 continue;
             }
 
             double cost_part = 0.0;
-            const Weight& the_weight = iter_weights->second;
-
+            const Weight& the_weight = weights.weights_[weight_idx];
             // handle constant and non constant weights
             if (the_weight.type_ == WEIGHT_LINEAR) {
-                cost_part = the_weight.weight_ * iter_attr->second;
+                cost_part = the_weight.weight_ * attr_value;
                 D_LINKCOST(
                     trace_file << std::setw(13) << std::setprecision(4) << std::fixed << the_weight.weight_;
-                    trace_file << " x " << iter_attr->second << " = " << cost_part << " (constant)" << std::endl;
+                    trace_file << " x " << attr_value << " = " << cost_part << " (constant)" << std::endl;
                 );
             } else if (the_weight.type_ == WEIGHT_EXPONENTIAL) {
-                cost_part = (std::pow(1.0+the_weight.weight_, iter_attr->second) - 1.0) / std::log(1.0 + the_weight.weight_);
+                cost_part = (std::pow(1.0+the_weight.weight_, attr_value) - 1.0) / std::log(1.0 + the_weight.weight_);
                 D_LINKCOST(
                     trace_file << std::setw(13) << std::setprecision(4) << cost_part;
-                    trace_file << " (exponential on " << iter_attr->second << " with weight " << std::fixed << the_weight.weight_;
+                    trace_file << " (exponential on " << attr_value << " with weight " << std::fixed << the_weight.weight_;
                     trace_file << ")" << std::endl;
                 );                
             } else if (the_weight.type_ == WEIGHT_LOGARITHMIC) {
-                cost_part = the_weight.weight_ * ((1.0 + iter_attr->second) * std::log(1.0 + iter_attr->second) - iter_attr->second) / std::log(the_weight.log_base_);
+                cost_part = the_weight.weight_ * ((1.0 + attr_value) * std::log(1.0 + attr_value) - attr_value) / std::log(the_weight.log_base_);
                 D_LINKCOST(
                     trace_file << std::setw(13) << std::setprecision(4) << cost_part;
-                    trace_file << " (logarithmic on " << iter_attr->second << " with weight " << std::fixed << the_weight.weight_;
+                    trace_file << " (logarithmic on " << attr_value << " with weight " << std::fixed << the_weight.weight_;
                     trace_file << ", log_base " << the_weight.log_base_;
                     trace_file << ")" << std::endl;
                 ); 
             } else if (the_weight.type_ == WEIGHT_LOGISTIC) {
-                double max_integral = (the_weight.logistic_max_ / the_weight.weight_) * std::log(std::exp(the_weight.weight_ * iter_attr->second) + std::exp(the_weight.weight_ * the_weight.logistic_mid_));
+                double max_integral = (the_weight.logistic_max_ / the_weight.weight_) * std::log(std::exp(the_weight.weight_ * attr_value) + std::exp(the_weight.weight_ * the_weight.logistic_mid_));
                 double min_integral = (the_weight.logistic_max_ / the_weight.weight_) * std::log(1.0 + std::exp(the_weight.weight_ * the_weight.logistic_mid_));
 
                 cost_part = max_integral - min_integral;
                 D_LINKCOST(
                     trace_file << std::setw(13) << std::setprecision(4) << cost_part;
-                    trace_file << " (logistic on " << iter_attr->second << " with weight " << std::setprecision(4) << std::fixed << the_weight.weight_;
+                    trace_file << " (logistic on " << attr_value << " with weight " << std::setprecision(4) << std::fixed << the_weight.weight_;
                     trace_file << ", logistic_mid " << the_weight.logistic_mid_;
                     trace_file << ", logistic_max " << the_weight.logistic_max_;
                     trace_file << ")" << std::endl;
@@ -848,19 +2317,16 @@ namespace fasttrips {
             }
         }
         // fare
-        static const std::string fare_str("fare");
-        Attributes::const_iterator fare_attr = attributes.find(fare_str);
         // fare is first converted to minutes using vot and then into utils using IVT weight
-        static const std::string ivt_str("in_vehicle_time_min");
-        NamedWeights::const_iterator ivt_weight = weights.find(ivt_str);
-        if ((fare_attr != attributes.end()) && (ivt_weight != weights.end())) {
+        const Weight* ivt_weight = weights.ivtWeight();
+        if (attributes.has(ATTR_FARE) && (ivt_weight != NULL)) {
             //       (60 min/hour)*(hours/vot currency)*(ivt_weight) x (currency)
-            cost += (60.0/path_spec.value_of_time_) * ivt_weight->second.weight_ * fare_attr->second;
+            cost += (60.0/path_spec.value_of_time_) * ivt_weight->weight_ * attributes.get(ATTR_FARE);
 
             D_LINKCOST(
                 trace_file << std::setw(26) << std::setfill(' ') << std::right << "fare" << ":  + ";
-                trace_file << std::setw(13) << std::setprecision(4) << std::fixed << (ivt_weight->second*60.0/path_spec.value_of_time_);
-                trace_file << " x " << fare_attr->second << std::endl;
+                trace_file << std::setw(13) << std::setprecision(4) << std::fixed << (ivt_weight->weight_*60.0/path_spec.value_of_time_);
+                trace_file << " x " << attributes.get(ATTR_FARE) << std::endl;
             );
         }
         D_LINKCOST(
@@ -907,7 +2373,6 @@ namespace fasttrips {
         if (rejected) { return; }
 
         static int link_num = 1;        // unique ID for the link
-        static int last_iter = -1;   // last stop id that got numbered
 
         if (!label_file.is_open()) {
             link_num = 1;  // reset
@@ -1011,17 +2476,17 @@ namespace fasttrips {
 
                 int stop_id = aelk.stop_id_;
                 Attributes link_attr = iter_aelk->second;
-                double attr_time = link_attr.find("time_min")->second;
-                double attr_dist = link_attr.find("dist")->second;
+                double attr_time = link_attr.get(ATTR_TIME_MIN);
+                double attr_dist = link_attr.get(ATTR_DIST);
 
                 // outbound: departure time = destination - access
                 // inbound:  arrival time   = origin      + access
                 double deparr_time = pref_time - (attr_time*dir_factor);
                 // we start out with no delay
-                link_attr["depart_late_min"]    = 0;
-                link_attr["arrive_early_min"]   = 0;
-                link_attr["depart_early_min"]   = 0.0;
-                link_attr["arrive_late_min"]    = 0.0;
+                link_attr[ATTR_DEPART_LATE_MIN]  = 0;
+                link_attr[ATTR_ARRIVE_EARLY_MIN] = 0;
+                link_attr[ATTR_DEPART_EARLY_MIN] = 0.0;
+                link_attr[ATTR_ARRIVE_LATE_MIN]  = 0.0;
 
                 double cost;
                 if (path_spec.hyperpath_) {
@@ -1064,6 +2529,7 @@ namespace fasttrips {
     void PathFinder::updateStopStatesForTransfers(
         const PathSpecification& path_spec,
         std::ofstream& trace_file,
+        const PathWeights& path_weights,
         StopStates& stop_states,
         LabelStopQueue& label_stop_queue,
         int label_iteration,
@@ -1079,13 +2545,13 @@ namespace fasttrips {
 
         // Lookup transfer weights
         // TODO: returning here is probably terrible and we shouldn't be silent... We should have zero weights if we don't want to penalize.
-        const NamedWeights* transfer_weights = getNamedWeights(path_spec.user_class_, path_spec.purpose_, MODE_TRANSFER, "transfer", transfer_supply_mode_);
+        const NamedWeights* transfer_weights = path_weights.transfer_weights_;
         if (transfer_weights == NULL) { return; }
 
         // add zero-walk transfer to this stop
         int               xfer_stop_id  = current_label_stop.stop_id_;
         const Attributes* zerowalk_xfer = getTransferAttributes(xfer_stop_id, xfer_stop_id);
-        double            transfer_time = zerowalk_xfer->find("walk_time_min")->second;  // todo: make this a different time?
+        double            transfer_time = zerowalk_xfer->get(ATTR_WALK_TIME_MIN);  // todo: make this a different time?
         double            deparr_time   = current_deparr_time - (transfer_time*dir_factor);
         double            link_cost, cost, transfer_dist;
         if (path_spec.hyperpath_)
@@ -1128,8 +2594,8 @@ namespace fasttrips {
              transfer_it != transfer_map_it->second.end(); ++transfer_it)
         {
             xfer_stop_id    = transfer_it->first;
-            transfer_time   = transfer_it->second.find("time_min")->second;
-            transfer_dist   = transfer_it->second.find("dist")->second;
+            transfer_time   = transfer_it->second.get(ATTR_TIME_MIN);
+            transfer_dist   = transfer_it->second.get(ATTR_DIST);
             // outbound: departure time = latest departure - transfer
             //  inbound: arrival time   = earliest arrival + transfer
             deparr_time     = current_deparr_time - (transfer_time*dir_factor);
@@ -1138,7 +2604,7 @@ namespace fasttrips {
             if (path_spec.hyperpath_)
             {
                 Attributes link_attr            = transfer_it->second;
-                link_attr["transfer_penalty"]   = 1.0; // TODO: make configurable or base off of IVT coefficient
+                link_attr[ATTR_TRANSFER_PENALTY] = 1.0; // TODO: make configurable or base off of IVT coefficient
                 link_cost                       = tallyLinkCost(transfer_supply_mode_, path_spec, trace_file, *transfer_weights, link_attr);
                 cost                            = nonwalk_label + link_cost;
             }
@@ -1199,6 +2665,7 @@ namespace fasttrips {
     void PathFinder::updateStopStatesForFinalLinks(
         const PathSpecification& path_spec,
         std::ofstream& trace_file,
+        const PathWeights& path_weights,
         const std::map<int, int>& reachable_final_stops,
         StopStates& stop_states,
         LabelStopQueue& label_stop_queue,
@@ -1214,7 +2681,6 @@ namespace fasttrips {
         // current_stop_state is a hyperlink
         // It should have trip-states in it, because otherwise it wouldn't have come up in the label stop queue to process
         Hyperlink& current_stop_state  = stop_states[current_label_stop.stop_id_];
-        double current_deparr_time     = current_stop_state.latestDepartureEarliestArrival(true);
         double nonwalk_label           = current_stop_state.hyperpathCost(true);
 
         int    end_taz_id = path_spec.outbound_ ? path_spec.origin_taz_id_ : path_spec.destination_taz_id_;
@@ -1236,14 +2702,7 @@ namespace fasttrips {
         }
 
         // Are there any supply modes for this demand mode?
-        UserClassPurposeMode ucpm = {
-            path_spec.user_class_,
-            path_spec.purpose_,
-            path_spec.outbound_ ? MODE_ACCESS: MODE_EGRESS,
-            path_spec.outbound_ ? path_spec.access_mode_ : path_spec.egress_mode_
-        };
-        WeightLookup::const_iterator iter_weights = weight_lookup_.find(ucpm);
-        if (iter_weights == weight_lookup_.end()) {
+        if (path_weights.final_weights_ == NULL) {
             // this shouldn't happen because of the shortcut
             std::cerr << "Couldn't find any weights configured for user class/purpose (2) [" << path_spec.user_class_ << "/" << path_spec.purpose_ << "], ";
             std::cerr << (path_spec.outbound_ ? "access mode [" : "egress mode [");
@@ -1253,8 +2712,8 @@ namespace fasttrips {
 
         // Iterate through valid supply modes
         SupplyModeToNamedWeights::const_iterator iter_s2w;
-        for (iter_s2w  = iter_weights->second.begin();
-             iter_s2w != iter_weights->second.end(); ++iter_s2w) {
+        for (iter_s2w  = path_weights.final_weights_->begin();
+             iter_s2w != path_weights.final_weights_->end(); ++iter_s2w) {
             int supply_mode_num = iter_s2w->first;
 
             for (AccessEgressLinkAttr::const_iterator iter_aelk  = access_egress_links_.lower_bound(end_taz_id, supply_mode_num, current_label_stop.stop_id_);
@@ -1268,13 +2727,13 @@ namespace fasttrips {
                 if (aelk.end_time_   <= earliest_dep_latest_arr_024) continue;
 
                 Attributes link_attr            = iter_aelk->second;
-                link_attr["depart_late_min"]    = 0;
-                link_attr["arrive_early_min"]   = 0;
-                link_attr["depart_early_min"]   = 0.0;
-                link_attr["arrive_late_min"]    = 0.0;
+                link_attr[ATTR_DEPART_LATE_MIN]  = 0;
+                link_attr[ATTR_ARRIVE_EARLY_MIN] = 0;
+                link_attr[ATTR_DEPART_EARLY_MIN] = 0.0;
+                link_attr[ATTR_ARRIVE_LATE_MIN]  = 0.0;
 
-                double  access_time             = link_attr.find("time_min")->second;
-                double  access_dist             = link_attr.find("dist")->second;
+                double  access_time             = link_attr.get(ATTR_TIME_MIN);
+                double  access_dist             = link_attr.get(ATTR_DIST);
                 double  deparr_time, link_cost, cost;
 
                 if (path_spec.hyperpath_)
@@ -1342,6 +2801,7 @@ namespace fasttrips {
     void PathFinder::updateStopStatesForTrips(
         const PathSpecification& path_spec,
         std::ofstream& trace_file,
+        const PathWeights& path_weights,
         StopStates& stop_states,
         LabelStopQueue& label_stop_queue,
         int label_iteration,
@@ -1350,10 +2810,8 @@ namespace fasttrips {
     {
         double dir_factor = path_spec.outbound_ ? 1.0 : -1.0;
 
-        // for weight lookup
-        UserClassPurposeMode ucpm = { path_spec.user_class_, path_spec.purpose_, MODE_TRANSIT, path_spec.transit_mode_};
-        WeightLookup::const_iterator iter_weights = weight_lookup_.find(ucpm);
-        if (iter_weights == weight_lookup_.end()) {
+        // no transit weights for this user class/purpose/transit mode
+        if (path_weights.transit_weights_.empty()) {
             return;
         }
 
@@ -1368,17 +2826,18 @@ namespace fasttrips {
         for (std::vector<TripStopTime>::const_iterator it=relevant_trips.begin(); it != relevant_trips.end(); ++it) {
 
             // the trip info for this trip
-            const TripInfo& trip_info = trip_info_.find(it->trip_id_)->second;
+            const TripInfo& trip_info = trip_info_[it->trip_id_];
             // the trip stop time for this trip
             const TripStopTime& tst = getTripStopTime(it->trip_id_, it->seq_);
 
             // get the weights applicable for this trip
-            SupplyModeToNamedWeights::const_iterator iter_sm2nw = iter_weights->second.find(trip_info.supply_mode_num_);
-            if (iter_sm2nw == iter_weights->second.end()) {
+            if ((trip_info.supply_mode_num_ < 0) ||
+                (trip_info.supply_mode_num_ >= (int)path_weights.transit_weights_.size()) ||
+                (path_weights.transit_weights_[trip_info.supply_mode_num_] == NULL)) {
                 // this supply mode isn't allowed for the userclass/demand mode
                 continue;
             }
-            const NamedWeights& named_weights = iter_sm2nw->second;
+            const NamedWeights& named_weights = *(path_weights.transit_weights_[trip_info.supply_mode_num_]);
 
             if (true && path_spec.trace_) {
                 trace_file << "valid trips: " << trip_num_to_str_.find(it->trip_id_)->second << " " << it->seq_ << " ";
@@ -1437,20 +2896,18 @@ namespace fasttrips {
             }
 
             // get the TripStopTimes for this trip
-            std::map<int, std::vector<TripStopTime> >::const_iterator tstiter = trip_stop_times_.find(it->trip_id_);
-            assert(tstiter != trip_stop_times_.end());
-            const std::vector<TripStopTime>& possible_stops = tstiter->second;
+            const TripStopTime* possible_stops = &trip_stop_times_[trip_stop_times_offsets_[it->trip_id_]];
+            int num_possible_stops = trip_stop_times_offsets_[it->trip_id_+1] - trip_stop_times_offsets_[it->trip_id_];
 
             // these are the relevant potential trips/stops; iterate through them
-            unsigned int start_seq = path_spec.outbound_ ? 1 : it->seq_+1;
-            unsigned int end_seq   = path_spec.outbound_ ? it->seq_-1 : possible_stops.size();
-            for (unsigned int seq_num = start_seq; seq_num <= end_seq; ++seq_num) {
+            int start_seq = path_spec.outbound_ ? 1 : it->seq_+1;
+            int end_seq   = path_spec.outbound_ ? it->seq_-1 : num_possible_stops;
+            for (int seq_num = start_seq; seq_num <= end_seq; ++seq_num) {
                 // possible board for outbound / alight for inbound
-                const TripStopTime& possible_board_alight = possible_stops.at(seq_num-1);
+                const TripStopTime& possible_board_alight = possible_stops[seq_num-1];
 
                 // new label = length of trip so far if the passenger boards/alights at this stop
                 int board_alight_stop = possible_board_alight.stop_id_;
-                StopStates::const_iterator possible_stop_state_iter = stop_states.find(board_alight_stop);
 
                 double  deparr_time     = path_spec.outbound_ ? possible_board_alight.depart_time_ : possible_board_alight.arrive_time_;
                 // the schedule crossed midnight
@@ -1509,17 +2966,16 @@ namespace fasttrips {
                     }
 
                     //update link ivtwt so that it is available when fares/fare-utils calculations are updated
-                    static const std::string ivt_str("in_vehicle_time_min");
-                    NamedWeights::const_iterator ivt_weight = named_weights.find(ivt_str);
-                    if (ivt_weight != named_weights.end()) ivtwt = ivt_weight->second.weight_;
+                    const Weight* ivt_weight = named_weights.ivtWeight();
+                    if (ivt_weight != NULL) ivtwt = ivt_weight->weight_;
 
                     // start with trip info attributes
                     Attributes link_attr = trip_info.trip_attr_;
-                    link_attr["in_vehicle_time_min"] = in_vehicle_time;
-                    link_attr["wait_time_min"      ] = wait_time;
-                    link_attr["overcap"            ] = overcap;
-                    link_attr["at_capacity"        ] = at_capacity;
-                    link_attr["fare"               ] = fare;
+                    link_attr[ATTR_IN_VEHICLE_TIME_MIN] = in_vehicle_time;
+                    link_attr[ATTR_WAIT_TIME_MIN      ] = wait_time;
+                    link_attr[ATTR_OVERCAP            ] = overcap;
+                    link_attr[ATTR_AT_CAPACITY        ] = at_capacity;
+                    link_attr[ATTR_FARE               ] = fare;
 
                     link_cost = 0;
                     // If outbound, and the current link is egress, then it's as late as possible and the wait time isn't accurate.
@@ -1527,49 +2983,43 @@ namespace fasttrips {
                     // ditto for inbound and access
                     if (( path_spec.outbound_ && best_guess_link.deparr_mode_ == MODE_EGRESS) ||
                         (!path_spec.outbound_ && best_guess_link.deparr_mode_ == MODE_ACCESS)) {
-                        link_attr["wait_time_min"      ] = 0;
+                        link_attr[ATTR_WAIT_TIME_MIN      ] = 0;
 
 
                         // TODO: this is awkward... setting this all up again.  Plus we don't have all the attributes set.  Cache something?
                         Attributes delay_attr;
-                        delay_attr["time_min"             ] = 0;
-                        delay_attr["drive_time_min"       ] = 0;
-                        delay_attr["walk_time_min"        ] = 0;
-                        delay_attr["elevation_gain"       ] = 0;
+                        delay_attr[ATTR_TIME_MIN          ] = 0;
+                        delay_attr[ATTR_DRIVE_TIME_MIN    ] = 0;
+                        delay_attr[ATTR_WALK_TIME_MIN     ] = 0;
+                        delay_attr[ATTR_ELEVATION_GAIN    ] = 0;
 
                         if (path_spec.outbound_) {
                           // outbound: if the wait_time < ARRIVE_LATE_ALLOWED_MIN_ then we've arrived later than our preferred time (by ARRIVE_LATE_ALLOWED_MIN_ - wait_time)
                           //           otherwise, we've arrive before our preferred time (by wait_time - ARRIVE_LATE_MIN_)
                           //           so ideal with wait_time = ARRIVE_LATE_ALLOWED_MIN_
                           if (wait_time < ARRIVE_LATE_ALLOWED_MIN_) {
-                            delay_attr["arrive_late_min"      ] = ARRIVE_LATE_ALLOWED_MIN_ - wait_time;
-                            delay_attr["arrive_early_min"     ] = 0;
+                            delay_attr[ATTR_ARRIVE_LATE_MIN   ] = ARRIVE_LATE_ALLOWED_MIN_ - wait_time;
+                            delay_attr[ATTR_ARRIVE_EARLY_MIN  ] = 0;
                           } else {
-                            delay_attr["arrive_late_min"      ] = 0;
-                            delay_attr["arrive_early_min"     ] = wait_time - ARRIVE_LATE_ALLOWED_MIN_;
+                            delay_attr[ATTR_ARRIVE_LATE_MIN   ] = 0;
+                            delay_attr[ATTR_ARRIVE_EARLY_MIN  ] = wait_time - ARRIVE_LATE_ALLOWED_MIN_;
                           }
                         } else {
                           // inbound: if the wait_time < DEPART_EARLY_ALLOWED_MIN_ then we've departed earlier than our preferred time (by DEPART_EARLY_ALLOWED_MIN_ - wait_time)
                           //           otherwise, we've depart before our preferred time (by wait_time - DEPART_EARLY_MIN_)
                           //           so ideal with wait_time = DEPART_EARLY_ALLOWED_MIN_
                           if (wait_time < DEPART_EARLY_ALLOWED_MIN_) {
-                            delay_attr["depart_early_min"] = DEPART_EARLY_ALLOWED_MIN_ - wait_time;
-                            delay_attr["depart_late_min"      ] = 0;
+                            delay_attr[ATTR_DEPART_EARLY_MIN  ] = DEPART_EARLY_ALLOWED_MIN_ - wait_time;
+                            delay_attr[ATTR_DEPART_LATE_MIN   ] = 0;
                           } else {
-                            delay_attr["depart_early_min"] = 0 ;
-                            delay_attr["depart_late_min"      ] = wait_time - DEPART_EARLY_ALLOWED_MIN_;
+                            delay_attr[ATTR_DEPART_EARLY_MIN  ] = 0 ;
+                            delay_attr[ATTR_DEPART_LATE_MIN   ] = wait_time - DEPART_EARLY_ALLOWED_MIN_;
                           }
                         }
 
-                        UserClassPurposeMode delay_ucpm = {
-                            path_spec.user_class_, path_spec.purpose_,
-                            path_spec.outbound_ ? MODE_EGRESS: MODE_ACCESS,
-                            path_spec.outbound_ ? path_spec.egress_mode_ : path_spec.access_mode_
-                        };
-                        WeightLookup::const_iterator delay_iter_weights = weight_lookup_.find(delay_ucpm);
-                        if (delay_iter_weights != weight_lookup_.end()) {
-                            SupplyModeToNamedWeights::const_iterator delay_iter_s2w = delay_iter_weights->second.find(best_guess_link.trip_id_);
-                            if (delay_iter_s2w != delay_iter_weights->second.end()) {
+                        if (path_weights.delay_weights_ != NULL) {
+                            SupplyModeToNamedWeights::const_iterator delay_iter_s2w = path_weights.delay_weights_->find(best_guess_link.trip_id_);
+                            if (delay_iter_s2w != path_weights.delay_weights_->end()) {
                                 link_cost = tallyLinkCost(best_guess_link.trip_id_, path_spec, trace_file, delay_iter_s2w->second, delay_attr);
                             }
                         }
@@ -1579,9 +3029,9 @@ namespace fasttrips {
                     // I think we can't do this as it's problematic
                     // TODO: devise test to demonstrate
                     if ((best_guess_link.deparr_mode_ == MODE_ACCESS) || (best_guess_link.deparr_mode_ == MODE_EGRESS)) {
-                        link_attr["transfer_penalty"] = 0.0;
+                        link_attr[ATTR_TRANSFER_PENALTY] = 0.0;
                     } else {
-                        link_attr["transfer_penalty"] = 1.0; //TODO: make configurable or based off of IVT coeff
+                        link_attr[ATTR_TRANSFER_PENALTY] = 1.0; //TODO: make configurable or based off of IVT coeff
                     }
 
                     link_cost = link_cost + tallyLinkCost(trip_info.supply_mode_num_, path_spec, trace_file, named_weights, link_attr);
@@ -1621,20 +3071,40 @@ namespace fasttrips {
     int PathFinder::labelStops(
         const PathSpecification& path_spec,
         std::ofstream& trace_file,
+        const PathWeights& path_weights,
         const std::map<int,int>& reachable_final_stops,
+        const StopLowerBounds* stop_lower_bounds,
         StopStates& stop_states,
         LabelStopQueue& label_stop_queue,
-        int& max_process_count) const
+        int& max_process_count,
+        int& pruned_stops) const
     {
         int label_iterations = 1;
         std::tr1::unordered_set<int> stop_done;
         std::tr1::unordered_set<int> trips_done;
-        double dir_factor = path_spec.outbound_ ? 1.0 : -1.0;
         LabelStop last_label_stop;
 
         // we'll use this to stop labeling when we're past useful paths
         double est_max_path_cost = MAX_COST;
 
+        // the lower bounds are in-vehicle minutes.  Deterministic labels are unweighted minutes, so they're used as is.
+        // Hyperpath labels are generalized costs, and every cost part is non-negative, so the lower bounds are scaled by
+        // the lowest in-vehicle time weight of the transit modes allowed; if any of those isn't linear, there's no bound.
+        double lower_bound_scale = 1.0;
+        if (stop_lower_bounds && path_spec.hyperpath_) {
+            lower_bound_scale = MAX_COST;
+            for (size_t mode_num = 0; mode_num < path_weights.transit_weights_.size(); ++mode_num) {
+                if (path_weights.transit_weights_[mode_num] == NULL) { continue; }
+                const Weight* ivt_weight = path_weights.transit_weights_[mode_num]->ivtWeight();
+                if ((ivt_weight == NULL) || (ivt_weight->type_ != WEIGHT_LINEAR) || (ivt_weight->weight_ <= 0)) {
+                    lower_bound_scale = 0;
+                    break;
+                }
+                lower_bound_scale = std::min(lower_bound_scale, ivt_weight->weight_);
+            }
+            if (lower_bound_scale >= MAX_COST) { lower_bound_scale = 0; }
+        }
+
         while (!label_stop_queue.empty()) {
             /***************************************************************************************
             * for outbound: we can depart from *stop_id*
@@ -1653,6 +3123,37 @@ namespace fasttrips {
             // if we just processed this one, then skip since it'll be a no-op
             if ((current_label_stop.stop_id_ == last_label_stop.stop_id_) && (current_label_stop.is_trip_ == last_label_stop.is_trip_)) { continue; }
 
+            // skip this stop if it can't get to the end TAZ.  Nothing labeled from it could either, so that doesn't
+            // change the labels of any stop that can.
+            // A label is no more than the cost of any path to the stop -- hyperpath labels are logsums, which are no more
+            // than their lowest cost -- so the label plus the stop's scaled lower bound is a lower bound on the cost of any
+            // path through it.  The stop is skipped if that's past the labeling cutoff, which for hyperpaths is the lowest
+            // cost so far plus the stochastic cutoff for MIN_PATH_PROBABILITY_ (see PathFinder::updateStopStatesForFinalLinks).
+            if (stop_lower_bounds) {
+                double lower_bound = MAX_COST;
+                if (current_label_stop.stop_id_ < (int)stop_lower_bounds->size()) { lower_bound = (*stop_lower_bounds)[current_label_stop.stop_id_]; }
+
+                bool unreachable = (lower_bound >= MAX_COST);
+                bool past_cutoff = (lower_bound_scale > 0) && (est_max_path_cost < MAX_COST) &&
+                                   (current_label_stop.label_ + lower_bound_scale*lower_bound > 2*est_max_path_cost);
+                if (unreachable || past_cutoff) {
+                    if (path_spec.trace_) {
+                        trace_file << "Pulling from label_stop_queue but stop " << stopStringForId(current_label_stop.stop_id_);
+                        trace_file << " is_trip " << current_label_stop.is_trip_ << " label " << current_label_stop.label_;
+                        if (unreachable) {
+                            trace_file << " can't get to the end TAZ so skipping." << std::endl;
+                        } else {
+                            trace_file << " has lower bound " << lower_bound_scale*lower_bound << " to the end TAZ, past 2*est_max_path_cost = ";
+                            trace_file << 2*est_max_path_cost << " so skipping." << std::endl;
+                        }
+                    }
+                    pruned_stops += 1;
+                    // the rest of the queue is no better
+                    if (current_label_stop.label_ > 2*est_max_path_cost) { break; }
+                    continue;
+                }
+            }
+
             // hyperpath only
             if (path_spec.hyperpath_) {
                 // have we hit the configured limit?
@@ -1696,6 +3197,7 @@ namespace fasttrips {
             {
                 updateStopStatesForTransfers(path_spec,
                                              trace_file,
+                                             path_weights,
                                              stop_states,
                                              label_stop_queue,
                                              label_iterations,
@@ -1703,6 +3205,7 @@ namespace fasttrips {
 
                 updateStopStatesForFinalLinks(path_spec,
                                               trace_file,
+                                              path_weights,
                                               reachable_final_stops,
                                               stop_states,
                                               label_stop_queue,
@@ -1715,6 +3218,7 @@ namespace fasttrips {
             {
                 updateStopStatesForTrips(path_spec,
                                          trace_file,
+                                         path_weights,
                                          stop_states,
                                          label_stop_queue,
                                          label_iterations,
@@ -1738,6 +3242,34 @@ namespace fasttrips {
         return label_iterations;
     }
 
+    void PathFinder::labelFinalStops(
+        const PathSpecification& path_spec,
+        std::ofstream& trace_file,
+        const PathWeights& path_weights,
+        const std::map<int,int>& reachable_final_stops,
+        StopStates& stop_states,
+        LabelStopQueue& label_stop_queue) const
+    {
+        // (trip label, stop id) for the reachable final stops that were labeled
+        std::vector< std::pair<double, int> > final_stops;
+        for (std::map<int,int>::const_iterator rfs_iter = reachable_final_stops.begin(); rfs_iter != reachable_final_stops.end(); ++rfs_iter) {
+            StopStates::const_iterator ssi = stop_states.find(rfs_iter->first);
+            if ((ssi == stop_states.end()) || (ssi->second.size(true) == 0)) { continue; }
+            final_stops.push_back(std::make_pair(ssi->second.hyperpathCost(true), rfs_iter->first));
+        }
+        std::sort(final_stops.begin(), final_stops.end());
+
+        double est_max_path_cost = MAX_COST;
+        for (size_t final_idx = 0; final_idx < final_stops.size(); ++final_idx) {
+            // labelStops would have stopped here
+            if (final_stops[final_idx].first > 2*est_max_path_cost) { break; }
+
+            LabelStop final_label_stop = { final_stops[final_idx].first, final_stops[final_idx].second, true };
+            updateStopStatesForFinalLinks(path_spec, trace_file, path_weights, reachable_final_stops, stop_states,
+                                          label_stop_queue, (int)final_idx+1, final_label_stop, est_max_path_cost);
+        }
+    }
+
     // Returns false if no stops are reachable
     bool PathFinder::setReachableFinalStops(
         const PathSpecification& path_spec,
@@ -1745,7 +3277,6 @@ namespace fasttrips {
         std::map<int, int>& reachable_final_stops) const
     {
         int end_taz_id = path_spec.outbound_ ? path_spec.origin_taz_id_ : path_spec.destination_taz_id_;
-        double dir_factor = path_spec.outbound_ ? 1.0 : -1.0;
 
         // are there any egress/access links?
         if (access_egress_links_.hasLinksForTaz(end_taz_id) == false) {
@@ -1867,8 +3398,8 @@ namespace fasttrips {
                 link_attr["depart_early_min"]   = 0.0;
                 link_attr["arrive_late_min" ]   = 0.0;
 
-                double  access_time             = link_attr.find("time_min")->second;
-                double  access_dist             = link_attr.find("dist")->second;
+                double  access_time             = link_attr.get(ATTR_TIME_MIN);
+                double  access_dist             = link_attr.get(ATTR_DIST);
                 double  deparr_time, link_cost, cost;
 
                 StopStates::const_iterator stop_states_iter = stop_states.find(stop_id);
@@ -1950,14 +3481,13 @@ namespace fasttrips {
     bool PathFinder::hyperpathGeneratePath(
         const PathSpecification& path_spec,
         std::ofstream& trace_file,
+        PathRandom& path_random,
         StopStates& stop_states,
         Path& path) const
     {
         int    start_state_id   = path_spec.outbound_ ? path_spec.origin_taz_id_ : path_spec.destination_taz_id_;
-        double dir_factor       = path_spec.outbound_ ? 1 : -1;
 
         Hyperlink& taz_state    = stop_states.find(start_state_id)->second;
-        double taz_label        = taz_state.hyperpathCost(false);
 
         // setup access/egress probabilities
         int maxcumi = taz_state.setupProbabilities(path_spec, trace_file, *this, false);
@@ -1966,12 +3496,9 @@ namespace fasttrips {
         // choose the state and store it
         if (path_spec.trace_) { trace_file << " -> Chose access/egress " << std::endl; }
         path.addLink(start_state_id,
-                     taz_state.chooseState(path_spec, trace_file),
+                     taz_state.chooseState(path_spec, trace_file, path_random),
                      trace_file, path_spec, *this);
 
-        // trip_id shouldn't repeat
-        int last_trip_id = -1;
-
         // moving on, ss is now the previous link
         while (true)
         {
@@ -1999,7 +3526,7 @@ namespace fasttrips {
             // choose next link and add it to the path
             if (path_spec.trace_) { trace_file << " -> Chose stop link " << std::endl; }
             path.addLink(current_stop_id,
-                         current_hyperlink.chooseState(path_spec, trace_file, &ss),
+                         current_hyperlink.chooseState(path_spec, trace_file, path_random, &ss),
                          trace_file, path_spec, *this);
 
             // are we done?
@@ -2007,21 +3534,17 @@ namespace fasttrips {
                 (!path_spec.outbound_ && path.back().second.deparr_mode_ == MODE_ACCESS)) {
                 break;
             }
-
-            if (isTrip(path.back().second.deparr_mode_)) {
-                last_trip_id = path.back().second.trip_id_;
-            }
-
         }
         return true;
     }
 
     Path PathFinder::choosePath(const PathSpecification& path_spec,
         std::ofstream& trace_file,
+        PathRandom& path_random,
         PathSet& paths,
         int max_prob_i) const
     {
-        int random_num = rand();
+        int random_num = path_random.next();
         if (path_spec.trace_) { trace_file << "random_num " << random_num << " -> "; }
 
         // mod it by max prob
@@ -2067,14 +3590,13 @@ namespace fasttrips {
         if (path_spec.hyperpath_)
         {
             double logsum = 0;
-            // random seed -- possible todo: make this a function of more meaningful attributes, like o/d/time/outbound/userclass/purpose ?
-            // srand(path_spec.path_id_);
-            srand(42);
+            // random numbers for this path spec only, so results don't depend on what else is running
+            PathRandom path_random(path_spec);
             // find a *set of Paths*
             for (int attempts = 1; attempts <= STOCH_PATHSET_SIZE_; ++attempts)
             {
                 Path new_path(path_spec.outbound_, true);
-                bool path_found = hyperpathGeneratePath(path_spec, trace_file, stop_states, new_path);
+                bool path_found = hyperpathGeneratePath(path_spec, trace_file, path_random, stop_states, new_path);
 
                 if (path_found) {
                     // we have to calculate the cost in order to find it, since it's ordered by cost also
@@ -2183,7 +3705,7 @@ namespace fasttrips {
             }
 
             // choose path
-            // path = choosePath(path_spec, trace_file, pathsset, cum_prob);
+            // path = choosePath(path_spec, trace_file, path_random, pathsset, cum_prob);
             // path_info = paths[path];
             return RET_SUCCESS;
         }
@@ -2225,15 +3747,14 @@ namespace fasttrips {
      */
     double PathFinder::getScheduledDeparture(int trip_id, int stop_id, int sequence) const
     {
-        std::map<int, std::vector<TripStopTime> >::const_iterator tsti = trip_stop_times_.find(trip_id);
-        if (tsti == trip_stop_times_.end()) { return -1; }
+        if ((trip_id < 0) || (trip_id+1 >= (int)trip_stop_times_offsets_.size())) { return -1; }
 
-        for (size_t stt_index = 0; stt_index < tsti->second.size(); ++stt_index)
+        for (int stt_index = trip_stop_times_offsets_[trip_id]; stt_index < trip_stop_times_offsets_[trip_id+1]; ++stt_index)
         {
-            if (tsti->second[stt_index].stop_id_ != stop_id) { continue; }
+            if (trip_stop_times_[stt_index].stop_id_ != stop_id) { continue; }
             // trip id matches and stop id matches -- does sequence match or is it unspecified?
-            if ((sequence < 0) || (sequence == tsti->second[stt_index].seq_)) {
-                return tsti->second[stt_index].depart_time_;
+            if ((sequence < 0) || (sequence == trip_stop_times_[stt_index].seq_)) {
+                return trip_stop_times_[stt_index].depart_time_;
             }
         }
         return -1;
@@ -2244,8 +3765,8 @@ namespace fasttrips {
      */
     const FarePeriod* PathFinder::getFarePeriod(int route_id, int board_stop_id, int alight_stop_id, double trip_depart_time) const
     {
-        int board_stop_zone  = stop_num_to_stop_.find(board_stop_id)->second.zone_num_;
-        int alight_stop_zone = stop_num_to_stop_.find(alight_stop_id)->second.zone_num_;
+        int board_stop_zone  = stop_num_to_stop_[board_stop_id].zone_num_;
+        int alight_stop_zone = stop_num_to_stop_[alight_stop_id].zone_num_;
         RouteStopZone rsz;
 
         for (int search_type = 0; search_type < 4; ++search_type) {
@@ -2307,17 +3828,40 @@ namespace fasttrips {
     void PathFinder::getTripsWithinTime(int stop_id, bool outbound, double timepoint, std::vector<TripStopTime>& return_trips) const
     {
         // are there any trips for this stop?
-        std::map<int, std::vector<TripStopTime> >::const_iterator mapiter = stop_trip_times_.find(stop_id);
-        if (mapiter == stop_trip_times_.end()) {
+        if ((stop_id < 0) || (stop_id+1 >= (int)stop_trip_times_offsets_.size())) {
             return;
         }
-        for (std::vector<TripStopTime>::const_iterator it  = mapiter->second.begin();
-                                                       it != mapiter->second.end();   ++it) {
-            if (outbound && (it->arrive_time_ <= timepoint) && (it->arrive_time_ > timepoint-Hyperlink::TIME_WINDOW_)) {
-                return_trips.push_back(*it);
-            } else if (!outbound && (it->depart_time_ >= timepoint) && (it->depart_time_ < timepoint+Hyperlink::TIME_WINDOW_)) {
-                return_trips.push_back(*it);
-            }
+        int stop_begin = stop_trip_times_offsets_[stop_id];
+        int stop_end   = stop_trip_times_offsets_[stop_id+1];
+        if (stop_begin == stop_end) {
+            return;
+        }
+
+        StopTimeIndex::const_iterator window_start, window_end;
+        if (outbound) {
+            // arrive in (timepoint - TIME_WINDOW_, timepoint]
+            window_start = std::lower_bound(stop_arrive_index_.begin() + stop_begin, stop_arrive_index_.begin() + stop_end,
+                                            std::make_pair(timepoint-Hyperlink::TIME_WINDOW_, INT_MAX));
+            window_end   = std::lower_bound(window_start, stop_arrive_index_.begin() + stop_end,
+                                            std::make_pair(timepoint, INT_MAX));
+        } else {
+            // depart in [timepoint, timepoint + TIME_WINDOW_)
+            window_start = std::lower_bound(stop_depart_index_.begin() + stop_begin, stop_depart_index_.begin() + stop_end,
+                                            std::make_pair(timepoint, INT_MIN));
+            window_end   = std::lower_bound(window_start, stop_depart_index_.begin() + stop_end,
+                                            std::make_pair(timepoint+Hyperlink::TIME_WINDOW_, INT_MIN));
+        }
+        if (window_start == window_end) { return; }
+
+        // return them in stop_trip_times_ order, which is how they were labeled before there was an index
+        std::vector<int> stt_indices;
+        stt_indices.reserve(window_end - window_start);
+        for (StopTimeIndex::const_iterator sti = window_start; sti != window_end; ++sti) {
+            stt_indices.push_back(sti->second);
+        }
+        std::sort(stt_indices.begin(), stt_indices.end());
+        for (std::vector<int>::const_iterator stt_idx = stt_indices.begin(); stt_idx != stt_indices.end(); ++stt_idx) {
+            return_trips.push_back(stop_trip_times_[*stt_idx]);
         }
     }
 
@@ -2381,7 +3925,7 @@ namespace fasttrips {
             ostr << std::setw(13) << std::setfill(' ') << "Transfer";
         } else if (mode == MODE_TRANSIT) {
             // show the supply mode
-            int supply_mode_num = trip_info_.find(trip_id)->second.supply_mode_num_;
+            int supply_mode_num = trip_info_[trip_id].supply_mode_num_;
             ostr << std::setw(13) << std::setfill(' ') << mode_num_to_str_.find(supply_mode_num)->second;
         } else {
             // trip
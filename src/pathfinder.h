@@ -15,6 +15,7 @@
 #include "access_egress.h"
 #include "LabelStopQueue.h"
 #include "hyperlink.h"
+#include "hyperpath_cache.h"
 #include "path.h"
 
 #if __APPLE__
@@ -66,11 +67,39 @@ namespace fasttrips {
       double     logistic_mid_;  // oly for WEIGHT_LOGISTIC
     } Weight;
 
+    /**
+     * The weights for a (user class, purpose, demand mode, supply mode).  These are read by name
+     * and then compiled into attribute slots so PathFinder::tallyLinkCost doesn't need names.
+     */
+    struct NamedWeights {
+        std::map<std::string, Weight> by_name_;     ///< weight name -> weight
+        std::vector<int>              slots_;       ///< attribute slot for each weight, in by_name_ order
+        std::vector<Weight>           weights_;     ///< the weights, in by_name_ order
+        int                           ivt_index_;   ///< index of the in_vehicle_time_min weight in weights_, or -1
+
+        NamedWeights() : ivt_index_(-1) {}
+
+        /// Sets slots_, weights_ and ivt_index_ from by_name_
+        void compile();
+        /// Returns the in_vehicle_time_min weight, or NULL if there isn't one
+        const Weight* ivtWeight() const { return ivt_index_ < 0 ? NULL : &weights_[ivt_index_]; }
+    };
+
     // This is a lot of naming but it does make iterator construction easier
-    typedef std::map<std::string, Weight> NamedWeights;
     typedef std::map<int, NamedWeights> SupplyModeToNamedWeights;
     typedef std::map< UserClassPurposeMode, SupplyModeToNamedWeights, struct fasttrips::UCPMCompare > WeightLookup;
 
+    /**
+     * The weights for a path specification, looked up once per path so that labeling
+     * doesn't need to look them up by user class, purpose and demand mode for every stop.
+     */
+    typedef struct {
+        const SupplyModeToNamedWeights*  final_weights_;     ///< access (outbound) or egress (inbound) weights; NULL if none
+        const SupplyModeToNamedWeights*  delay_weights_;     ///< egress (outbound) or access (inbound) weights; NULL if none
+        std::vector<const NamedWeights*> transit_weights_;   ///< transit weights indexed by supply mode number; NULL if not allowed
+        const NamedWeights*              transfer_weights_;  ///< transfer weights; NULL if none
+    } PathWeights;
+
 
 
     // Transfer information: stop id -> stop id -> attribute map
@@ -103,6 +132,41 @@ namespace fasttrips {
         double  overcap_;         /// number of passengers overcap
     } TripStopTime;
 
+    /// Stop times at a stop sorted by time: (arrival or departure time, index into PathFinder::stop_trip_times_)
+    typedef std::vector< std::pair<double, int> > StopTimeIndex;
+
+    /// Supply data: a transit vehicle trip's run from one stop to the next, for PathFinder::findPathSetByConnectionScan.
+    /// Times are minutes after midnight but keep increasing past 24*60 for trips that cross midnight.
+    typedef struct {
+        int     trip_id_;         ///< trip ID
+        int     seq_;             ///< stop sequence of the departure stop; the arrival stop is seq_+1
+        int     dep_stop_id_;     ///< departure stop ID
+        int     arr_stop_id_;     ///< arrival stop ID
+        double  depart_time_;     ///< departure time from dep_stop_id_
+        double  arrive_time_;     ///< arrival time at arr_stop_id_
+    } Connection;
+
+    /// Orders fasttrips::Connection instances by departure time, then arrival time, trip and sequence
+    struct ConnectionCompare {
+        bool operator()(const Connection& c1, const Connection& c2) const {
+            if (c1.depart_time_ < c2.depart_time_) { return true;  }
+            if (c1.depart_time_ > c2.depart_time_) { return false; }
+            if (c1.arrive_time_ < c2.arrive_time_) { return true;  }
+            if (c1.arrive_time_ > c2.arrive_time_) { return false; }
+            if (c1.trip_id_     < c2.trip_id_    ) { return true;  }
+            if (c1.trip_id_     > c2.trip_id_    ) { return false; }
+            if (c1.seq_         < c2.seq_        ) { return true;  }
+            if (c1.seq_         > c2.seq_        ) { return false; }
+            return false;
+        }
+    };
+
+    /// Stop hops: for each stop id, (adjacent stop id, shortest scheduled run time in minutes) by any trip
+    typedef std::vector< std::vector< std::pair<int, double> > > StopHops;
+
+    /// Lower bounds on the in-vehicle time between each stop and a TAZ, in unweighted minutes like deterministic labels, indexed by stop id.  See PathFinder::getStopLowerBounds
+    typedef std::vector<double> StopLowerBounds;
+
     /// For capacity lookups: TripStop definition
     typedef struct {
         int     trip_id_;
@@ -177,8 +241,66 @@ namespace fasttrips {
         long    workingset_bytes_;              ///< Working set size, in bytes
         long    privateusage_bytes_;            ///< Private memory usage, in bytes
         long    mem_timestamp_;                 ///< Time of memory query, in seconds since epoch
+        int     queue_pushes_;                  ///< Number of pushes onto the fasttrips::LabelStopQueue
+        int     queue_decrease_keys_;           ///< Number of those pushes that lowered the label of a stop already in the queue
+        int     queue_pops_;                    ///< Number of pops from the fasttrips::LabelStopQueue
+        int     pruned_stops_;                  ///< Number of those pops skipped by lower bound pruning
+        int     cache_hits_;                    ///< 1 if the labeling came from the fasttrips::HyperpathCache
+        int     cache_misses_;                  ///< 1 if the labeling was done and added to the fasttrips::HyperpathCache
+        int     cache_evictions_;               ///< Number of labelings evicted from the fasttrips::HyperpathCache to make room
     } PerformanceInfo;
 
+    /**
+     * The labels for PathFinder::findPathSetByConnectionScan.  The scan goes forward in time for inbound
+     * path specifications and backward for outbound ones, so "best" is earliest arrival for inbound and latest
+     * departure for outbound.  The vectors are sized once and only the entries a search touches are reset.
+     */
+    struct ConnectionScanLabels {
+        std::vector<double>    walk_time_;      ///< by stop id: best time at the stop via access, egress or transfer
+        std::vector<StopState> walk_state_;     ///< by stop id: the link for walk_time_; iteration_ is -1 if there isn't one
+        std::vector<double>    trip_time_;      ///< by stop id: best time at the stop via transit trip
+        std::vector<StopState> trip_state_;     ///< by stop id: the link for trip_time_; iteration_ is -1 if there isn't one
+        std::vector<int>       trip_start_seq_; ///< by trip id: the sequence boarded at (inbound) or alighted at (outbound); 0 if neither
+        std::vector<double>    trip_start_time_;///< by trip id: the vehicle departure (inbound) or arrival (outbound) time there
+        std::vector<double>    trip_start_wait_;///< by trip id: the wait before boarding (inbound) or after alighting (outbound)
+        std::vector<int>       touched_stops_;  ///< stop ids with a walk or trip state
+        std::vector<int>       touched_trips_;  ///< trip ids with a trip_start_seq_
+        std::vector<int>       end_taz_ids_;    ///< the TAZs searched for; an end number is an index into this
+        std::vector<double>    end_time_;       ///< by end number: best time at the end TAZ
+        std::vector<StopState> end_state_;      ///< by end number: the access (outbound) or egress (inbound) link for end_time_; iteration_ is -1 if there isn't one
+        std::vector<int>       end_scan_num_;   ///< by end number: the scan that last set end_state_
+        std::map< int, std::vector< std::pair<int, int> > > end_links_; ///< stop id -> (end number, supply mode number) with weights
+    };
+
+    /// The zone-to-zone skims from PathFinder::findSkims, in this order for each pair of TAZs
+    enum SkimAttribute {
+        SKIM_IVT_MIN        = 0,    ///< in-vehicle time, in minutes
+        SKIM_WAIT_MIN       = 1,    ///< wait time, in minutes, including the wait from the skim time until the path starts
+        SKIM_WALK_MIN       = 2,    ///< access, egress and transfer time, in minutes
+        SKIM_TRANSFERS      = 3,    ///< number of transfers
+        SKIM_FARE           = 4,    ///< fare
+        SKIM_COST           = 5,    ///< generalized cost of the least cost path
+        NUM_SKIM_ATTRIBUTES = 6
+    };
+
+    /**
+     * The labeling state for path searches: the stop states and the label stop queue, plus the
+     * fasttrips::NodePool their links come from.  Each thread keeps one and reuses it for every
+     * path specification it finds, so that memory is recycled rather than freed and allocated
+     * again for each search.
+     *
+     * The fasttrips::HyperpathCache is here too since its stop states come from the same pool.
+     */
+    struct LabelingWorkspace {
+        NodePool             node_pool_;              ///< declared first so it outlives the containers using it
+        StopStates           stop_states_;            ///< see PathFinder::labelStops
+        LabelStopQueue       label_stop_queue_;       ///< see PathFinder::labelStops
+        HyperpathCache       hyperpath_cache_;        ///< labelings to reuse; see PathFinder::findPathSet
+        ConnectionScanLabels connection_scan_labels_; ///< see PathFinder::findPathSetByConnectionScan
+
+        LabelingWorkspace() : stop_states_(&node_pool_), hyperpath_cache_(&node_pool_) {}
+    };
+
     /**
     * This is the class that does all the work.  Setup the network supply first.
     */
@@ -208,6 +330,15 @@ namespace fasttrips {
 
         /// See <a href="_generated/fasttrips.Assignment.html#fasttrips.Assignment.MIN_PATH_PROBABILITY">fasttrips.Assignment.MIN_PATH_PROBABILITY</a>
         double MIN_PATH_PROBABILITY_;
+
+        /// See <a href="_generated/fasttrips.Assignment.html#fasttrips.Assignment.LOWER_BOUND_PRUNING">fasttrips.Assignment.LOWER_BOUND_PRUNING</a>
+        bool LOWER_BOUND_PRUNING_;
+
+        /// See <a href="_generated/fasttrips.Assignment.html#fasttrips.Assignment.HYPERPATH_CACHE_MB">fasttrips.Assignment.HYPERPATH_CACHE_MB</a>
+        double HYPERPATH_CACHE_MB_;
+
+        /// See <a href="_generated/fasttrips.Assignment.html#fasttrips.Assignment.HYPERPATH_CACHE_TIME_BUCKET_MIN">fasttrips.Assignment.HYPERPATH_CACHE_TIME_BUCKET_MIN</a>
+        double HYPERPATH_CACHE_TIME_BUCKET_MIN_;
         ///@}
 
         /// Access this through getTransferAttributes()
@@ -229,14 +360,35 @@ namespace fasttrips {
         /// Transfer information: stop id -> stop id -> attributes
         StopStopToAttr transfer_links_o_d_;
         StopStopToAttr transfer_links_d_o_;
-        /// Trip information: trip id -> Trip Info
-        std::map<int, TripInfo> trip_info_;
-        /// Trip information: trip id -> vector of [trip id, sequence, stop id, arrival time, departure time, overcap]
-        std::map<int, std::vector<TripStopTime> > trip_stop_times_;
-        /// Stop information: stop id -> vector of [trip id, sequence, stop id, arrival time, departure time, overcap]
-        std::map<int, std::vector<TripStopTime> > stop_trip_times_;
-        // Fare information: route id -> fare id
-        std::map<int, int> route_fares_;
+        /// Trip information: Trip Info indexed by trip id
+        std::vector<TripInfo> trip_info_;
+        /// Trip information: [trip id, sequence, stop id, arrival time, departure time, overcap] grouped by trip id in sequence order.
+        /// The stop times for trip id t are [trip_stop_times_offsets_[t], trip_stop_times_offsets_[t+1])
+        std::vector<TripStopTime> trip_stop_times_;
+        std::vector<int> trip_stop_times_offsets_;
+        /// Trip information: for each of trip_stop_times_, the index of the same stop time in stop_trip_times_
+        std::vector<int> trip_stop_times_stop_idx_;
+        /// Stop information: [trip id, sequence, stop id, arrival time, departure time, overcap] grouped by stop id in input order.
+        /// The stop times for stop id s are [stop_trip_times_offsets_[s], stop_trip_times_offsets_[s+1])
+        std::vector<TripStopTime> stop_trip_times_;
+        std::vector<int> stop_trip_times_offsets_;
+        /// Stop information: stop_trip_times_ sorted by arrival time within each stop, for PathFinder::getTripsWithinTime.
+        /// Uses the same offsets as stop_trip_times_.
+        StopTimeIndex stop_arrive_index_;
+        /// Stop information: stop_trip_times_ sorted by departure time within each stop, for PathFinder::getTripsWithinTime
+        /// Uses the same offsets as stop_trip_times_.
+        StopTimeIndex stop_depart_index_;
+        /// Stop information: hops to the next stop of each trip, for PathFinder::getStopLowerBounds
+        StopHops stop_hops_next_;
+        /// Stop information: hops from the previous stop of each trip, for PathFinder::getStopLowerBounds
+        StopHops stop_hops_prev_;
+        /// Trip information: every trip's runs between consecutive stops, sorted by fasttrips::ConnectionCompare,
+        /// for PathFinder::findPathSetByConnectionScan
+        std::vector<Connection> connections_;
+        /// Trip information: connections_ sorted by arrival time, as (arrival time, index into connections_)
+        StopTimeIndex connections_by_arrival_;
+        /// Trip information: (first departure time, last arrival time) of each trip's connections, indexed by trip id
+        std::vector< std::pair<double, double> > trip_connection_times_;
         // Fare information: route/origin zone/dest zone -> fare period
         FarePeriodMmap fare_periods_;
         // Fare transfer rules: (from_fare_period,to_fare_period) -> FareTransfer
@@ -244,7 +396,7 @@ namespace fasttrips {
 
         // ================ ID numbers to ID strings ===============
         std::map<int, std::string> trip_num_to_str_;
-        std::map<int, Stop>        stop_num_to_stop_;
+        std::vector<Stop>          stop_num_to_stop_;  // indexed by stop id
         std::map<int, std::string> route_num_to_str_;
         std::map<int, std::string> mode_num_to_str_; // supply modes
         int transfer_supply_mode_;
@@ -259,6 +411,21 @@ namespace fasttrips {
          */
         std::map<TripStop, double, struct TripStopCompare> bump_wait_;
 
+        /**
+         * Lower bounds computed so far by PathFinder::getStopLowerBounds, keyed by (TAZ id, outbound).
+         * These are filled in as path searches need them and cleared when the stop times are updated.
+         * PathFinder::findPathSets fills in the ones its path specifications need before starting any threads,
+         * so the threads only read this.
+         */
+        mutable std::map< std::pair<int, bool>, StopLowerBounds > stop_lower_bounds_;
+
+        /**
+         * A fasttrips::LabelingWorkspace for each thread, kept from one call to the next so the
+         * fasttrips::HyperpathCache in each lasts.  Created by PathFinder::getWorkspace, which isn't
+         * thread-safe, so PathFinder::findPathSets creates them before starting any threads.
+         */
+        mutable std::vector<LabelingWorkspace*> workspaces_;
+
         /**
          * Read the intermediate files mapping integer IDs to strings
          * for modes, stops, trips, and routes.
@@ -272,7 +439,32 @@ namespace fasttrips {
         void readAccessLinks();
         void readTransferLinks();
         void readTripInfo();
-        void readWeights();
+        /// Reads ft_intermediate_weights.txt from the given directory into PathFinder::weight_lookup_
+        void readWeights(const std::string& weights_dir);
+
+        /// Sets PathFinder::stop_hops_next_ and PathFinder::stop_hops_prev_ from PathFinder::trip_stop_times_
+        void setStopHops();
+
+        /// Sets PathFinder::connections_, PathFinder::connections_by_arrival_ and PathFinder::trip_connection_times_
+        /// from PathFinder::trip_stop_times_
+        void setConnections();
+
+        /// Returns the given workspace from PathFinder::workspaces_, creating it if need be.
+        LabelingWorkspace& getWorkspace(size_t workspace_num) const;
+
+        /// Clears the fasttrips::HyperpathCache in each of PathFinder::workspaces_, since the labels depend on the supply and parameters
+        void clearHyperpathCaches();
+
+        /**
+         * Returns a lower bound on the in-vehicle time, in minutes, between every stop and the given TAZ, indexed by stop id.
+         * For outbound, this is from the TAZ to the stop, since labeling works back from the destination and the
+         * origin TAZ is still to come; for inbound, it's from the stop to the TAZ.
+         *
+         * The bound comes from a time-independent search over PathFinder::stop_hops_next_ or PathFinder::stop_hops_prev_
+         * plus the transfer links, which are free.  Stops that can't be connected to the TAZ that way get MAX_COST.
+         * It's the same for every path specification so it's computed once per TAZ and direction.
+         */
+        const StopLowerBounds& getStopLowerBounds(int taz_id, bool outbound) const;
 
         void addStopState(const PathSpecification& path_spec,
                           std::ofstream& trace_file,
@@ -300,6 +492,7 @@ namespace fasttrips {
          */
         void updateStopStatesForTransfers(const PathSpecification& path_spec,
                                   std::ofstream& trace_file,
+                                  const PathWeights& path_weights,
                                   StopStates& stop_states,
                                   LabelStopQueue& label_stop_queue,
                                   int label_iteration,
@@ -312,6 +505,7 @@ namespace fasttrips {
          */
         void updateStopStatesForFinalLinks(const PathSpecification& path_spec,
                                   std::ofstream& trace_file,
+                                  const PathWeights& path_weights,
                                   const std::map<int, int>& reachable_final_stops,
                                   StopStates& stop_states,
                                   LabelStopQueue& label_stop_queue,
@@ -328,6 +522,7 @@ namespace fasttrips {
          */
         void updateStopStatesForTrips(const PathSpecification& path_spec,
                                   std::ofstream& trace_file,
+                                  const PathWeights& path_weights,
                                   StopStates& stop_states,
                                   LabelStopQueue& label_stop_queue,
                                   int label_iteration,
@@ -343,13 +538,34 @@ namespace fasttrips {
          *
          * Assume we're done if we've reached the final TAZ already and the current cost is some percent bigger than
          * threshhold based on the lowest cost and the minimum probability.
+         *
+         * If *stop_lower_bounds* is given (see PathFinder::getStopLowerBounds), stops that can't reach the final TAZ
+         * are skipped, which leaves the labels of the rest unchanged.  So are stops whose label plus the lower bound to the
+         * final TAZ is past that threshhold.  Deterministic labels are unweighted minutes like the lower bounds; for
+         * hyperpaths, the lower bounds are scaled by the lowest in-vehicle time weight to make them generalized costs.
+         * These are counted in *pruned_stops*.
          */
         int labelStops(const PathSpecification& path_spec,
                        std::ofstream& trace_file,
+                       const PathWeights& path_weights,
                        const std::map<int,int>& reachable_final_stops,
+                       const StopLowerBounds* stop_lower_bounds,
                        StopStates& stop_states,
                        LabelStopQueue& label_stop_queue,
-                       int& max_process_count) const;
+                       int& max_process_count,
+                       int& pruned_stops) const;
+
+        /**
+         * For stop states from the fasttrips::HyperpathCache, which were labeled without an end TAZ: adds the links from the
+         * reachable final stops to the end TAZ (see PathFinder::updateStopStatesForFinalLinks).  The final stops are taken
+         * in label order, as PathFinder::labelStops would have, stopping once they're past the cutoff it would have stopped at.
+         */
+        void labelFinalStops(const PathSpecification& path_spec,
+                             std::ofstream& trace_file,
+                             const PathWeights& path_weights,
+                             const std::map<int,int>& reachable_final_stops,
+                             StopStates& stop_states,
+                             LabelStopQueue& label_stop_queue) const;
 
         /**
          * This fills the reachable_final_stops map with stop_id -> number of supply links between
@@ -383,6 +599,7 @@ namespace fasttrips {
          */
         bool hyperpathGeneratePath(const PathSpecification& path_spec,
                                   std::ofstream& trace_file,
+                                  PathRandom& path_random,
                                   StopStates& stop_states,
                                   Path& path) const;
 
@@ -394,9 +611,74 @@ namespace fasttrips {
          */
         Path choosePath(const PathSpecification& path_spec,
                         std::ofstream& trace_file,
+                        PathRandom& path_random,
                         PathSet& paths,
                         int max_prob_i) const;
 
+        /**
+         * Finds a single path for the path specification with the Connection Scan Algorithm rather than by labeling stops.
+         * Unlike the deterministic labeling, which minimizes generalized cost, this finds the time-optimal path: the earliest
+         * arrival at the destination (inbound) or latest departure from the origin (outbound), using the access, egress,
+         * transfer and transit supply modes that the path specification has weights for.  It scans PathFinder::connections_ once, forward from the preferred
+         * departure time or backward from the preferred arrival time, stopping once no later connection can improve on
+         * the best path found.  The path is then costed with the generalized cost weights and fares by Path::calculateCost,
+         * but that cost played no part in choosing it.
+         *
+         * @return the same return codes as PathFinder::findPathSet
+         */
+        int findPathSetByConnectionScan(const PathSpecification& path_spec,
+                                        std::ofstream&           trace_file,
+                                        PathSet&                 pathset,
+                                        PerformanceInfo&         performance_info,
+                                        ConnectionScanLabels&    labels) const;
+
+        /**
+         * For the connection scan: sizes the labels for this network and labels the stops linked to the start TAZ
+         * (the origin for inbound, the destination for outbound) by the access (inbound) or egress (outbound) links
+         * that are open at the preferred time.  Labels already there are only replaced by better ones.
+         *
+         * @param horizon   Returns how far the scan needs to go in time to use the new labels
+         * @return true if any stops were labeled.
+         */
+        bool startConnectionScan(const PathSpecification& path_spec,
+                                 const PathWeights&       path_weights,
+                                 double                   start_time,
+                                 double&                  horizon,
+                                 ConnectionScanLabels&    labels) const;
+
+        /// For the connection scan: sets the end TAZs and which stops link to them, clearing the best ways to them.
+        void setConnectionScanEnds(const PathSpecification& path_spec,
+                                   const PathWeights&       path_weights,
+                                   const std::vector<int>&  end_taz_ids,
+                                   ConnectionScanLabels&    labels) const;
+
+        /**
+         * Scans PathFinder::connections_ from the start time until the horizon, or until no connection can improve
+         * on the best way to every end TAZ, updating the labels and the best ways to the end TAZs with scan_num.
+         *
+         * @return the number of connections scanned.
+         */
+        int scanConnections(const PathSpecification& path_spec,
+                            const PathWeights&       path_weights,
+                            double                   start_time,
+                            double                   horizon,
+                            int                      scan_num,
+                            std::ofstream&           trace_file,
+                            ConnectionScanLabels&    labels) const;
+
+        /**
+         * Builds the path to the given end TAZ from the connection scan labels, filling in the fare periods and
+         * in-vehicle time weights of the trips.  The path isn't costed.
+         *
+         * @return RET_SUCCESS, or RET_FAIL_NO_PATHS_GEN if the labels don't make a path.
+         */
+        int getConnectionScanPath(const PathSpecification&    path_spec,
+                                  const PathWeights&          path_weights,
+                                  size_t                      end_num,
+                                  std::ofstream&              trace_file,
+                                  const ConnectionScanLabels& labels,
+                                  Path&                       path) const;
+
         int getPathSet(const PathSpecification&      path_spec,
                        std::ofstream&                trace_file,
                        StopStates&                   stop_states,
@@ -405,6 +687,9 @@ namespace fasttrips {
         /**
          * If outbound, then we're searching backwards, so this returns trips that arrive at the given stop in time to depart at timepoint.
          * If inbound,  then we're searching forwards,  so this returns trips that depart at the given stop time after timepoint
+         *
+         * The trips are found by binary search in PathFinder::stop_arrive_index_ or PathFinder::stop_depart_index_,
+         * and returned in the same order as PathFinder::stop_trip_times_.
          */
         void getTripsWithinTime(int stop_id, bool outbound, double timepoint, std::vector<TripStopTime>& return_trips) const;
 
@@ -437,6 +722,7 @@ namespace fasttrips {
         const TripStopTime& getTripStopTime(int trip_id, int stop_seq) const;
         /**
          * Tally the link cost, which is the sum of the weighted attributes.
+         * The weights are compiled to attribute slots (see NamedWeights::compile) so this doesn't look up any names.
          * @return the cost.
          */
         double tallyLinkCost(const int supply_mode_num,
@@ -455,6 +741,10 @@ namespace fasttrips {
                                             DemandModeType     demand_mode_type,
                                             const std::string& demand_mode,
                                             int                suppy_mode_num) const;
+        /**
+         * Look up the weights for the given path specification.
+         **/
+        void getPathWeights(const PathSpecification& path_spec, PathWeights& path_weights) const;
         /**
          * Setup the path finding parameters.
          */
@@ -469,7 +759,10 @@ namespace fasttrips {
                                   bool       transfer_fare_ignore_pf,
                                   bool       transfer_fare_ignore_pe,
                                   int        max_num_paths,
-                                  double     min_path_probability);
+                                  double     min_path_probability,
+                                  bool       lower_bound_pruning,
+                                  double     hyperpath_cache_mb,
+                                  double     hyperpath_cache_time_bucket_min);
 
         /**
          * Setup the network supply.  This should happen once, before any pathfinding.
@@ -488,6 +781,34 @@ namespace fasttrips {
                               double*       stoptime_times,
                               int           num_stoptimes);
 
+        /**
+         * Replace the stop times, keeping the rest of the network supply.  This is for
+         * subsequent iterations, after PathFinder::initializeSupply has been called.
+         *
+         * @param stoptime_index    For populating PathFinder::trip_stop_times_, this array contains
+         *                          trip IDs, sequence numbers, stop IDs
+         * @param stoptime_times    For populating PathFinder::trip_stop_times_, this array contains
+         *                          transit vehicle arrival times, departure times, and overcap pax at a stop.
+         * @param num_stoptimes     The number of stop times described in the previous two arrays.
+         */
+        void updateSupply(int*          stoptime_index,
+                          double*       stoptime_times,
+                          int           num_stoptimes);
+
+        /**
+         * Replace the times and overcap of the given stop times, keeping the rest of the network supply
+         * and the other stop times.  This is for subsequent iterations when only some stop times have
+         * changed, after PathFinder::initializeSupply has been called; the stop times must be the same
+         * trip stops PathFinder::updateSupply was last given.
+         *
+         * @param stoptime_index    Trip IDs, sequence numbers, stop IDs of the changed stop times
+         * @param stoptime_times    Their new arrival times, departure times, shape_dist_traveled and overcap
+         * @param num_stoptimes     The number of stop times described in the previous two arrays.
+         */
+        void updateStopTimes(int*          stoptime_index,
+                             double*       stoptime_times,
+                             int           num_stoptimes);
+
         /**
          * Setup the information for bumped passengers.
          *
@@ -502,6 +823,15 @@ namespace fasttrips {
                          double*    bw_data,
                          int        num_bw);
 
+        /**
+         * Replace the path weights with those in ft_intermediate_weights.txt in the given directory,
+         * keeping the rest of the network supply.  This is for re-costing with different weights,
+         * after PathFinder::initializeSupply has been called.
+         *
+         * @param weights_dir       The directory containing ft_intermediate_weights.txt
+         */
+        void reloadWeights(const char* weights_dir);
+
         /// Reset - clear state
         void reset();
 
@@ -524,6 +854,112 @@ namespace fasttrips {
             PathSet           &pathset,
             PerformanceInfo   &performance_info) const;
 
+        /**
+         * Same as the above but using the given fasttrips::LabelingWorkspace, which is
+         * cleared first and can be reused for the next path specification.
+         *
+         * If the workspace's fasttrips::HyperpathCache is on, untraced path specifications
+         * look up the labeling there by fasttrips::HyperpathCacheKey.  A miss labels the stops
+         * without regard to the end TAZ, so that the labeling works for any end TAZ, and caches
+         * them; either way, only PathFinder::labelFinalStops and the path enumeration are
+         * specific to this path specification.
+         *
+         * Path specifications with connection_scan_ set go to PathFinder::findPathSetByConnectionScan instead.
+         */
+        int findPathSet(
+            PathSpecification path_spec,
+            PathSet           &pathset,
+            PerformanceInfo   &performance_info,
+            LabelingWorkspace &workspace) const;
+
+        /**
+         * Find the path sets for a batch of path specifications using a pool of native threads
+         * that share this (read-only) PathFinder.  Traced specifications are run serially on the
+         * calling thread since tracing writes to shared files.
+         *
+         * @param path_specs        The specifications of the paths to find
+         * @param pathsets          Returns a fasttrips::PathSet for each path specification, in order
+         * @param performance_infos Returns a fasttrips::PerformanceInfo for each path specification, in order
+         * @param return_statuses   Returns the PathFinder::findPathSet return code for each path specification, in order
+         * @param num_threads       The number of threads to use
+         */
+        void findPathSets(
+            const std::vector<PathSpecification>& path_specs,
+            std::vector<PathSet>                  &pathsets,
+            std::vector<PerformanceInfo>          &performance_infos,
+            std::vector<int>                      &return_statuses,
+            int                                   num_threads) const;
+
+        /**
+         * Zone-to-zone skims from the stochastic (hyperpath) labeling, so the paths are chosen by generalized cost.
+         * For each path specification and skim time, the stops are labeled once from its origin (inbound) or
+         * destination (outbound), without final stops, as for the hyperpath cache (see PathFinder::findPathSet).
+         * Then for each end TAZ, the final links are labeled, paths are enumerated from the hyperpath as
+         * PathFinder::getPathSet does, and the least cost one is skimmed.
+         *
+         * Each path is costed with Path::calculateCost, and its fasttrips::SkimAttribute values are averaged over the
+         * skim times for which there is a path.  Those without any path at all, and the start TAZ itself, are NaN.
+         *
+         * @param path_specs    One per start TAZ, with the user class, purpose, modes and value of time to skim for
+         * @param end_taz_ids   The TAZs to skim to (inbound) or from (outbound)
+         * @param skim_times    The preferred departure (inbound) or arrival (outbound) times, in minutes after midnight
+         * @param skims         Returns NUM_SKIM_ATTRIBUTES values for each path specification and end TAZ, in that order
+         * @param num_threads   The number of threads to use
+         */
+        void findSkims(
+            const std::vector<PathSpecification>& path_specs,
+            const std::vector<int>&               end_taz_ids,
+            const std::vector<double>&            skim_times,
+            std::vector<double>&                  skims,
+            int                                   num_threads) const;
+
+        /**
+         * Skims from the start TAZ of the path specification to each of the end TAZs, as
+         * PathFinder::findSkims describes, into skims: NUM_SKIM_ATTRIBUTES values for each end TAZ.
+         */
+        void skimFromTaz(PathSpecification          path_spec,
+                         const std::vector<int>&    end_taz_ids,
+                         const std::vector<double>& skim_times,
+                         double*                    skims,
+                         LabelingWorkspace&         workspace) const;
+
+        /**
+         * Costs paths that were already found with Path::calculateCost, the same cost model pathfinding uses,
+         * so that the simulation can re-cost its paths without its own copy of the weights, access/egress,
+         * transfer and fare tables.
+         *
+         * The links are laid out as the path finding results are (see _fasttrips.find_pathsets_batch), in origin to
+         * destination order within each path, with each path's links together.  The fare and cost link doubles
+         * are ignored.
+         *
+         * @param path_specs        The path specifications the links' path specification indices refer to
+         * @param num_links         The number of links
+         * @param link_ints         9 per link: path specification index, path number, link number, mode, trip id or
+         *                          supply mode number, A stop id, B stop id, A sequence, B sequence
+         * @param link_doubles      6 per link: B time, A time, link time, fare, cost, distance
+         * @param link_overrides    fasttrips::NUM_LINK_COST_OVERRIDES per link, or NULL
+         * @param link_costs        Returns the cost of each link
+         * @param link_fares        Returns the fare of each link
+         * @param path_links        Returns the index of the first link of each path
+         * @param path_costs        Returns the cost of each path
+         * @param path_fares        Returns the fare of each path
+         * @param path_probabilities Returns the probability of each path within its path specification's paths
+         * @param path_logsums      Returns the sum of the exponentiated utilities of the path specification's paths, for each path
+         */
+        void calculatePathCosts(
+            const std::vector<PathSpecification>& path_specs,
+            size_t                                num_links,
+            const int*                            link_ints,
+            const double*                         link_doubles,
+            const double*                         link_overrides,
+            std::vector<double>&                  link_costs,
+            std::vector<double>&                  link_fares,
+            std::vector<int>&                     path_links,
+            std::vector<double>&                  path_costs,
+            std::vector<double>&                  path_fares,
+            std::vector<double>&                  path_probabilities,
+            std::vector<double>&                  path_logsums) const;
+
         double getScheduledDeparture(int trip_id, int stop_id, int sequence) const;
 
         const FarePeriod* getFarePeriod(int route_id, int board_stop_id, int alight_stop_id, double trip_depart_time) const;
@@ -537,7 +973,7 @@ namespace fasttrips {
         void printMode(std::ostream& ostr, const int& mode, const int& trip_id) const;
 
         /// Accessor for stop strings.  Assumes valid stop id.
-        const std::string& stopStringForId(int stop_id) const { return stop_num_to_stop_.find(stop_id)->second.stop_str_; }
+        const std::string& stopStringForId(int stop_id) const { return stop_num_to_stop_[stop_id].stop_str_; }
         /// Accessor for trip strings.  Assumes valid trip id.
         const std::string& tripStringForId(int trip_id) const { return trip_num_to_str_.find(trip_id)->second; }
         /// Accessor for mode strings.  Assumes valid mode number.
@@ -16,6 +16,7 @@ namespace fasttrips {
         int     iteration_;             ///< Iteration
         int     pathfinding_iteration_; ///< Pathfinding iteration
         bool    hyperpath_;             ///< If true, find path using stochastic algorithm
+        bool    connection_scan_;       ///< If true, find path using the deterministic connection scan algorithm
         int     origin_taz_id_;         ///< Origin of path
         int     destination_taz_id_;    ///< Destination of path
         bool    outbound_;              ///< If true, the preferred time is for arrival, otherwise it's departure
@@ -31,6 +32,51 @@ namespace fasttrips {
         std::string egress_mode_;       ///< Egress demand mode
     } PathSpecification;
 
+    /**
+     * Random number generator for path enumeration.  Each path specification gets its own
+     * generator, seeded from the iteration, person ID and person trip ID, so the paths chosen
+     * don't depend on the order in which path sets are found or on which thread finds them.
+     *
+     * This is the Park-Miller minimal standard generator using Schrage's method to avoid overflow.
+     */
+    class PathRandom {
+    private:
+        int state_;                     ///< Current state, in [1, MODULUS-1]
+
+    public:
+        const static int MODULUS    = 2147483647;   ///< 2^31 - 1
+        const static int MULTIPLIER = 16807;
+        const static int QUOTIENT   = 127773;       ///< MODULUS / MULTIPLIER
+        const static int REMAINDER  = 2836;         ///< MODULUS % MULTIPLIER
+
+        /// Seed from (iteration, person_id, person_trip_id) via FNV-1a
+        PathRandom(const PathSpecification& path_spec) {
+            unsigned int hash = 2166136261u;
+            for (size_t i = 0; i < path_spec.person_id_.size(); ++i) {
+                hash = (hash ^ (unsigned char)path_spec.person_id_[i]) * 16777619u;
+            }
+            hash = (hash ^ 0xff) * 16777619u;  // separator so ("ab","c") != ("a","bc")
+            for (size_t i = 0; i < path_spec.person_trip_id_.size(); ++i) {
+                hash = (hash ^ (unsigned char)path_spec.person_trip_id_[i]) * 16777619u;
+            }
+            for (int i = 0; i < 4; ++i) {
+                hash = (hash ^ ((path_spec.iteration_ >> (8*i)) & 0xff)) * 16777619u;
+            }
+            state_ = (int)(hash % (unsigned int)(MODULUS - 1)) + 1;
+            // the first draws are correlated with the seed so skip a few
+            for (int i = 0; i < 3; ++i) { next(); }
+        }
+
+        /// Returns the next random number, in [1, MODULUS-1]
+        int next() {
+            int hi = state_ / QUOTIENT;
+            int lo = state_ % QUOTIENT;
+            int t  = MULTIPLIER*lo - REMAINDER*hi;
+            state_ = (t > 0) ? t : t + MODULUS;
+            return state_;
+        }
+    };
+
     /**
      * The pathfinding algorithm is a labeling algorithm which associates each stop with a state (or link), encapsulated
      * here.  If the sought path is outbound, then the preferred time is an arrival time
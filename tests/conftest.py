@@ -0,0 +1,75 @@
+import os
+import pandas as pd
+import pytest
+from fasttrips import Run
+
+EXAMPLE_DIR    = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield')
+
+# DIRECTORY LOCATIONS
+INPUT_NETWORK       = os.path.join(EXAMPLE_DIR, 'networks', 'vermont')
+OUTPUT_DIR          = os.path.join(EXAMPLE_DIR, 'output')
+
+# INPUT FILE LOCATIONS, by config
+SPRINGFIELD_INPUTS  = {
+    'A': dict(input_demand_dir = os.path.join(EXAMPLE_DIR, 'demand', 'general'),
+              run_config       = os.path.join(EXAMPLE_DIR, 'configs', 'A', 'config_ft.txt'),
+              input_weights    = os.path.join(EXAMPLE_DIR, 'configs', 'A', 'pathweight_ft.txt')),
+    # the simpson_zorn demand repeats trips
+    'B': dict(input_demand_dir = os.path.join(EXAMPLE_DIR, 'demand', 'simpson_zorn'),
+              run_config       = os.path.join(EXAMPLE_DIR, 'configs', 'B', 'config_ft.txt'),
+              input_weights    = os.path.join(EXAMPLE_DIR, 'configs', 'B', 'pathweight_ft.txt'),
+              input_functions  = os.path.join(EXAMPLE_DIR, 'configs', 'B', 'config_ft.py')),
+}
+
+# RUN PARAMETERS, unless the test says otherwise
+SPRINGFIELD_RUN_ARGS = dict(pathfinding_type = "stochastic",
+                            overlap_variable = "None",
+                            iters            = 1,
+                            dispersion       = 0.50,
+                            num_trips        = 20)
+
+# PATHSET PATHS COLUMNS that should be the same for runs that find the same pathsets
+PATHSET_ITER_COLS   = ["iteration","pathfinding_iteration","simulation_iteration"]
+PATHSET_COLS        = ["person_id","person_trip_id","pathnum","description","pf_cost","pf_probability"]
+
+def run_springfield(output_folder, config='A', **kwargs):
+    """
+    Runs fast-trips on the Springfield vermont network with the given config's demand and weights,
+    writing to *output_folder* in the Springfield output directory.  *kwargs* are passed to
+    :py:func:`Run.run_fasttrips`, overriding :py:data:`SPRINGFIELD_RUN_ARGS`.
+
+    Returns (results, output directory).
+    """
+    run_args = dict(SPRINGFIELD_RUN_ARGS)
+    run_args.update(SPRINGFIELD_INPUTS[config])
+    run_args.update(kwargs)
+    r = Run.run_fasttrips(input_network_dir = INPUT_NETWORK,
+                          output_dir        = OUTPUT_DIR,
+                          output_folder     = output_folder,
+                          **run_args)
+    return (r, os.path.join(OUTPUT_DIR, output_folder))
+
+@pytest.fixture(scope='session')
+def springfield():
+    """
+    :py:func:`run_springfield`, for tests to run fast-trips on Springfield with their own options.
+    """
+    return run_springfield
+
+def read_springfield_pathsets(output_dir):
+    """
+    Reads the pathset paths written to *output_dir* by :py:func:`run_springfield`.
+
+    Returns their :py:data:`PATHSET_ITER_COLS` and :py:data:`PATHSET_COLS`, sorted by iteration, person trip and
+    path number, for comparing runs.
+    """
+    pathset_paths_df = pd.read_csv(os.path.join(output_dir, "pathset_paths.csv"))
+    sort_cols        = PATHSET_ITER_COLS + ["person_id","person_trip_id","pathnum"]
+    return pathset_paths_df[PATHSET_ITER_COLS + PATHSET_COLS].sort_values(by=sort_cols).reset_index(drop=True)
+
+@pytest.fixture(scope='session')
+def springfield_pathsets():
+    """
+    :py:func:`read_springfield_pathsets`, for tests to compare the pathsets of their Springfield runs.
+    """
+    return read_springfield_pathsets
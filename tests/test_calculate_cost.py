@@ -49,6 +49,59 @@ def test_growth_type_cost_calculation():
     np.testing.assert_almost_equal(sample_df['test_cost'].values.tolist(), result_set, decimal=5)
 
 
+@pytest.mark.travis
+def test_compiled_link_costs():
+    weights_df = pd.DataFrame({
+        'user_class':       ['all', 'all', 'all', 'all'],
+        'purpose':          ['work', 'work', 'work', 'other'],
+        'demand_mode_type': ['transit', 'transit', 'transit', 'transit'],
+        'demand_mode':      ['transit', 'transit', 'transit', 'transit'],
+        'supply_mode':      ['local_bus', 'local_bus', 'local_bus', 'local_bus'],
+        'supply_mode_num':  [1, 1, 1, 1],
+        'weight_name':      ['in_vehicle_time_min', 'wait_time_min', 'fare', 'in_vehicle_time_min'],
+        'weight_value':     [3.93, .03, 2.0, 1.0],
+        'growth_type':      ['constant', 'exponential', np.nan, 'constant'],
+    })
+    (weight_keys_df, compiled_weights) = PathSet.compile_weights(weights_df)
+    assert len(weight_keys_df) == 2
+    assert len(compiled_weights) == 3
+
+    key_nums = dict(zip(weight_keys_df['purpose'], weight_keys_df[PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM]))
+    links_df = pd.DataFrame({
+        PathSet.WEIGHTS_COLUMN_WEIGHT_KEY_NUM: [key_nums['work'], key_nums['other'], key_nums['work']],
+        'vot':                                 [12.0, 12.0, 12.0],
+        'missed_xfer':                         [0, 0, 1],
+    })
+    var_values = {'in_vehicle_time_min': np.array([24., 10., 5.]),
+                  'wait_time_min':       np.array([3., 2., 1.]),
+                  'fare':                np.array([1.5, 1.5, 1.5])}
+    (costs, num_weights, missing_df) = PathSet.calculate_link_costs(links_df, compiled_weights, var_values)
+
+    np.testing.assert_almost_equal(costs, [94.32 + 3.13704 + 2.0*60.0/12.0*1.5, 10.0, 3*PathSet.HUGE_COST], decimal=5)
+    assert num_weights.tolist() == [3, 1, 3]
+    assert len(missing_df) == 0
+
+    # a weight without a variable value is missing
+    del var_values['wait_time_min']
+    (costs, num_weights, missing_df) = PathSet.calculate_link_costs(links_df, compiled_weights, var_values)
+    assert len(missing_df) == 2
+    assert set(missing_df[PathSet.WEIGHTS_COLUMN_WEIGHT_NAME]) == {'wait_time_min'}
+
+    # the path weights are compiled once, and again only when they're set
+    (saved_weights_df, saved_compiled_weights) = (PathSet.WEIGHTS_DF, PathSet.COMPILED_WEIGHTS)
+    try:
+        PathSet.WEIGHTS_DF = weights_df
+        (weight_keys_df, compiled_weights) = PathSet.get_compiled_weights()
+        assert len(weight_keys_df) == 2
+        assert PathSet.get_compiled_weights()[1] is compiled_weights
+
+        PathSet.WEIGHTS_DF = weights_df.loc[weights_df['purpose'] == 'work']
+        (weight_keys_df, compiled_weights) = PathSet.get_compiled_weights()
+        assert len(weight_keys_df) == 1
+    finally:
+        (PathSet.WEIGHTS_DF, PathSet.COMPILED_WEIGHTS) = (saved_weights_df, saved_compiled_weights)
+
+
 def verify_dataframe(ctl_path, test_path, dtypes, join_cols, compare_cols):
     '''
     Method to verify that a test dataframe is equal (or nearly equal for floats)
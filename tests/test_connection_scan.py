@@ -0,0 +1,63 @@
+import os
+import pandas as pd
+import pytest
+from fasttrips import PathSet
+
+# the demand, for the preferred times
+INPUT_DEMAND        = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield', 'demand', 'general')
+
+# LIST OF RUN PARAMETERS
+test_size           = 20
+
+def run_pathfinding_type(springfield, pathfinding_type):
+    """
+    Runs the given pathfinding type and returns the results along with a row per path found,
+    with its departure from the origin and arrival at the destination.
+    """
+    (r, output_dir) = springfield("test_connection_scan_%s" % pathfinding_type,
+                                  pathfinding_type = pathfinding_type,
+                                  num_trips        = test_size)
+
+    paths_df = pd.read_csv(os.path.join(output_dir, "pathset_paths.csv"), dtype={"person_id":object})
+    links_df = pd.read_csv(os.path.join(output_dir, "pathset_links.csv"), dtype={"person_id":object},
+                           parse_dates=["pf_A_time", "pf_B_time"])
+    path_times_df = links_df.groupby(["person_id","person_trip_id","pathnum"]).agg({"pf_A_time":"min", "pf_B_time":"max"})
+    path_times_df.rename(columns={"pf_A_time":"depart_time", "pf_B_time":"arrive_time"}, inplace=True)
+    paths_df = pd.merge(left=paths_df, right=path_times_df.reset_index(), how="left")
+    return (r, paths_df)
+
+@pytest.mark.travis
+def test_connection_scan(springfield):
+    """
+    The connection scan should find a path for everyone the deterministic search does, arriving no later,
+    within the preferred times, with the path costed and fares included.
+    """
+    (r, paths_df) = run_pathfinding_type(springfield, "connection_scan")
+    assert r["paths_found"] > 0
+    assert r["passengers_arrived"] > 0
+
+    # the preferred times are on the network date
+    trip_list_df = pd.read_csv(os.path.join(INPUT_DEMAND, "trip_list.txt"), dtype={"person_id":object})
+    paths_df = pd.merge(left=paths_df, right=trip_list_df, how="left")
+    network_date = paths_df["depart_time"].dt.strftime("%Y-%m-%d ")
+    outbound = paths_df["pathdir"] == PathSet.DIR_OUTBOUND
+    inbound  = paths_df["pathdir"] == PathSet.DIR_INBOUND
+    assert outbound.sum() > 0
+    assert inbound.sum() > 0
+    assert (paths_df.loc[outbound, "arrive_time"] <= pd.to_datetime(network_date + paths_df["arrival_time"])[outbound]).all()
+    assert (paths_df.loc[inbound,  "depart_time"] >= pd.to_datetime(network_date + paths_df["departure_time"])[inbound]).all()
+
+    assert pd.notnull(paths_df["pf_cost"]).all()
+    assert (paths_df["pf_cost"] > 0).all()
+    assert pd.notnull(paths_df["pf_fare"]).all()
+    assert (paths_df["pf_fare"] > 0).any()
+
+    (det_r, det_paths_df) = run_pathfinding_type(springfield, "deterministic")
+    assert r["paths_found"] >= det_r["paths_found"]
+
+    both_df = pd.merge(left=paths_df, right=det_paths_df, on=["person_id","person_trip_id"], suffixes=["","_det"])
+    assert len(both_df) == det_r["paths_found"]
+    assert (both_df["arrive_time"] <= both_df["arrive_time_det"]).all()
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -68,7 +68,7 @@ def pathfinder_paths(ft_instance, config_scenario):
     """
 
     ft = ft_instance
-    OUTPUT_FOLDER = os.path.join(EXAMPLES_DIR, 'output', 'test_cost_symmetry', config_scenario)
+    OUTPUT_FOLDER = os.path.join(EXAMPLE_DIR, 'output', 'test_cost_symmetry', config_scenario)
 
     # for debugging insight
     Assignment.write_configuration(OUTPUT_FOLDER)
@@ -85,18 +85,14 @@ def pathfinder_paths(ft_instance, config_scenario):
     path_cols = list(ft.passengers.pathfind_trip_list_df.columns.values)
     for path_tuple in ft.passengers.pathfind_trip_list_df.itertuples(index=False):
         path_dict = dict(zip(path_cols, path_tuple))
-        trip_list_id = path_dict[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]
-
-        trip_pathset = PathSet(path_dict)
-        ft.passengers.add_pathset(trip_list_id, trip_pathset)
 
-        (pathdict, perf_dict) = \
-            Assignment.find_trip_based_pathset(1, 1, trip_pathset,
+        (paths_df, links_df, perf_dict) = \
+            Assignment.find_trip_based_pathset(1, 1, PathSet(path_dict),
                                                Assignment.PATHFINDING_TYPE ==
                                                Assignment.PATHFINDING_TYPE_STOCHASTIC,
                                                trace=path_dict[Passenger.TRIP_LIST_COLUMN_TRACE])
 
-        trip_pathset.pathdict = pathdict
+        ft.passengers.add_pathset_results(paths_df, links_df)
 
     yield ft.passengers.setup_passenger_pathsets(1, 1, ft.stops, ft.trips.trip_id_df,
                                                   ft.trips.trips_df, ft.routes.modes_df,
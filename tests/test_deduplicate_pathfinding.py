@@ -0,0 +1,44 @@
+import os
+import pandas as pd
+import pytest
+from fasttrips import Assignment, Passenger, Performance
+
+@pytest.mark.travis
+def test_deduplicate_pathfinding(springfield):
+    """
+    The simpson_zorn demand repeats trips, so some should share a pathset rather than
+    be found again, and they should still all get paths.  Each person trip sharing a pathset
+    gets the same one as the person trip it was found for, but chooses from it on its own.
+    """
+    (r, output_dir) = springfield("test_deduplicate_pathfinding", config='B', deduplicate_pathfinding=True)
+
+    assert r["passengers_arrived"] > 0
+
+    # only the first of each group of duplicates is in the pathfinding performance
+    performance_df = pd.read_csv(os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_PF_FILE))
+    assert len(performance_df) < r["paths_found"]
+
+    # (first person trip in the group, person trip sharing its pathset) from the pathfinding
+    duplicates_df = Assignment.pathfinding_duplicates_df
+    assert len(duplicates_df) > 0
+
+    # every member of a group has the same pathset as the first
+    cols = ["pathnum","description","pf_cost","pf_fare","pf_probability"]
+    pathset_paths_df = pd.read_csv(os.path.join(output_dir, "pathset_paths.csv"))
+    pathsets = dict((trip_list_id_num, paths_df[cols].sort_values(by="pathnum").reset_index(drop=True))
+                    for (trip_list_id_num, paths_df) in pathset_paths_df.groupby(Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM))
+    for (first_id, duplicate_id) in zip(duplicates_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM],
+                                        duplicates_df[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM]):
+        pd.testing.assert_frame_equal(pathsets[duplicate_id], pathsets[first_id])
+
+    # everyone chose paths, and not every member of a group chose the same ones
+    chosen_paths_df = pd.read_csv(os.path.join(output_dir, "chosenpaths_paths.csv"))
+    assert chosen_paths_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM].nunique() == r["paths_found"]
+    choices = dict((trip_list_id_num, sorted(zip(paths_df["chosen"], paths_df["pathnum"])))
+                   for (trip_list_id_num, paths_df) in chosen_paths_df.groupby(Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM))
+    assert any(choices[duplicate_id] != choices[first_id]
+               for (first_id, duplicate_id) in zip(duplicates_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM],
+                                                   duplicates_df[Assignment.DEDUP_COL_DUPLICATE_TRIP_LIST_ID_NUM]))
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,91 @@
+import os
+import pandas as pd
+import pytest
+from fasttrips import Performance
+
+# LIST OF RUN PARAMETERS: (hyperpath_cache_mb, hyperpath_cache_time_bucket_min, number_of_threads)
+cache_options = [(0, 0, 1), (50, 0, 1), (50, 5, 1), (50, 5, 4)]
+
+# cached labels aren't cut off at the trip's end TAZ or pruned, so the best path's cost
+# may come out this much (relatively) better or worse than without the cache
+BEST_COST_TOLERANCE        = 0.10
+# with time buckets, trips are also labeled for the start of their bucket rather than their
+# own preferred time, so their best path's cost may drift this much (relatively)
+BUCKET_BEST_COST_TOLERANCE = 0.25
+
+@pytest.fixture(scope='module')
+def cache_results(springfield):
+    """
+    (results, output directory) for each (hyperpath_cache_mb, hyperpath_cache_time_bucket_min, number_of_threads).
+    Without time buckets, cached labels are for the trip's own preferred time.
+    """
+    return dict(((cache_mb, bucket_min, number_of_threads),
+                 springfield("test_hyperpath_cache_%d_%d_%d" % (cache_mb, bucket_min, number_of_threads), config='B',
+                             hyperpath_cache_mb              = cache_mb,
+                             hyperpath_cache_time_bucket_min = bucket_min,
+                             number_of_threads               = number_of_threads))
+                for (cache_mb, bucket_min, number_of_threads) in cache_options)
+
+def best_costs_within(cache_results, springfield_pathsets, cache_option, tolerance):
+    """
+    Returns True if the same person trips find paths with *cache_option* as without the cache,
+    and their best path costs are within *tolerance* (relatively) of those without it.
+    """
+    best_costs = []
+    for option in [(0, 0, 1), cache_option]:
+        pathsets_df = springfield_pathsets(cache_results[option][1])
+        best_costs.append(pathsets_df.groupby(["person_id","person_trip_id"])["pf_cost"].min())
+
+    if list(best_costs[0].index) != list(best_costs[1].index): return False
+    return ((best_costs[1] - best_costs[0]).abs() <= tolerance*best_costs[0].abs()).all()
+
+@pytest.mark.travis
+def test_hyperpath_cache(cache_results):
+    """
+    The simpson_zorn demand repeats trips, so some should reuse a cached labeling, and
+    they should still all find paths.
+    """
+    (r, output_dir) = cache_results[(50, 0, 1)]
+
+    assert r["passengers_arrived"] > 0
+
+    performance_df = pd.read_csv(os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_PF_FILE))
+    # every untraced search either hit or missed
+    untraced_df = performance_df.loc[performance_df[Performance.PERFORMANCE_PF_COL_TRACED] == False]
+    assert (untraced_df[Performance.PERFORMANCE_PF_COL_CACHE_HITS] +
+            untraced_df[Performance.PERFORMANCE_PF_COL_CACHE_MISSES] == 1).all()
+    assert performance_df[Performance.PERFORMANCE_PF_COL_CACHE_HITS].sum() > 0
+
+@pytest.mark.travis
+def test_hyperpath_cache_threads(cache_results, springfield_pathsets):
+    """
+    With time buckets, cached labels are for the start of the bucket, whichever trip got there first,
+    so the pathsets shouldn't depend on how many threads (each with its own cache) found them.
+    """
+    pd.testing.assert_frame_equal(springfield_pathsets(cache_results[(50, 5, 1)][1]),
+                                  springfield_pathsets(cache_results[(50, 5, 4)][1]))
+
+@pytest.mark.travis
+def test_hyperpath_cache_off(cache_results, springfield_pathsets):
+    """
+    With the cache, the same person trips find paths, and their best path costs are within
+    :py:data:`BEST_COST_TOLERANCE` of those without it.
+    """
+    assert best_costs_within(cache_results, springfield_pathsets, (50, 0, 1), BEST_COST_TOLERANCE)
+
+@pytest.mark.travis
+def test_hyperpath_cache_time_buckets(cache_results, springfield_pathsets):
+    """
+    Time buckets share labelings among more trips, and the best path costs are still within
+    :py:data:`BUCKET_BEST_COST_TOLERANCE` of those without the cache.
+    """
+    hits = []
+    for cache_option in [(50, 0, 1), (50, 5, 1)]:
+        performance_df = pd.read_csv(os.path.join(cache_results[cache_option][1], Performance.OUTPUT_PERFORMANCE_PF_FILE))
+        hits.append(performance_df[Performance.PERFORMANCE_PF_COL_CACHE_HITS].sum())
+    assert hits[1] >= hits[0]
+
+    assert best_costs_within(cache_results, springfield_pathsets, (50, 5, 1), BUCKET_BEST_COST_TOLERANCE)
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,150 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from fasttrips import Assignment, Passenger, PathSet, Trip
+
+# LIST OF RUN PARAMETERS
+test_size           = 20
+
+def make_supply(departure_time_min, bump_wait_min):
+    """
+    Returns a supply like :py:meth:`Assignment.get_incremental_pathfinding_supply` for two trips,
+    the first with four stops and the second with three, the second stop of which is shared with the first.
+    """
+    supply_df = pd.DataFrame({Trip.STOPTIMES_COLUMN_TRIP_ID_NUM       :np.array([1,1,1,1,2,2,2],        dtype=np.int32),
+                              Trip.STOPTIMES_COLUMN_STOP_SEQUENCE     :np.array([1,2,3,4,1,2,3],        dtype=np.int32),
+                              Trip.STOPTIMES_COLUMN_STOP_ID_NUM       :np.array([10,11,12,13,20,12,21], dtype=np.int32),
+                              Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN  :[900.0,905.0,910.0,915.0,902.0,907.0,912.0],
+                              Trip.SIM_COL_VEH_OVERCAP                :-1.0,
+                              Passenger.PF_COL_PAX_A_TIME_MIN         :np.nan})
+    supply_df[Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN] = departure_time_min
+    supply_df[Passenger.PF_COL_PAX_A_TIME_MIN]          = bump_wait_min
+    return supply_df
+
+@pytest.mark.travis
+def test_filter_trip_list_to_supply_changes():
+    """
+    Only person trips with pathsets that ride, board or alight at changed trip-stops are found again,
+    along with those without a pathset or with one found in a later pathfinding iteration.
+    """
+    trip_list_df = pd.DataFrame({Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM:[0,1,2,3,4]})
+    # (trip list id num, pf_iteration, trip id num, A_seq, B_seq, A_id_num, B_id_num); person trip 4 has no pathset
+    # and person trip 3's was found in pathfinding iteration 101 of iteration 1
+    links = [(0, 1.01, 1, 1, 2, 10, 11),
+             (1, 1.01, 1, 2, 4, 11, 13),
+             (2, 1.01, 2, 1, 2, 20, 12),
+             (3, 2.01, 1, 1, 2, 10, 11)]
+    pathset_links_df = pd.DataFrame(links, columns=[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PF_ITERATION,
+                                                    Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, "A_seq", "B_seq", "A_id_num", "B_id_num"])
+    pathset_links_df[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM] = pathset_links_df[Trip.STOPTIMES_COLUMN_TRIP_ID_NUM].astype(np.float64)
+    pathset_links_df[Passenger.PF_COL_LINK_MODE]        = PathSet.STATE_MODE_TRIP
+    pathset_paths_df = pathset_links_df[[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PF_ITERATION]].copy()
+    pathset_paths_df[Passenger.PF_COL_PATHFINDING_ITERATION] = np.array([1,1,1,101], dtype=np.int32)
+
+    prev_supply_df = make_supply([900.0,905.0,910.0,915.0,902.0,907.0,912.0], np.nan)
+
+    # nothing changed: only person trips 3 and 4 are found
+    filtered_df = Assignment.filter_trip_list_to_supply_changes(trip_list_df, pathset_paths_df, pathset_links_df,
+                                                                prev_supply_df, prev_supply_df.copy())
+    assert list(filtered_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]) == [3,4]
+
+    # trip 1 leaves stop 12 later: 1 rides through it and 2 alights there
+    supply_df   = make_supply([900.0,905.0,911.0,915.0,902.0,907.0,912.0], np.nan)
+    filtered_df = Assignment.filter_trip_list_to_supply_changes(trip_list_df, pathset_paths_df, pathset_links_df,
+                                                                prev_supply_df, supply_df)
+    assert list(filtered_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]) == [1,2,3,4]
+
+    # a new bump wait at the first stop of trip 1 affects 0
+    supply_df   = make_supply([900.0,905.0,910.0,915.0,902.0,907.0,912.0], [899.0,np.nan,np.nan,np.nan,np.nan,np.nan,np.nan])
+    filtered_df = Assignment.filter_trip_list_to_supply_changes(trip_list_df, pathset_paths_df, pathset_links_df,
+                                                                prev_supply_df, supply_df)
+    assert list(filtered_df[Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM]) == [0,3,4]
+
+# the route whose trips get new times after the first iteration: the bus route most, but not all, pathsets use
+changed_route_id    = "A"
+
+def update_route_trip_times(update_trip_times, route_id):
+    """
+    Returns :py:meth:`Trip.update_trip_times` but with only the trips of *route_id* getting new times,
+    so the supply changes after the first iteration are limited to them.
+    """
+    key_cols  = [Trip.STOPTIMES_COLUMN_TRIP_ID_NUM, Trip.STOPTIMES_COLUMN_STOP_SEQUENCE]
+    time_cols = [Trip.STOPTIMES_COLUMN_ARRIVAL_TIME,     Trip.STOPTIMES_COLUMN_DEPARTURE_TIME,
+                 Trip.STOPTIMES_COLUMN_ARRIVAL_TIME_MIN, Trip.STOPTIMES_COLUMN_DEPARTURE_TIME_MIN]
+
+    def update_some_trip_times(trips_df, MSA_RESULTS):
+        prev_times_df = trips_df[key_cols + time_cols].copy()
+        trips_df      = update_trip_times(trips_df, MSA_RESULTS)
+        # in the order of trips_df
+        prev_times_df = pd.merge(left=trips_df[key_cols + [Trip.TRIPS_COLUMN_ROUTE_ID]], right=prev_times_df, how="left")
+        unchanged     = (prev_times_df[Trip.TRIPS_COLUMN_ROUTE_ID] != route_id).values
+        for time_col in time_cols:
+            trips_df.loc[unchanged, time_col] = prev_times_df.loc[unchanged, time_col].values
+        return trips_df
+
+    return staticmethod(update_some_trip_times)
+
+@pytest.mark.travis
+def test_incremental_pathfinding(springfield, monkeypatch):
+    """
+    When only one route's trips change, only the person trips whose pathsets use that route or its stops are
+    found again in the second iteration, and the pathsets carried over for the rest are the same as finding
+    everyone's paths again gives.
+
+    Path enumeration draws depend on the iteration, so this is deterministic pathfinding, where they don't.
+    """
+    monkeypatch.setattr(Trip, "update_trip_times", update_route_trip_times(Trip.update_trip_times, changed_route_id))
+
+    cols    = ["trip_list_id_num","pathnum","description","pf_cost","pf_probability"]
+    results = {}
+    for incremental_pathfinding in [False, True]:
+        (r, output_dir) = springfield("test_incremental_pathfinding_%s" % str(incremental_pathfinding),
+                                      pathfinding_type        = "deterministic",
+                                      iters                   = 2,
+                                      num_trips               = test_size,
+                                      incremental_pathfinding = incremental_pathfinding)
+        assert r["paths_found"] == test_size
+        assert r["passengers_arrived"] > 0
+
+        # the pathsets found in the first pathfinding iteration of each iteration
+        enumerated_df = pd.read_csv(os.path.join(output_dir, Passenger.PF_PATHS_CSV))
+        enumerated_df = enumerated_df.loc[enumerated_df["pathfinding_iteration"]==1]
+        results[incremental_pathfinding] = dict((iteration,
+            enumerated_df.loc[enumerated_df["iteration"]==iteration, cols].sort_values(by=["trip_list_id_num","pathnum"]).reset_index(drop=True))
+            for iteration in [1, 2])
+
+        if incremental_pathfinding:
+            # the person trips with a first iteration pathset that rides the changed route or boards or alights at its stops
+            links_df      = pd.read_csv(os.path.join(output_dir, Passenger.PF_LINKS_CSV))
+            links_df      = links_df.loc[(links_df["iteration"]==1) & (links_df["pathfinding_iteration"]==1) &
+                                         (links_df[Passenger.PF_COL_LINK_MODE]==PathSet.STATE_MODE_TRIP)]
+            route_stops   = set(links_df.loc[links_df["route_id"]==changed_route_id, "A_id"]) | \
+                            set(links_df.loc[links_df["route_id"]==changed_route_id, "B_id"])
+            using_route   = set(links_df.loc[(links_df["route_id"]==changed_route_id) |
+                                             links_df["A_id"].isin(route_stops) | links_df["B_id"].isin(route_stops),
+                                             "trip_list_id_num"])
+
+    # everyone's found in the first iteration, the same way
+    pd.testing.assert_frame_equal(results[True][1], results[False][1])
+    assert results[True][1]["trip_list_id_num"].nunique() == test_size
+
+    # only some are found again in the second, and those use the changed route
+    refound     = set(results[True][2]["trip_list_id_num"])
+    carried     = set(results[True][1]["trip_list_id_num"]) - refound
+    assert len(refound) > 0
+    assert len(carried) > 0
+    assert refound <= using_route
+
+    # the ones found again get what finding everyone's paths gives them
+    full_iter2_df = results[False][2]
+    pd.testing.assert_frame_equal(results[True][2],
+                                  full_iter2_df.loc[full_iter2_df["trip_list_id_num"].isin(refound)].reset_index(drop=True))
+
+    # and so do the ones carried over
+    iter1_df = results[True][1]
+    pd.testing.assert_frame_equal(iter1_df.loc[iter1_df["trip_list_id_num"].isin(carried)].reset_index(drop=True),
+                                  full_iter2_df.loc[full_iter2_df["trip_list_id_num"].isin(carried)].reset_index(drop=True))
+
+if __name__ == '__main__':
+    pytest.main([__file__])
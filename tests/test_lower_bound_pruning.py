@@ -0,0 +1,54 @@
+import os
+import pandas as pd
+import pytest
+from fasttrips import Performance
+
+# LIST OF RUN PARAMETERS
+test_size           = 20
+
+def pruning_results(springfield, springfield_pathsets, pathfinding_type):
+    """
+    Returns [(pathsets, pathfinding performance)] without and with lower bound pruning.
+    """
+    results = []
+    for lower_bound_pruning in [False, True]:
+        (r, output_dir) = springfield("test_lower_bound_pruning_%s_%s" % (pathfinding_type, lower_bound_pruning),
+                                      pathfinding_type    = pathfinding_type,
+                                      num_trips           = test_size,
+                                      lower_bound_pruning = lower_bound_pruning)
+
+        assert r["paths_found"] == test_size
+        assert r["passengers_arrived"] > 0
+
+        performance_df = pd.read_csv(os.path.join(output_dir, Performance.OUTPUT_PERFORMANCE_PF_FILE))
+        results.append((springfield_pathsets(output_dir), performance_df))
+    return results
+
+@pytest.mark.travis
+def test_stochastic_lower_bound_pruning(springfield, springfield_pathsets):
+    """
+    For hyperpaths, the lower bounds are scaled to generalized costs, so stops that can't reach the other end
+    of the trip, or can't get there under the stochastic cutoff, are skipped, which shouldn't change anyone's pathset.
+    """
+    [(unpruned_df, unpruned_perf_df), (pruned_df, pruned_perf_df)] = pruning_results(springfield, springfield_pathsets, "stochastic")
+
+    assert pruned_perf_df[Performance.PERFORMANCE_PF_COL_PRUNED_STOPS].sum() > 0
+    assert pruned_perf_df[Performance.PERFORMANCE_PF_COL_LABEL_ITERATIONS].sum() <= \
+           unpruned_perf_df[Performance.PERFORMANCE_PF_COL_LABEL_ITERATIONS].sum()
+    pd.testing.assert_frame_equal(unpruned_df, pruned_df)
+
+@pytest.mark.travis
+def test_lower_bound_pruning(springfield, springfield_pathsets):
+    """
+    Deterministic labels are minutes, like the lower bounds, so stops past the labeling cutoff are
+    skipped too, and that shouldn't change anyone's pathset, or path costs, either.
+    """
+    [(unpruned_df, unpruned_perf_df), (pruned_df, pruned_perf_df)] = pruning_results(springfield, springfield_pathsets, "deterministic")
+
+    assert pruned_perf_df[Performance.PERFORMANCE_PF_COL_PRUNED_STOPS].sum() > 0
+    assert pruned_perf_df[Performance.PERFORMANCE_PF_COL_LABEL_ITERATIONS].sum() < \
+           unpruned_perf_df[Performance.PERFORMANCE_PF_COL_LABEL_ITERATIONS].sum()
+    pd.testing.assert_frame_equal(unpruned_df, pruned_df)
+
+if __name__ == '__main__':
+    pytest.main([__file__])
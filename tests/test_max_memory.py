@@ -0,0 +1,144 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+import _fasttrips
+from fasttrips import Assignment
+from fasttrips import FastTrips
+from fasttrips import Passenger
+from fasttrips import PathSet
+from fasttrips import Trip
+from fasttrips import Util
+
+EXAMPLE_DIR    = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield')
+
+# DIRECTORY LOCATIONS
+INPUT_NETWORK       = os.path.join(EXAMPLE_DIR, 'networks', 'vermont')
+INPUT_DEMAND        = os.path.join(EXAMPLE_DIR, 'demand', 'general')
+INPUT_CONFIG        = os.path.join(EXAMPLE_DIR, 'configs', 'A')
+OUTPUT_DIR          = os.path.join(EXAMPLE_DIR, 'output', 'test_max_memory')
+
+# INPUT FILE LOCATIONS
+CONFIG_FILE         = os.path.join(INPUT_CONFIG, 'config_ft.txt')
+INPUT_WEIGHTS       = os.path.join(INPUT_CONFIG, 'pathweight_ft.txt')
+
+@pytest.mark.travis
+def test_get_chunk_rows():
+    """
+    Chunks shrink when more memory per row is observed, and don't go below a tenth of the budget.
+    """
+    input_df = pd.DataFrame({"a":range(100), "b":1.0})
+    Util.CHUNK_BYTES_PER_ROW.pop("test", None)
+    mem_gb   = Util.get_process_mem_use_bytes()/(1000.0*1000.0*1000.0)
+
+    chunk_rows = Util.get_chunk_rows("test", input_df, mem_gb + 0.1, 2)
+    assert Util.CHUNK_BYTES_PER_ROW["test"] > 0
+
+    # pretend the last chunk grew the process by 1KB per row
+    Util.CHUNK_BYTES_PER_ROW["test"] = 100
+    Util.record_chunk_memory("test", 1000, Util.get_process_mem_use_bytes() - 1000*1000)
+    assert Util.CHUNK_BYTES_PER_ROW["test"] >= 1000
+    assert Util.get_chunk_rows("test", input_df, mem_gb + 0.1, 2) < chunk_rows
+
+    # over budget
+    assert Util.get_chunk_rows("test", input_df, mem_gb/2, 2) == int(0.1*mem_gb/2*1000*1000*1000/Util.CHUNK_BYTES_PER_ROW["test"])
+    Util.CHUNK_BYTES_PER_ROW.pop("test")
+
+@pytest.fixture(scope='module')
+def pathsets():
+    """
+    A Fast-Trips instance with the network supply in the C++ extension, and the pathsets found for some person
+    trips, ready for costing.
+    """
+    try:
+        os.makedirs(OUTPUT_DIR)
+    except OSError:
+        if not os.path.isdir(OUTPUT_DIR):
+            raise
+
+    ft = FastTrips(INPUT_NETWORK, INPUT_DEMAND, INPUT_WEIGHTS, CONFIG_FILE, OUTPUT_DIR)
+    ft.read_configuration()
+    Assignment.DEBUG_NUM_TRIPS  = 20
+    ft.read_input_files()
+
+    Assignment.PATHFINDING_TYPE = Assignment.PATHFINDING_TYPE_STOCHASTIC
+    Assignment.STOCH_DISPERSION = 0.5
+    PathSet.OVERLAP_VARIABLE      = PathSet.OVERLAP_COUNT
+    PathSet.OVERLAP_SPLIT_TRANSIT = True
+    Assignment.write_configuration(OUTPUT_DIR)
+
+    _fasttrips.reset()
+    veh_trips_df = ft.trips.get_full_trips()
+    Trip.reset_onboard(veh_trips_df)
+    Assignment.initialize_fasttrips_extension(0, OUTPUT_DIR, veh_trips_df)
+
+    ft.passengers.pathfind_trip_list_df = ft.passengers.trip_list_df
+    path_cols = list(ft.passengers.pathfind_trip_list_df.columns.values)
+    for path_tuple in ft.passengers.pathfind_trip_list_df.itertuples(index=False):
+        path_dict = dict(zip(path_cols, path_tuple))
+        (paths_df, links_df, perf_dict) = Assignment.find_trip_based_pathset(1, 1, PathSet(path_dict), True, trace=False)
+        ft.passengers.add_pathset_results(paths_df, links_df)
+
+    (pathset_paths_df, pathset_links_df) = ft.passengers.setup_passenger_pathsets(1, 1, ft.stops, ft.trips.trip_id_df,
+                                                 ft.trips.trips_df, ft.routes.modes_df, ft.transfers, ft.tazs,
+                                                 Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
+    pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
+    (pathset_paths_df, pathset_links_df) = Assignment.flag_missed_transfers(pathset_paths_df, pathset_links_df)
+
+    yield (ft, veh_trips_df, pathset_paths_df, pathset_links_df)
+
+    Assignment.DEBUG_NUM_TRIPS    = -1
+    Assignment.MAX_MEMORY_GB      = 0
+    PathSet.OVERLAP_VARIABLE      = PathSet.OVERLAP_NONE
+    PathSet.OVERLAP_SPLIT_TRANSIT = False
+
+@pytest.mark.travis
+def test_max_memory(pathsets, monkeypatch):
+    """
+    Costing in chunks to fit a small memory budget gives the same results as costing everything at once,
+    in the same order and with the same index, even if the pathsets aren't sorted by person trip.
+    """
+    (ft, veh_trips_df, pathset_paths_df, pathset_links_df) = pathsets
+    # shuffled, with an index that costing's merges wouldn't give back on their own
+    pathset_paths_df = pathset_paths_df.sample(frac=1, random_state=0)
+    pathset_links_df = pathset_links_df.sample(frac=1, random_state=1)
+
+    # count the chunks
+    num_costed = [0]
+    calculate_cost_for_trips = PathSet.calculate_cost_for_trips
+    def count_calculate_cost_for_trips(*args, **kwargs):
+        num_costed[0] += 1
+        return calculate_cost_for_trips(*args, **kwargs)
+    monkeypatch.setattr(PathSet, "calculate_cost_for_trips", staticmethod(count_calculate_cost_for_trips))
+
+    results = []
+    for max_memory_gb in [0, 10]:
+        Assignment.MAX_MEMORY_GB = max_memory_gb
+        # at most about a third of the links per chunk
+        Util.CHUNK_BYTES_PER_ROW["calculate_cost"] = 3*10*1000*1000*1000/len(pathset_links_df)
+        num_costed[0] = 0
+        results.append(PathSet.calculate_cost(Assignment.STOCH_DISPERSION,
+            pathset_paths_df.copy(), pathset_links_df.copy(), veh_trips_df,
+            ft.passengers.trip_list_df, ft.routes, ft.tazs, ft.transfers, stops=ft.stops))
+    Util.CHUNK_BYTES_PER_ROW.pop("calculate_cost")
+    assert num_costed[0] >= 3
+
+    (full_paths_df,    full_links_df)    = results[0]
+    (chunked_paths_df, chunked_links_df) = results[1]
+    pd.testing.assert_frame_equal(full_paths_df, chunked_paths_df)
+    pd.testing.assert_frame_equal(full_links_df, chunked_links_df)
+
+    # and the pathsets come back as they went in
+    path_cols = [Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM]
+    link_cols = path_cols + [Passenger.PF_COL_LINK_NUM, Passenger.PF_COL_LINK_MODE]
+    pd.testing.assert_frame_equal(chunked_paths_df[path_cols], pathset_paths_df[path_cols])
+    pd.testing.assert_frame_equal(chunked_links_df[link_cols], pathset_links_df[link_cols])
+
+    # and each path's cost is the sum of its links'
+    link_costs = chunked_links_df.groupby(path_cols)[Assignment.SIM_COL_PAX_COST].sum()
+    path_costs = chunked_paths_df.set_index(path_cols)[Assignment.SIM_COL_PAX_COST]
+    np.testing.assert_allclose(path_costs.values, link_costs.loc[path_costs.index].values)
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,124 @@
+import os
+import numpy as np
+import pytest
+
+import _fasttrips
+from fasttrips import Assignment
+from fasttrips import FastTrips
+from fasttrips import Passenger
+from fasttrips import PathSet
+from fasttrips import Trip
+
+
+EXAMPLE_DIR    = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield')
+
+# DIRECTORY LOCATIONS
+INPUT_NETWORK       = os.path.join(EXAMPLE_DIR, 'networks', 'vermont')
+INPUT_DEMAND        = os.path.join(EXAMPLE_DIR, 'demand', 'general')
+INPUT_CONFIG        = os.path.join(EXAMPLE_DIR, 'configs', 'A')
+OUTPUT_DIR          = os.path.join(EXAMPLE_DIR, 'output', 'test_native_costing')
+
+@pytest.fixture(scope='module')
+def ft_instance():
+    """
+    A Fast-Trips instance with the network supply in the C++ extension, for some person trips.
+    """
+    try:
+        os.makedirs(OUTPUT_DIR)
+    except OSError:
+        if not os.path.isdir(OUTPUT_DIR):
+            raise
+
+    ft = FastTrips(INPUT_NETWORK, INPUT_DEMAND,
+                   os.path.join(INPUT_CONFIG, 'pathweight_ft.txt'),
+                   os.path.join(INPUT_CONFIG, 'config_ft.txt'),
+                   OUTPUT_DIR)
+    ft.read_configuration()
+    Assignment.DEBUG_NUM_TRIPS  = 20
+    ft.read_input_files()
+
+    Assignment.PATHFINDING_TYPE = Assignment.PATHFINDING_TYPE_STOCHASTIC
+    Assignment.STOCH_DISPERSION = 0.5
+    Assignment.write_configuration(OUTPUT_DIR)
+
+    _fasttrips.reset()
+    veh_trips_df = ft.trips.get_full_trips()
+    Trip.reset_onboard(veh_trips_df)
+    Assignment.initialize_fasttrips_extension(0, OUTPUT_DIR, veh_trips_df)
+
+    ft.passengers.pathfind_trip_list_df = ft.passengers.trip_list_df
+
+    yield (ft, veh_trips_df)
+
+    Assignment.DEBUG_NUM_TRIPS  = -1
+    PathSet.NATIVE_COSTING      = False
+
+@pytest.mark.travis
+def test_calculate_costs_pathfinding(ft_instance):
+    """
+    Costing the pathfinding results gives the pathfinding costs and probabilities back.
+    """
+    (ft, veh_trips_df) = ft_instance
+    (trip_list_id_nums, spec_strs, spec_ints, spec_doubles) = Assignment.get_pathfinding_specs(ft.passengers.trip_list_df)
+
+    (path_ints, path_doubles, link_ints, link_doubles, perf_info) = \
+        _fasttrips.find_pathsets_batch(1, 1, Assignment.get_pathfinding_type_num(), 1, spec_strs, spec_ints, spec_doubles)
+    assert len(path_ints) > 0
+
+    (link_results, cost_path_ints, cost_path_doubles) = \
+        _fasttrips.calculate_costs(spec_strs, spec_ints, spec_doubles, link_ints, link_doubles)
+
+    np.testing.assert_allclose(link_results[:,0], link_doubles[:,4])
+    np.testing.assert_allclose(link_results[:,1], link_doubles[:,3])
+
+    # the paths are in the same order, each starting with link number 0
+    np.testing.assert_array_equal(cost_path_ints[:,0], path_ints[:,0])
+    assert (link_ints[cost_path_ints[:,1],2] == 0).all()
+    np.testing.assert_allclose(cost_path_doubles[:,0], path_doubles[:,0])
+    np.testing.assert_allclose(cost_path_doubles[:,1], path_doubles[:,1])
+    np.testing.assert_allclose(cost_path_doubles[:,2], path_doubles[:,2])
+    # logsum is the same for each path of a person trip and the probabilities sum to one
+    for spec_idx in np.unique(cost_path_ints[:,0]):
+        spec_paths = cost_path_doubles[cost_path_ints[:,0]==spec_idx]
+        assert (spec_paths[:,3] == spec_paths[0,3]).all()
+        assert abs(spec_paths[:,2].sum() - 1.0) < 0.0001
+
+    # a huge link cost override makes that path unlikely
+    link_overrides = np.full((len(link_ints), 3), np.nan)
+    link_overrides[cost_path_ints[0,1],2] = PathSet.HUGE_COST
+    (link_results, cost_path_ints, cost_path_doubles) = \
+        _fasttrips.calculate_costs(spec_strs, spec_ints, spec_doubles, link_ints, link_doubles, link_overrides)
+    assert link_results[cost_path_ints[0,1],0] == PathSet.HUGE_COST
+    assert cost_path_doubles[0,2] < path_doubles[0,2]
+
+@pytest.mark.travis
+def test_native_costing(ft_instance):
+    """
+    With native costing, simulation costs the pathfinding results as pathfinding did.
+    """
+    (ft, veh_trips_df) = ft_instance
+    path_cols = list(ft.passengers.pathfind_trip_list_df.columns.values)
+    for path_tuple in ft.passengers.pathfind_trip_list_df.itertuples(index=False):
+        path_dict = dict(zip(path_cols, path_tuple))
+        (paths_df, links_df, perf_dict) = Assignment.find_trip_based_pathset(1, 1, PathSet(path_dict), True, trace=False)
+        ft.passengers.add_pathset_results(paths_df, links_df)
+
+    (pathset_paths_df, pathset_links_df) = ft.passengers.setup_passenger_pathsets(1, 1, ft.stops, ft.trips.trip_id_df,
+                                                 ft.trips.trips_df, ft.routes.modes_df, ft.transfers, ft.tazs,
+                                                 Assignment.PREPEND_ROUTE_ID_TO_TRIP_ID)
+    pathset_links_df = Assignment.find_passenger_vehicle_times(pathset_links_df, veh_trips_df)
+    (pathset_paths_df, pathset_links_df) = Assignment.flag_missed_transfers(pathset_paths_df, pathset_links_df)
+
+    PathSet.NATIVE_COSTING = True
+    (pathset_paths_df, pathset_links_df) = PathSet.calculate_cost(
+        Assignment.STOCH_DISPERSION, pathset_paths_df, pathset_links_df, veh_trips_df,
+        ft.passengers.trip_list_df, ft.routes, ft.tazs, ft.transfers, stops=ft.stops)
+
+    np.testing.assert_allclose(pathset_links_df[Assignment.SIM_COL_PAX_COST].values, pathset_links_df[Passenger.PF_COL_LINK_COST].values.astype(np.float64))
+    np.testing.assert_allclose(pathset_paths_df[Assignment.SIM_COL_PAX_COST].values, pathset_paths_df[PathSet.PATH_KEY_COST].values)
+
+    prob_sum = pathset_paths_df.groupby(Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM)[Assignment.SIM_COL_PAX_PROBABILITY].sum()
+    np.testing.assert_allclose(prob_sum.values, 1.0)
+
+if __name__ == '__main__':
+    pytest.main([__file__])
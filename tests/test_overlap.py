@@ -1,6 +1,8 @@
 import os
+import numpy as np
+import pandas as pd
 import pytest
-from fasttrips import Run
+from fasttrips import PathSet, Run
 
 EXAMPLE_DIR    = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield')
 
@@ -40,3 +42,30 @@ def test_overlap(overlap_var, split_links ):
         num_trips        = 5)
 
     assert r["passengers_arrived"] > 0
+
+@pytest.mark.parametrize("overlap_var", ["count","distance","time"])
+@pytest.mark.travis
+def test_overlap_pathsize(overlap_var, monkeypatch):
+    """
+    Two paths sharing their access link, with path lengths 3 and 3 links, or 20 and 30 minutes/miles.
+    With gamma=1, that gives path sizes of 5/6 for count, and 0.9 for time and distance.
+    """
+    links_df = pd.DataFrame({"person_id"       :"p1",
+                             "person_trip_id"  :"t1",
+                             "trip_list_id_num":1,
+                             "trace"           :False,
+                             "pathnum"         :[0,0,0,1,1,1],
+                             "linknum"         :[0,1,2,0,1,2],
+                             "A_id_num"        :[1,2,3,1,2,5],
+                             "B_id_num"        :[2,3,4,2,5,4],
+                             "mode"            :["walk_access","local_bus","walk_egress","walk_access","local_bus","walk_egress"],
+                             "distance"        :[5.0,10.0,5.0,5.0,20.0,5.0]})
+    links_df["new_linktime"] = pd.to_timedelta(links_df["distance"], unit='m')
+
+    monkeypatch.setattr(PathSet, "OVERLAP_VARIABLE",        overlap_var)
+    monkeypatch.setattr(PathSet, "OVERLAP_SCALE_PARAMETER", 1.0)
+    overlap_df = PathSet.calculate_overlap(links_df)
+
+    expected_PS = 5.0/6.0 if overlap_var == "count" else 0.9
+    assert list(overlap_df["pathnum"]) == [0,1]
+    np.testing.assert_allclose(overlap_df["ln_PS"], np.log(expected_PS))
@@ -0,0 +1,145 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from fasttrips import Assignment, Passenger, PathSetCache, Run
+
+EXAMPLE_DIR    = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield')
+
+# DIRECTORY LOCATIONS
+INPUT_NETWORK       = os.path.join(EXAMPLE_DIR, 'networks', 'vermont')
+INPUT_DEMAND        = os.path.join(EXAMPLE_DIR, 'demand', 'general')
+INPUT_CONFIG        = os.path.join(EXAMPLE_DIR, 'configs', 'A')
+OUTPUT_DIR          = os.path.join(EXAMPLE_DIR, 'output')
+CACHE_DIR           = os.path.join(OUTPUT_DIR, 'test_pathset_cache_dir')
+
+# INPUT FILE LOCATIONS
+CONFIG_FILE         = os.path.join(INPUT_CONFIG, 'config_ft.txt')
+INPUT_WEIGHTS       = os.path.join(INPUT_CONFIG, 'pathweight_ft.txt')
+
+# LIST OF RUN PARAMETERS
+test_size           = 10
+
+def make_results(num_trips, num_paths):
+    """
+    Returns columnar pathset results like the C++ extension's, with *num_paths* paths of two links for each person trip.
+    """
+    path_ints    = np.array([[trip, path] for trip in range(num_trips) for path in range(num_paths)], dtype=np.int32).reshape(-1,2)
+    path_doubles = np.repeat(path_ints[:,:1].astype(np.float64), 5, axis=1)
+    link_ints    = np.array([[trip, path, link, 0, 0, 0, 0, 0, 0] for trip, path in path_ints for link in range(2)], dtype=np.int32).reshape(-1,9)
+    link_doubles = np.repeat(link_ints[:,:1].astype(np.float64), 6, axis=1)
+    return (path_ints, path_doubles, link_ints, link_doubles)
+
+@pytest.mark.travis
+def test_pathset_cache_lookup():
+    """
+    Cached results come back for the trip keys that were added, under the supply they were added for.
+    """
+    if os.path.exists(CACHE_DIR): shutil.rmtree(CACHE_DIR)
+    cache = PathSetCache(CACHE_DIR, 100)
+    cache.set_supply(["supply A"])
+    cache.add(["a","b"], make_results(2, 2))
+    # c has no paths, and the None person trip isn't cached
+    cache.add(["c",None], make_results(0, 0))
+
+    # writing happens when the supply changes
+    cache.set_supply(["supply B"])
+    assert cache.lookup(["a"])[0].tolist() == [False]
+    cache.set_supply(["supply A"])
+    (hit, (path_ints, path_doubles, link_ints, link_doubles)) = cache.lookup(["c","x","b",None])
+    assert hit.tolist() == [True, False, True, False]
+    # b is the second hit
+    assert path_ints[:,0].tolist() == [1,1]
+    assert path_doubles[:,0].tolist() == [1.0,1.0]
+    assert link_ints[:,0].tolist() == [1,1,1,1]
+    assert len(link_doubles) == 4
+
+    # over the cap, the least recently used segment goes, but temporary files aren't segments
+    temp_path = cache.get_segment_path("temp") + PathSetCache.TEMP_FILE_SUFFIX
+    open(temp_path, 'w').close()
+    cache.max_bytes = 0
+    cache.add(["d"], make_results(1, 1))
+    cache.write()
+    assert sorted(os.listdir(CACHE_DIR)) == sorted([os.path.basename(cache.get_segment_path(cache.supply_key)),
+                                                    os.path.basename(temp_path)])
+
+@pytest.mark.travis
+def test_pathset_cache_write_failure():
+    """
+    A segment that fails to write doesn't leave its temporary file behind.
+    """
+    if os.path.exists(CACHE_DIR): shutil.rmtree(CACHE_DIR)
+    cache = PathSetCache(CACHE_DIR, 100)
+    cache.set_supply(["supply A"])
+    cache.add(["a"], make_results(1, 1))
+    # a directory in the way of the segment file
+    os.makedirs(cache.get_segment_path(cache.supply_key))
+
+    with pytest.raises(OSError):
+        cache.write()
+    assert not os.path.exists(cache.get_segment_path(cache.supply_key) + PathSetCache.TEMP_FILE_SUFFIX)
+
+@pytest.mark.travis
+def test_pathset_cache_keys():
+    """
+    Trip keys come straight from the trip list columns: the same path specification gets the same key,
+    the preferred time is the arrival time for outbound trips, and traced person trips aren't cached.
+    """
+    trip_list_df = pd.DataFrame({
+        Passenger.TRIP_LIST_COLUMN_PERSON_ID:               ["p1", "p1", "p1", "p2"],
+        Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID:          ["t1", "t1", "t1", "t1"],
+        Passenger.TRIP_LIST_COLUMN_USER_CLASS:              ["all"]*4,
+        Passenger.TRIP_LIST_COLUMN_PURPOSE:                 ["work"]*4,
+        Passenger.TRIP_LIST_COLUMN_ACCESS_MODE:             ["walk"]*4,
+        Passenger.TRIP_LIST_COLUMN_TRANSIT_MODE:            ["transit"]*4,
+        Passenger.TRIP_LIST_COLUMN_EGRESS_MODE:             ["walk"]*4,
+        Passenger.TRIP_LIST_COLUMN_ORIGIN_TAZ_ID_NUM:       [1, 1, 1, 1],
+        Passenger.TRIP_LIST_COLUMN_DESTINATION_TAZ_ID_NUM:  [2, 2, 2, 2],
+        Passenger.TRIP_LIST_COLUMN_OUTBOUND:                [True, True, False, True],
+        Passenger.TRIP_LIST_COLUMN_ARRIVAL_TIME_MIN:        [480.0, 480.0, 480.0, 480.0],
+        Passenger.TRIP_LIST_COLUMN_DEPARTURE_TIME_MIN:      [420.0, 450.0, 420.0, 420.0],
+        Passenger.TRIP_LIST_COLUMN_VOT:                     [10.0]*4,
+        Passenger.TRIP_LIST_COLUMN_TRACE:                   [False, False, False, True],
+    })
+    trip_keys = Assignment.get_pathset_cache_keys(1, trip_list_df)
+    # outbound, so the departure time doesn't matter
+    assert trip_keys[0] == trip_keys[1]
+    assert trip_keys[0] != trip_keys[2]
+    assert trip_keys[3] is None
+    assert Assignment.get_pathset_cache_keys(2, trip_list_df)[0] != trip_keys[0]
+
+@pytest.mark.travis
+def test_pathset_cache_run():
+    """
+    A second run with the same network, demand and pathfinding configuration reads everyone's pathsets from
+    the cache and gets the same paths.
+    """
+    if os.path.exists(CACHE_DIR): shutil.rmtree(CACHE_DIR)
+    for output_folder in ["test_pathset_cache_1", "test_pathset_cache_2"]:
+        Run.run_fasttrips(
+            input_network_dir= INPUT_NETWORK,
+            input_demand_dir = INPUT_DEMAND,
+            run_config       = CONFIG_FILE,
+            input_weights    = INPUT_WEIGHTS,
+            output_dir       = OUTPUT_DIR,
+            output_folder    = output_folder,
+            pathfinding_type = "stochastic",
+            overlap_variable = "None",
+            iters            = 1,
+            dispersion       = 0.50,
+            num_trips        = test_size,
+            pathset_cache_dir= CACHE_DIR)
+
+    assert Assignment.pathset_cache.hits   == test_size
+    assert Assignment.pathset_cache.misses == 0
+
+    paths_1 = pd.read_csv(os.path.join(OUTPUT_DIR, "test_pathset_cache_1", "pathset_paths.csv"))
+    paths_2 = pd.read_csv(os.path.join(OUTPUT_DIR, "test_pathset_cache_2", "pathset_paths.csv"))
+    pd.util.testing.assert_frame_equal(paths_1, paths_2)
+
+if __name__ == '__main__':
+    test_pathset_cache_lookup()
+    test_pathset_cache_write_failure()
+    test_pathset_cache_keys()
+    test_pathset_cache_run()
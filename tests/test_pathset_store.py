@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from fasttrips.PathSetStore import PathSetStore
+
+
+def make_pathsets(trip_list_id_nums, num_paths, label):
+    """
+    Returns (paths_df, links_df) with *num_paths* paths of two links each for the given trip list ID numbers.
+    """
+    paths = [(trip_list_id_num, pathnum, label) for trip_list_id_num in trip_list_id_nums for pathnum in range(num_paths)]
+    links = [path + (linknum,) for path in paths for linknum in range(2)]
+    return (pd.DataFrame(paths, columns=["trip_list_id_num","pathnum","label"]),
+            pd.DataFrame(links, columns=["trip_list_id_num","pathnum","label","linknum"]))
+
+@pytest.mark.travis
+def test_pathset_store_replace():
+    store = PathSetStore(4)
+    store.set_pathsets(*make_pathsets([1,2,3,4], 2, "first"))
+
+    # 2 is found again, 3 is sought but not found
+    store.replace_pathsets([2,3], *make_pathsets([2], 3, "second"))
+    (paths_df, links_df) = store.get_pathsets()
+
+    assert list(paths_df["trip_list_id_num"]) == [1,1,2,2,2,4,4]
+    assert list(paths_df["pathnum"]) == [0,1,0,1,2,0,1]
+    assert list(paths_df["label"]) == ["first"]*2 + ["second"]*3 + ["first"]*2
+    assert list(paths_df.index) == list(range(len(paths_df)))
+    assert list(links_df.index) == list(range(len(links_df)))
+    assert list(links_df["linknum"]) == [0,1]*len(paths_df)
+    assert len(links_df) == 2*len(paths_df)
+    assert set(links_df.loc[links_df["trip_list_id_num"]==2, "label"]) == set(["second"])
+
+    # the blocks were put together, so another replacement only keeps the latest
+    store.replace_pathsets([1], *make_pathsets([1], 1, "third"))
+    (paths_df, links_df) = store.get_pathsets()
+    assert list(paths_df["trip_list_id_num"]) == [1,2,2,2,4,4]
+    assert list(paths_df.index) == list(range(len(paths_df)))
+
+    # nothing replaced, so nothing to put together
+    assert store.get_pathsets()[0] is paths_df
+
+@pytest.mark.travis
+def test_pathset_store_grows():
+    store = PathSetStore()
+    store.set_pathsets(*make_pathsets([10], 1, "first"))
+    store.replace_pathsets([3,12], *make_pathsets([12], 2, "second"))
+    (paths_df, links_df) = store.get_pathsets()
+
+    assert len(store.trip_block) > 12
+    assert list(paths_df["trip_list_id_num"]) == [10,12,12]
+    assert list(paths_df["label"]) == ["first"] + ["second"]*2
@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from fasttrips import Assignment
+
+# LIST OF RUN PARAMETERS
+number_of_processes_options = [1, 2]
+test_size                   = 20
+
+@pytest.fixture(scope='module')
+def process_results(springfield):
+    """
+    (results, output directory) for each number of processes.
+    """
+    return dict((number_of_processes, springfield("test_processes_%d" % number_of_processes,
+                                                  max_stop_process_count = 2,
+                                                  pf_iters               = 2,
+                                                  iters                  = 2,
+                                                  num_trips              = test_size,
+                                                  number_of_processes    = number_of_processes))
+                for number_of_processes in number_of_processes_options)
+
+@pytest.mark.parametrize("number_of_processes", number_of_processes_options)
+
+@pytest.mark.travis
+def test_processes(process_results, number_of_processes):
+
+    (r, output_dir) = process_results[number_of_processes]
+
+    assert r["paths_found"] == test_size
+    assert r["passengers_arrived"] > 0
+
+@pytest.mark.travis
+def test_processes_same_pathsets(process_results, springfield_pathsets):
+    """
+    Worker processes get the same network supply as the parent, so the pathsets
+    shouldn't depend on how many processes found them.
+    """
+    pd.testing.assert_frame_equal(springfield_pathsets(process_results[1][1]),
+                                  springfield_pathsets(process_results[2][1]))
+
+@pytest.mark.travis
+def test_processes_persist(process_results):
+    """
+    Worker processes are started once and then get supply updates for subsequent iterations.
+    """
+    (r, output_dir) = process_results[2]
+    for worker_num in [1, 2]:
+        with open(os.path.join(output_dir, "ft_debug_worker%02d.log" % worker_num)) as worker_log:
+            log_lines = worker_log.readlines()
+        assert len([line for line in log_lines if line.rstrip().endswith("starting")]) == 1
+        assert len([line for line in log_lines if line.rstrip().endswith("updating supply")]) > 1
+        # after the first iteration, they only get the stop times that changed
+        assert len([line for line in log_lines if line.rstrip().endswith("changed stop times")]) > 0
+
+def test_stop_times_changes():
+    """
+    Only the stop times whose times or overcap changed are sent, unless the trip stops changed.
+    """
+    stoptime_index = np.array([[0,1,5],[0,2,6],[1,1,5]], dtype=np.int32)
+    stoptime_times = np.array([[10.0,11.0,0.0,0.0],[15.0,15.5,1.0,0.0],[20.0,21.0,0.0,0.0]])
+
+    new_times      = stoptime_times.copy()
+    new_times[1,3] = 2.0
+    (changed_index, changed_times) = Assignment.get_stop_times_changes((stoptime_index, stoptime_times), (stoptime_index, new_times))
+    np.testing.assert_array_equal(changed_index, stoptime_index[[1]])
+    np.testing.assert_array_equal(changed_times, new_times[[1]])
+
+    assert Assignment.get_stop_times_changes(None, (stoptime_index, new_times)) is None
+    assert Assignment.get_stop_times_changes((stoptime_index[:2], stoptime_times[:2]), (stoptime_index, new_times)) is None
+
+@pytest.mark.travis
+def test_processes_resize(process_results):
+    """
+    When the number of processes changes, the running workers are kept and the pool is resized to fit.
+    """
+    # the workers read the configuration the last run wrote
+    (r, output_dir) = process_results[2]
+    assert Assignment.OUTPUT_DIR == output_dir
+
+    try:
+        Assignment.start_worker_processes(1, 1, 2)
+        worker_pids = dict((process_idx, process_info["process"].pid) for process_idx, process_info in Assignment.worker_process_dict.items())
+
+        Assignment.start_worker_processes(1, 1, 3)
+        assert sorted(Assignment.worker_process_dict.keys()) == [1, 2, 3]
+        for process_idx in [1, 2]:
+            assert Assignment.worker_process_dict[process_idx]["process"].pid == worker_pids[process_idx]
+
+        Assignment.start_worker_processes(1, 1, 1)
+        assert sorted(Assignment.worker_process_dict.keys()) == [1]
+        assert Assignment.worker_process_dict[1]["process"].pid == worker_pids[1]
+        assert Assignment.worker_process_dict[1]["process"].is_alive()
+    finally:
+        Assignment.stop_worker_processes()
+
+if __name__ == '__main__':
+    pytest.main([__file__])
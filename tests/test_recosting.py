@@ -0,0 +1,83 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from fasttrips import Assignment, Passenger, Run
+
+EXAMPLE_DIR    = os.path.join(os.getcwd(), 'fasttrips', 'Examples', 'Springfield')
+
+# DIRECTORY LOCATIONS
+INPUT_NETWORK       = os.path.join(EXAMPLE_DIR, 'networks', 'vermont')
+INPUT_DEMAND        = os.path.join(EXAMPLE_DIR, 'demand', 'general')
+INPUT_CONFIG        = os.path.join(EXAMPLE_DIR, 'configs', 'A')
+OUTPUT_DIR          = os.path.join(EXAMPLE_DIR, 'output')
+
+# INPUT FILE LOCATIONS
+CONFIG_FILE         = os.path.join(INPUT_CONFIG, 'config_ft.txt')
+INPUT_WEIGHTS       = os.path.join(INPUT_CONFIG, 'pathweight_ft.txt')
+
+# LIST OF RUN PARAMETERS
+test_size           = 20
+
+def read_paths_column(pathset_dir, colname):
+    """
+    Returns the given column of the pathset paths in the given directory, in a consistent order.
+    """
+    paths_df = pd.read_csv(os.path.join(pathset_dir, Passenger.PATHSET_PATHS_CSV),
+                           dtype={Passenger.TRIP_LIST_COLUMN_PERSON_ID:object, Passenger.TRIP_LIST_COLUMN_PERSON_TRIP_ID:object})
+    paths_df.sort_values([Passenger.TRIP_LIST_COLUMN_TRIP_LIST_ID_NUM, Passenger.PF_COL_PATH_NUM], inplace=True)
+    return paths_df[colname].values
+
+@pytest.mark.travis
+@pytest.mark.parametrize("native_costing", [False, True])
+def test_recosting(native_costing):
+    """
+    Re-costing a run's pathsets with its own weights reproduces its path probabilities, and
+    re-costing them with other weights changes them, without finding any paths.
+    With native costing, the C++ extension costs each with the right weights.
+    """
+    run_args = dict(input_network_dir= INPUT_NETWORK,
+                    input_demand_dir = INPUT_DEMAND,
+                    run_config       = CONFIG_FILE,
+                    output_dir       = OUTPUT_DIR,
+                    pathfinding_type = "stochastic",
+                    overlap_variable = "None",
+                    iters            = 1,
+                    dispersion       = 0.50,
+                    native_costing   = native_costing,
+                    num_trips        = test_size)
+    output_folder = "test_recosting_native" if native_costing else "test_recosting"
+
+    r = Run.run_fasttrips(input_weights=INPUT_WEIGHTS, output_folder="%s_paths" % output_folder, **run_args)
+    pathset_dir = os.path.join(OUTPUT_DIR, "%s_paths" % output_folder)
+
+    # weigh waiting three times as heavily
+    alt_weights = os.path.join(OUTPUT_DIR, "test_recosting_pathweight_ft.txt")
+    with open(INPUT_WEIGHTS, 'r') as infile:
+        weights_text = infile.read()
+    with open(alt_weights, 'w') as outfile:
+        outfile.write(weights_text.replace("wait_time_min        0.0354", "wait_time_min        0.1062"))
+
+    results = Run.run_recosting(pathset_dir, [INPUT_WEIGHTS, alt_weights], output_folder=output_folder, **run_args)
+
+    assert len(results) == 2
+    for result in results:
+        assert result["paths_found"] == r["paths_found"]
+        assert result["passengers_arrived"] == r["passengers_arrived"]
+
+    found_probabilities = read_paths_column(pathset_dir, Assignment.SIM_COL_PAX_PROBABILITY)
+    same_probabilities  = read_paths_column(os.path.join(OUTPUT_DIR, output_folder, "recost_0"), Assignment.SIM_COL_PAX_PROBABILITY)
+    alt_probabilities   = read_paths_column(os.path.join(OUTPUT_DIR, output_folder, "recost_1"), Assignment.SIM_COL_PAX_PROBABILITY)
+
+    assert len(same_probabilities) == len(found_probabilities)
+    assert np.allclose(same_probabilities, found_probabilities)
+    assert len(alt_probabilities) == len(found_probabilities)
+    assert not np.allclose(alt_probabilities, found_probabilities)
+
+    same_costs = read_paths_column(os.path.join(OUTPUT_DIR, output_folder, "recost_0"), Assignment.SIM_COL_PAX_COST)
+    alt_costs  = read_paths_column(os.path.join(OUTPUT_DIR, output_folder, "recost_1"), Assignment.SIM_COL_PAX_COST)
+    assert len(alt_costs) == len(same_costs)
+    assert not np.allclose(alt_costs, same_costs)
+
+if __name__ == '__main__':
+    test_recosting(False)
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from fasttrips import Skimming
+
+@pytest.mark.travis
+def test_create_skims(springfield):
+    """
+    Skims should be written for every pair of zones, with paths between some of them.
+    """
+    (r, skim_dir) = springfield("test_create_skims",
+                                num_trips        = 5,
+                                create_skims     = True,
+                                skim_start_time  = "15:00",
+                                skim_end_time    = "16:00")
+
+    zones_df = pd.read_csv(os.path.join(skim_dir, Skimming.OUTPUT_SKIM_ZONES_FILE))
+    num_zones = len(zones_df)
+    assert num_zones > 1
+
+    skims = {}
+    for skim_name in Skimming.SKIMS:
+        skims[skim_name] = np.load(os.path.join(skim_dir, Skimming.OUTPUT_SKIM_FILE_TEMPLATE % skim_name), mmap_mode='r')
+        assert skims[skim_name].shape == (num_zones, num_zones)
+
+    # no skims within a zone
+    assert np.isnan(np.diagonal(skims["ivt"])).all()
+
+    # the skims have paths for the same zone pairs
+    has_path = np.isfinite(skims["ivt"])
+    assert has_path.sum() > 0
+    for skim_name in Skimming.SKIMS:
+        assert (np.isfinite(skims[skim_name]) == has_path).all()
+
+    assert (skims["ivt"][has_path]       >  0).all()
+    assert (skims["wait"][has_path]      >= 0).all()
+    assert (skims["walk"][has_path]      >  0).all()
+    assert (skims["transfers"][has_path] >= 0).all()
+    assert (skims["cost"][has_path]      >  0).all()
+
+if __name__ == '__main__':
+    pytest.main([__file__])
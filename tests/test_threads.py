@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+# LIST OF RUN PARAMETERS
+number_of_threads_options = [1, 4]
+test_size                 = 20
+
+@pytest.fixture(scope='module')
+def thread_results(springfield):
+    """
+    (results, output directory) for each number of threads.
+    """
+    return dict((number_of_threads, springfield("test_threads_%d" % number_of_threads,
+                                                max_stop_process_count = 2,
+                                                pf_iters               = 2,
+                                                num_trips              = test_size,
+                                                number_of_threads      = number_of_threads))
+                for number_of_threads in number_of_threads_options)
+
+@pytest.mark.parametrize("number_of_threads", number_of_threads_options)
+
+@pytest.mark.travis
+def test_threads(thread_results, number_of_threads):
+
+    (r, output_dir) = thread_results[number_of_threads]
+
+    assert r["paths_found"] == test_size
+    assert r["passengers_arrived"] > 0
+
+@pytest.mark.travis
+def test_threads_same_pathsets(thread_results, springfield_pathsets):
+    """
+    Path enumeration uses a random number generator per person trip, so the pathsets
+    shouldn't depend on how many threads found them.
+    """
+    pd.testing.assert_frame_equal(springfield_pathsets(thread_results[1][1]),
+                                  springfield_pathsets(thread_results[4][1]))
+
+@pytest.mark.travis
+def test_threads_same_as_processes(springfield, springfield_pathsets):
+    """
+    With capacity constraints, later iterations find paths around the bump waits.  Threads
+    get those just as worker processes do, so the pathsets should be the same either way.
+    """
+    output_dirs = []
+    for (number_of_threads, number_of_processes) in [(4, 1), (1, 2)]:
+        (r, output_dir) = springfield("test_threads_capacity_%d_%d" % (number_of_threads, number_of_processes),
+                                      capacity            = True,
+                                      iters               = 3,
+                                      num_trips           = test_size,
+                                      number_of_threads   = number_of_threads,
+                                      number_of_processes = number_of_processes)
+        assert r["passengers_arrived"] > 0
+        output_dirs.append(output_dir)
+
+    pd.testing.assert_frame_equal(springfield_pathsets(output_dirs[0]),
+                                  springfield_pathsets(output_dirs[1]))
+
+if __name__ == '__main__':
+    pytest.main([__file__])